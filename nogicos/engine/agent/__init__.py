@@ -11,6 +11,7 @@ Components:
 """
 
 from .react_agent import ReActAgent, AgentResult
+from .conversation import ConversationHistory
 from .planner import TaskPlanner, Plan, PlanExecuteState, is_simple_task
 from .classifier import TaskClassifier, TaskType, TaskComplexity, ClassificationResult
 from .modes import AgentMode, ModeRouter, get_mode_router, ModeConfig
@@ -26,7 +27,7 @@ from .events import (
 from .event_bus import (
     EventBus, get_event_bus, set_event_bus, on_event, on_all_events,
     BackpressureEventBus, get_backpressure_bus, init_backpressure_bus,
-    EventBusOverflowError,
+    EventBusOverflowError, DispatchEventBus, OverflowPolicy, configure_event_bus,
 )
 from .ws_adapter import (
     WebSocketEventAdapter, get_ws_adapter, set_ws_adapter,
@@ -50,7 +51,7 @@ from .types import (
     ToolResult, ToolCall, ToolDefinition, ToolParameter,
     Message, MessageRole, MessageHistory,
     WindowContext, AgentContext,
-    LLMResponse, StopReason,
+    LLMResponse, StopReason, CallTiming,
     HWND,
 )
 from .validators import (
@@ -78,6 +79,7 @@ from .concurrency import (
     TaskSlotInfo, WindowLockInfo,
     get_concurrency_manager, set_concurrency_manager,
 )
+from .agent_pool import AgentPool
 from .termination import (
     TerminationChecker, TerminationConfig, TerminationResult,
     TerminationReason, TerminationType,
@@ -101,7 +103,7 @@ from .tool_descriptions import (
     TOOL_DESCRIPTIONS,
 )
 from .context_manager import (
-    ContextManager, TokenBudget, TokenCounter,
+    ContextManager, TokenBudget, TokenCounter, get_token_counter,
     ContextCompressor, CompressionResult,
     get_context_manager,
 )
@@ -117,6 +119,7 @@ from .vision import (
 __all__ = [
     # Core Agent
     'ReActAgent',
+    'ConversationHistory',
     'AgentResult',
     # Planning
     'TaskPlanner',
@@ -148,6 +151,9 @@ __all__ = [
     'get_backpressure_bus',
     'init_backpressure_bus',
     'EventBusOverflowError',
+    'DispatchEventBus',
+    'OverflowPolicy',
+    'configure_event_bus',
     'WebSocketEventAdapter',
     'get_ws_adapter',
     'set_ws_adapter',
@@ -192,6 +198,7 @@ __all__ = [
     'AgentContext',
     'LLMResponse',
     'StopReason',
+    'CallTiming',
     'HWND',
     'ToolCallValidator',
     'SecurityValidator',
@@ -230,6 +237,7 @@ __all__ = [
     'WindowLockInfo',
     'get_concurrency_manager',
     'set_concurrency_manager',
+    'AgentPool',
     # Termination (Phase 3)
     'TerminationChecker',
     'TerminationConfig',
@@ -262,6 +270,7 @@ __all__ = [
     'ContextManager',
     'TokenBudget',
     'TokenCounter',
+    'get_token_counter',
     'ContextCompressor',
     'CompressionResult',
     'get_context_manager',
@@ -0,0 +1,149 @@
+# -*- coding: utf-8 -*-
+"""
+NogicOS Agent Pool
+==================
+
+ReActAgent keeps per-task state (current task id, browser session, cache
+warm-up bookkeeping), so one instance cannot run two tasks at once. The
+pool holds up to `size` agents and leases one per task.
+
+Admission goes through ConcurrencyManager: tasks whose windows, files and
+sessions are disjoint run in parallel, the rest wait in FIFO order instead
+of being rejected.
+
+Usage:
+    pool = AgentPool(lambda: ReActAgent(status_server=server))
+    pool.warm(1)
+
+    async with pool.lease(task_id, session_id="s1", target_hwnds={hwnd}) as agent:
+        result = await agent.run_with_planning(task=task, session_id="s1")
+"""
+
+import asyncio
+import logging
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Dict, List, Optional, Set
+
+from .concurrency import ConcurrencyManager, get_concurrency_manager
+
+logger = logging.getLogger(__name__)
+
+
+class AgentPool:
+    """Bounded pool of agent instances scheduled by ConcurrencyManager"""
+
+    def __init__(
+        self,
+        factory: Callable[[], Any],
+        size: Optional[int] = None,
+        concurrency: Optional[ConcurrencyManager] = None,
+    ):
+        """
+        Args:
+            factory: Creates a new agent (e.g. ReActAgent)
+            size: Maximum agents; defaults to the manager's task slot count
+            concurrency: Scheduler; defaults to the global ConcurrencyManager
+        """
+        self.concurrency = concurrency or get_concurrency_manager()
+        self.size = size or self.concurrency.config.max_concurrent_tasks
+        self._factory = factory
+
+        self._idle: List[Any] = []
+        self._leased: Dict[str, Any] = {}
+        self._created = 0
+        self._available = asyncio.Condition()
+
+    def warm(self, count: int = 1):
+        """Create agents up front so the first requests skip initialization"""
+        while self._created < min(count, self.size):
+            self._idle.append(self._create())
+
+    def _create(self) -> Any:
+        self._created += 1
+        agent = self._factory()
+        logger.info(f"[AgentPool] Agent {self._created}/{self.size} created")
+        return agent
+
+    async def _checkout(self) -> Any:
+        async with self._available:
+            while not self._idle and self._created >= self.size:
+                await self._available.wait()
+            if self._idle:
+                return self._idle.pop()
+            return self._create()
+
+    async def _checkin(self, agent: Any):
+        async with self._available:
+            self._idle.append(agent)
+            self._available.notify()
+
+    @asynccontextmanager
+    async def lease(
+        self,
+        task_id: str,
+        session_id: Optional[str] = None,
+        target_hwnds: Optional[Set[int]] = None,
+        target_files: Optional[Set[str]] = None,
+        max_iterations: Optional[int] = None,
+        timeout: Optional[float] = None,
+        desktop: bool = True,
+    ):
+        """
+        Wait for a task slot and an idle agent, yield the agent, return it.
+
+        Args:
+            task_id: Task identifier (one slot per id)
+            session_id: Tasks in the same session never run concurrently
+            target_hwnds: Windows the task operates on
+            target_files: Files the task operates on
+            max_iterations: Per-task override, restored on return
+            timeout: Maximum wait for a slot (None waits indefinitely)
+            desktop: The task drives the mouse/keyboard. Tasks that do not
+                     (read-only modes) never wait for desktop tasks
+
+        Raises:
+            TooManyTasksError: No slot within `timeout`
+        """
+        async with self.concurrency.task_slot(
+            task_id,
+            target_hwnds=target_hwnds,
+            target_files=target_files,
+            session_id=session_id,
+            timeout=timeout,
+            desktop=desktop,
+        ):
+            agent = await self._checkout()
+            default_iterations = getattr(agent, "max_iterations", None)
+            if max_iterations is not None:
+                agent.max_iterations = max_iterations
+            self._leased[task_id] = agent
+            try:
+                yield agent
+            finally:
+                self._leased.pop(task_id, None)
+                if max_iterations is not None:
+                    agent.max_iterations = default_iterations
+                await self._checkin(agent)
+
+    @property
+    def active_task_ids(self) -> List[str]:
+        """Tasks currently holding an agent"""
+        return list(self._leased)
+
+    @property
+    def is_saturated(self) -> bool:
+        """No slot is free for a new task"""
+        return self.concurrency.available_slots <= 0 or (
+            not self._idle and self._created >= self.size
+        )
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Pool and scheduler counters"""
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": len(self._idle),
+            "leased": len(self._leased),
+            "active_tasks": self.active_task_ids,
+            "scheduler": self.concurrency.get_stats(),
+        }
@@ -7,7 +7,8 @@ NogicOS 异步数据库封装
 方案:
 1. aiosqlite - 纯异步，推荐
 2. 连接池管理
-3. 批量写入优化
+3. 批量写入优化：按语句类型分组 executemany，数量/时间双触发刷新
+4. 追加日志（操作日志）：写入先落盘到日志文件，启动时重放，崩溃不丢状态
 
 参考:
 - LangGraph Checkpointer 持久化策略
@@ -17,10 +18,14 @@ NogicOS 异步数据库封装
 import asyncio
 import json
 import logging
-from typing import Optional, List, Dict, Any, Union, TYPE_CHECKING
+import os
+import time
+from typing import Optional, List, Dict, Any, Tuple, Union, TYPE_CHECKING
 from contextlib import asynccontextmanager
 from datetime import datetime
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from ..observability import spans as tracing
 
 logger = logging.getLogger(__name__)
 
@@ -52,6 +57,139 @@ class TaskRecord:
     updated_at: str
 
 
+# ========== 追加日志 ==========
+
+class AppendLog:
+    """
+    写前追加日志（按代号分段的 JSON Lines 文件）
+    
+    每次缓冲写入先追加一行到当前段文件，刷新到数据库前切换到下一段；
+    事务提交时在同一事务里记录已应用的段号，然后删除旧段。
+    因此进程崩溃后，未入库的操作可以在启动时按顺序重放，且不会重复应用。
+    
+    文件名: <base>.<gen:06d>
+    """
+    
+    def __init__(self, base_path: str, fsync: bool = False):
+        """
+        Args:
+            base_path: 日志文件前缀
+            fsync: 每次追加后 fsync（防断电；默认只保证进程崩溃不丢）
+        """
+        self.base_path = base_path
+        self.fsync = fsync
+        self.generation = 0
+        self._file = None
+        self.bytes_written = 0
+        self.records_written = 0
+    
+    def _path(self, generation: int) -> str:
+        return f"{self.base_path}.{generation:06d}"
+    
+    def segments(self) -> List[Tuple[int, str]]:
+        """磁盘上的所有段 (gen, path)，按代号升序"""
+        directory = os.path.dirname(os.path.abspath(self.base_path))
+        prefix = os.path.basename(self.base_path) + "."
+        found = []
+        if not os.path.isdir(directory):
+            return found
+        for name in os.listdir(directory):
+            suffix = name[len(prefix):]
+            if name.startswith(prefix) and suffix.isdigit():
+                found.append((int(suffix), os.path.join(directory, name)))
+        return sorted(found)
+    
+    def open(self, after_generation: int):
+        """从给定代号之后开始写新段"""
+        self.generation = after_generation + 1
+    
+    def append(self, op: str, args: list):
+        """追加一条操作（同步写入 OS 缓冲，单行很小，不阻塞事件循环）"""
+        if self._file is None:
+            self._file = open(self._path(self.generation), "ab")
+        line = json.dumps([op, args], ensure_ascii=False).encode("utf-8") + b"\n"
+        self._file.write(line)
+        self._file.flush()
+        if self.fsync:
+            os.fsync(self._file.fileno())
+        self.bytes_written += len(line)
+        self.records_written += 1
+    
+    def rotate(self) -> int:
+        """封存当前段并切到下一段，返回被封存的代号"""
+        sealed = self.generation
+        self._close_file()
+        self.generation += 1
+        return sealed
+    
+    def delete_through(self, generation: int):
+        """删除代号 <= generation 的所有段"""
+        for gen, path in self.segments():
+            if gen > generation:
+                break
+            if gen == self.generation:
+                self._close_file()
+            try:
+                os.remove(path)
+            except OSError as e:
+                logger.warning(f"Failed to remove task log segment {path}: {e}")
+    
+    @staticmethod
+    def read(path: str) -> List[Tuple[str, list]]:
+        """读取一个段；末尾被截断的行（崩溃时写了一半）会被忽略"""
+        records = []
+        with open(path, "rb") as f:
+            for line in f:
+                try:
+                    op, args = json.loads(line)
+                except ValueError:
+                    logger.warning(f"Skipping truncated record in {path}")
+                    break
+                records.append((op, args))
+        return records
+    
+    def _close_file(self):
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+    
+    def close(self):
+        self._close_file()
+
+
+@dataclass
+class _WriteBatch:
+    """待刷新的写入（按语句类型分组，便于 executemany）"""
+    tasks: Dict[str, list] = field(default_factory=dict)         # task_id -> tasks 行
+    statuses: Dict[str, Tuple[str, str]] = field(default_factory=dict)  # task_id -> (status, updated_at)
+    checkpoints: List[tuple] = field(default_factory=list)
+    messages: List[tuple] = field(default_factory=list)
+    started_at: float = 0.0  # 第一条写入的时间（perf_counter）
+    
+    @property
+    def rows(self) -> int:
+        return len(self.tasks) + len(self.statuses) + len(self.checkpoints) + len(self.messages)
+    
+    def __bool__(self) -> bool:
+        return self.rows > 0
+    
+    def merge_newer(self, newer: "_WriteBatch") -> "_WriteBatch":
+        """把较新的批次合并到本批次之后（刷新失败时放回缓冲区）"""
+        for task_id, row in newer.tasks.items():
+            self.tasks.setdefault(task_id, row)
+        for task_id, (status, updated_at) in newer.statuses.items():
+            if task_id in self.tasks:
+                self.tasks[task_id][1] = status
+                self.tasks[task_id][5] = updated_at
+            else:
+                self.statuses[task_id] = (status, updated_at)
+        self.checkpoints.extend(newer.checkpoints)
+        self.messages.extend(newer.messages)
+        if newer and not self.started_at:
+            self.started_at = newer.started_at
+        return self
+
+
 class AsyncTaskStore:
     """
     异步任务存储 - 替代原同步 TaskStore
@@ -59,30 +197,75 @@ class AsyncTaskStore:
     特性:
     - 完全异步，不阻塞事件循环
     - 连接池管理
-    - 批量写入优化 (缓冲区)
+    - 批量写入：任务、状态、检查点、消息统一缓冲，按语句类型 executemany
+    - 刷新触发：缓冲行数达到 flush_size，或最早一条写入超过 flush_interval
+    - 状态合并：同一任务的多次 update_status 只写最后一次
+    - 追加日志：写入先落到日志，启动时重放未入库的操作
     - WAL 模式提升并发性能
+    
+    读操作保证读到自己的写入：get_task 叠加缓冲区中的状态，
+    检查点/消息查询前先刷新缓冲区。
     """
     
-    def __init__(self, db_path: str = "nogicos_tasks.db", pool_size: int = 3):
+    # 默认刷新策略
+    FLUSH_SIZE = 256
+    FLUSH_INTERVAL = 0.5  # 秒
+    # 缓冲超过 flush_size * 该倍数时，写入方等待刷新（背压）
+    MAX_PENDING_FACTOR = 8
+    
+    def __init__(
+        self,
+        db_path: str = "nogicos_tasks.db",
+        pool_size: int = 3,
+        flush_size: int = FLUSH_SIZE,
+        flush_interval: float = FLUSH_INTERVAL,
+        log_path: Optional[str] = None,
+        durable: bool = True,
+        fsync: bool = False,
+    ):
         """
         初始化异步任务存储
         
         Args:
             db_path: 数据库文件路径
             pool_size: 连接池大小
+            flush_size: 缓冲行数达到该值时立即刷新
+            flush_interval: 最早一条缓冲写入的最长等待时间（秒）
+            log_path: 追加日志前缀（默认 <db_path>.oplog）
+            durable: 是否启用追加日志（:memory: 数据库自动关闭）
+            fsync: 每条日志 fsync（防断电，吞吐较低）
         """
         self.db_path = db_path
         self.pool_size = pool_size
+        self.flush_size = max(1, flush_size)
+        self.flush_interval = flush_interval
         self._pool: List[DBConnection] = []
         self._pool_lock = asyncio.Lock()
-        self._write_buffer: List[tuple] = []
-        self._buffer_lock = asyncio.Lock()
+        self._batch = _WriteBatch()
+        self._inflight: Optional[_WriteBatch] = None  # 已交换出去、尚未提交的批次
+        self._flush_lock = asyncio.Lock()
+        self._flush_wakeup = asyncio.Event()
         self._flush_task: Optional[asyncio.Task[None]] = None
         self._initialized = False
+        
+        self._log: Optional[AppendLog] = None
+        if durable and db_path != ":memory:":
+            self._log = AppendLog(log_path or f"{db_path}.oplog", fsync=fsync)
+        
+        self._stats = {
+            "flushes": 0,
+            "flush_failures": 0,
+            "rows_written": 0,
+            "status_coalesced": 0,
+            "replayed": 0,
+            "backpressure_waits": 0,
+        }
+        self._flush_time_total = 0.0
+        self._flush_time_max = 0.0
     
     async def initialize(self):
         """
-        初始化连接池和表结构
+        初始化连接池和表结构，重放追加日志
         
         Raises:
             AiosqliteNotInstalledError: 如果 aiosqlite 未安装
@@ -127,7 +310,7 @@ class AsyncTaskStore:
                     FOREIGN KEY (task_id) REFERENCES tasks(id)
                 );
                 
-                CREATE INDEX IF NOT EXISTS idx_checkpoints_task 
+                CREATE INDEX IF NOT EXISTS idx_checkpoints_task
                 ON checkpoints(task_id, iteration DESC);
                 
                 CREATE TABLE IF NOT EXISTS messages (
@@ -141,12 +324,19 @@ class AsyncTaskStore:
                 
                 CREATE INDEX IF NOT EXISTS idx_messages_task
                 ON messages(task_id, timestamp);
+                
+                CREATE TABLE IF NOT EXISTS store_meta (
+                    key TEXT PRIMARY KEY,
+                    value TEXT
+                );
             """)
             await conn.commit()
         
-        # 启动定期刷新任务
-        self._flush_task = asyncio.create_task(self._periodic_flush())
         self._initialized = True
+        await self._replay_log()
+        
+        # 启动刷新任务
+        self._flush_task = asyncio.create_task(self._periodic_flush())
         logger.info(f"AsyncTaskStore initialized: {self.db_path}")
     
     @asynccontextmanager
@@ -171,66 +361,82 @@ class AsyncTaskStore:
     # ========== 任务操作 ==========
     
     async def create_task(
-        self, 
-        task_id: str, 
+        self,
+        task_id: str,
         task_text: str,
         target_hwnds: Optional[List[int]] = None,
     ) -> bool:
-        """创建新任务"""
+        """
+        创建新任务（缓冲写入）
+        
+        Returns:
+            False 表示该任务已在缓冲区中（重复创建）
+        """
+        if task_id in self._batch.tasks or (self._inflight is not None and task_id in self._inflight.tasks):
+            return False
         now = datetime.now().isoformat()
         hwnds_str = json.dumps(target_hwnds or [])
-        
-        async with self._get_connection() as conn:
-            await conn.execute(
-                """INSERT INTO tasks (id, status, task_text, target_hwnds, created_at, updated_at)
-                   VALUES (?, ?, ?, ?, ?, ?)""",
-                (task_id, "pending", task_text, hwnds_str, now, now)
-            )
-            await conn.commit()
-        
+        await self._write("task", [task_id, "pending", task_text, hwnds_str, now, now])
         return True
     
     async def update_status(self, task_id: str, status: str) -> bool:
-        """更新任务状态"""
+        """更新任务状态（同一任务的多次更新在刷新前合并为一次）"""
         now = datetime.now().isoformat()
-        
-        async with self._get_connection() as conn:
-            await conn.execute(
-                "UPDATE tasks SET status = ?, updated_at = ? WHERE id = ?",
-                (status, now, task_id)
-            )
-            await conn.commit()
-        
+        await self._write("status", [task_id, status, now])
         return True
     
     async def get_task(self, task_id: str) -> Optional[Dict[str, Any]]:
-        """获取任务信息"""
-        async with self._get_connection() as conn:
-            async with conn.execute(
-                "SELECT id, status, task_text, target_hwnds, created_at, updated_at FROM tasks WHERE id = ?",
-                (task_id,)
-            ) as cursor:
-                row = await cursor.fetchone()
-                if row:
-                    return {
-                        "id": row[0],
-                        "status": row[1],
-                        "task_text": row[2],
-                        "target_hwnds": json.loads(row[3]) if row[3] else [],
-                        "created_at": row[4],
-                        "updated_at": row[5],
-                    }
-        return None
+        """获取任务信息（包含尚未刷新、以及正在刷新中的创建和状态更新）"""
+        pending = self._batch.tasks.get(task_id)
+        if pending is not None:
+            return self._task_dict(pending)
+        
+        # 正在提交的批次已从 _batch 换出，但数据库里还看不到
+        inflight = self._inflight
+        row = list(inflight.tasks[task_id]) if inflight is not None and task_id in inflight.tasks else None
+        
+        if row is None:
+            async with self._get_connection() as conn:
+                async with conn.execute(
+                    "SELECT id, status, task_text, target_hwnds, created_at, updated_at FROM tasks WHERE id = ?",
+                    (task_id,)
+                ) as cursor:
+                    row = await cursor.fetchone()
+            if not row:
+                return None
+            row = list(row)
+            # 数据库读期间批次可能已提交或换出，按新旧顺序叠加未提交的状态
+            if inflight is not None and inflight is self._inflight:
+                pending_status = inflight.statuses.get(task_id)
+                if pending_status:
+                    row[1], row[5] = pending_status
+        
+        pending_status = self._batch.statuses.get(task_id)
+        if pending_status:
+            row[1], row[5] = pending_status
+        return self._task_dict(row)
+    
+    @staticmethod
+    def _task_dict(row) -> Dict[str, Any]:
+        return {
+            "id": row[0],
+            "status": row[1],
+            "task_text": row[2],
+            "target_hwnds": json.loads(row[3]) if row[3] else [],
+            "created_at": row[4],
+            "updated_at": row[5],
+        }
     
     # ========== 检查点操作 ==========
     
     async def save_checkpoint(
-        self, 
-        task_id: str, 
-        iteration: int, 
+        self,
+        task_id: str,
+        iteration: int,
         state: dict,
         screenshot_id: str = None,
         is_full: bool = True,
+        state_json: Optional[str] = None,
     ):
         """
         异步保存检查点 - 带缓冲批量写入
@@ -241,25 +447,23 @@ class AsyncTaskStore:
             state: 状态字典
             screenshot_id: 关联的截图 ID
             is_full: 是否全量检查点
+            state_json: 已序列化的状态（调用方已有时传入，避免重复 json.dumps）
         """
         now = datetime.now().isoformat()
-        
-        async with self._buffer_lock:
-            self._write_buffer.append((
-                "checkpoint",
-                (task_id, iteration, json.dumps(state), screenshot_id, 1 if is_full else 0, now)
-            ))
-        
-        # 缓冲区满时立即刷新
-        if len(self._write_buffer) >= 10:
-            await self._flush_buffer()
+        if state_json is None:
+            state_json = json.dumps(state)
+        await self._write(
+            "checkpoint",
+            [task_id, iteration, state_json, screenshot_id, 1 if is_full else 0, now],
+        )
     
     async def restore_checkpoint(self, task_id: str) -> Optional[dict]:
         """恢复最新检查点"""
+        await self._flush_pending()
         async with self._get_connection() as conn:
             async with conn.execute(
-                """SELECT state_json FROM checkpoints 
-                   WHERE task_id = ? ORDER BY iteration DESC LIMIT 1""",
+                """SELECT state_json FROM checkpoints
+                   WHERE task_id = ? ORDER BY iteration DESC, id DESC LIMIT 1""",
                 (task_id,)
             ) as cursor:
                 row = await cursor.fetchone()
@@ -267,10 +471,11 @@ class AsyncTaskStore:
     
     async def get_all_checkpoints(self, task_id: str) -> List[Dict[str, Any]]:
         """获取所有检查点（用于增量恢复）"""
+        await self._flush_pending()
         async with self._get_connection() as conn:
             async with conn.execute(
-                """SELECT iteration, state_json, is_full FROM checkpoints 
-                   WHERE task_id = ? ORDER BY iteration ASC""",
+                """SELECT iteration, state_json, is_full FROM checkpoints
+                   WHERE task_id = ? ORDER BY iteration ASC, id ASC""",
                 (task_id,)
             ) as cursor:
                 rows = await cursor.fetchall()
@@ -279,23 +484,36 @@ class AsyncTaskStore:
                     for r in rows
                 ]
     
+    async def get_latest_checkpoints(self, task_id: str) -> List[Dict[str, Any]]:
+        """获取最近一个全量检查点及其后的增量（恢复只需要这些）"""
+        await self._flush_pending()
+        async with self._get_connection() as conn:
+            async with conn.execute(
+                """SELECT iteration, state_json, is_full FROM checkpoints
+                   WHERE task_id = ? AND id >= COALESCE(
+                       (SELECT MAX(id) FROM checkpoints WHERE task_id = ? AND is_full = 1), 0)
+                   ORDER BY id ASC""",
+                (task_id, task_id)
+            ) as cursor:
+                rows = await cursor.fetchall()
+                return [
+                    {"iteration": r[0], "state": json.loads(r[1]), "is_full": bool(r[2])}
+                    for r in rows
+                ]
+    
     # ========== 消息操作 ==========
     
     async def save_message(self, task_id: str, role: str, content: str):
         """保存消息"""
         now = datetime.now().isoformat()
-        
-        async with self._buffer_lock:
-            self._write_buffer.append((
-                "message",
-                (task_id, role, content, now)
-            ))
+        await self._write("message", [task_id, role, content, now])
     
     async def get_messages(self, task_id: str) -> List[Dict[str, Any]]:
         """获取任务的所有消息"""
+        await self._flush_pending()
         async with self._get_connection() as conn:
             async with conn.execute(
-                "SELECT role, content, timestamp FROM messages WHERE task_id = ? ORDER BY timestamp",
+                "SELECT role, content, timestamp FROM messages WHERE task_id = ? ORDER BY timestamp, id",
                 (task_id,)
             ) as cursor:
                 rows = await cursor.fetchall()
@@ -307,74 +525,209 @@ class AsyncTaskStore:
     MAX_RETRY_ATTEMPTS = 3
     RETRY_DELAY_BASE = 0.5  # 基础延迟（秒）
     
+    async def _write(self, op: str, args: list):
+        """记录日志、放入缓冲区，并按数量触发刷新"""
+        if self._log is not None:
+            self._log.append(op, args)
+        was_empty = not self._batch
+        self._apply(op, args)
+        
+        rows = self._batch.rows
+        if was_empty or rows >= self.flush_size:
+            # 首条写入启动计时，数量达到阈值立即刷新
+            self._flush_wakeup.set()
+        if rows >= self.flush_size * self.MAX_PENDING_FACTOR:
+            # 数据库跟不上，写入方等待一次刷新
+            self._stats["backpressure_waits"] += 1
+            await self._flush_buffer()
+    
+    def _apply(self, op: str, args: list):
+        """把一条操作合并进当前批次（日志重放也走这里）"""
+        batch = self._batch
+        if not batch:
+            batch.started_at = time.perf_counter()
+        
+        if op == "task":
+            batch.tasks.setdefault(args[0], list(args))
+        elif op == "status":
+            task_id, status, updated_at = args
+            pending = batch.tasks.get(task_id)
+            if pending is not None:
+                # 任务还没入库：直接改写待插入的行
+                pending[1], pending[5] = status, updated_at
+                self._stats["status_coalesced"] += 1
+            else:
+                if task_id in batch.statuses:
+                    self._stats["status_coalesced"] += 1
+                batch.statuses[task_id] = (status, updated_at)
+        elif op == "checkpoint":
+            batch.checkpoints.append(tuple(args))
+        elif op == "message":
+            batch.messages.append(tuple(args))
+        else:
+            logger.warning(f"Unknown task store operation: {op}")
+    
+    async def _flush_pending(self):
+        """读操作前刷新缓冲区，保证读到自己的写入（同时等待正在进行的刷新提交）"""
+        await self._flush_buffer()
+    
+    @tracing.traced(tracing.DB_FLUSH)
     async def _flush_buffer(self, max_retries: int = None) -> bool:
         """
         刷新写入缓冲区（带重试机制）
         
+        一个事务内按语句类型 executemany，并记录已应用的日志段号，
+        提交后删除对应日志段。
+        
         Args:
             max_retries: 最大重试次数（默认使用类常量）
-            
+        
         Returns:
             是否成功刷新
         """
         max_retries = max_retries or self.MAX_RETRY_ATTEMPTS
         
-        async with self._buffer_lock:
-            if not self._write_buffer:
+        async with self._flush_lock:
+            if not self._batch:
                 return True
             
-            buffer = self._write_buffer.copy()
-            self._write_buffer.clear()
-        
-        last_error = None
-        
-        for attempt in range(max_retries):
+            # 交换批次和切换日志段之间没有 await，新写入一定落在下一段
+            batch, self._batch = self._batch, _WriteBatch()
+            self._inflight = batch
+            sealed = self._log.rotate() if self._log is not None else None
+            
+            last_error = None
+            started = time.perf_counter()
+            
             try:
-                async with self._get_connection() as conn:
-                    for item_type, data in buffer:
-                        if item_type == "checkpoint":
-                            await conn.execute(
-                                """INSERT INTO checkpoints 
-                                   (task_id, iteration, state_json, screenshot_id, is_full, created_at) 
-                                   VALUES (?, ?, ?, ?, ?, ?)""",
-                                data
-                            )
-                        elif item_type == "message":
-                            await conn.execute(
-                                """INSERT INTO messages (task_id, role, content, timestamp)
-                                   VALUES (?, ?, ?, ?)""",
-                                data
-                            )
-                    await conn.commit()
-                    return True
+                for attempt in range(max_retries):
+                    try:
+                        async with self._get_connection() as conn:
+                            try:
+                                await self._write_batch(conn, batch, sealed)
+                                await conn.commit()
+                            except Exception:
+                                await conn.rollback()
+                                raise
+                        break
+                    except Exception as e:
+                        last_error = e
+                        logger.warning(f"Flush attempt {attempt + 1}/{max_retries} failed: {e}")
                     
-            except Exception as e:
-                last_error = e
-                logger.warning(f"Flush attempt {attempt + 1}/{max_retries} failed: {e}")
-                
-                if attempt < max_retries - 1:
-                    # 指数退避
-                    delay = self.RETRY_DELAY_BASE * (2 ** attempt)
-                    await asyncio.sleep(delay)
-        
-        # 所有重试都失败了，把数据放回缓冲区
-        async with self._buffer_lock:
-            self._write_buffer = buffer + self._write_buffer
+                        if attempt < max_retries - 1:
+                            # 指数退避
+                            delay = self.RETRY_DELAY_BASE * (2 ** attempt)
+                            await asyncio.sleep(delay)
+                else:
+                    # 所有重试都失败了，把数据放回缓冲区（日志段保留，崩溃后仍可重放）
+                    self._batch = batch.merge_newer(self._batch)
+                    self._stats["flush_failures"] += 1
+                    logger.error(f"Flush failed after {max_retries} attempts: {last_error}")
+                    return False
+            finally:
+                self._inflight = None
+            
+            if sealed is not None:
+                self._log.delete_through(sealed)
             
-        logger.error(f"Flush failed after {max_retries} attempts: {last_error}")
-        return False
+            elapsed = time.perf_counter() - started
+            self._stats["flushes"] += 1
+            self._stats["rows_written"] += batch.rows
+            self._flush_time_total += elapsed
+            self._flush_time_max = max(self._flush_time_max, elapsed)
+            return True
+    
+    @staticmethod
+    async def _write_batch(conn: DBConnection, batch: _WriteBatch, sealed: Optional[int]):
+        """按语句类型分组写入一个批次（调用方负责事务）"""
+        if batch.tasks:
+            await conn.executemany(
+                """INSERT OR IGNORE INTO tasks (id, status, task_text, target_hwnds, created_at, updated_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                list(batch.tasks.values()),
+            )
+        if batch.statuses:
+            await conn.executemany(
+                "UPDATE tasks SET status = ?, updated_at = ? WHERE id = ?",
+                [(status, updated_at, task_id) for task_id, (status, updated_at) in batch.statuses.items()],
+            )
+        if batch.checkpoints:
+            await conn.executemany(
+                """INSERT INTO checkpoints
+                   (task_id, iteration, state_json, screenshot_id, is_full, created_at)
+                   VALUES (?, ?, ?, ?, ?, ?)""",
+                batch.checkpoints,
+            )
+        if batch.messages:
+            await conn.executemany(
+                """INSERT INTO messages (task_id, role, content, timestamp)
+                   VALUES (?, ?, ?, ?)""",
+                batch.messages,
+            )
+        if sealed is not None:
+            await conn.execute(
+                "INSERT OR REPLACE INTO store_meta (key, value) VALUES ('applied_log_generation', ?)",
+                (str(sealed),),
+            )
+    
+    async def _replay_log(self):
+        """启动时重放未入库的日志段"""
+        if self._log is None:
+            return
+        
+        async with self._get_connection() as conn:
+            async with conn.execute(
+                "SELECT value FROM store_meta WHERE key = 'applied_log_generation'"
+            ) as cursor:
+                row = await cursor.fetchone()
+        applied = int(row[0]) if row else -1
+        
+        segments = self._log.segments()
+        # 已提交但未删除的段直接清理
+        self._log.delete_through(applied)
+        
+        replayed = 0
+        last_generation = applied
+        for generation, path in segments:
+            last_generation = max(last_generation, generation)
+            if generation <= applied:
+                continue
+            for op, args in AppendLog.read(path):
+                self._apply(op, args)
+                replayed += 1
+        
+        self._log.open(last_generation)
+        if replayed:
+            self._stats["replayed"] += replayed
+            logger.info(f"Replaying {replayed} task store operations from log")
+            if not await self._flush_buffer():
+                logger.error("Failed to apply replayed task store operations; they remain in the log")
     
     async def _periodic_flush(self):
-        """定期刷新缓冲区（每 5 秒，带重试和背压控制）"""
+        """
+        刷新循环（数量/时间双触发，带失败退避）
+        
+        空闲时不唤醒；首条写入后最多等待 flush_interval，
+        缓冲达到 flush_size 时立即刷新。
+        """
         consecutive_failures = 0
         max_consecutive_failures = 5
         
         while True:
-            # 动态调整间隔：失败时增加间隔
-            interval = 5 * (1 + consecutive_failures)
-            await asyncio.sleep(min(interval, 30))  # 最大 30 秒
-            
             try:
+                await self._flush_wakeup.wait()
+                self._flush_wakeup.clear()
+                if not self._batch:
+                    continue
+                
+                remaining = self._batch.started_at + self.flush_interval - time.perf_counter()
+                if remaining > 0 and self._batch.rows < self.flush_size:
+                    try:
+                        await asyncio.wait_for(self._flush_wakeup.wait(), timeout=remaining)
+                    except asyncio.TimeoutError:
+                        pass
+                    self._flush_wakeup.clear()
+                
                 success = await self._flush_buffer()
                 
                 if success:
@@ -385,20 +738,39 @@ class AsyncTaskStore:
                     if consecutive_failures >= max_consecutive_failures:
                         logger.error(
                             f"Periodic flush failed {consecutive_failures} times consecutively. "
-                            f"Buffer size: {len(self._write_buffer)}"
+                            f"Buffer size: {self._batch.rows}"
                         )
                         # 不中断，继续尝试
-                        
+                    
+                    # 动态调整间隔：失败时增加间隔（最大 30 秒）
+                    await asyncio.sleep(min(self.flush_interval * (2 ** consecutive_failures), 30))
+                    self._flush_wakeup.set()
+            
             except asyncio.CancelledError:
                 # 正常取消，尝试最后一次刷新
                 logger.info("Periodic flush cancelled, attempting final flush...")
                 await self._flush_buffer(max_retries=1)
                 raise
-                
+            
             except Exception as e:
                 consecutive_failures += 1
                 logger.error(f"Unexpected error in periodic flush: {e}")
     
+    def get_stats(self) -> Dict[str, Any]:
+        """获取写入统计"""
+        flushes = self._stats["flushes"]
+        return {
+            **self._stats,
+            "pending_rows": self._batch.rows,
+            "flush_size": self.flush_size,
+            "flush_interval_s": self.flush_interval,
+            "avg_flush_ms": round(self._flush_time_total / flushes * 1000, 3) if flushes else 0.0,
+            "max_flush_ms": round(self._flush_time_max * 1000, 3),
+            "log_enabled": self._log is not None,
+            "log_records": self._log.records_written if self._log else 0,
+            "log_bytes": self._log.bytes_written if self._log else 0,
+        }
+    
     async def close(self):
         """关闭连接池"""
         if self._flush_task:
@@ -407,9 +779,14 @@ class AsyncTaskStore:
                 await self._flush_task
             except asyncio.CancelledError:
                 pass
+            self._flush_task = None
         
         # 刷新剩余数据
-        await self._flush_buffer()
+        if self._initialized:
+            await self._flush_buffer()
+        
+        if self._log is not None:
+            self._log.close()
         
         # 关闭连接
         async with self._pool_lock:
@@ -3,7 +3,11 @@ NogicOS 并发管理器
 ==================
 
 控制 Agent 系统的并发资源，包括：
-1. 任务槽位管理 - 限制同时运行的任务数
+1. 任务槽位管理 - 限制同时运行的任务数，满载时公平排队（FIFO）
+   任务可声明目标窗口/文件/会话，资源不相交的任务并行，冲突的任务排队；
+   声明操作桌面（desktop=True）但未声明窗口和文件的任务按"整个桌面"处理
+   （共享鼠标键盘），与所有桌面任务互斥；不操作桌面的任务（ASK/PLAN 等
+   只读模式）只按窗口、会话和文件互斥
 2. 窗口独占锁 - 防止多任务同时操作同一窗口
 3. API 调用限流 - 避免触发速率限制
 
@@ -14,11 +18,15 @@ NogicOS 并发管理器
 
 import asyncio
 import logging
+import os
+import time
 from contextlib import asynccontextmanager
 from dataclasses import dataclass, field
-from typing import Optional, Dict, Set, TYPE_CHECKING
+from typing import Optional, Dict, Iterable, List, Set, Tuple, TYPE_CHECKING
 from datetime import datetime, timedelta
 
+from .errors import TooManyTasksError
+
 # 已删除: host_agent 依赖，改用独立的 ConcurrencyConfig
 
 logger = logging.getLogger(__name__)
@@ -50,6 +58,37 @@ class TaskSlotInfo:
     task_id: str
     acquired_at: datetime
     target_hwnds: Set[int] = field(default_factory=set)
+    target_files: Set[str] = field(default_factory=set)
+    session_id: Optional[str] = None
+    desktop: bool = False  # 是否通过鼠标键盘操作桌面（Agent 任务由 AgentPool 声明）
+    
+    @property
+    def whole_desktop(self) -> bool:
+        """操作桌面但未声明窗口和文件：可能操作任意窗口，按占用整个桌面处理"""
+        return self.desktop and not self.target_hwnds and not self.target_files
+    
+    @property
+    def uses_desktop(self) -> bool:
+        """是否操作桌面（鼠标键盘输入）：声明了窗口，或未声明资源"""
+        return bool(self.target_hwnds) or self.whole_desktop
+    
+    def conflicts_with(self, other: "TaskSlotInfo") -> bool:
+        """两个任务是否争用同一窗口、文件、会话或整个桌面"""
+        if (self.whole_desktop and other.uses_desktop) or (other.whole_desktop and self.uses_desktop):
+            return True
+        if self.target_hwnds & other.target_hwnds:
+            return True
+        if self.target_files & other.target_files:
+            return True
+        return self.session_id is not None and self.session_id == other.session_id
+
+
+@dataclass
+class _SlotWaiter:
+    """排队中的任务槽位请求"""
+    info: TaskSlotInfo
+    future: "asyncio.Future"
+    enqueued_at: float
 
 
 @dataclass
@@ -104,6 +143,17 @@ class ConcurrencyManager:
         self._active_tasks: Dict[str, TaskSlotInfo] = {}
         self._task_lock = asyncio.Lock()
         
+        # 槽位等待队列（FIFO，按到达顺序授予）
+        self._waiters: List[_SlotWaiter] = []
+        self._slot_stats = {
+            "granted": 0,
+            "queued": 0,
+            "waited": 0,
+            "timeouts": 0,
+            "total_wait_s": 0.0,
+            "max_wait_s": 0.0,
+        }
+        
         # 窗口锁
         self._window_locks: Dict[int, asyncio.Lock] = {}
         self._window_owners: Dict[int, WindowLockInfo] = {}
@@ -122,17 +172,84 @@ class ConcurrencyManager:
     
     # ========== 任务槽位管理 ==========
     
+    @staticmethod
+    def _make_slot_info(
+        task_id: str,
+        target_hwnds: Optional[Iterable[int]] = None,
+        target_files: Optional[Iterable[str]] = None,
+        session_id: Optional[str] = None,
+        desktop: bool = False,
+    ) -> TaskSlotInfo:
+        return TaskSlotInfo(
+            task_id=task_id,
+            acquired_at=datetime.now(),
+            target_hwnds=set(target_hwnds or ()),
+            target_files={os.path.normcase(os.path.abspath(f)) for f in (target_files or ())},
+            session_id=session_id,
+            desktop=desktop,
+        )
+    
+    def _can_run(self, info: TaskSlotInfo, ahead: Iterable[TaskSlotInfo] = ()) -> bool:
+        """有空闲槽位，且不与运行中任务或排在前面的任务冲突"""
+        if len(self._active_tasks) >= self.config.max_concurrent_tasks:
+            return False
+        if any(info.conflicts_with(active) for active in self._active_tasks.values()):
+            return False
+        return not any(info.conflicts_with(other) for other in ahead)
+    
+    def _grant(self, info: TaskSlotInfo):
+        info.acquired_at = datetime.now()
+        self._active_tasks[info.task_id] = info
+        self._slot_stats["granted"] += 1
+        logger.debug(
+            f"Task slot acquired: {info.task_id} "
+            f"({len(self._active_tasks)}/{self.config.max_concurrent_tasks})"
+        )
+    
+    def _dispatch_waiters(self):
+        """
+        按到达顺序授予槽位
+        
+        排在前面但被阻塞的任务会为自己保留资源，后来的任务只有在
+        与它们不冲突时才能越过它们，避免饿死。
+        """
+        blocked: List[TaskSlotInfo] = []
+        now = time.monotonic()
+        for waiter in list(self._waiters):
+            if waiter.future.done():
+                # 已超时或取消
+                self._waiters.remove(waiter)
+                continue
+            if len(self._active_tasks) >= self.config.max_concurrent_tasks:
+                break
+            if self._can_run(waiter.info, blocked):
+                self._waiters.remove(waiter)
+                self._grant(waiter.info)
+                waited = now - waiter.enqueued_at
+                self._slot_stats["waited"] += 1
+                self._slot_stats["total_wait_s"] += waited
+                self._slot_stats["max_wait_s"] = max(self._slot_stats["max_wait_s"], waited)
+                waiter.future.set_result(True)
+            else:
+                blocked.append(waiter.info)
+    
     async def acquire_task_slot(
         self, 
         task_id: str,
         target_hwnds: Optional[Set[int]] = None,
+        target_files: Optional[Set[str]] = None,
+        session_id: Optional[str] = None,
+        desktop: bool = False,
     ) -> bool:
         """
-        获取任务槽位
+        获取任务槽位（不等待）
         
         Args:
             task_id: 任务 ID
             target_hwnds: 目标窗口集合
+            target_files: 目标文件集合
+            session_id: 会话 ID（同一会话的任务串行执行）
+            desktop: 是否操作桌面（True 且未声明窗口/文件时占用整个桌面）
             
         Returns:
             是否成功获取槽位
@@ -143,30 +260,159 @@ class ConcurrencyManager:
                 logger.warning(f"Task {task_id} already has a slot")
                 return True
             
-            # 检查槽位数量
-            if len(self._active_tasks) >= self.config.max_concurrent_tasks:
+            info = self._make_slot_info(task_id, target_hwnds, target_files, session_id, desktop)
+            # 不插队：排队中的任务优先
+            if not self._can_run(info, [w.info for w in self._waiters]):
                 logger.info(
-                    f"No available task slots: "
-                    f"{len(self._active_tasks)}/{self.config.max_concurrent_tasks}"
+                    f"No available task slot for {task_id}: "
+                    f"{len(self._active_tasks)}/{self.config.max_concurrent_tasks}, "
+                    f"{len(self._waiters)} waiting"
                 )
                 return False
             
-            # 分配槽位
-            self._active_tasks[task_id] = TaskSlotInfo(
-                task_id=task_id,
-                acquired_at=datetime.now(),
-                target_hwnds=target_hwnds or set(),
-            )
+            self._grant(info)
+            return True
+    
+    async def wait_for_task_slot(
+        self,
+        task_id: str,
+        target_hwnds: Optional[Set[int]] = None,
+        target_files: Optional[Set[str]] = None,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        desktop: bool = False,
+    ) -> bool:
+        """
+        获取任务槽位，满载或资源冲突时排队等待
+        
+        Args:
+            task_id: 任务 ID
+            target_hwnds: 目标窗口集合
+            target_files: 目标文件集合
+            session_id: 会话 ID（同一会话的任务串行执行）
+            timeout: 最长等待时间（秒），None 表示一直等待
+            desktop: 是否操作桌面（True 且未声明窗口/文件时占用整个桌面）
             
-            logger.debug(
-                f"Task slot acquired: {task_id} "
-                f"({len(self._active_tasks)}/{self.config.max_concurrent_tasks})"
+        Returns:
+            是否成功获取槽位（仅超时返回 False）
+        """
+        acquired, _ = await self._wait_for_slot(task_id, target_hwnds, target_files, session_id, timeout, desktop)
+        return acquired
+    
+    async def _wait_for_slot(
+        self,
+        task_id: str,
+        target_hwnds: Optional[Set[int]],
+        target_files: Optional[Set[str]],
+        session_id: Optional[str],
+        timeout: Optional[float],
+        desktop: bool = False,
+    ) -> Tuple[bool, bool]:
+        """
+        wait_for_task_slot 的实现
+        
+        Returns:
+            (是否持有槽位, 是否由本次调用获得)：任务已在运行时返回 (True, False)，
+            调用方不应释放别人持有的槽位
+        """
+        if task_id in self._active_tasks:
+            logger.warning(f"Task {task_id} already has a slot")
+            return True, False
+        
+        info = self._make_slot_info(task_id, target_hwnds, target_files, session_id, desktop)
+        if self._can_run(info, [w.info for w in self._waiters]):
+            self._grant(info)
+            return True, True
+        
+        waiter = _SlotWaiter(
+            info=info,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=time.monotonic(),
+        )
+        self._waiters.append(waiter)
+        self._slot_stats["queued"] += 1
+        logger.info(
+            f"Task {task_id} queued for a slot "
+            f"(position {len(self._waiters)}, "
+            f"{len(self._active_tasks)}/{self.config.max_concurrent_tasks} running)"
+        )
+        
+        try:
+            await asyncio.wait_for(waiter.future, timeout=timeout)
+            return True, True
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if waiter.future.done() and not waiter.future.cancelled():
+                # 刚被授予就被取消，归还槽位
+                self.release_task_slot(task_id)
+            elif waiter in self._waiters:
+                self._waiters.remove(waiter)
+                # 它保留的资源可能挡住了后面的任务
+                self._dispatch_waiters()
+            if isinstance(e, asyncio.CancelledError):
+                raise
+            self._slot_stats["timeouts"] += 1
+            logger.warning(f"Task {task_id} timed out waiting for a slot")
+            return False, False
+    
+    @asynccontextmanager
+    async def task_slot(
+        self,
+        task_id: str,
+        target_hwnds: Optional[Set[int]] = None,
+        target_files: Optional[Set[str]] = None,
+        session_id: Optional[str] = None,
+        timeout: Optional[float] = None,
+        desktop: bool = False,
+    ):
+        """
+        任务槽位上下文管理器（排队等待）
+        
+        使用示例:
+        ```python
+        async with manager.task_slot(task_id, target_hwnds={hwnd}):
+            await run_task()
+        ```
+        
+        Raises:
+            TooManyTasksError: 等待超时
+        """
+        acquired, owned = await self._wait_for_slot(
+            task_id, target_hwnds, target_files, session_id, timeout, desktop,
+        )
+        if not acquired:
+            raise TooManyTasksError(
+                len(self._active_tasks),
+                self.config.max_concurrent_tasks,
+                details={"task_id": task_id, "waiting": len(self._waiters)},
             )
-            return True
+        try:
+            yield
+        finally:
+            # 只释放本次获得的槽位（同 ID 任务已在运行时不动它的槽位）
+            if owned:
+                self.release_task_slot(task_id)
+    
+    def can_start(
+        self,
+        target_hwnds: Optional[Set[int]] = None,
+        target_files: Optional[Set[str]] = None,
+        session_id: Optional[str] = None,
+        desktop: bool = False,
+    ) -> bool:
+        """新任务现在能否立即获得槽位（不排队）"""
+        info = self._make_slot_info("", target_hwnds, target_files, session_id, desktop)
+        return self._can_run(info, [w.info for w in self._waiters])
+    
+    def get_queue_position(self, task_id: str) -> Optional[int]:
+        """排队位置（1 开始），未排队返回 None"""
+        for index, waiter in enumerate(self._waiters, 1):
+            if waiter.info.task_id == task_id:
+                return index
+        return None
     
     def release_task_slot(self, task_id: str):
         """
-        释放任务槽位
+        释放任务槽位，并唤醒可以运行的排队任务
         
         Args:
             task_id: 任务 ID
@@ -177,6 +423,7 @@ class ConcurrencyManager:
                 f"Task slot released: {task_id} "
                 f"({len(self._active_tasks)}/{self.config.max_concurrent_tasks})"
             )
+            self._dispatch_waiters()
     
     def get_active_tasks(self) -> Dict[str, TaskSlotInfo]:
         """获取活动任务列表"""
@@ -187,6 +434,11 @@ class ConcurrencyManager:
         """可用槽位数"""
         return self.config.max_concurrent_tasks - len(self._active_tasks)
     
+    @property
+    def waiting_tasks(self) -> int:
+        """排队中的任务数"""
+        return len(self._waiters)
+    
     # ========== 窗口锁管理 ==========
     
     async def acquire_window(
@@ -407,6 +659,10 @@ class ConcurrencyManager:
         警告：会释放所有锁和槽位
         """
         self._active_tasks.clear()
+        for waiter in self._waiters:
+            if not waiter.future.done():
+                waiter.future.cancel()
+        self._waiters.clear()
         
         for hwnd in list(self._window_locks.keys()):
             self.release_window(hwnd)
@@ -422,6 +678,15 @@ class ConcurrencyManager:
         return {
             "active_tasks": len(self._active_tasks),
             "max_tasks": self.config.max_concurrent_tasks,
+            "waiting_tasks": len(self._waiters),
+            "slots_granted": self._slot_stats["granted"],
+            "slots_queued": self._slot_stats["queued"],
+            "slot_timeouts": self._slot_stats["timeouts"],
+            "slot_wait_avg_s": (
+                self._slot_stats["total_wait_s"] / self._slot_stats["waited"]
+                if self._slot_stats["waited"] else 0.0
+            ),
+            "slot_wait_max_s": self._slot_stats["max_wait_s"],
             "locked_windows": len(self._window_owners),
             "api_semaphore_value": self._api_semaphore._value,  # type: ignore
             "max_api_concurrency": self.config.max_api_concurrency,
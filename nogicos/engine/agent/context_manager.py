@@ -15,11 +15,14 @@ NogicOS Context Manager - 上下文压缩策略
 Phase 5b 实现
 """
 
+from collections import OrderedDict
 from dataclasses import dataclass, field
-from typing import Optional, List, Dict, Any, TYPE_CHECKING
+from typing import Optional, List, Dict, Any, Tuple, TYPE_CHECKING
 import logging
 import base64
 import json
+import math
+import re
 
 try:
     import tiktoken
@@ -35,6 +38,9 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+# 中文 / 日文假名 / 韩文
+_CJK_PATTERN = re.compile("[\u4e00-\u9fff\u3040-\u30ff\uac00-\ud7af]")
+
 
 # ========== Token 预算 ==========
 
@@ -92,13 +98,111 @@ class TokenBudget:
 
 # ========== Token 计数器 ==========
 
+def usage_input_tokens(usage: Any) -> int:
+    """
+    从 Anthropic usage 中取出本次请求的实际输入 token 总数
+    
+    启用 Prompt Caching 时 input_tokens 不含缓存读写部分，需要加回
+    """
+    if usage is None:
+        return 0
+    if isinstance(usage, int):
+        return usage
+    if isinstance(usage, dict):
+        get = usage.get
+    else:
+        get = lambda key, default=0: getattr(usage, key, default)
+    return sum(
+        int(get(key, 0) or 0)
+        for key in ("input_tokens", "cache_read_input_tokens", "cache_creation_input_tokens")
+    )
+
+
+def _decode_base64_head(data: str, max_bytes: int) -> bytes:
+    """解码 base64 数据的前 max_bytes 字节（不解码整张图片）"""
+    chars = (max_bytes + 2) // 3 * 4
+    try:
+        return base64.b64decode(data[:chars])
+    except (ValueError, TypeError):
+        return b""
+
+
+def image_dimensions(data: str) -> Optional[Tuple[int, int]]:
+    """
+    从 base64 图片头部读取宽高
+    
+    支持 PNG / GIF / WebP / JPEG，只解码文件头（JPEG 最多 64KB）
+    
+    Returns:
+        (width, height)，无法识别时返回 None
+    """
+    if not data:
+        return None
+    head = _decode_base64_head(data, 32)
+    
+    if head[:8] == b"\x89PNG\r\n\x1a\n" and len(head) >= 24:
+        return int.from_bytes(head[16:20], "big"), int.from_bytes(head[20:24], "big")
+    
+    if head[:4] == b"GIF8" and len(head) >= 10:
+        return int.from_bytes(head[6:8], "little"), int.from_bytes(head[8:10], "little")
+    
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP" and len(head) >= 30:
+        chunk = head[12:16]
+        if chunk == b"VP8X":
+            return int.from_bytes(head[24:27], "little") + 1, int.from_bytes(head[27:30], "little") + 1
+        if chunk == b"VP8 ":
+            return int.from_bytes(head[26:28], "little") & 0x3FFF, int.from_bytes(head[28:30], "little") & 0x3FFF
+        if chunk == b"VP8L":
+            bits = int.from_bytes(head[21:25], "little")
+            return (bits & 0x3FFF) + 1, ((bits >> 14) & 0x3FFF) + 1
+        return None
+    
+    if head[:2] == b"\xff\xd8":
+        return _jpeg_dimensions(_decode_base64_head(data, 65536))
+    
+    return None
+
+
+def _jpeg_dimensions(buf: bytes) -> Optional[Tuple[int, int]]:
+    """遍历 JPEG 段，读取 SOF 中的宽高"""
+    pos = 2
+    while pos + 9 < len(buf):
+        if buf[pos] != 0xFF:
+            return None
+        marker = buf[pos + 1]
+        if marker == 0xFF:  # 填充字节
+            pos += 1
+            continue
+        if 0xC0 <= marker <= 0xCF and marker not in (0xC4, 0xC8, 0xCC):
+            height = int.from_bytes(buf[pos + 5:pos + 7], "big")
+            width = int.from_bytes(buf[pos + 7:pos + 9], "big")
+            return width, height
+        pos += 2 + int.from_bytes(buf[pos + 2:pos + 4], "big")
+    return None
+
+
 class TokenCounter:
     """
     Token 计数器
     
     使用 tiktoken 进行准确计数，回退到估算
+    
+    - 文本计数按内容哈希做 LRU 缓存，重复内容不再重新编码
+    - 消息计数按内容指纹缓存在 Message 对象上，内容变化时自动失效
+    - 图片按文件头中的真实宽高计算 token
+    - 可用 API 返回的 usage 校准估算值（calibrate）
     """
     
+    TEXT_CACHE_SIZE = 4096       # 文本/图片计数缓存条目
+    MAX_IMAGE_LONG_EDGE = 1568   # 超过此长边的图片会被 API 缩放
+    MAX_IMAGE_TOKENS = 1600      # 单张图片 token 上限（约 1.19MP）
+    MIN_IMAGE_TOKENS = 85        # 极小图片的最小开销
+    
+    # 校准：usage 与估算值之比的指数移动平均
+    CALIBRATION_ALPHA = 0.2
+    CALIBRATION_BOUNDS = (0.5, 3.0)
+    CALIBRATION_MIN_TOKENS = 100  # 太小的请求噪声大，不参与校准
+    
     def __init__(self):
         self._encoder = None
         if HAS_TIKTOKEN:
@@ -107,14 +211,35 @@ class TokenCounter:
                 self._encoder = tiktoken.get_encoding("cl100k_base")
             except Exception:
                 pass
+        
+        # (kind, len, hash) -> tokens
+        self._cache: "OrderedDict[Tuple, int]" = OrderedDict()
+        self._calibration = 1.0
+        self._calibration_samples = 0
+        self._stats = {"hits": 0, "misses": 0, "message_hits": 0, "message_misses": 0}
+    
+    # ---------- 文本 ----------
     
     def count(self, text: str) -> int:
-        """计算文本的 token 数"""
+        """计算文本的 token 数（未校准，结果缓存）"""
+        if not text:
+            return 0
+        key = ("text", len(text), hash(text))
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
         if self._encoder:
-            return len(self._encoder.encode(text))
+            tokens = len(self._encoder.encode(text))
         else:
             # 无 tiktoken 时使用改进的估算
-            return self._estimate_tokens(text)
+            tokens = self._estimate_tokens(text)
+        self._cache_put(key, tokens)
+        return tokens
+    
+    def estimate(self, text: str) -> int:
+        """计算文本的 token 数并应用校准系数"""
+        return self.apply_calibration(self.count(text))
     
     def _estimate_tokens(self, text: str) -> int:
         """
@@ -128,17 +253,8 @@ class TokenCounter:
         if not text:
             return 0
         
-        # 统计 CJK 字符数量
-        cjk_count = 0
-        for char in text:
-            # CJK 统一汉字范围
-            if '\u4e00' <= char <= '\u9fff':  # 中文
-                cjk_count += 1
-            elif '\u3040' <= char <= '\u30ff':  # 日文平假名/片假名
-                cjk_count += 1
-            elif '\uac00' <= char <= '\ud7af':  # 韩文
-                cjk_count += 1
-        
+        # 纯 ASCII 文本不可能包含 CJK，跳过逐字符扫描
+        cjk_count = 0 if text.isascii() else len(_CJK_PATTERN.findall(text))
         non_cjk_count = len(text) - cjk_count
         
         # CJK 字符约 1.5 字符/token，非 CJK 约 4 字符/token
@@ -148,8 +264,22 @@ class TokenCounter:
         # 加 10% 安全边际
         return int((cjk_tokens + non_cjk_tokens) * 1.1)
     
+    # ---------- 消息 ----------
+    
     def count_message(self, message: Message) -> int:
-        """计算消息的 token 数"""
+        """
+        计算消息的 token 数（未校准）
+        
+        结果连同内容指纹缓存在消息对象上；指纹只对字符串取哈希
+        （CPython 会缓存 str 的哈希），不重新编码内容。
+        """
+        fingerprint = self._message_fingerprint(message)
+        cached = getattr(message, "_token_cache", None)
+        if cached is not None and cached[0] == fingerprint:
+            self._stats["message_hits"] += 1
+            return cached[1]
+        
+        self._stats["message_misses"] += 1
         tokens = 4  # 消息开销
         
         if isinstance(message.content, str):
@@ -162,8 +292,39 @@ class TokenCounter:
                 tokens += self.count(tc.name)
                 tokens += self.count(json.dumps(tc.arguments))
         
+        try:
+            message._token_cache = (fingerprint, tokens)
+        except AttributeError:
+            pass  # 不支持属性的对象（如 __slots__）不缓存
         return tokens
     
+    def _message_fingerprint(self, message: Message) -> Tuple:
+        """消息内容指纹：内容变化（含原地修改列表）时指纹随之变化"""
+        tool_calls = tuple(
+            (tc.id, tc.name, len(tc.arguments or ())) for tc in (message.tool_calls or ())
+        )
+        return (self._content_key(message.content), tool_calls)
+    
+    def _content_key(self, content: Any) -> Any:
+        if isinstance(content, str):
+            return (len(content), hash(content))
+        if isinstance(content, list):
+            return tuple(self._content_key(item) for item in content)
+        if isinstance(content, dict):
+            item_type = content.get("type")
+            if item_type == "text":
+                return ("text", self._content_key(content.get("text", "")))
+            if item_type == "image":
+                source = content.get("source", {})
+                if isinstance(source, dict):
+                    return ("image", self._content_key(source.get("data", "")), source.get("width"), source.get("height"))
+            if item_type == "tool_result":
+                return ("tool_result", self._content_key(content.get("content", "")))
+            if item_type == "tool_use":
+                return ("tool_use", content.get("id"), content.get("name"), len(content.get("input") or ()))
+            return ("other", id(content), len(content))
+        return ("other", id(content))
+    
     def _count_content_list(self, content_list: List[Any]) -> int:
         """
         递归计算内容列表的 token 数
@@ -207,17 +368,22 @@ class TokenCounter:
         return tokens
     
     def count_messages(self, messages: List[Message]) -> int:
-        """计算消息列表的总 token 数"""
+        """计算消息列表的总 token 数（未校准）"""
         return sum(self.count_message(m) for m in messages)
     
+    # ---------- 图片 ----------
+    
     def _estimate_image_tokens(self, image_item: Dict[str, Any]) -> int:
         """
-        动态估算图片 token 数
+        按图片尺寸估算 token 数
         
         根据 Anthropic 文档：
-        - 基础估算：(width * height) / 750
-        - 最小值：约 1000 tokens
-        - 1920x1080 ≈ 2765 tokens，但实际可能更高
+        - tokens ≈ (width * height) / 750
+        - 长边超过 1568 像素时按比例缩小
+        - 单张图片上限约 1600 tokens
+        
+        尺寸优先取 source 中的 width/height，其次解析 base64 文件头，
+        都没有时按数据大小粗略推断。
         
         Args:
             image_item: 图片内容字典，可能包含尺寸信息
@@ -225,44 +391,125 @@ class TokenCounter:
         Returns:
             估算的 token 数
         """
-        # 尝试从图片数据中提取尺寸
-        width, height = 1920, 1080  # 默认 Full HD
-        
-        # 检查是否有尺寸信息
         source = image_item.get("source", {})
-        if isinstance(source, dict):
-            # 检查是否有明确的尺寸
-            if "width" in source and "height" in source:
-                width = source.get("width", width)
-                height = source.get("height", height)
-            
-            # 尝试从 base64 数据推断尺寸
-            data = source.get("data", "")
-            if data and len(data) > 100:
-                # 根据 base64 数据大小粗略估算
-                # PNG/JPEG 压缩率不同，使用保守估算
-                data_size = len(data) * 3 / 4  # base64 解码后大小
-                
-                # 假设 8-bit 颜色深度，3 通道，50% 压缩率
-                # pixels ≈ data_size / (3 * 0.5) = data_size * 0.67
-                estimated_pixels = data_size * 0.67
-                
-                # 假设宽高比 16:9
-                estimated_height = int((estimated_pixels / (16/9)) ** 0.5)
-                estimated_width = int(estimated_height * 16 / 9)
-                
-                if estimated_width > 100 and estimated_height > 100:
-                    width = min(estimated_width, 4096)  # 限制最大尺寸
-                    height = min(estimated_height, 4096)
-        
-        # 计算 token 数
-        # Anthropic 公式：(width * height) / 750
-        # 添加 20% 安全边际
-        raw_tokens = (width * height) / 750
-        tokens_with_margin = int(raw_tokens * 1.2)
+        if not isinstance(source, dict):
+            source = {}
+        data = source.get("data", "") or ""
+        
+        if "width" in source and "height" in source:
+            return self.image_tokens(source["width"], source["height"])
+        
+        key = ("image", len(data), hash(data))
+        cached = self._cache_get(key)
+        if cached is not None:
+            return cached
+        
+        dims = image_dimensions(data) if isinstance(data, str) else None
+        if dims is None:
+            dims = self._guess_dimensions(len(data))
+        tokens = self.image_tokens(*dims)
+        self._cache_put(key, tokens)
+        return tokens
+    
+    @classmethod
+    def image_tokens(cls, width: int, height: int) -> int:
+        """按 API 缩放规则计算给定尺寸图片的 token 数"""
+        if width <= 0 or height <= 0:
+            return cls.MIN_IMAGE_TOKENS
+        scale = min(1.0, cls.MAX_IMAGE_LONG_EDGE / max(width, height))
+        tokens = math.ceil(width * height * scale * scale / 750)
+        return max(cls.MIN_IMAGE_TOKENS, min(tokens, cls.MAX_IMAGE_TOKENS))
+    
+    @staticmethod
+    def _guess_dimensions(data_len: int) -> Tuple[int, int]:
+        """无法解析文件头时，按 base64 大小推断尺寸（默认 Full HD）"""
+        if data_len <= 100:
+            return 1920, 1080
+        # 假设 8-bit 颜色深度，3 通道，50% 压缩率，宽高比 16:9
+        estimated_pixels = data_len * 3 / 4 * 0.67
+        height = int((estimated_pixels / (16 / 9)) ** 0.5)
+        width = int(height * 16 / 9)
+        if width <= 100 or height <= 100:
+            return 1920, 1080
+        return min(width, 4096), min(height, 4096)
+    
+    # ---------- 校准 ----------
+    
+    @property
+    def calibration_factor(self) -> float:
+        """实际 token / 估算 token 的平滑比值"""
+        return self._calibration
+    
+    def apply_calibration(self, tokens: int) -> int:
+        """把原始估算值换算为校准后的值"""
+        return int(round(tokens * self._calibration))
+    
+    def calibrate(self, estimated_tokens: int, usage: Any) -> float:
+        """
+        用 API 返回的 usage 校准估算器
         
-        # 最小 1500 tokens（保守估算）
-        return max(tokens_with_margin, 1500)
+        Args:
+            estimated_tokens: 同一请求的原始（未校准）估算值
+            usage: Anthropic usage 对象/字典，或实际输入 token 数
+            
+        Returns:
+            更新后的校准系数
+        """
+        actual = usage_input_tokens(usage)
+        if estimated_tokens < self.CALIBRATION_MIN_TOKENS or actual <= 0:
+            return self._calibration
+        
+        low, high = self.CALIBRATION_BOUNDS
+        ratio = min(max(actual / estimated_tokens, low), high)
+        if self._calibration_samples == 0:
+            self._calibration = ratio
+        else:
+            alpha = self.CALIBRATION_ALPHA
+            self._calibration = (1 - alpha) * self._calibration + alpha * ratio
+        self._calibration_samples += 1
+        return self._calibration
+    
+    # ---------- 缓存 ----------
+    
+    def _cache_get(self, key: Tuple) -> Optional[int]:
+        tokens = self._cache.get(key)
+        if tokens is None:
+            self._stats["misses"] += 1
+            return None
+        self._stats["hits"] += 1
+        self._cache.move_to_end(key)
+        return tokens
+    
+    def _cache_put(self, key: Tuple, tokens: int):
+        self._cache[key] = tokens
+        while len(self._cache) > self.TEXT_CACHE_SIZE:
+            try:
+                self._cache.popitem(last=False)
+            except KeyError:
+                break
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """缓存命中与校准状态"""
+        return {
+            **self._stats,
+            "cache_size": len(self._cache),
+            "calibration_factor": round(self._calibration, 4),
+            "calibration_samples": self._calibration_samples,
+            "encoder": "tiktoken" if self._encoder else "heuristic",
+        }
+
+
+_default_counter: Optional[TokenCounter] = None
+
+
+def get_token_counter() -> TokenCounter:
+    """获取全局 Token 计数器（LLMClient 的 usage 校准会作用于所有使用者）"""
+    global _default_counter
+    
+    if _default_counter is None:
+        _default_counter = TokenCounter()
+    
+    return _default_counter
 
 
 # ========== 上下文压缩器 ==========
@@ -303,6 +550,7 @@ class ContextCompressor:
         self,
         llm_client: Optional["LLMClient"] = None,
         use_haiku_summary: bool = True,
+        counter: Optional[TokenCounter] = None,
     ):
         """
         初始化压缩器
@@ -310,10 +558,11 @@ class ContextCompressor:
         Args:
             llm_client: LLM 客户端（用于生成摘要）
             use_haiku_summary: 是否使用 Haiku 生成摘要
+            counter: Token 计数器（默认使用全局计数器）
         """
         self._llm_client = llm_client
         self._use_haiku_summary = use_haiku_summary
-        self._counter = TokenCounter()
+        self._counter = counter or get_token_counter()
     
     async def compress(
         self,
@@ -527,6 +776,7 @@ class ContextManager:
         self,
         budget: Optional[TokenBudget] = None,
         llm_client: Optional["LLMClient"] = None,
+        counter: Optional[TokenCounter] = None,
     ):
         """
         初始化上下文管理器
@@ -534,17 +784,81 @@ class ContextManager:
         Args:
             budget: Token 预算配置
             llm_client: LLM 客户端（用于压缩）
+            counter: Token 计数器（默认使用全局计数器，共享 usage 校准）
         """
         self.budget = budget or TokenBudget()
-        self._counter = TokenCounter()
-        self._compressor = ContextCompressor(llm_client)
+        self._counter = counter or get_token_counter()
+        self._compressor = ContextCompressor(llm_client, counter=self._counter)
         
         # 截图追踪
         self._screenshot_count = 0
+        
+        # 运行总数：追踪同一个消息列表，追加时只计算新消息
+        self._tracked: Optional[List[Message]] = None
+        self._tracked_len = 0
+        self._tracked_last: Optional[Message] = None
+        self._running_tokens = 0
+    
+    def track(self, messages: List[Message]) -> int:
+        """
+        更新并返回消息列表的原始 token 运行总数
+        
+        同一个列表只追加消息时，只计算新增部分；换了列表（如压缩后）
+        则重新求和，但每条消息的计数已缓存在消息对象上，不会重新编码。
+        原地修改旧消息后可调用 invalidate() 强制重算。
+        """
+        n = len(messages)
+        tracked_len = self._tracked_len
+        if (
+            messages is self._tracked
+            and n >= tracked_len
+            and (tracked_len == 0 or messages[tracked_len - 1] is self._tracked_last)
+        ):
+            if n > tracked_len:
+                self._running_tokens += self._counter.count_messages(messages[tracked_len:])
+        else:
+            self._tracked = messages
+            self._running_tokens = self._counter.count_messages(messages)
+        
+        self._tracked_len = n
+        self._tracked_last = messages[-1] if n else None
+        return self._running_tokens
+    
+    def invalidate(self):
+        """丢弃运行总数，下次调用时重新求和"""
+        self._tracked = None
+        self._tracked_len = 0
+        self._tracked_last = None
+        self._running_tokens = 0
     
     def count_tokens(self, messages: List[Message]) -> int:
-        """计算消息的 token 数"""
-        return self._counter.count_messages(messages)
+        """计算消息的 token 数（已按 usage 校准）"""
+        return self._counter.apply_calibration(self.track(messages))
+    
+    def record_usage(
+        self,
+        usage: Any,
+        messages: Optional[List[Message]] = None,
+        overhead_tokens: int = 0,
+    ) -> float:
+        """
+        用 API 返回的 usage 校准 token 估算
+        
+        Args:
+            usage: Anthropic usage（或实际输入 token 数）
+            messages: 本次请求发送的消息（默认使用当前追踪的列表）
+            overhead_tokens: 系统提示词、工具定义等非消息部分的原始估算
+            
+        Returns:
+            更新后的校准系数
+        """
+        if messages is not None:
+            estimated = self.track(messages)
+        elif self._tracked is not None:
+            estimated = self._running_tokens
+        else:
+            return self._counter.calibration_factor
+        return self._counter.calibrate(estimated + overhead_tokens, usage)
     
     def get_usage_ratio(self, messages: List[Message]) -> float:
         """获取 token 使用率"""
@@ -583,6 +897,12 @@ class ContextManager:
         
         result = await self._compressor.compress(messages, self.budget)
         
+        # 压缩器已经计算过新列表的总数，直接接管追踪
+        self._tracked = result.messages
+        self._tracked_len = len(result.messages)
+        self._tracked_last = result.messages[-1] if result.messages else None
+        self._running_tokens = result.compressed_tokens
+        
         if result.compression_ratio > 0:
             logger.info(
                 f"Compressed context: {result.original_tokens} -> {result.compressed_tokens} tokens "
@@ -671,6 +991,7 @@ class ContextManager:
             "should_compress": self.should_compress(messages),
             "message_count": len(messages),
             "estimated_cost": self.budget.estimate_cost(tokens, 0),
+            "calibration_factor": round(self._counter.calibration_factor, 4),
         }
 
 
@@ -0,0 +1,191 @@
+# -*- coding: utf-8 -*-
+"""
+Conversation History - Screenshot-aware message list for the ReAct loop
+
+Screenshots dominate the agent's context: a single 1280x800 capture is
+several MB of base64 and tens of thousands of tokens. The API request only
+needs the most recent few, so older ones are replaced by a short text
+placeholder before every call.
+
+ConversationHistory is a drop-in `list` of Anthropic-style messages that
+records where image blocks live as messages are appended. Pruning then
+touches only the images that just fell out of the window instead of
+rescanning (and deep-copying) the whole conversation each iteration.
+
+Key Features:
+- Image positions indexed on append (direct and inside tool_result blocks)
+- Copy-on-write replacement: only the affected message/block is copied,
+  caller-owned dicts are never mutated
+- Pruned image data is released from the history immediately
+- Per-iteration cost is O(new messages + newly pruned images)
+- Pinned images (the keyframes that screenshot patches refer to, see
+  screenshot_diff.py) are pruned only after every unpinned image
+
+Usage:
+    history = ConversationHistory([{"role": "user", "content": task}])
+    history.append({"role": "assistant", "content": response.content})
+    history.append({"role": "user", "content": tool_results})
+    messages_for_api = history.prune_images(max_images=2)
+"""
+
+from typing import Any, Collection, Dict, Iterable, List, Optional, Tuple
+
+# Placeholder sent in place of a pruned screenshot
+PRUNED_IMAGE_TEXT = "[Previous screenshot removed to save context space]"
+
+# (message index, content index, inner index inside tool_result or None)
+ImageLocation = Tuple[int, int, Optional[int]]
+
+
+def find_image_blocks(message: Dict[str, Any]) -> List[Tuple[int, Optional[int]]]:
+    """Locate image blocks in one message as (content index, inner index)"""
+    content = message.get("content") if isinstance(message, dict) else None
+    if not isinstance(content, list):
+        return []
+
+    found = []
+    for content_idx, block in enumerate(content):
+        if not isinstance(block, dict):
+            continue
+        block_type = block.get("type")
+        if block_type == "image":
+            found.append((content_idx, None))
+        elif block_type == "tool_result":
+            inner = block.get("content")
+            if isinstance(inner, list):
+                for inner_idx, inner_block in enumerate(inner):
+                    if isinstance(inner_block, dict) and inner_block.get("type") == "image":
+                        found.append((content_idx, inner_idx))
+    return found
+
+
+def replace_images(message: Dict[str, Any], positions: Iterable[Tuple[int, Optional[int]]]) -> Dict[str, Any]:
+    """
+    Return a copy of `message` with the given image blocks replaced.
+
+    Only the message, its content list and touched tool_result blocks are
+    copied; every other block is shared with the original.
+    """
+    new_message = dict(message)
+    content = list(message["content"])
+    copied_results = set()
+
+    for content_idx, inner_idx in positions:
+        if inner_idx is None:
+            content[content_idx] = {"type": "text", "text": PRUNED_IMAGE_TEXT}
+            continue
+        if content_idx not in copied_results:
+            block = dict(content[content_idx])
+            block["content"] = list(block["content"])
+            content[content_idx] = block
+            copied_results.add(content_idx)
+        content[content_idx]["content"][inner_idx] = {"type": "text", "text": PRUNED_IMAGE_TEXT}
+
+    new_message["content"] = content
+    return new_message
+
+
+class ConversationHistory(list):
+    """
+    Message list that tracks image blocks for incremental pruning.
+
+    Behaves like the plain list the agent loop used before (append, len,
+    iteration, indexing). Mutations other than append/extend are not
+    expected from the loop; if they happen the image index is rebuilt.
+    """
+
+    def __init__(self, messages: Optional[Iterable[Dict[str, Any]]] = None):
+        super().__init__()
+        self._images: List[ImageLocation] = []  # Live (unpruned) images, oldest first
+        self.images_pruned = 0
+        if messages:
+            self.extend(messages)
+
+    # ------------------------------------------------------------------
+    # list API
+    # ------------------------------------------------------------------
+
+    def append(self, message: Dict[str, Any]):
+        msg_idx = len(self)
+        super().append(message)
+        for content_idx, inner_idx in find_image_blocks(message):
+            self._images.append((msg_idx, content_idx, inner_idx))
+
+    def extend(self, messages: Iterable[Dict[str, Any]]):
+        for message in messages:
+            self.append(message)
+
+    def __setitem__(self, index, value):
+        super().__setitem__(index, value)
+        self._reindex()
+
+    def __delitem__(self, index):
+        super().__delitem__(index)
+        self._reindex()
+
+    def insert(self, index, value):
+        super().insert(index, value)
+        self._reindex()
+
+    def pop(self, index=-1):
+        value = super().pop(index)
+        self._reindex()
+        return value
+
+    def clear(self):
+        super().clear()
+        self._images.clear()
+
+    # ------------------------------------------------------------------
+    # Images
+    # ------------------------------------------------------------------
+
+    @property
+    def image_count(self) -> int:
+        """Images still present in the history"""
+        return len(self._images)
+
+    def prune_images(self, max_images: int = 2, pinned: Collection[str] = ()) -> "ConversationHistory":
+        """
+        Keep only the newest `max_images` images, replacing older ones.
+
+        Images whose base64 data is in `pinned` go last: the oldest unpinned
+        images are replaced first. The replacement happens in the history
+        itself, so pruned screenshots are freed and never revisited.
+        Returns self for call chaining.
+        """
+        excess = len(self._images) - max(max_images, 0)
+        if excess <= 0:
+            return self
+
+        if pinned:
+            unpinned = [loc for loc in self._images if self._image_data(loc) not in pinned]
+            kept_pinned = [loc for loc in self._images if self._image_data(loc) in pinned]
+            expired = (unpinned + kept_pinned)[:excess]
+            expired_set = set(expired)
+            self._images = [loc for loc in self._images if loc not in expired_set]
+        else:
+            expired, self._images = self._images[:excess], self._images[excess:]
+        by_message: Dict[int, List[Tuple[int, Optional[int]]]] = {}
+        for msg_idx, content_idx, inner_idx in expired:
+            by_message.setdefault(msg_idx, []).append((content_idx, inner_idx))
+
+        for msg_idx, positions in by_message.items():
+            list.__setitem__(self, msg_idx, replace_images(self[msg_idx], positions))
+        self.images_pruned += excess
+        return self
+
+    def _image_data(self, location: ImageLocation) -> Optional[str]:
+        msg_idx, content_idx, inner_idx = location
+        block = self[msg_idx]["content"][content_idx]
+        if inner_idx is not None:
+            block = block["content"][inner_idx]
+        source = block.get("source")
+        return source.get("data") if isinstance(source, dict) else None
+
+    def _reindex(self):
+        self._images = [
+            (msg_idx, content_idx, inner_idx)
+            for msg_idx, message in enumerate(self)
+            for content_idx, inner_idx in find_image_blocks(message)
+        ]
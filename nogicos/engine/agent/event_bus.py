@@ -9,16 +9,19 @@ NogicOS 事件总线
 - 背压控制（可选，在 Phase 0.25 增强）
 - 全局订阅（用于日志、追踪）
 - 优先级队列支持
+- 分发模式（默认）：每个订阅者独立队列 + worker，发布近似 O(1)
 
 参考:
 - UFO Agent Interaction Protocol (AIP)
 - Node.js EventEmitter
 """
 
-from typing import Callable, Dict, List, Set, Optional, Union, Awaitable
+from typing import Any, Callable, Deque, Dict, List, Set, Optional, Tuple, Union, Awaitable
 from collections import defaultdict, deque
 import asyncio
 import logging
+import time
+import zlib
 from dataclasses import dataclass, field
 from enum import Enum
 
@@ -228,39 +231,56 @@ class EventBus:
 # ========== 单例模式 ==========
 
 _default_bus: Optional[EventBus] = None
-_use_backpressure: bool = False  # 是否使用背压总线
+_bus_mode: str = "dispatch"  # dispatch | inline | backpressure
+_bus_options: Dict[str, Any] = {}
 
+EVENT_BUS_MODES = ("dispatch", "inline", "backpressure")
 
-def configure_event_bus(use_backpressure: bool = False):
+
+def configure_event_bus(
+    use_backpressure: bool = False,
+    mode: Optional[str] = None,
+    **options,
+):
     """
     配置事件总线类型（必须在首次调用 get_event_bus 前调用）
     
     Args:
-        use_backpressure: 是否使用背压事件总线
+        use_backpressure: 是否使用背压事件总线（兼容旧参数，等价于 mode="backpressure"）
+        mode: dispatch（默认，每订阅者队列）/ inline（发布者内联执行）/ backpressure
+        **options: 传给 DispatchEventBus 的参数（workers、max_queue、handler_timeout、overflow）
     """
-    global _use_backpressure, _default_bus
+    global _bus_mode, _bus_options, _default_bus
     if _default_bus is not None:
         logger.warning("Event bus already initialized, configuration ignored")
         return
-    _use_backpressure = use_backpressure
+    if mode is None:
+        mode = "backpressure" if use_backpressure else "dispatch"
+    if mode not in EVENT_BUS_MODES:
+        raise ValueError(f"Unknown event bus mode: {mode} (expected one of {EVENT_BUS_MODES})")
+    _bus_mode = mode
+    _bus_options = options
 
 
 def get_event_bus() -> EventBus:
     """
     获取默认事件总线（单例）
     
-    根据配置返回普通 EventBus 或 BackpressureEventBus。
-    使用 configure_event_bus() 在启动时配置。
+    默认返回 DispatchEventBus：处理器在各自的 worker 中运行，
+    慢处理器（LangSmith、WebSocket 转发）不会拖慢 Agent 循环。
+    使用 configure_event_bus() 在启动时切换模式。
     """
     global _default_bus
     if _default_bus is None:
-        if _use_backpressure:
-            # 延迟导入避免循环依赖
+        if _bus_mode == "backpressure":
             _default_bus = BackpressureEventBus()
             logger.info("Using BackpressureEventBus")
-        else:
+        elif _bus_mode == "inline":
             _default_bus = EventBus()
             logger.info("Using standard EventBus")
+        else:
+            _default_bus = DispatchEventBus(**_bus_options)
+            logger.info("Using DispatchEventBus")
     return _default_bus
 
 
@@ -504,16 +524,7 @@ class BackpressureEventBus(EventBus):
     
     def _get_priority(self, event: AgentEvent) -> int:
         """获取事件优先级"""
-        # 先检查事件自带的优先级
-        if event.priority == EventPriority.CRITICAL:
-            return 0
-        elif event.priority == EventPriority.HIGH:
-            return 1
-        elif event.priority == EventPriority.LOW:
-            return 4
-        
-        # 使用类型映射
-        return self.PRIORITY_MAP.get(event.type, 2)
+        return event_priority(event)
     
     async def _worker(self):
         """Worker 协程：批量处理事件"""
@@ -627,6 +638,515 @@ class BackpressureEventBus(EventBus):
             await asyncio.sleep(0.1)
 
 
+def event_priority(event: AgentEvent) -> int:
+    """
+    事件的丢弃优先级（数字越小越重要）
+    
+    事件自带的优先级优先，其次使用 BackpressureEventBus.PRIORITY_MAP。
+    小于 DROPPABLE_THRESHOLD 的事件在任何溢出策略下都不会被丢弃。
+    """
+    if event.priority == EventPriority.CRITICAL:
+        return 0
+    elif event.priority == EventPriority.HIGH:
+        return 1
+    elif event.priority == EventPriority.LOW:
+        return 4
+    return BackpressureEventBus.PRIORITY_MAP.get(event.type, 2)
+
+
+# ========== 分发事件总线（默认） ==========
+
+class OverflowPolicy(Enum):
+    """订阅者队列溢出策略"""
+    DROP_OLDEST = "drop_oldest"  # 丢弃最旧的可丢弃事件，保留新事件
+    DROP_NEWEST = "drop_newest"  # 丢弃新到达的事件
+    BLOCK = "block"              # 发布者等待队列有空间（仅用于必须完整消费的订阅者）
+
+
+class _Subscriber:
+    """
+    单个订阅者的分发状态
+    
+    事件按 task_id 哈希到分片，每个分片一个 worker，
+    因此同一任务的事件对同一订阅者严格保序。
+    """
+    
+    LATENCY_WINDOW = 256
+    
+    def __init__(
+        self,
+        bus: "DispatchEventBus",
+        info: HandlerInfo,
+        event_type: Optional[EventType],
+        workers: int,
+        max_queue: int,
+        timeout: Optional[float],
+        overflow: OverflowPolicy,
+    ):
+        self.bus = bus
+        self.info = info
+        self.event_type = event_type
+        self.workers = max(1, workers)
+        self.max_queue = max(1, max_queue)
+        self.timeout = timeout
+        self.overflow = overflow
+        
+        # 每个分片：(入队时间, 事件)
+        self._shards: List[Deque[Tuple[float, AgentEvent]]] = [deque() for _ in range(self.workers)]
+        self._tasks: List[Optional[asyncio.Task]] = [None] * self.workers
+        self._wakeups: List[asyncio.Event] = []
+        self._space: Optional[asyncio.Event] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._depth = 0
+        self._inflight = 0
+        self._closed = False
+        
+        self.stats = {
+            "received": 0,
+            "processed": 0,
+            "errors": 0,
+            "timeouts": 0,
+            "dropped": 0,
+            "overflow": 0,  # 不可丢弃事件超出队列上限的次数
+            "blocked": 0,
+            "max_depth": 0,
+        }
+        self._latencies: Deque[float] = deque(maxlen=self.LATENCY_WINDOW)
+        self._waits: Deque[float] = deque(maxlen=self.LATENCY_WINDOW)
+        self._latency_total = 0.0
+        self._latency_max = 0.0
+    
+    @property
+    def depth(self) -> int:
+        return self._depth
+    
+    @property
+    def busy(self) -> bool:
+        return self._depth > 0 or self._inflight > 0
+    
+    # ---------- 入队 ----------
+    
+    def offer(self, event: AgentEvent) -> bool:
+        """
+        非阻塞入队
+        
+        Returns:
+            False 表示队列已满且事件未入队（DROP_NEWEST 丢弃或 BLOCK 需等待）
+        """
+        self._bind_loop()
+        self.stats["received"] += 1
+        
+        if self._depth >= self.max_queue:
+            if event_priority(event) < BackpressureEventBus.DROPPABLE_THRESHOLD:
+                # 关键事件永不丢弃，允许暂时超过上限
+                self.stats["overflow"] += 1
+            elif self.overflow is OverflowPolicy.BLOCK:
+                self.stats["received"] -= 1
+                return False
+            elif self.overflow is OverflowPolicy.DROP_NEWEST or not self._drop_oldest():
+                self.stats["dropped"] += 1
+                return False
+        
+        self._enqueue(event)
+        return True
+    
+    async def put(self, event: AgentEvent):
+        """阻塞入队（BLOCK 策略）：等待 worker 腾出空间"""
+        self.stats["blocked"] += 1
+        while not self._closed and self._depth >= self.max_queue:
+            self._space.clear()
+            await self._space.wait()
+        self.stats["received"] += 1
+        self._enqueue(event)
+    
+    def _enqueue(self, event: AgentEvent):
+        shard = self._shard_for(event.task_id)
+        self._shards[shard].append((time.perf_counter(), event))
+        self._depth += 1
+        if self._depth > self.stats["max_depth"]:
+            self.stats["max_depth"] = self._depth
+        self._ensure_worker(shard)
+        self._wakeups[shard].set()
+    
+    def _shard_for(self, task_id: str) -> int:
+        if self.workers == 1:
+            return 0
+        # 稳定哈希（不受 PYTHONHASHSEED 影响），保证同一 task_id 总落在同一分片
+        return zlib.crc32((task_id or "").encode("utf-8", "replace")) % self.workers
+    
+    def _drop_oldest(self) -> bool:
+        """丢弃最旧的可丢弃事件；全部不可丢弃时返回 False"""
+        oldest_shard, oldest_item, oldest_at = None, None, None
+        for shard in self._shards:
+            for item in shard:
+                if event_priority(item[1]) >= BackpressureEventBus.DROPPABLE_THRESHOLD:
+                    if oldest_at is None or item[0] < oldest_at:
+                        oldest_shard, oldest_item, oldest_at = shard, item, item[0]
+                    break
+        if oldest_shard is None:
+            return False
+        oldest_shard.remove(oldest_item)
+        self._depth -= 1
+        self.stats["dropped"] += 1
+        return True
+    
+    # ---------- Worker ----------
+    
+    def _bind_loop(self):
+        """
+        绑定当前事件循环
+        
+        单例总线可能跨越多个事件循环（测试、重启），循环变化时重建
+        同步原语和 worker；已排队的事件由新 worker 继续处理。
+        """
+        loop = asyncio.get_running_loop()
+        if loop is self._loop:
+            return
+        self._loop = loop
+        self._wakeups = [asyncio.Event() for _ in range(self.workers)]
+        self._space = asyncio.Event()
+        self._tasks = [None] * self.workers
+        self._inflight = 0
+        for shard, queue in enumerate(self._shards):
+            if queue:
+                self._ensure_worker(shard)
+                self._wakeups[shard].set()
+    
+    def _ensure_worker(self, shard: int):
+        task = self._tasks[shard]
+        if task is None or task.done():
+            self._tasks[shard] = self._loop.create_task(
+                self._worker(shard),
+                name=f"event-bus:{self.info.name}:{shard}",
+            )
+    
+    async def _worker(self, shard: int):
+        queue = self._shards[shard]
+        wakeup = self._wakeups[shard]
+        while not self._closed:
+            if not queue:
+                wakeup.clear()
+                await wakeup.wait()
+                continue
+            
+            enqueued_at, event = queue.popleft()
+            self._depth -= 1
+            self._inflight += 1
+            self._space.set()
+            
+            started = time.perf_counter()
+            self._waits.append(started - enqueued_at)
+            try:
+                await self._call(event)
+                self.stats["processed"] += 1
+            except asyncio.CancelledError:
+                raise
+            except asyncio.TimeoutError:
+                self.stats["timeouts"] += 1
+                self.bus._error_count += 1
+                logger.warning(
+                    f"Handler '{self.info.name}' timed out after {self.timeout}s on {event.type.value}"
+                )
+            except Exception as e:
+                self.stats["errors"] += 1
+                self.bus._error_count += 1
+                logger.error(f"Handler '{self.info.name}' error for {event.type.value}: {e}")
+            finally:
+                self._inflight -= 1
+            
+            latency = time.perf_counter() - started
+            self._latencies.append(latency)
+            self._latency_total += latency
+            if latency > self._latency_max:
+                self._latency_max = latency
+    
+    async def _call(self, event: AgentEvent):
+        if not self.info.is_async:
+            self.info.handler(event)
+            return
+        if self.timeout:
+            await asyncio.wait_for(self.info.handler(event), self.timeout)
+        else:
+            await self.info.handler(event)
+    
+    async def close(self):
+        """停止 worker，丢弃未处理事件"""
+        self._closed = True
+        tasks = [t for t in self._tasks if t is not None and not t.done()]
+        for task in tasks:
+            try:
+                task.cancel()
+            except RuntimeError:
+                # 所属事件循环已关闭
+                continue
+        current = asyncio.get_running_loop()
+        for task in tasks:
+            if task.get_loop() is current:
+                try:
+                    await task
+                except (asyncio.CancelledError, Exception):
+                    pass
+        for shard in self._shards:
+            shard.clear()
+        self._depth = 0
+        if self._space is not None:
+            self._space.set()
+    
+    def close_nowait(self):
+        """同步取消（用于 unsubscribe）"""
+        self._closed = True
+        for task in self._tasks:
+            if task is not None and not task.done():
+                try:
+                    task.cancel()
+                except RuntimeError:
+                    pass
+        for shard in self._shards:
+            shard.clear()
+        self._depth = 0
+        if self._space is not None:
+            self._space.set()
+    
+    # ---------- 统计 ----------
+    
+    def get_stats(self) -> Dict[str, Any]:
+        latencies = sorted(self._latencies)
+        processed = self.stats["processed"] + self.stats["errors"] + self.stats["timeouts"]
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))] if latencies else 0.0
+        avg_wait = sum(self._waits) / len(self._waits) if self._waits else 0.0
+        return {
+            "name": self.info.name,
+            "event_type": self.event_type.value if self.event_type else "*",
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "overflow_policy": self.overflow.value,
+            "timeout_s": self.timeout,
+            "depth": self._depth,
+            "inflight": self._inflight,
+            **self.stats,
+            "avg_latency_ms": round(self._latency_total / processed * 1000, 3) if processed else 0.0,
+            "p95_latency_ms": round(p95 * 1000, 3),
+            "max_latency_ms": round(self._latency_max * 1000, 3),
+            "avg_queue_wait_ms": round(avg_wait * 1000, 3),
+        }
+
+
+class DispatchEventBus(EventBus):
+    """
+    分发事件总线 - 每个订阅者独立队列和 worker（默认模式）
+    
+    EventBus.publish 在发布者协程里依次 await 每个处理器，慢处理器
+    （LangSmith、WebSocket 转发）会直接叠加到 Agent 每一步的延迟上。
+    DispatchEventBus.publish 只把事件放入各订阅者的队列即返回，
+    处理器在各自的 worker 中执行。
+    
+    特性:
+    - 每订阅者队列：一个慢处理器只拖慢自己
+    - 可配置 worker 数：事件按 task_id 分片，同一任务对同一订阅者保序
+    - 处理器超时：异步处理器超过 handler_timeout 被取消并计数
+    - 溢出策略：drop_oldest / drop_newest / block；关键事件永不丢弃
+    - get_stats() 输出每个处理器的延迟、排队等待、超时和丢弃
+    
+    注意: 不同订阅者之间不再保证执行先后（priority 仅影响入队顺序）。
+    
+    使用示例:
+    ```python
+    bus = DispatchEventBus(workers=1, max_queue=1000, handler_timeout=5.0)
+    bus.subscribe_all(send_to_langsmith, name="langsmith", workers=4)
+    bus.subscribe(EventType.TOOL_END, record_tool, overflow="drop_newest")
+    
+    await bus.publish(event)   # 仅入队
+    await bus.drain()          # 等待所有处理器完成（测试/关闭时）
+    await bus.stop()
+    ```
+    """
+    
+    def __init__(
+        self,
+        max_queue_size: int = 1000,
+        workers: int = 1,
+        max_queue: Optional[int] = None,
+        handler_timeout: Optional[float] = 10.0,
+        overflow: Union[OverflowPolicy, str] = OverflowPolicy.DROP_OLDEST,
+    ):
+        """
+        Args:
+            max_queue_size: 兼容 EventBus 参数；未指定 max_queue 时作为每订阅者队列上限
+            workers: 每个订阅者的默认 worker 数
+            max_queue: 每个订阅者的默认队列上限
+            handler_timeout: 异步处理器默认超时（秒），None 表示不限
+            overflow: 默认溢出策略
+        """
+        super().__init__(max_queue_size)
+        self._default_workers = max(1, workers)
+        self._default_max_queue = max_queue or max_queue_size
+        self._default_timeout = handler_timeout
+        self._default_overflow = OverflowPolicy(overflow)
+        self._typed_subscribers: Dict[EventType, List[_Subscriber]] = defaultdict(list)
+        self._global_subscribers: List[_Subscriber] = []
+        self._events_dropped = 0
+    
+    def _make_subscriber(
+        self,
+        handler: EventHandler,
+        event_type: Optional[EventType],
+        priority: int,
+        name: str,
+        workers: Optional[int],
+        max_queue: Optional[int],
+        timeout: Optional[float],
+        overflow: Optional[Union[OverflowPolicy, str]],
+    ) -> _Subscriber:
+        info = HandlerInfo(
+            handler=handler,
+            is_async=asyncio.iscoroutinefunction(handler),
+            priority=priority,
+            name=name,
+        )
+        return _Subscriber(
+            self,
+            info,
+            event_type,
+            workers=workers or self._default_workers,
+            max_queue=max_queue or self._default_max_queue,
+            timeout=self._default_timeout if timeout is None else (timeout or None),
+            overflow=OverflowPolicy(overflow) if overflow else self._default_overflow,
+        )
+    
+    def subscribe(
+        self,
+        event_type: EventType,
+        handler: EventHandler,
+        priority: int = 0,
+        name: str = "",
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        timeout: Optional[float] = None,
+        overflow: Optional[Union[OverflowPolicy, str]] = None,
+    ) -> Callable[[], None]:
+        """
+        订阅特定事件类型
+        
+        Args:
+            workers: 该订阅者的 worker 数（默认取总线配置）
+            max_queue: 该订阅者的队列上限
+            timeout: 异步处理器超时（秒），0 表示不限
+            overflow: 溢出策略
+        
+        Returns:
+            取消订阅的函数
+        """
+        name = name or getattr(handler, "__name__", "anonymous")
+        unsubscribe_info = super().subscribe(event_type, handler, priority=priority, name=name)
+        sub = self._make_subscriber(handler, event_type, priority, name, workers, max_queue, timeout, overflow)
+        subs = self._typed_subscribers[event_type]
+        subs.append(sub)
+        subs.sort(key=lambda s: -s.info.priority)
+        
+        def unsubscribe():
+            unsubscribe_info()
+            if sub in subs:
+                subs.remove(sub)
+            sub.close_nowait()
+        
+        return unsubscribe
+    
+    def subscribe_all(
+        self,
+        handler: EventHandler,
+        priority: int = 0,
+        name: str = "",
+        workers: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        timeout: Optional[float] = None,
+        overflow: Optional[Union[OverflowPolicy, str]] = None,
+    ) -> Callable[[], None]:
+        """订阅所有事件（参数同 subscribe）"""
+        name = name or getattr(handler, "__name__", "global_handler")
+        unsubscribe_info = super().subscribe_all(handler, priority=priority, name=name)
+        sub = self._make_subscriber(handler, None, priority, name, workers, max_queue, timeout, overflow)
+        self._global_subscribers.append(sub)
+        self._global_subscribers.sort(key=lambda s: -s.info.priority)
+        
+        def unsubscribe():
+            unsubscribe_info()
+            if sub in self._global_subscribers:
+                self._global_subscribers.remove(sub)
+            sub.close_nowait()
+        
+        return unsubscribe
+    
+    async def publish(self, event: AgentEvent) -> bool:
+        """
+        发布事件：入队到每个匹配的订阅者后立即返回
+        
+        Returns:
+            所有订阅者都接收了事件时为 True；任一订阅者丢弃时为 False
+        """
+        if self._paused:
+            logger.warning(f"EventBus paused, dropping event: {event.type.value}")
+            return False
+        
+        self._event_count += 1
+        accepted = True
+        for subscribers in (self._global_subscribers, self._typed_subscribers.get(event.type, ())):
+            for sub in subscribers:
+                if sub.offer(event):
+                    continue
+                if sub.overflow is OverflowPolicy.BLOCK:
+                    await sub.put(event)
+                else:
+                    accepted = False
+                    self._events_dropped += 1
+        return accepted
+    
+    def _all_subscribers(self) -> List[_Subscriber]:
+        subs = list(self._global_subscribers)
+        for typed in self._typed_subscribers.values():
+            subs.extend(typed)
+        return subs
+    
+    async def start(self):
+        """兼容 BackpressureEventBus 接口；worker 在首次发布时按需启动"""
+    
+    async def drain(self, timeout: float = 5.0) -> bool:
+        """等待所有已发布事件处理完成"""
+        deadline = time.perf_counter() + timeout
+        while any(sub.busy for sub in self._all_subscribers()):
+            if time.perf_counter() > deadline:
+                pending = sum(sub.depth for sub in self._all_subscribers())
+                logger.warning(f"Drain timeout, {pending} events remaining")
+                return False
+            await asyncio.sleep(0.005)
+        return True
+    
+    async def stop(self):
+        """停止所有 worker（未处理事件被丢弃，需要时先调用 drain）"""
+        for sub in self._all_subscribers():
+            await sub.close()
+        logger.info("DispatchEventBus workers stopped")
+    
+    def clear(self):
+        """清除所有处理器并停止其 worker"""
+        for sub in self._all_subscribers():
+            sub.close_nowait()
+        self._typed_subscribers.clear()
+        self._global_subscribers.clear()
+        super().clear()
+    
+    def get_stats(self) -> Dict:
+        """获取统计信息（含每个处理器的延迟、超时和溢出）"""
+        subscribers = [sub.get_stats() for sub in self._all_subscribers()]
+        return {
+            **super().get_stats(),
+            "mode": "dispatch",
+            "queue_size": sum(s["depth"] for s in subscribers),
+            "events_dropped": self._events_dropped,
+            "timeouts": sum(s["timeouts"] for s in subscribers),
+            "subscribers": subscribers,
+        }
+
+
 # ========== 工厂函数 ==========
 
 _backpressure_bus: Optional[BackpressureEventBus] = None
@@ -5,26 +5,42 @@ NogicOS 增量检查点
 减少序列化开销，优化状态持久化性能。
 
 策略:
-1. 计算状态差异，只保存变化部分
-2. 定期做全量检查点
-3. 恢复时合并增量
+1. 对整个状态做结构化差异（JSON Patch 风格），只保存变化部分
+2. 差异中的值只序列化一次，直接作为存储内容写入
+3. 增量累计到数量或体积阈值时压缩为新的全量检查点
+4. 截图以引用形式保存（ScreenshotManager），检查点里不内联 base64
+5. 恢复时只读取最近的全量检查点及其后的增量
 
 参考:
 - LangGraph Checkpointer
 - Git 增量提交
+- RFC 6902 JSON Patch
 """
 
+import base64
+import binascii
 import json
 import logging
-from typing import Dict, Optional, Any, List
+from typing import Dict, Optional, Any, List, Tuple
 from dataclasses import dataclass, field
 
+from ..observability import spans as tracing
+
 logger = logging.getLogger(__name__)
 
+# 增量检查点格式标识
+PATCH_FORMAT = "json-patch"
+
+# 截图引用的 source.type
+SCREENSHOT_REF_TYPE = "screenshot_ref"
+
+# 恢复时截图已被清理的占位文本
+MISSING_SCREENSHOT_TEXT = "[Screenshot no longer available]"
+
 
 @dataclass
 class CheckpointDelta:
-    """检查点增量"""
+    """检查点增量（旧格式，仅用于恢复历史检查点）"""
     iteration: int
     new_messages: List[dict] = field(default_factory=list)
     status_change: Optional[str] = None
@@ -45,14 +61,140 @@ class CheckpointDelta:
         return result
 
 
+# ========== 结构化差异 ==========
+
+def snapshot(value: Any) -> Any:
+    """
+    结构副本：复制 dict/list 容器，共享不可变叶子（字符串、数字）
+    
+    比 json.loads(json.dumps(...)) 便宜得多，大字符串（如 base64）不会被复制。
+    """
+    if isinstance(value, dict):
+        return {k: snapshot(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [snapshot(v) for v in value]
+    return value
+
+
+def _escape(token: Any) -> str:
+    return str(token).replace("~", "~0").replace("/", "~1")
+
+
+def _unescape(token: str) -> str:
+    return token.replace("~1", "/").replace("~0", "~")
+
+
+def diff_into(old: Any, new: Any, path: str, ops: List[Tuple[str, str, Any]]) -> Any:
+    """
+    比较快照 old 与新值 new，原地把 old 更新为 new 的快照，并记录操作
+    
+    Args:
+        old: 上一次的快照（会被原地修改）
+        new: 当前状态
+        path: 当前节点的 JSON Pointer
+        ops: 输出 (op, path, value) 列表，op 为 add / replace / remove
+    
+    Returns:
+        更新后的快照节点（类型变化时为新对象）
+    """
+    if isinstance(new, dict) and isinstance(old, dict):
+        for key, value in new.items():
+            child = f"{path}/{_escape(key)}"
+            if key in old:
+                old[key] = diff_into(old[key], value, child, ops)
+            else:
+                old[key] = snapshot(value)
+                ops.append(("add", child, old[key]))
+        if len(old) != len(new):
+            for key in [k for k in old if k not in new]:
+                del old[key]
+                ops.append(("remove", f"{path}/{_escape(key)}", None))
+        return old
+    
+    if isinstance(new, (list, tuple)) and isinstance(old, list):
+        common = min(len(old), len(new))
+        for i in range(common):
+            old[i] = diff_into(old[i], new[i], f"{path}/{i}", ops)
+        if len(new) > len(old):
+            for i in range(common, len(new)):
+                old.append(snapshot(new[i]))
+                ops.append(("add", f"{path}/{i}", old[i]))
+        elif len(old) > len(new):
+            for i in range(len(old) - 1, common - 1, -1):
+                ops.append(("remove", f"{path}/{i}", None))
+            del old[common:]
+        return old
+    
+    # 叶子：同一对象直接跳过，bool/int 等类型变化视为修改
+    if old is new or (type(old) is type(new) and old == new):
+        return old
+    replacement = snapshot(new)
+    ops.append(("replace", path, replacement))
+    return replacement
+
+
+def apply_patch(state: Any, ops: List[Dict[str, Any]]) -> Any:
+    """
+    应用 JSON Patch 操作（add / replace / remove），原地修改并返回根节点
+    """
+    for op in ops:
+        path = op["path"]
+        if path == "":
+            if op["op"] != "remove":
+                state = op["value"]
+            continue
+        
+        *parents, last = [_unescape(t) for t in path[1:].split("/")]
+        target = state
+        for token in parents:
+            target = target[int(token)] if isinstance(target, list) else target[token]
+        
+        if isinstance(target, list):
+            if op["op"] == "add":
+                if last == "-":
+                    target.append(op["value"])
+                else:
+                    target.insert(int(last), op["value"])
+            elif op["op"] == "replace":
+                target[int(last)] = op["value"]
+            elif op["op"] == "remove":
+                del target[int(last)]
+        else:
+            if op["op"] in ("add", "replace"):
+                target[last] = op["value"]
+            elif op["op"] == "remove":
+                target.pop(last, None)
+    return state
+
+
+def _is_inline_image(block: Any) -> bool:
+    if not isinstance(block, dict) or block.get("type") != "image":
+        return False
+    source = block.get("source")
+    return isinstance(source, dict) and source.get("type") == "base64" and isinstance(source.get("data"), str)
+
+
+@dataclass
+class _TaskCheckpoint:
+    """单个任务的检查点状态"""
+    snapshot: Any                     # 上次保存后的状态快照（用于差异）
+    full_bytes: int = 0               # 最近全量检查点的大小
+    delta_count: int = 0              # 最近全量之后的增量数
+    delta_bytes: int = 0              # 最近全量之后增量累计大小
+    image_refs: Dict[str, dict] = field(default_factory=dict)  # base64 数据 -> 引用 source
+    last_screenshot_id: Optional[str] = None
+
+
 class IncrementalCheckpointer:
     """
     增量检查点管理器
     
     减少序列化和存储开销:
-    - 每次只保存变化的消息
-    - 每 N 次增量后做一次全量
-    - 恢复时自动合并
+    - 对整个状态做结构化差异，只保存变化的路径
+    - 快照只复制容器，不做 JSON 往返深拷贝
+    - 变化的值只序列化一次，拼装成增量直接交给存储
+    - 增量数量或体积超过阈值时压缩为全量检查点
+    - 截图以引用保存，恢复时再取回 base64
     
     使用示例:
     ```python
@@ -68,18 +210,51 @@ class IncrementalCheckpointer:
     
     # 每 10 次增量后做全量
     FULL_CHECKPOINT_INTERVAL = 10
+    # 增量累计体积超过全量的该比例时做全量（写入总量摊还为最终状态的常数倍）
+    COMPACT_BYTES_RATIO = 1.0
     
-    def __init__(self, task_store):
+    def __init__(
+        self,
+        task_store,
+        screenshot_manager=None,
+        max_deltas: int = FULL_CHECKPOINT_INTERVAL,
+        compact_ratio: float = COMPACT_BYTES_RATIO,
+        store_screenshots: bool = True,
+    ):
         """
         初始化增量检查点管理器
         
         Args:
             task_store: 任务存储实例 (AsyncTaskStore)
+            screenshot_manager: 截图存储（默认使用全局 ScreenshotManager）
+            max_deltas: 全量检查点之间的最大增量数
+            compact_ratio: 增量累计体积 / 全量体积 超过该值时压缩
+            store_screenshots: 是否把 base64 截图转为引用
         """
         self.task_store = task_store
-        self._last_state: Dict[str, dict] = {}  # task_id -> last_state
-        self._delta_count: Dict[str, int] = {}  # task_id -> delta_count
+        self._screenshot_manager = screenshot_manager
+        self.max_deltas = max(1, max_deltas)
+        self.compact_ratio = compact_ratio
+        self.store_screenshots = store_screenshots
+        self._tasks: Dict[str, _TaskCheckpoint] = {}
+        self._stats = {
+            "full_saves": 0,
+            "delta_saves": 0,
+            "unchanged": 0,
+            "compactions": 0,
+            "bytes_written": 0,
+            "patch_ops": 0,
+            "screenshots_stored": 0,
+        }
     
+    @property
+    def screenshot_manager(self):
+        if self._screenshot_manager is None:
+            from .screenshot_manager import get_screenshot_manager
+            self._screenshot_manager = get_screenshot_manager()
+        return self._screenshot_manager
+    
+    @tracing.traced(tracing.CHECKPOINT_SAVE)
     async def save(self, task_id: str, state: dict) -> bool:
         """
         保存检查点（自动选择增量/全量）
@@ -87,93 +262,198 @@ class IncrementalCheckpointer:
         Args:
             task_id: 任务 ID
             state: 当前状态
-            
+        
         Returns:
             是否保存成功
         """
-        last_state = self._last_state.get(task_id, {})
-        delta_count = self._delta_count.get(task_id, 0)
+        track = self._tasks.get(task_id)
+        iteration = state.get("iteration", 0)
         
-        # 判断是否需要全量
-        needs_full = (
-            delta_count >= self.FULL_CHECKPOINT_INTERVAL or
-            task_id not in self._last_state
-        )
+        if track is None:
+            track = _TaskCheckpoint(snapshot=snapshot(state))
+            await self._save_full(task_id, iteration, track)
+            self._tasks[task_id] = track
+            return True
         
-        if needs_full:
-            # 全量保存
-            await self.task_store.save_checkpoint(
-                task_id,
-                state.get("iteration", 0),
-                state,
-                is_full=True
-            )
-            self._last_state[task_id] = self._deep_copy(state)
-            self._delta_count[task_id] = 0
-            logger.debug(f"Full checkpoint saved for task {task_id}")
-        else:
-            # 计算并保存增量
-            delta = self._compute_delta(last_state, state)
-            
-            if delta:
-                await self.task_store.save_checkpoint(
-                    task_id,
-                    state.get("iteration", 0),
-                    delta,
-                    is_full=False
-                )
-                # 更新本地缓存
-                self._apply_delta(self._last_state[task_id], delta)
-                self._delta_count[task_id] = delta_count + 1
-                logger.debug(f"Incremental checkpoint saved for task {task_id} (delta #{delta_count + 1})")
+        # 在基准的副本上求差异：写入成功后才替换基准，
+        # 写入失败时下一次仍相对已落盘的状态求差，不会丢掉这次的变化
+        ops: List[Tuple[str, str, Any]] = []
+        new_snapshot = diff_into(snapshot(track.snapshot), state, "", ops)
+        if not ops:
+            self._stats["unchanged"] += 1
+            logger.debug(f"No changes to checkpoint for task {task_id}")
+            return True
+        
+        if track.delta_count >= self.max_deltas:
+            self._stats["compactions"] += 1
+            await self._save_full(task_id, iteration, track, new_snapshot)
+            return True
+        
+        await self._externalize_images([value for _, _, value in ops], track)
+        encoded_ops = []
+        for op, path, value in ops:
+            if op == "remove":
+                encoded_ops.append(f'{{"op":"remove","path":{json.dumps(path)}}}')
             else:
-                logger.debug(f"No changes to checkpoint for task {task_id}")
+                encoded = json.dumps(self._to_stored(value, track))
+                encoded_ops.append(f'{{"op":"{op}","path":{json.dumps(path)},"value":{encoded}}}')
+        payload = f'{{"format":"{PATCH_FORMAT}","ops":[{",".join(encoded_ops)}]}}'
         
+        if track.full_bytes and track.delta_bytes + len(payload) > track.full_bytes * self.compact_ratio:
+            # 增量已经接近全量大小，直接写全量
+            self._stats["compactions"] += 1
+            await self._save_full(task_id, iteration, track, new_snapshot)
+            return True
+        
+        await self.task_store.save_checkpoint(
+            task_id,
+            iteration,
+            None,
+            screenshot_id=track.last_screenshot_id,
+            is_full=False,
+            state_json=payload,
+        )
+        track.snapshot = new_snapshot
+        track.delta_count += 1
+        track.delta_bytes += len(payload)
+        self._stats["delta_saves"] += 1
+        self._stats["patch_ops"] += len(ops)
+        self._stats["bytes_written"] += len(payload)
+        logger.debug(
+            f"Incremental checkpoint saved for task {task_id} "
+            f"(delta #{track.delta_count}, {len(ops)} ops, {len(payload)} bytes)"
+        )
         return True
     
-    def _compute_delta(self, old_state: dict, new_state: dict) -> Optional[dict]:
+    async def _save_full(self, task_id: str, iteration: int, track: _TaskCheckpoint, state_snapshot: Any = None):
+        """把快照写为全量检查点（state_snapshot 写入成功后成为新基准）"""
+        if state_snapshot is None:
+            state_snapshot = track.snapshot
+        await self._externalize_images([state_snapshot], track, prune=True)
+        payload = json.dumps(self._to_stored(state_snapshot, track))
+        await self.task_store.save_checkpoint(
+            task_id,
+            iteration,
+            None,
+            screenshot_id=track.last_screenshot_id,
+            is_full=True,
+            state_json=payload,
+        )
+        track.snapshot = state_snapshot
+        track.full_bytes = len(payload)
+        track.delta_count = 0
+        track.delta_bytes = 0
+        self._stats["full_saves"] += 1
+        self._stats["bytes_written"] += len(payload)
+        logger.debug(f"Full checkpoint saved for task {task_id} ({len(payload)} bytes)")
+    
+    # ========== 截图引用 ==========
+    
+    async def _externalize_images(self, values: List[Any], track: _TaskCheckpoint, prune: bool = False):
         """
-        计算状态差异
+        把新出现的 base64 截图存入 ScreenshotManager，记录引用
         
         Args:
-            old_state: 旧状态
-            new_state: 新状态
-            
-        Returns:
-            差异字典，如果无变化则返回 None
+            prune: 全量保存时丢弃不再出现在状态里的引用
         """
-        delta = {}
-        
-        # 检查消息增量
-        old_messages = old_state.get("messages", [])
-        new_messages = new_state.get("messages", [])
-        
-        if len(new_messages) > len(old_messages):
-            delta["new_messages"] = new_messages[len(old_messages):]
-        
-        # 检查状态变化
-        for key in ["status", "iteration", "last_tool_result", "current_hwnd"]:
-            old_val = old_state.get(key)
-            new_val = new_state.get(key)
-            if new_val != old_val:
-                delta[key] = new_val
+        if not self.store_screenshots:
+            return
+        found: List[dict] = []
+        for value in values:
+            self._find_images(value, found)
         
-        # 检查 agent_status 变化
-        old_agent_status = old_state.get("agent_status")
-        new_agent_status = new_state.get("agent_status")
-        if new_agent_status != old_agent_status:
-            delta["agent_status"] = new_agent_status
+        if prune:
+            live = {block["source"]["data"] for block in found}
+            track.image_refs = {data: ref for data, ref in track.image_refs.items() if data in live}
         
-        return delta if delta else None
+        for block in found:
+            source = block["source"]
+            data = source["data"]
+            if data in track.image_refs:
+                continue
+            try:
+                raw = base64.b64decode(data, validate=True)
+                manager = self.screenshot_manager
+                # 按字节精确去重：恢复时必须拿回原样的图片
+                screenshot_id = await manager.store(raw, compress=False, exact=True)
+                ref = await manager.make_ref(screenshot_id)
+            except (binascii.Error, ValueError) as e:
+                logger.debug(f"Keeping undecodable image inline: {e}")
+                continue
+            except Exception as e:
+                logger.warning(f"Failed to store checkpoint screenshot, keeping it inline: {e}")
+                continue
+            if ref is None:
+                continue
+            track.image_refs[data] = {
+                "type": SCREENSHOT_REF_TYPE,
+                "media_type": source.get("media_type"),
+                **ref,
+            }
+            track.last_screenshot_id = screenshot_id
+            self._stats["screenshots_stored"] += 1
+    
+    def _find_images(self, value: Any, found: List[dict]):
+        if isinstance(value, dict):
+            if _is_inline_image(value):
+                found.append(value)
+                return
+            for child in value.values():
+                self._find_images(child, found)
+        elif isinstance(value, list):
+            for child in value:
+                self._find_images(child, found)
+    
+    def _to_stored(self, value: Any, track: _TaskCheckpoint) -> Any:
+        """存储形式：已存入 ScreenshotManager 的截图替换为引用"""
+        if not track.image_refs:
+            return value
+        if isinstance(value, dict):
+            if _is_inline_image(value):
+                ref = track.image_refs.get(value["source"]["data"])
+                if ref is not None:
+                    return {**value, "source": ref}
+                return value
+            return {k: self._to_stored(v, track) for k, v in value.items()}
+        if isinstance(value, list):
+            return [self._to_stored(v, track) for v in value]
+        return value
+    
+    async def _resolve_images(self, value: Any, track: _TaskCheckpoint) -> Any:
+        """恢复形式：截图引用换回 base64（已被清理的截图替换为占位文本）"""
+        if isinstance(value, dict):
+            source = value.get("source") if value.get("type") == "image" else None
+            if isinstance(source, dict) and source.get("type") == SCREENSHOT_REF_TYPE:
+                data = None
+                try:
+                    data = await self.screenshot_manager.get_base64(source["screenshot_id"])
+                except Exception as e:
+                    logger.warning(f"Failed to load checkpoint screenshot {source.get('screenshot_id')}: {e}")
+                if data is None:
+                    return {"type": "text", "text": MISSING_SCREENSHOT_TEXT}
+                track.image_refs[data] = source
+                return {
+                    **value,
+                    "source": {"type": "base64", "media_type": source.get("media_type"), "data": data},
+                }
+            for key, child in value.items():
+                value[key] = await self._resolve_images(child, track)
+        elif isinstance(value, list):
+            for i, child in enumerate(value):
+                value[i] = await self._resolve_images(child, track)
+        return value
+    
+    # ========== 恢复 ==========
     
     def _apply_delta(self, state: dict, delta: dict):
         """
-        将增量应用到状态
+        将增量应用到状态（原地修改）
         
-        Args:
-            state: 要更新的状态（原地修改）
-            delta: 增量数据
+        支持 JSON Patch 增量和旧格式（new_messages + 固定字段）增量。
         """
+        if delta.get("format") == PATCH_FORMAT:
+            return apply_patch(state, delta.get("ops", []))
+        
         if "new_messages" in delta:
             if "messages" not in state:
                 state["messages"] = []
@@ -182,10 +462,7 @@ class IncrementalCheckpointer:
         for key in ["status", "iteration", "last_tool_result", "current_hwnd", "agent_status"]:
             if key in delta:
                 state[key] = delta[key]
-    
-    def _deep_copy(self, obj: Any) -> Any:
-        """深拷贝（使用 JSON 序列化）"""
-        return json.loads(json.dumps(obj))
+        return state
     
     async def restore(self, task_id: str) -> Optional[dict]:
         """
@@ -193,11 +470,14 @@ class IncrementalCheckpointer:
         
         Args:
             task_id: 任务 ID
-            
+        
         Returns:
             恢复的状态，如果没有检查点则返回 None
         """
-        checkpoints = await self.task_store.get_all_checkpoints(task_id)
+        if hasattr(self.task_store, "get_latest_checkpoints"):
+            checkpoints = await self.task_store.get_latest_checkpoints(task_id)
+        else:
+            checkpoints = await self.task_store.get_all_checkpoints(task_id)
         
         if not checkpoints:
             return None
@@ -222,14 +502,17 @@ class IncrementalCheckpointer:
             else:
                 return None
         
-        # 应用所有增量
-        state = self._deep_copy(full_checkpoint)
+        full_bytes = len(json.dumps(full_checkpoint))
+        
+        # 应用所有增量（存储层每次返回新解析的对象，可直接原地修改）
+        state = full_checkpoint
         for delta in deltas:
-            self._apply_delta(state, delta)
+            state = self._apply_delta(state, delta)
         
-        # 更新本地缓存
-        self._last_state[task_id] = state
-        self._delta_count[task_id] = len(deltas)
+        track = _TaskCheckpoint(snapshot=None, full_bytes=full_bytes, delta_count=len(deltas))
+        state = await self._resolve_images(state, track)
+        track.snapshot = snapshot(state)
+        self._tasks[task_id] = track
         
         logger.info(f"Restored checkpoint for task {task_id} (full + {len(deltas)} deltas)")
         return state
@@ -242,22 +525,23 @@ class IncrementalCheckpointer:
             task_id: 指定任务 ID，或 None 清除所有
         """
         if task_id:
-            self._last_state.pop(task_id, None)
-            self._delta_count.pop(task_id, None)
+            self._tasks.pop(task_id, None)
         else:
-            self._last_state.clear()
-            self._delta_count.clear()
+            self._tasks.clear()
     
     def get_stats(self) -> dict:
         """获取统计信息"""
+        saves = self._stats["full_saves"] + self._stats["delta_saves"]
         return {
-            "cached_tasks": len(self._last_state),
-            "delta_counts": dict(self._delta_count),
+            "cached_tasks": len(self._tasks),
+            "delta_counts": {task_id: t.delta_count for task_id, t in self._tasks.items()},
+            **self._stats,
+            "avg_bytes_per_save": round(self._stats["bytes_written"] / saves, 1) if saves else 0.0,
         }
 
 
 # ========== 工厂函数 ==========
 
-def create_checkpointer(task_store) -> IncrementalCheckpointer:
+def create_checkpointer(task_store, **kwargs) -> IncrementalCheckpointer:
     """创建增量检查点管理器"""
-    return IncrementalCheckpointer(task_store)
+    return IncrementalCheckpointer(task_store, **kwargs)
@@ -37,8 +37,11 @@ T = TypeVar('T')
 
 from .types import (
     LLMResponse, ToolCall, Message, MessageRole, StopReason,
-    ToolDefinition,
+    ToolDefinition, CallTiming,
 )
+from .context_manager import get_token_counter
+from ..observability import spans as tracing
+from ..observability.metrics import get_metrics
 
 logger = logging.getLogger(__name__)
 
@@ -173,6 +176,9 @@ class LLMClient:
         self._client: Optional[AsyncAnthropic] = None
         self._cache_stats = CacheStats()
         
+        # Token 估算（每次响应的 usage 用于校准）
+        self._token_counter = get_token_counter()
+        
         # 系统提示词缓存（用于 Prompt Caching）
         self._cached_system_prompt: Optional[str] = None
         self._cached_tools: Optional[List[Dict[str, Any]]] = None
@@ -404,11 +410,15 @@ class LLMClient:
         
         return result if result else [{"type": "text", "text": content}]
     
-    def _parse_response(self, response) -> LLMResponse:
+    def _parse_response(self, response, estimated_input_tokens: int = 0) -> LLMResponse:
         """
         解析 API 响应
         
         转换 Anthropic API 响应为 LLMResponse
+        
+        Args:
+            response: Anthropic 响应
+            estimated_input_tokens: 请求的原始 token 估算（用于校准）
         """
         text_parts = []  # 收集所有文本块
         tool_calls = []
@@ -436,16 +446,7 @@ class LLMClient:
         }
         stop_reason = stop_reason_map.get(response.stop_reason, StopReason.END_TURN)
         
-        # 更新缓存统计
-        self._cache_stats.total_calls += 1
-        self._cache_stats.input_tokens += response.usage.input_tokens
-        self._cache_stats.output_tokens += response.usage.output_tokens
-        
-        # Prompt Caching 统计
-        if hasattr(response.usage, 'cache_read_input_tokens'):
-            self._cache_stats.cache_read_tokens += response.usage.cache_read_input_tokens
-        if hasattr(response.usage, 'cache_creation_input_tokens'):
-            self._cache_stats.cache_write_tokens += response.usage.cache_creation_input_tokens
+        self._record_usage(response.usage, estimated_input_tokens)
         
         return LLMResponse(
             content=content_text,
@@ -453,8 +454,62 @@ class LLMClient:
             tool_calls=tool_calls,
             input_tokens=response.usage.input_tokens,
             output_tokens=response.usage.output_tokens,
+            timing=CallTiming(
+                model=self.config.model,
+                streaming=False,
+                cache=self._cache_status(response.usage),
+                output_tokens=response.usage.output_tokens,
+            ),
         )
     
+    def _record_usage(self, usage, estimated_input_tokens: int = 0):
+        """更新缓存统计，并用实际 usage 校准 token 估算"""
+        self._cache_stats.total_calls += 1
+        self._cache_stats.input_tokens += usage.input_tokens
+        self._cache_stats.output_tokens += usage.output_tokens
+        
+        # Prompt Caching 统计
+        if hasattr(usage, 'cache_read_input_tokens'):
+            self._cache_stats.cache_read_tokens += usage.cache_read_input_tokens or 0
+        if hasattr(usage, 'cache_creation_input_tokens'):
+            self._cache_stats.cache_write_tokens += usage.cache_creation_input_tokens or 0
+        
+        if estimated_input_tokens:
+            self._token_counter.calibrate(estimated_input_tokens, usage)
+    
+    @staticmethod
+    def _cache_status(usage) -> str:
+        """本次请求的 prompt cache 状态：hit / write / miss"""
+        if getattr(usage, 'cache_read_input_tokens', None):
+            return "hit"
+        if getattr(usage, 'cache_creation_input_tokens', None):
+            return "write"
+        return "miss"
+    
+    def _record_timing(self, timing: CallTiming):
+        """把调用计时汇总到指标系统（按模型和缓存状态分组）"""
+        try:
+            get_metrics().record_llm_timing(timing)
+        except Exception as e:
+            logger.debug(f"Failed to record LLM timing: {e}")
+    
+    def _estimate_request_tokens(
+        self,
+        messages: List[Message],
+        system_prompt: str,
+        tools: Optional[List[Dict[str, Any]]] = None,
+    ) -> int:
+        """
+        请求输入 token 的原始估算（消息 + 系统提示词 + 工具定义）
+        
+        消息计数缓存在 Message 对象上，多轮对话中只有新消息需要计算
+        """
+        counter = self._token_counter
+        tokens = counter.count_messages(messages) + counter.count(system_prompt or "")
+        if tools:
+            tokens += counter.count(json.dumps(tools, sort_keys=True))
+        return tokens
+    
     def _calculate_retry_delay(self, attempt: int, error: Exception = None) -> float:
         """
         计算重试延迟（指数退避）
@@ -547,13 +602,32 @@ class LLMClient:
         if tools:
             kwargs["tools"] = self._prepare_tools(tools)
         
+        estimated_tokens = self._estimate_request_tokens(messages, system_prompt, tools)
         logger.debug(f"Calling Claude API: model={self.config.model}, messages={len(messages)}")
         
+        response = await self._generate_with_retry(kwargs, estimated_tokens)
+        self._record_timing(response.timing)
+        return response
+    
+    async def _generate_with_retry(self, kwargs: Dict[str, Any], estimated_tokens: int) -> LLMResponse:
+        """
+        非流式调用的重试循环
+        
+        返回的 response.timing 已填好耗时和重试时间，由调用方决定何时汇总
+        """
+        call_started = time.perf_counter()
         last_error = None
         for attempt in range(1, self.config.max_retries + 1):
+            attempt_started = time.perf_counter()
             try:
                 response = await self._client.messages.create(**kwargs)
-                return self._parse_response(response)
+                response = self._parse_response(response, estimated_tokens)
+                timing = response.timing
+                timing.attempts = attempt
+                timing.total_ms = (time.perf_counter() - attempt_started) * 1000
+                timing.ttft_ms = timing.total_ms
+                timing.retry_ms = (attempt_started - call_started) * 1000
+                return response
             
             except (RateLimitError, APIConnectionError, APIStatusError, asyncio.TimeoutError) as e:
                 last_error = e
@@ -626,12 +700,19 @@ class LLMClient:
         if tools:
             kwargs["tools"] = self._prepare_tools(tools)
         
+        estimated_tokens = self._estimate_request_tokens(messages, system_prompt, tools)
         logger.debug(f"Streaming from Claude API: model={self.config.model}")
         
+        call_started = time.perf_counter()
         last_error = None
         for attempt in range(1, self.config.max_retries + 1):
+            attempt_started = time.perf_counter()
             try:
-                return await self._do_stream(kwargs, on_text, on_tool_call)
+                response = await self._do_stream(kwargs, on_text, on_tool_call, estimated_tokens)
+                response.timing.attempts = attempt
+                response.timing.retry_ms = (attempt_started - call_started) * 1000
+                self._record_timing(response.timing)
+                return response
             
             except (RateLimitError, APIConnectionError, APIStatusError, asyncio.TimeoutError) as e:
                 last_error = e
@@ -670,9 +751,14 @@ class LLMClient:
                     pass  # 忽略回调错误
             
             try:
-                response = await self.generate(messages, system_prompt, tools)
+                fallback_started = time.perf_counter()
+                response = await self._generate_with_retry(kwargs, estimated_tokens)
                 # 标记为回退响应，调用方可据此决定是否重置 UI
                 response.is_fallback = True
+                # 失败的流式尝试计入重试时间
+                response.timing.fallback = True
+                response.timing.retry_ms += (fallback_started - call_started) * 1000
+                self._record_timing(response.timing)
                 return response
             except Exception as fallback_error:
                 logger.error(f"Fallback to non-streaming also failed: {fallback_error}")
@@ -687,6 +773,7 @@ class LLMClient:
         kwargs: Dict[str, Any],
         on_text: Optional[Callable[[str], Awaitable[None]]] = None,
         on_tool_call: Optional[Callable[[ToolCall], Awaitable[None]]] = None,
+        estimated_input_tokens: int = 0,
     ) -> LLMResponse:
         """
         执行流式调用的内部方法
@@ -695,6 +782,7 @@ class LLMClient:
             kwargs: API 调用参数
             on_text: 文本回调
             on_tool_call: 工具调用回调
+            estimated_input_tokens: 请求的原始 token 估算（用于校准）
             
         Returns:
             LLMResponse
@@ -709,78 +797,103 @@ class LLMClient:
         output_tokens = 0
         stop_reason = StopReason.END_TURN
         
-        async with self._client.messages.stream(**kwargs) as stream:
-            async for event in stream:
-                if event.type == "message_start":
-                    if hasattr(event.message, 'usage'):
-                        input_tokens = event.message.usage.input_tokens
-                
-                elif event.type == "content_block_start":
-                    if event.content_block.type == "tool_use":
-                        current_tool_id = event.content_block.id
-                        current_tool_name = event.content_block.name
-                        current_tool_input = ""
-                
-                elif event.type == "content_block_delta":
-                    if hasattr(event.delta, 'text'):
-                        # 文本增量
-                        text = event.delta.text
-                        content_text += text
-                        if on_text:
-                            await on_text(text)
+        # 计时：message_start（首包）、首个/最后一个内容增量、增量间隔
+        timing = CallTiming(model=kwargs.get("model", self.config.model))
+        gaps = timing.inter_token_ms
+        started = time.perf_counter()
+        first_token = last_token = None
+        
+        with tracing.span(tracing.LLM_STREAM, model=timing.model) as span:
+            async with self._client.messages.stream(**kwargs) as stream:
+                async for event in stream:
+                    if event.type == "content_block_delta":
+                        now = time.perf_counter()
+                        if first_token is None:
+                            first_token = now
+                        else:
+                            gaps.append((now - last_token) * 1000)
+                        last_token = now
                     
-                    elif hasattr(event.delta, 'partial_json'):
-                        # 工具输入增量
-                        current_tool_input += event.delta.partial_json
-                
-                elif event.type == "content_block_stop":
-                    if current_tool_id and current_tool_name:
-                        # 完成工具调用
-                        try:
-                            tool_input = json.loads(current_tool_input) if current_tool_input else {}
-                        except json.JSONDecodeError:
-                            tool_input = {}
-                        
-                        tool_call = ToolCall(
-                            id=current_tool_id,
-                            name=current_tool_name,
-                            arguments=tool_input,
-                        )
-                        tool_calls.append(tool_call)
+                    if event.type == "message_start":
+                        timing.queue_ms = (time.perf_counter() - started) * 1000
+                        if hasattr(event.message, 'usage'):
+                            input_tokens = event.message.usage.input_tokens
+                    
+                    elif event.type == "content_block_start":
+                        if event.content_block.type == "tool_use":
+                            current_tool_id = event.content_block.id
+                            current_tool_name = event.content_block.name
+                            current_tool_input = ""
+                    
+                    elif event.type == "content_block_delta":
+                        if hasattr(event.delta, 'text'):
+                            # 文本增量
+                            text = event.delta.text
+                            content_text += text
+                            if on_text:
+                                await on_text(text)
                         
-                        if on_tool_call:
-                            await on_tool_call(tool_call)
+                        elif hasattr(event.delta, 'partial_json'):
+                            # 工具输入增量
+                            current_tool_input += event.delta.partial_json
+                    
+                    elif event.type == "content_block_stop":
+                        if current_tool_id and current_tool_name:
+                            # 完成工具调用
+                            try:
+                                tool_input = json.loads(current_tool_input) if current_tool_input else {}
+                            except json.JSONDecodeError:
+                                tool_input = {}
+                            
+                            tool_call = ToolCall(
+                                id=current_tool_id,
+                                name=current_tool_name,
+                                arguments=tool_input,
+                            )
+                            tool_calls.append(tool_call)
+                            
+                            if on_tool_call:
+                                await on_tool_call(tool_call)
+                            
+                            # 重置
+                            current_tool_id = None
+                            current_tool_name = None
+                            current_tool_input = ""
+                    
+                    elif event.type == "message_delta":
+                        if hasattr(event, 'delta') and hasattr(event.delta, 'stop_reason'):
+                            stop_reason_map = {
+                                "end_turn": StopReason.END_TURN,
+                                "tool_use": StopReason.TOOL_USE,
+                                "max_tokens": StopReason.MAX_TOKENS,
+                                "stop_sequence": StopReason.STOP_SEQUENCE,
+                            }
+                            stop_reason = stop_reason_map.get(event.delta.stop_reason, StopReason.END_TURN)
                         
-                        # 重置
-                        current_tool_id = None
-                        current_tool_name = None
-                        current_tool_input = ""
+                        if hasattr(event, 'usage'):
+                            output_tokens = event.usage.output_tokens
                 
-                elif event.type == "message_delta":
-                    if hasattr(event, 'delta') and hasattr(event.delta, 'stop_reason'):
-                        stop_reason_map = {
-                            "end_turn": StopReason.END_TURN,
-                            "tool_use": StopReason.TOOL_USE,
-                            "max_tokens": StopReason.MAX_TOKENS,
-                            "stop_sequence": StopReason.STOP_SEQUENCE,
-                        }
-                        stop_reason = stop_reason_map.get(event.delta.stop_reason, StopReason.END_TURN)
-                    
-                    if hasattr(event, 'usage'):
-                        output_tokens = event.usage.output_tokens
-            
-            # 获取最终消息以获取完整 usage
-            final_message = await stream.get_final_message()
+                # 获取最终消息以获取完整 usage
+                final_message = await stream.get_final_message()
+                
+                # 更新统计
+                self._record_usage(final_message.usage, estimated_input_tokens)
             
-            # 更新统计
-            self._cache_stats.total_calls += 1
-            self._cache_stats.input_tokens += final_message.usage.input_tokens
-            self._cache_stats.output_tokens += final_message.usage.output_tokens
+            timing.total_ms = (time.perf_counter() - started) * 1000
+            if first_token is not None:
+                timing.ttft_ms = (first_token - started) * 1000
+                timing.generation_ms = (last_token - first_token) * 1000
+            timing.output_tokens = final_message.usage.output_tokens
+            timing.cache = self._cache_status(final_message.usage)
             
-            if hasattr(final_message.usage, 'cache_read_input_tokens'):
-                self._cache_stats.cache_read_tokens += final_message.usage.cache_read_input_tokens
-            if hasattr(final_message.usage, 'cache_creation_input_tokens'):
-                self._cache_stats.cache_write_tokens += final_message.usage.cache_creation_input_tokens
+            span.set_attributes(
+                input_tokens=final_message.usage.input_tokens,
+                output_tokens=final_message.usage.output_tokens,
+                tool_calls=len(tool_calls),
+                cache=timing.cache,
+            )
+            if timing.ttft_ms is not None:
+                span.set_attribute("ttft_ms", round(timing.ttft_ms, 2))
         
         return LLMResponse(
             content=content_text,
@@ -788,6 +901,7 @@ class LLMClient:
             tool_calls=tool_calls,
             input_tokens=final_message.usage.input_tokens,
             output_tokens=final_message.usage.output_tokens,
+            timing=timing,
         )
     
     def get_cache_stats(self) -> CacheStats:
@@ -802,11 +916,10 @@ class LLMClient:
         """
         估算文本的 token 数量
         
-        使用简单估算（实际应使用 tiktoken）
+        使用共享 TokenCounter（tiktoken 或 CJK 感知估算），
+        并按历史响应的 usage 校准
         """
-        # 粗略估算：1 token ≈ 4 字符（英文），1 token ≈ 1.5 字符（中文）
-        # 这里使用保守估算
-        return len(text) // 3
+        return self._token_counter.estimate(text)
     
     async def close(self):
         """关闭客户端"""
@@ -8,6 +8,9 @@ for faster execution.
 
 Key Features:
 - Semantic similarity matching using embeddings
+- Pluggable embedders (keyword features, local sentence-transformers model)
+- Matrix-backed index: one dot product over all cached plans per lookup
+- LRU + TTL eviction with a configurable size cap
 - Only caches successful plans
 - Tracks execution time for speedup metrics
 - Thread-safe and persistent (SQLite)
@@ -17,12 +20,15 @@ import os
 import json
 import time
 import hashlib
-import sqlite3
 import threading
+from abc import ABC, abstractmethod
+from collections import OrderedDict
 from typing import Optional, Dict, List, Any, Tuple
 from dataclasses import dataclass, field, asdict
 from datetime import datetime
 
+from ..sqlite_pool import get_sqlite_pool
+
 # Logging
 try:
     from ..observability import get_logger
@@ -31,13 +37,19 @@ except ImportError:
     import logging
     logger = logging.getLogger("plan_cache")
 
-# Anthropic for embeddings (using voyage or fallback to simple hashing)
 try:
-    import anthropic
-    ANTHROPIC_AVAILABLE = True
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+    logger.warning("[PlanCache] numpy not available, using linear similarity scan")
+
+# Optional local embedding model
+try:
+    import sentence_transformers
+    SENTENCE_TRANSFORMERS_AVAILABLE = True
 except ImportError:
-    ANTHROPIC_AVAILABLE = False
-    logger.warning("[PlanCache] Anthropic not available, using hash-based matching")
+    SENTENCE_TRANSFORMERS_AVAILABLE = False
 
 
 @dataclass
@@ -61,20 +73,289 @@ class CachedPlan:
         return cls(**data)
 
 
+# ============================================================================
+# Embedders
+# ============================================================================
+
+class PlanEmbedder(ABC):
+    """Turns task text into fixed-size vectors for similarity matching"""
+
+    name: str = "base"
+    dim: int = 0
+
+    @abstractmethod
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        """Embed a batch of task strings"""
+
+
+class KeywordPlanEmbedder(PlanEmbedder):
+    """
+    Hand-made keyword feature vector (28 synonym groups).
+
+    Uses keyword matching with stemming for better similarity detection.
+    No model download, so this is the default.
+    """
+
+    name = "keyword-v1"
+
+    # Each category maps synonyms to the same feature
+    FEATURES = [
+        # Actions
+        {"list", "show", "display", "view", "see", "get"},
+        {"click", "tap", "press"},
+        {"type", "write", "input", "enter"},
+        {"open", "launch", "start", "run"},
+        {"close", "exit", "quit", "stop"},
+        {"send", "submit", "post"},
+        {"save", "store", "download"},
+        {"copy", "duplicate"},
+        {"paste", "insert"},
+        {"fill", "complete"},
+        {"navigate", "go", "visit", "browse"},
+        {"scroll", "move"},
+        {"select", "choose", "pick"},
+        {"search", "find", "look", "locate"},
+        {"create", "make", "new", "add"},
+        {"delete", "remove", "erase"},
+        {"upload"},
+        {"screenshot", "capture"},
+        # Targets
+        {"file", "document", "doc"},
+        {"folder", "directory", "dir"},
+        {"browser", "chrome", "edge", "firefox"},
+        {"window", "app", "application"},
+        {"form", "field"},
+        {"button", "link"},
+        {"text", "content", "message"},
+        {"image", "picture", "photo"},
+        {"current", "this", "here"},
+        {"all", "every", "entire"},
+    ]
+    dim = len(FEATURES)
+
+    def _embed_one(self, task: str) -> List[float]:
+        # Simple stemming: remove common suffixes
+        stemmed_words = set()
+        for word in task.lower().split():
+            stemmed_words.add(word)
+            if word.endswith("ing"):
+                stemmed_words.add(word[:-3])
+            if word.endswith("s") and len(word) > 3:
+                stemmed_words.add(word[:-1])
+            if word.endswith("ed") and len(word) > 3:
+                stemmed_words.add(word[:-2])
+
+        # 1.0 if any word in the task matches any word in the feature set
+        return [1.0 if stemmed_words & feature_set else 0.0 for feature_set in self.FEATURES]
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        return [self._embed_one(text) for text in texts]
+
+
+class SentenceTransformerPlanEmbedder(PlanEmbedder):
+    """
+    Local sentence-transformers model (optional dependency)
+
+    The model is loaded in __init__ to read its dimension, so a missing or
+    broken model makes create_plan_embedder fall back to keyword features.
+    """
+
+    DEFAULT_MODEL = "all-MiniLM-L6-v2"
+
+    def __init__(self, model_name: Optional[str] = None):
+        if not SENTENCE_TRANSFORMERS_AVAILABLE:
+            raise ImportError("sentence-transformers is not installed")
+        self.model_name = model_name or self.DEFAULT_MODEL
+        self.name = f"st:{self.model_name}"
+        self._model = None
+        self.dim = self._get_model().get_sentence_embedding_dimension()
+
+    def _get_model(self):
+        if self._model is None:
+            self._model = sentence_transformers.SentenceTransformer(self.model_name)
+        return self._model
+
+    def embed(self, texts: List[str]) -> List[List[float]]:
+        vectors = self._get_model().encode(texts, normalize_embeddings=True, show_progress_bar=False)
+        return [list(map(float, v)) for v in vectors]
+
+
+def create_plan_embedder(kind: Optional[str] = None) -> PlanEmbedder:
+    """
+    Create an embedder by name.
+
+    Args:
+        kind: "keyword" (default) or "sentence[:model_name]".
+              Defaults to $NOGICOS_PLAN_EMBEDDER.
+    """
+    kind = kind or os.getenv("NOGICOS_PLAN_EMBEDDER", "keyword")
+    if kind.startswith("sentence"):
+        _, _, model_name = kind.partition(":")
+        try:
+            return SentenceTransformerPlanEmbedder(model_name or None)
+        except Exception as e:
+            logger.warning(f"[PlanCache] Sentence embedder unavailable ({e}), using keyword features")
+    return KeywordPlanEmbedder()
+
+
+# ============================================================================
+# Index backends
+# ============================================================================
+
+class PlanIndex(ABC):
+    """Vector index over cached plans, keyed by task hash"""
+
+    @abstractmethod
+    def add(self, key: str, vector: List[float]):
+        """Insert or replace a vector"""
+
+    @abstractmethod
+    def remove(self, key: str):
+        """Remove a vector (no-op if missing)"""
+
+    @abstractmethod
+    def search(self, vector: List[float], k: int = 1) -> List[Tuple[str, float]]:
+        """Top-k (key, cosine similarity) pairs, best first"""
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+
+class MatrixPlanIndex(PlanIndex):
+    """
+    Normalized vectors in a contiguous NumPy matrix.
+
+    Lookup is a single matrix-vector product plus argpartition. Removal
+    swaps the last row into the hole, so the live rows stay dense.
+    """
+
+    def __init__(self, dim: int, initial_capacity: int = 256):
+        self.dim = dim
+        self._matrix = np.zeros((initial_capacity, dim), dtype=np.float32)
+        self._keys: List[str] = []
+        self._rows: Dict[str, int] = {}
+
+    def add(self, key: str, vector: List[float]):
+        v = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(v))
+        if v.shape != (self.dim,) or norm == 0.0:
+            self.remove(key)
+            return
+        row = self._rows.get(key)
+        if row is None:
+            row = len(self._keys)
+            if row >= len(self._matrix):
+                grown = np.zeros((len(self._matrix) * 2, self.dim), dtype=np.float32)
+                grown[:row] = self._matrix[:row]
+                self._matrix = grown
+            self._keys.append(key)
+            self._rows[key] = row
+        self._matrix[row] = v / norm
+
+    def remove(self, key: str):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        last = len(self._keys) - 1
+        if row != last:
+            moved = self._keys[last]
+            self._matrix[row] = self._matrix[last]
+            self._keys[row] = moved
+            self._rows[moved] = row
+        self._keys.pop()
+
+    def search(self, vector: List[float], k: int = 1) -> List[Tuple[str, float]]:
+        n = len(self._keys)
+        if n == 0 or k <= 0:
+            return []
+        q = np.asarray(vector, dtype=np.float32)
+        norm = float(np.linalg.norm(q))
+        if q.shape != (self.dim,) or norm == 0.0:
+            return []
+        scores = self._matrix[:n] @ (q / norm)
+        k = min(k, n)
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [(self._keys[i], float(scores[i])) for i in top]
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+
+class LinearPlanIndex(PlanIndex):
+    """Pure-Python fallback when numpy is not installed"""
+
+    def __init__(self, dim: int):
+        self.dim = dim
+        self._vectors: Dict[str, List[float]] = {}
+
+    def add(self, key: str, vector: List[float]):
+        norm = sum(x * x for x in vector) ** 0.5
+        if len(vector) != self.dim or norm == 0:
+            self._vectors.pop(key, None)
+            return
+        self._vectors[key] = [x / norm for x in vector]
+
+    def remove(self, key: str):
+        self._vectors.pop(key, None)
+
+    def search(self, vector: List[float], k: int = 1) -> List[Tuple[str, float]]:
+        norm = sum(x * x for x in vector) ** 0.5
+        if len(vector) != self.dim or norm == 0:
+            return []
+        scored = [
+            (key, sum(a * b for a, b in zip(vector, v)) / norm)
+            for key, v in self._vectors.items()
+        ]
+        scored.sort(key=lambda item: item[1], reverse=True)
+        return scored[:k]
+
+    def __len__(self) -> int:
+        return len(self._vectors)
+
+
+def create_plan_index(dim: int) -> PlanIndex:
+    """Matrix index when numpy is available, linear scan otherwise"""
+    return MatrixPlanIndex(dim) if NUMPY_AVAILABLE else LinearPlanIndex(dim)
+
+
+# ============================================================================
+# Plan Cache
+# ============================================================================
+
 class PlanCache:
     """
     Intelligent Plan Caching System
 
     Caches successful execution plans and retrieves them for similar tasks.
     Uses semantic similarity when available, falls back to exact matching.
+
+    The in-memory cache is kept in LRU order. Plans beyond `max_plans`, or
+    not used within `ttl_seconds`, are evicted from memory and the database.
     """
 
-    def __init__(self, db_path: str = None):
+    DEFAULT_MAX_PLANS = 1000
+    DEFAULT_TTL_SECONDS = 30 * 24 * 3600  # 30 days
+
+    def __init__(
+        self,
+        db_path: str = None,
+        embedder: Optional[PlanEmbedder] = None,
+        index: Optional[PlanIndex] = None,
+        max_plans: Optional[int] = None,
+        ttl_seconds: Optional[float] = None,
+    ):
         """
         Initialize Plan Cache.
 
         Args:
             db_path: Path to SQLite database (default: ~/.nogicos/plan_cache.db)
+            embedder: Task embedder (default: create_plan_embedder())
+            index: Vector index backend (default: create_plan_index())
+            max_plans: Size cap (default: $NOGICOS_PLAN_CACHE_MAX or 1000)
+            ttl_seconds: Evict plans unused for this long, 0 disables
+                         (default: $NOGICOS_PLAN_CACHE_TTL or 30 days)
         """
         if db_path is None:
             cache_dir = os.path.expanduser("~/.nogicos")
@@ -82,9 +363,28 @@ class PlanCache:
             db_path = os.path.join(cache_dir, "plan_cache.db")
 
         self.db_path = db_path
+        self._db = get_sqlite_pool(db_path)
+        self.max_plans = max_plans if max_plans is not None else int(
+            os.getenv("NOGICOS_PLAN_CACHE_MAX", self.DEFAULT_MAX_PLANS)
+        )
+        self.ttl_seconds = ttl_seconds if ttl_seconds is not None else float(
+            os.getenv("NOGICOS_PLAN_CACHE_TTL", self.DEFAULT_TTL_SECONDS)
+        )
+        self._embedder = embedder or create_plan_embedder()
+        self._index = index or create_plan_index(self._embedder.dim)
+
         self._lock = threading.Lock()
-        self._memory_cache: Dict[str, CachedPlan] = {}  # In-memory cache for speed
-        self._embedding_cache: Dict[str, List[float]] = {}  # Task embeddings
+        # In-memory cache in LRU order (least recently used first)
+        self._memory_cache: "OrderedDict[str, CachedPlan]" = OrderedDict()
+        self._last_access: Dict[str, float] = {}  # task_hash -> epoch seconds
+
+        # Counters for get_stats
+        self._exact_hits = 0
+        self._semantic_hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._lookup_time_total = 0.0
+        self._lookup_time_max = 0.0
 
         # Initialize database
         self._init_db()
@@ -92,11 +392,14 @@ class PlanCache:
         # Load existing plans into memory
         self._load_to_memory()
 
-        logger.info(f"[PlanCache] Initialized with {len(self._memory_cache)} cached plans")
+        logger.info(
+            f"[PlanCache] Initialized with {len(self._memory_cache)} cached plans "
+            f"(embedder={self._embedder.name}, index={type(self._index).__name__})"
+        )
 
     def _init_db(self):
         """Initialize SQLite database schema"""
-        with sqlite3.connect(self.db_path) as conn:
+        with self._db.connect() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS plans (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -108,21 +411,28 @@ class PlanCache:
                     created_at TEXT NOT NULL,
                     use_count INTEGER DEFAULT 0,
                     last_used_at TEXT,
-                    embedding TEXT
+                    embedding TEXT,
+                    embedding_model TEXT
                 )
             """)
             conn.execute("""
                 CREATE INDEX IF NOT EXISTS idx_task_hash ON plans(task_hash)
             """)
+            # Migrate databases created before embedders were pluggable
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(plans)")}
+            if "embedding_model" not in columns:
+                conn.execute("ALTER TABLE plans ADD COLUMN embedding_model TEXT")
             conn.commit()
 
     def _load_to_memory(self):
-        """Load all plans from database to memory cache"""
-        with sqlite3.connect(self.db_path) as conn:
+        """Load plans from database to memory cache, re-embedding stale vectors"""
+        stale: List[CachedPlan] = []
+        with self._db.connect() as conn:
             cursor = conn.execute("""
                 SELECT task_hash, task, plan_steps, execution_time, success,
-                       created_at, use_count, last_used_at, embedding
+                       created_at, use_count, last_used_at, embedding, embedding_model
                 FROM plans WHERE success = 1
+                ORDER BY COALESCE(last_used_at, created_at)
             """)
             for row in cursor:
                 plan = CachedPlan(
@@ -137,8 +447,37 @@ class PlanCache:
                     embedding=json.loads(row[8]) if row[8] else None,
                 )
                 self._memory_cache[row[0]] = plan
-                if plan.embedding:
-                    self._embedding_cache[row[0]] = plan.embedding
+                self._last_access[row[0]] = self._parse_time(plan.last_used_at or plan.created_at)
+                if plan.embedding and row[9] == self._embedder.name:
+                    self._index.add(row[0], plan.embedding)
+                else:
+                    stale.append(plan)
+
+        if stale:
+            vectors = self._embedder.embed([plan.task for plan in stale])
+            for plan, vector in zip(stale, vectors):
+                plan.embedding = vector
+                self._index.add(plan.task_hash, vector)
+            try:
+                with self._db.connect() as conn:
+                    conn.executemany(
+                        "UPDATE plans SET embedding = ?, embedding_model = ? WHERE task_hash = ?",
+                        [(json.dumps(p.embedding), self._embedder.name, p.task_hash) for p in stale],
+                    )
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"[PlanCache] Failed to persist re-embedded plans: {e}")
+            logger.info(f"[PlanCache] Re-embedded {len(stale)} plans with {self._embedder.name}")
+
+        with self._lock:
+            self._evict_locked()
+
+    @staticmethod
+    def _parse_time(value: Optional[str]) -> float:
+        try:
+            return datetime.fromisoformat(value).timestamp()
+        except (TypeError, ValueError):
+            return time.time()
 
     def _compute_hash(self, task: str) -> str:
         """Compute a hash for a task string"""
@@ -147,83 +486,50 @@ class PlanCache:
         return hashlib.md5(normalized.encode()).hexdigest()
 
     def _compute_embedding(self, task: str) -> Optional[List[float]]:
-        """
-        Compute semantic embedding for a task.
+        """Compute semantic embedding for a task with the configured embedder"""
+        return self._embedder.embed([task])[0]
 
-        Uses keyword matching with stemming for better similarity detection.
-        """
-        # Normalize: lowercase, extract words
-        words = task.lower().split()
-        word_set = set(words)
+    def _touch(self, task_hash: str):
+        """Mark a plan as most recently used (caller holds the lock)"""
+        self._memory_cache.move_to_end(task_hash)
+        self._last_access[task_hash] = time.time()
 
-        # Simple stemming: remove common suffixes
-        stemmed_words = set()
-        for word in words:
-            stemmed_words.add(word)
-            # Handle common suffixes
-            if word.endswith("ing"):
-                stemmed_words.add(word[:-3])
-            if word.endswith("s") and len(word) > 3:
-                stemmed_words.add(word[:-1])
-            if word.endswith("ed") and len(word) > 3:
-                stemmed_words.add(word[:-2])
-
-        # Feature categories for better matching
-        # Each category maps synonyms to the same feature
-        features = [
-            # Actions
-            {"list", "show", "display", "view", "see", "get"},
-            {"click", "tap", "press"},
-            {"type", "write", "input", "enter"},
-            {"open", "launch", "start", "run"},
-            {"close", "exit", "quit", "stop"},
-            {"send", "submit", "post"},
-            {"save", "store", "download"},
-            {"copy", "duplicate"},
-            {"paste", "insert"},
-            {"fill", "complete"},
-            {"navigate", "go", "visit", "browse"},
-            {"scroll", "move"},
-            {"select", "choose", "pick"},
-            {"search", "find", "look", "locate"},
-            {"create", "make", "new", "add"},
-            {"delete", "remove", "erase"},
-            {"upload"},
-            {"screenshot", "capture"},
-            # Targets
-            {"file", "document", "doc"},
-            {"folder", "directory", "dir"},
-            {"browser", "chrome", "edge", "firefox"},
-            {"window", "app", "application"},
-            {"form", "field"},
-            {"button", "link"},
-            {"text", "content", "message"},
-            {"image", "picture", "photo"},
-            {"current", "this", "here"},
-            {"all", "every", "entire"},
-        ]
-
-        # Build embedding: 1.0 if any word in the task matches any word in the feature set
-        embedding = []
-        for feature_set in features:
-            match = 1.0 if bool(stemmed_words & feature_set) else 0.0
-            embedding.append(match)
-
-        return embedding
-
-    def _cosine_similarity(self, vec1: List[float], vec2: List[float]) -> float:
-        """Compute cosine similarity between two vectors"""
-        if not vec1 or not vec2 or len(vec1) != len(vec2):
-            return 0.0
-
-        dot_product = sum(a * b for a, b in zip(vec1, vec2))
-        norm1 = sum(a * a for a in vec1) ** 0.5
-        norm2 = sum(b * b for b in vec2) ** 0.5
+    def _evict_locked(self) -> int:
+        """
+        Drop expired plans and enforce the size cap (caller holds the lock).
 
-        if norm1 == 0 or norm2 == 0:
-            return 0.0
+        The cache is in LRU order, so both checks only look at the front.
+        """
+        evicted: List[str] = []
+        if self.ttl_seconds and self.ttl_seconds > 0:
+            cutoff = time.time() - self.ttl_seconds
+            while self._memory_cache:
+                oldest = next(iter(self._memory_cache))
+                if self._last_access.get(oldest, 0.0) >= cutoff:
+                    break
+                evicted.append(oldest)
+                self._drop_locked(oldest)
+        if self.max_plans and self.max_plans > 0:
+            while len(self._memory_cache) > self.max_plans:
+                oldest = next(iter(self._memory_cache))
+                evicted.append(oldest)
+                self._drop_locked(oldest)
+
+        if evicted:
+            self._evictions += len(evicted)
+            try:
+                with self._db.connect() as conn:
+                    conn.executemany("DELETE FROM plans WHERE task_hash = ?", [(h,) for h in evicted])
+                    conn.commit()
+            except Exception as e:
+                logger.error(f"[PlanCache] Failed to delete evicted plans: {e}")
+            logger.debug(f"[PlanCache] Evicted {len(evicted)} plans")
+        return len(evicted)
 
-        return dot_product / (norm1 * norm2)
+    def _drop_locked(self, task_hash: str):
+        self._memory_cache.pop(task_hash, None)
+        self._last_access.pop(task_hash, None)
+        self._index.remove(task_hash)
 
     def find_similar(self, task: str, threshold: float = 0.85) -> Optional[Tuple[CachedPlan, float]]:
         """
@@ -236,41 +542,45 @@ class PlanCache:
         Returns:
             Tuple of (CachedPlan, similarity_score) if found, None otherwise
         """
-        with self._lock:
-            # First, try exact match
-            task_hash = self._compute_hash(task)
-            if task_hash in self._memory_cache:
-                plan = self._memory_cache[task_hash]
-                logger.info(f"[PlanCache] Exact match found for task")
-                return (plan, 1.0)
-
-            # Then, try semantic similarity
+        start = time.perf_counter()
+        # Embedding may be a model call, keep it outside the lock
+        task_hash = self._compute_hash(task)
+        task_embedding = None
+        if task_hash not in self._memory_cache:
             task_embedding = self._compute_embedding(task)
-            if not task_embedding:
-                return None
-
-            best_match = None
-            best_score = 0.0
-
-            logger.info(f"[PlanCache] Searching {len(self._memory_cache)} cached plans for similarity")
-
-            for cached_hash, cached_plan in self._memory_cache.items():
-                cached_embedding = self._embedding_cache.get(cached_hash)
-                if not cached_embedding:
-                    cached_embedding = self._compute_embedding(cached_plan.task)
-                    self._embedding_cache[cached_hash] = cached_embedding
 
-                similarity = self._cosine_similarity(task_embedding, cached_embedding)
-                logger.info(f"[PlanCache] Similarity with '{cached_plan.task[:40]}...': {similarity:.3f}")
-                if similarity > best_score:
-                    best_score = similarity
-                    best_match = cached_plan
-
-            if best_match and best_score >= threshold:
-                logger.info(f"[PlanCache] Similar plan found (score={best_score:.2f})")
-                return (best_match, best_score)
-
-            return None
+        with self._lock:
+            try:
+                self._evict_locked()
+
+                # First, try exact match
+                if task_hash in self._memory_cache:
+                    self._touch(task_hash)
+                    self._exact_hits += 1
+                    logger.debug("[PlanCache] Exact match found for task")
+                    return (self._memory_cache[task_hash], 1.0)
+
+                # Then, try semantic similarity
+                if task_embedding is None:
+                    task_embedding = self._compute_embedding(task)
+                matches = self._index.search(task_embedding, k=1) if task_embedding else []
+                if matches and matches[0][1] >= threshold and matches[0][0] in self._memory_cache:
+                    best_hash, best_score = matches[0]
+                    self._touch(best_hash)
+                    self._semantic_hits += 1
+                    logger.info(f"[PlanCache] Similar plan found (score={best_score:.2f})")
+                    return (self._memory_cache[best_hash], best_score)
+
+                self._misses += 1
+                logger.debug(
+                    f"[PlanCache] No match among {len(self._memory_cache)} plans "
+                    f"(best={matches[0][1] if matches else 0.0:.3f})"
+                )
+                return None
+            finally:
+                elapsed = time.perf_counter() - start
+                self._lookup_time_total += elapsed
+                self._lookup_time_max = max(self._lookup_time_max, elapsed)
 
     def cache_plan(
         self,
@@ -295,10 +605,10 @@ class PlanCache:
             logger.debug(f"[PlanCache] Not caching failed plan")
             return None
 
-        with self._lock:
-            task_hash = self._compute_hash(task)
-            embedding = self._compute_embedding(task)
+        task_hash = self._compute_hash(task)
+        embedding = self._compute_embedding(task)
 
+        with self._lock:
             plan = CachedPlan(
                 task=task,
                 task_hash=task_hash,
@@ -311,11 +621,12 @@ class PlanCache:
 
             # Save to database
             try:
-                with sqlite3.connect(self.db_path) as conn:
+                with self._db.connect() as conn:
                     conn.execute("""
                         INSERT OR REPLACE INTO plans
-                        (task_hash, task, plan_steps, execution_time, success, created_at, embedding)
-                        VALUES (?, ?, ?, ?, ?, ?, ?)
+                        (task_hash, task, plan_steps, execution_time, success, created_at,
+                         embedding, embedding_model)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
                     """, (
                         task_hash,
                         task,
@@ -324,6 +635,7 @@ class PlanCache:
                         1 if success else 0,
                         plan.created_at,
                         json.dumps(embedding) if embedding else None,
+                        self._embedder.name,
                     ))
                     conn.commit()
             except Exception as e:
@@ -332,8 +644,10 @@ class PlanCache:
 
             # Update memory cache
             self._memory_cache[task_hash] = plan
+            self._touch(task_hash)
             if embedding:
-                self._embedding_cache[task_hash] = embedding
+                self._index.add(task_hash, embedding)
+            self._evict_locked()
 
             logger.info(f"[PlanCache] Cached new plan (total={len(self._memory_cache)})")
             return plan
@@ -345,10 +659,11 @@ class PlanCache:
                 plan = self._memory_cache[task_hash]
                 plan.use_count += 1
                 plan.last_used_at = datetime.now().isoformat()
+                self._touch(task_hash)
 
                 # Update database
                 try:
-                    with sqlite3.connect(self.db_path) as conn:
+                    with self._db.connect() as conn:
                         conn.execute("""
                             UPDATE plans SET use_count = ?, last_used_at = ?
                             WHERE task_hash = ?
@@ -366,11 +681,25 @@ class PlanCache:
                 sum(p.execution_time for p in self._memory_cache.values()) / total_plans
                 if total_plans > 0 else 0
             )
+            hits = self._exact_hits + self._semantic_hits
+            lookups = hits + self._misses
 
             return {
                 "total_plans": total_plans,
                 "total_uses": total_uses,
                 "average_execution_time": avg_time,
+                "hits": hits,
+                "exact_hits": self._exact_hits,
+                "semantic_hits": self._semantic_hits,
+                "misses": self._misses,
+                "hit_rate": hits / lookups if lookups else 0.0,
+                "evictions": self._evictions,
+                "lookup_avg_ms": self._lookup_time_total / lookups * 1000 if lookups else 0.0,
+                "lookup_max_ms": self._lookup_time_max * 1000,
+                "max_plans": self.max_plans,
+                "ttl_seconds": self.ttl_seconds,
+                "embedder": self._embedder.name,
+                "index": type(self._index).__name__,
                 "db_path": self.db_path,
             }
 
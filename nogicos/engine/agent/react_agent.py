@@ -24,8 +24,8 @@ import os
 import json
 import time
 import asyncio
-import copy
-from typing import Optional, List, Dict, Any, TYPE_CHECKING, Callable, Awaitable
+import logging
+from typing import Optional, List, Dict, Any, TYPE_CHECKING, Callable, Awaitable, Collection
 from dataclasses import dataclass, field
 
 # Logging
@@ -51,6 +51,12 @@ except ImportError:
     wrap_anthropic_client = lambda c: c
     trace_span = None
 
+# Per-step spans (always available, cheap when unsampled)
+from ..observability import spans as tracing
+# LLM call timing summary (GET /api/agent/stats -> "llm")
+from ..observability.metrics import get_metrics as get_perf_metrics
+from .types import CallTiming
+
 # Prometheus metrics (optional)
 try:
     from monitoring.prometheus.metrics import get_metrics, AgentMetrics
@@ -66,6 +72,10 @@ from ..tools import create_full_registry
 # Import mode router
 from .modes import AgentMode, ModeRouter, get_mode_router
 
+# Screenshot-aware message history
+from .conversation import ConversationHistory
+from .screenshot_diff import ScreenshotDiffer
+
 # Centralized optional imports (reduces ~80 lines of try/except boilerplate)
 from .imports import (
     # Anthropic
@@ -148,7 +158,9 @@ def _agent_debug_log(hypothesis_id: str, location: str, message: str, data: dict
     """
     Write a single NDJSON debug line to debug.log (append-only). Keep tiny payload; avoid secrets.
     Uses os.fsync to ensure immediate disk write (prevent segfault data loss).
+    Also recorded as an event on the current span.
     """
+    tracing.current_span().add_event(message, location=location, hypothesis=hypothesis_id)
     try:
         payload = {
             "sessionId": "debug-session",
@@ -1036,17 +1048,19 @@ class ReActAgent:
             return getattr(block, "type", type(block).__name__)
 
         # Debug: log input messages structure
-        logger.info(f"[Agent] _strip_thinking_blocks INPUT: {len(messages)} messages")
-        for i, m in enumerate(messages):
-            role = m.get("role", "?")
-            content = m.get("content", "N/A")
-            if isinstance(content, list):
-                types = [get_block_type(b) for b in content]
-                logger.info(f"[Agent]   msg[{i}] role={role}, content types: {types}")
-            else:
-                logger.info(f"[Agent]   msg[{i}] role={role}, content type: {type(content).__name__}")
+        if logger.isEnabledFor(logging.DEBUG):
+            logger.debug(f"[Agent] _strip_thinking_blocks INPUT: {len(messages)} messages")
+            for i, m in enumerate(messages):
+                role = m.get("role", "?")
+                content = m.get("content", "N/A")
+                if isinstance(content, list):
+                    types = [get_block_type(b) for b in content]
+                    logger.debug(f"[Agent]   msg[{i}] role={role}, content types: {types}")
+                else:
+                    logger.debug(f"[Agent]   msg[{i}] role={role}, content type: {type(content).__name__}")
 
-        for msg in copy.deepcopy(messages):
+        # Blocks are shared with the input; only messages that change are copied
+        for msg in messages:
             if msg.get("role") == "assistant":
                 content = msg.get("content", [])
                 if isinstance(content, list):
@@ -1057,9 +1071,10 @@ class ReActAgent:
                         if not is_thinking_block(block)
                     ]
                     thinking_blocks_removed += original_len - len(filtered_content)
-                    if filtered_content:
-                        msg["content"] = filtered_content
+                    if len(filtered_content) == original_len:
                         stripped.append(msg)
+                    elif filtered_content:
+                        stripped.append({**msg, "content": filtered_content})
                     # If no content remains, skip this message entirely
                     else:
                         logger.info(f"[Agent] Skipping assistant message with empty content after strip")
@@ -1067,10 +1082,10 @@ class ReActAgent:
                     stripped.append(msg)
             else:
                 stripped.append(msg)
-        logger.info(f"[Agent] _strip_thinking_blocks OUTPUT: {len(stripped)} messages, removed {thinking_blocks_removed} thinking blocks")
+        logger.debug(f"[Agent] _strip_thinking_blocks OUTPUT: {len(stripped)} messages, removed {thinking_blocks_removed} thinking blocks")
         return stripped
 
-    def _prune_old_screenshots(self, messages: List[Dict], max_screenshots: int = 2) -> List[Dict]:
+    def _prune_old_screenshots(self, messages: List[Dict], max_screenshots: int = 2, pinned: Collection[str] = ()) -> List[Dict]:
         """
         Prune old screenshot images from message history to prevent token overflow.
         
@@ -1078,63 +1093,31 @@ class ReActAgent:
         This is critical because each 1280x800 screenshot can consume ~80K+ tokens,
         and the API limit is 200K tokens.
         
+        A ConversationHistory is pruned incrementally in place (only images
+        that just fell out of the window are touched). A plain list is
+        scanned once and copied on write; the input is never mutated.
+        
         Args:
             messages: The conversation history
             max_screenshots: Maximum number of screenshots to keep (default: 2)
+            pinned: Image data pruned last (keyframes referenced by region crops)
             
         Returns:
             Pruned messages with old screenshots replaced by text placeholders
         """
-        # Count total images and find their locations
-        image_locations = []  # [(msg_idx, content_idx, is_tool_result)]
-        
-        for msg_idx, msg in enumerate(messages):
-            content = msg.get("content", [])
-            if isinstance(content, list):
-                for content_idx, block in enumerate(content):
-                    if isinstance(block, dict):
-                        # Direct image block
-                        if block.get("type") == "image":
-                            image_locations.append((msg_idx, content_idx, False))
-                        # Tool result with image content
-                        elif block.get("type") == "tool_result":
-                            inner_content = block.get("content", [])
-                            if isinstance(inner_content, list):
-                                for inner_idx, inner_block in enumerate(inner_content):
-                                    if isinstance(inner_block, dict) and inner_block.get("type") == "image":
-                                        image_locations.append((msg_idx, content_idx, True, inner_idx))
-        
-        # If within limit, no pruning needed
-        if len(image_locations) <= max_screenshots:
+        if isinstance(messages, ConversationHistory):
+            before = messages.images_pruned
+            messages.prune_images(max_screenshots, pinned=pinned)
+            if messages.images_pruned > before:
+                logger.info(f"[Agent] Pruned {messages.images_pruned - before} old screenshots from message history (keeping {max_screenshots})")
             return messages
         
-        # Prune old screenshots (keep only the last max_screenshots)
-        images_to_remove = len(image_locations) - max_screenshots
-        locations_to_remove = image_locations[:images_to_remove]
-        
-        logger.info(f"[Agent] Pruning {images_to_remove} old screenshots from message history (keeping {max_screenshots})")
-        
-        # Create a deep copy to avoid modifying original
-        pruned = copy.deepcopy(messages)
-        
-        for location in locations_to_remove:
-            msg_idx = location[0]
-            content_idx = location[1]
-            is_tool_result = location[2]
-            
-            if is_tool_result and len(location) > 3:
-                # Replace image inside tool_result
-                inner_idx = location[3]
-                inner_content = pruned[msg_idx]["content"][content_idx].get("content", [])
-                if isinstance(inner_content, list) and inner_idx < len(inner_content):
-                    inner_content[inner_idx] = {"type": "text", "text": "[Previous screenshot removed to save context space]"}
-            else:
-                # Replace direct image block
-                content = pruned[msg_idx].get("content", [])
-                if isinstance(content, list) and content_idx < len(content):
-                    content[content_idx] = {"type": "text", "text": "[Previous screenshot removed to save context space]"}
-        
-        return pruned
+        pruned = ConversationHistory(messages)
+        pruned.prune_images(max_screenshots, pinned=pinned)
+        if not pruned.images_pruned:
+            return messages
+        logger.info(f"[Agent] Pruning {pruned.images_pruned} old screenshots from message history (keeping {max_screenshots})")
+        return list(pruned)
 
     async def cleanup_browser_session(self) -> None:
         """
@@ -1485,6 +1468,28 @@ HINT: Consider reusing these tool sequences for faster execution.
             logger.error(f"Failed to warm cache: {e}")
             return False
     
+    def _record_llm_timing(self, timing: CallTiming, started: float, first_token, last_token, response):
+        """
+        Finish the timing of one agent stream call and add it to the LLM stats.
+        
+        The agent streams through its own Anthropic client rather than LLMClient,
+        so its calls are recorded here.
+        """
+        try:
+            timing.total_ms = (time.perf_counter() - started) * 1000
+            if first_token is not None:
+                timing.ttft_ms = (first_token - started) * 1000
+                timing.generation_ms = (last_token - first_token) * 1000
+            usage = getattr(response, "usage", None)
+            timing.output_tokens = getattr(usage, "output_tokens", 0) or 0
+            if getattr(usage, "cache_read_input_tokens", None):
+                timing.cache = "hit"
+            elif getattr(usage, "cache_creation_input_tokens", None):
+                timing.cache = "write"
+            get_perf_metrics().record_llm_timing(timing)
+        except Exception as e:
+            logger.debug(f"Failed to record LLM timing: {e}")
+    
     def _build_cached_system(self, system_prompt: str) -> list:
         """
         Build system prompt with cache_control for Anthropic API.
@@ -1838,10 +1843,20 @@ HINT: Consider reusing these tool sequences for faster execution.
             "content": str(output),
         }
 
-    def _format_window_screenshot_result(self, tool_use_id: str, output: Any, kind: str = "window_screenshot") -> Dict[str, Any]:
+    def _format_window_screenshot_result(
+        self,
+        tool_use_id: str,
+        output: Any,
+        kind: str = "window_screenshot",
+        differ: Optional[ScreenshotDiffer] = None,
+    ) -> Dict[str, Any]:
         """
         Format window/desktop screenshot (local tools) to multimodal blocks.
         Avoid dumping base64 as plain text to LLM (prevents 400 / oversize).
+        
+        With a differ, a capture of the same window is compared with the last
+        full frame the model received: unchanged frames are replaced by a
+        note, small changes by a crop of the changed region plus coordinates.
         """
         image_b64 = ""
         title = ""
@@ -1852,6 +1867,13 @@ HINT: Consider reusing these tool sequences for faster execution.
             size = output.get("window_size") or output.get("size") or output.get("dimensions")
 
         content_blocks: List[Dict[str, Any]] = []
+        if image_b64 and differ is not None:
+            diff = differ.diff(output.get("hwnd") or kind, image_b64)
+            image_b64 = diff.image_base64
+            note = diff.describe(kind)
+            if note:
+                content_blocks.append({"type": "text", "text": note})
+
         if image_b64:
             content_blocks.append({
                 "type": "image",
@@ -2049,6 +2071,27 @@ HINT: Consider reusing these tool sequences for faster execution.
         Returns:
             AgentResult with success status and response
         """
+        with tracing.span(tracing.AGENT_RUN, session_id=session_id, mode=mode.value) as span:
+            result = await self._run(
+                task, session_id, context, mode, confirmed_plan,
+                on_text_delta, on_thinking_delta, on_tool_start, on_tool_end,
+            )
+            span.set_attributes(success=result.success, iterations=result.iterations)
+            return result
+    
+    async def _run(
+        self,
+        task: str,
+        session_id: str = "default",
+        context: Optional[str] = None,
+        mode: AgentMode = AgentMode.AGENT,
+        confirmed_plan: Optional[Plan] = None,
+        on_text_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        on_thinking_delta: Optional[Callable[[str], Awaitable[None]]] = None,
+        on_tool_start: Optional[Callable[[str, str, Dict[str, Any]], Awaitable[None]]] = None,
+        on_tool_end: Optional[Callable[[str, bool, str], Awaitable[None]]] = None,
+    ) -> AgentResult:
+        """ReAct loop behind run(); runs inside the agent.run span"""
         # ===========================================
         # REMOVED: Hardcoded workflow trigger detection
         # Agent now uses ReAct loop to autonomously decide actions
@@ -2070,6 +2113,7 @@ HINT: Consider reusing these tool sequences for faster execution.
 
         # Event system: Initialize task tracking
         self._current_task_id = f"task-{message_id}"
+        tracing.set_task_id(self._current_task_id)
         if EVENT_SYSTEM_AVAILABLE:
             await self._ensure_task_store()
             if self._state_manager:
@@ -2324,7 +2368,9 @@ HINT: Consider reusing these tool sequences for faster execution.
             plan_text = "\n".join([f"{i+1}. {step}" for i, step in enumerate(plan.steps)])
             user_content = f"{user_content}\n\n**Suggested Plan:**\n{plan_text}\n\nFollow this plan step by step."
         
-        messages = [{"role": "user", "content": user_content}]
+        messages = ConversationHistory([{"role": "user", "content": user_content}])
+        # Window screenshots are sent as diffs against the last full frame per window
+        screenshot_differ = ScreenshotDiffer()
         
         # ReAct loop
         iteration = 0
@@ -2364,8 +2410,13 @@ HINT: Consider reusing these tool sequences for faster execution.
         if VISUALIZATION_AVAILABLE and self.status_server:
             await visualize_task_start(self.status_server, max_steps=effective_max_iterations)
         
+        iteration_span = None
         while iteration < effective_max_iterations:
             iteration += 1
+            if iteration_span is not None:
+                iteration_span.end()
+            iteration_span = tracing.span(tracing.AGENT_ITERATION, iteration=iteration).activate()
+            llm_span = None
             
             # #region agent log D1
             _agent_debug_log("D1", "react_agent:loop_start", f"Iteration {iteration} START", {"iteration": iteration, "max_iterations": effective_max_iterations, "messages_count": len(messages)})
@@ -2417,20 +2468,14 @@ HINT: Consider reusing these tool sequences for faster execution.
 
                 # CRITICAL: Prune old screenshots to prevent token overflow (200K limit)
                 # Each 1280x800 screenshot can consume 80K+ tokens
-                messages_for_api = self._prune_old_screenshots(messages, max_screenshots=2)
+                messages_for_api = self._prune_old_screenshots(
+                    messages, max_screenshots=2, pinned=screenshot_differ.pinned_images(),
+                )
                 
                 # When thinking is disabled, strip thinking blocks from message history
                 # This is required because Haiku can't process thinking blocks from Opus
                 if not use_thinking:
                     messages_for_api = self._strip_thinking_blocks(messages_for_api)
-                    # Debug: verify thinking blocks were removed
-                    for i, msg in enumerate(messages_for_api):
-                        if msg.get("role") == "assistant":
-                            content = msg.get("content", [])
-                            if isinstance(content, list):
-                                types = [b.get("type") for b in content if isinstance(b, dict)]
-                                has_thinking = any(t == "thinking" for t in types)
-                                logger.info(f"[Agent] msg[{i}] assistant content: {types}, has_thinking={has_thinking}")
                     logger.info(f"[Agent] Stripped thinking blocks: {len(messages)} -> {len(messages_for_api)} messages")
 
                 api_params = {
@@ -2514,11 +2559,28 @@ HINT: Consider reusing these tool sequences for faster execution.
                 # #region agent log H10
                 _agent_debug_log("H10", "stream:enter", "Entering stream context", {"iteration": iteration})
                 # #endregion
+                llm_span = tracing.span(tracing.LLM_STREAM, model=use_model, thinking=use_thinking).activate()
+                # Same phases as LLMClient._do_stream: message_start, first/last content delta
+                llm_timing = CallTiming(model=use_model)
+                llm_clock = time.perf_counter()
+                first_token = last_token = None
                 async with self.async_client.messages.stream(**api_params) as stream:
                     # #region agent log H10
                     _agent_debug_log("H10", "stream:started", "Stream context started", {})
                     # #endregion
                     async for event in stream:
+                        if event.type == "message_start":
+                            llm_timing.queue_ms = (time.perf_counter() - llm_clock) * 1000
+                        elif event.type == "content_block_delta":
+                            now = time.perf_counter()
+                            if first_token is None:
+                                first_token = now
+                                # Same first-delta timestamp as llm_timing.ttft_ms
+                                llm_span.set_attribute("ttft_ms", round((now - llm_clock) * 1000, 2))
+                            else:
+                                llm_timing.inter_token_ms.append((now - last_token) * 1000)
+                            last_token = now
+                        
                         # Record TTFT on first event
                         if not ttft_recorded:
                             ttft_ms = (time.time() - task_start_time) * 1000
@@ -2642,6 +2704,8 @@ HINT: Consider reusing these tool sequences for faster execution.
                     # #region agent log H10
                     _agent_debug_log("H10", "stream:final_msg", "Got final message", {"stop_reason": getattr(response, 'stop_reason', None)})
                     # #endregion
+                llm_span.end()
+                self._record_llm_timing(llm_timing, llm_clock, first_token, last_token, response)
 
                 # Signal end of streaming content
                 if text_content and self.status_server:
@@ -2762,7 +2826,9 @@ HINT: Consider reusing these tool sequences for faster execution.
                         if result.success and tool_name == "browser_screenshot":
                             tool_result = self._format_screenshot_result(tool_id, result.output)
                         elif result.success and tool_name in {"window_screenshot", "desktop_screenshot"}:
-                            tool_result = self._format_window_screenshot_result(tool_id, result.output, kind=tool_name)
+                            tool_result = self._format_window_screenshot_result(
+                                tool_id, result.output, kind=tool_name, differ=screenshot_differ,
+                            )
                         elif result.success:
                             tool_result = {
                                 "type": "tool_result",
@@ -2937,7 +3003,9 @@ HINT: Consider reusing these tool sequences for faster execution.
                         if result.success and tool_name == "browser_screenshot":
                             tool_result = self._format_screenshot_result(tool_id, result.output)
                         elif result.success and tool_name in {"window_screenshot", "desktop_screenshot"}:
-                            tool_result = self._format_window_screenshot_result(tool_id, result.output, kind=tool_name)
+                            tool_result = self._format_window_screenshot_result(
+                                tool_id, result.output, kind=tool_name, differ=screenshot_differ,
+                            )
                         elif result.success:
                             tool_result = {
                                 "type": "tool_result",
@@ -2978,6 +3046,10 @@ HINT: Consider reusing these tool sequences for faster execution.
             except Exception as e:
                 error_type = type(e).__name__
                 error_msg = str(e)
+                for open_span in (llm_span, iteration_span):
+                    if open_span is not None:
+                        open_span.record_error(e)
+                        open_span.end()
                 
                 # #region agent log D5
                 _agent_debug_log("D5", "react_agent:exception", f"EXCEPTION in iteration {iteration}", {"error_type": error_type, "error_msg": error_msg[:500], "iteration": iteration})
@@ -3056,6 +3128,9 @@ HINT: Consider reusing these tool sequences for faster execution.
                     tool_calls=tool_calls_made,
                 )
         
+        if iteration_span is not None:
+            iteration_span.end()
+        
         # Record final performance metrics (A3.1)
         total_time_ms = (time.time() - task_start_time) * 1000
         if self.status_server:
@@ -0,0 +1,271 @@
+# -*- coding: utf-8 -*-
+"""
+Screenshot Diff - Send only what changed between window screenshots
+
+In the desktop ReAct loop the agent screenshots the same window after
+almost every click or keystroke, and most of each frame is identical to
+one the model already has. ScreenshotDiffer compares every new capture
+with the last full frame sent for the same window (the keyframe) and
+decides what actually goes into the conversation:
+
+- unchanged: no image, just a "no visual change" note
+- region: a crop of the changed area plus its coordinates in the frame
+- full: the whole frame, which becomes the new keyframe
+
+Frames are compared on 16x16 blocks of the grayscale image with NumPy.
+16 px is the JPEG MCU size of the captures, so compression noise stays
+inside the blocks that really changed. Region crops are cumulative
+relative to the keyframe, so the model only needs the keyframe and the
+newest crop. Keyframes are pinned in ConversationHistory so that screenshot
+pruning drops older crops before the frame they refer to.
+
+Usage:
+    differ = ScreenshotDiffer()
+    diff = differ.diff(hwnd, image_b64)   # diff.kind, diff.image_base64, diff.describe()
+    history.prune_images(2, pinned=differ.pinned_images())
+"""
+
+import base64
+import logging
+from collections import OrderedDict
+from dataclasses import dataclass, field
+from io import BytesIO
+from typing import Any, Dict, Hashable, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+try:
+    import numpy as np
+    from PIL import Image
+    DIFF_AVAILABLE = True
+except ImportError:
+    DIFF_AVAILABLE = False
+    logger.warning("[ScreenshotDiff] numpy/Pillow not available, screenshots are always sent in full")
+
+# (x1, y1, x2, y2) in frame pixels, x2/y2 exclusive
+Box = Tuple[int, int, int, int]
+
+# Changed areas listed in the note sent to the model
+MAX_DESCRIBED_BOXES = 8
+
+
+@dataclass
+class ScreenshotDiff:
+    """What to send for one capture"""
+    kind: str                                   # "full" | "region" | "unchanged"
+    image_base64: str = ""                      # Full frame or region crop (JPEG); empty if unchanged
+    region: Optional[Box] = None                # Crop position in the frame
+    boxes: List[Box] = field(default_factory=list)  # Changed areas relative to the keyframe
+    frame_size: Tuple[int, int] = (0, 0)
+    changed_ratio: float = 0.0                  # Fraction of changed blocks
+
+    def describe(self, kind: str = "window_screenshot") -> str:
+        """Note telling the model how to read the image (empty for full frames)"""
+        width, height = self.frame_size
+        if self.kind == "unchanged":
+            return f"{kind}: no visual change since the previous screenshot ({width}x{height})."
+        if self.kind != "region":
+            return ""
+
+        x1, y1, x2, y2 = self.region
+        areas = ", ".join(f"({b[0]}, {b[1]})-({b[2]}, {b[3]})" for b in self.boxes[:MAX_DESCRIBED_BOXES])
+        if len(self.boxes) > MAX_DESCRIBED_BOXES:
+            areas += f" and {len(self.boxes) - MAX_DESCRIBED_BOXES} more"
+        return (
+            f"{kind}: only part of the {width}x{height} frame changed since the last full screenshot. "
+            f"The image shows region ({x1}, {y1})-({x2}, {y2}) of the frame; "
+            f"everything outside it is unchanged. Changed areas: {areas}."
+        )
+
+
+@dataclass
+class _Keyframe:
+    data: str                   # base64 of the full frame the model has
+    pixels: Any                 # Grayscale keyframe
+    current: Any                # Keyframe with the latest region crop applied
+    last_capture: str           # base64 of the latest capture (fast path for identical frames)
+    size: Tuple[int, int]
+
+
+class ScreenshotDiffer:
+    """
+    Per-conversation screenshot diff stage.
+
+    Args:
+        block_size: Comparison block edge in pixels
+        threshold: Mean absolute gray difference above which a block counts as changed
+        max_region_ratio: Send a full frame when the crop would cover more of it than this
+        padding: Context pixels added around the changed area
+        max_keyframes: Windows tracked at once (their keyframes stay pinned in the
+                       history, so keep this below the screenshot pruning limit)
+        jpeg_quality: Quality of the region crops (matches the capture pipeline)
+    """
+
+    def __init__(
+        self,
+        block_size: int = 16,
+        threshold: float = 2.0,
+        max_region_ratio: float = 0.5,
+        padding: int = 16,
+        max_keyframes: int = 1,
+        jpeg_quality: int = 60,
+    ):
+        self.block_size = block_size
+        self.threshold = threshold
+        self.max_region_ratio = max_region_ratio
+        self.padding = padding
+        self.max_keyframes = max_keyframes
+        self.jpeg_quality = jpeg_quality
+
+        self._frames: "OrderedDict[Hashable, _Keyframe]" = OrderedDict()
+        self._stats = {"full": 0, "region": 0, "unchanged": 0, "bytes_in": 0, "bytes_out": 0}
+
+    def diff(self, key: Hashable, image_b64: str) -> ScreenshotDiff:
+        """
+        Compare a capture with the keyframe of the same window.
+
+        Args:
+            key: Window identity (hwnd, or the tool name for full-desktop captures)
+            image_b64: The new capture
+        """
+        self._stats["bytes_in"] += len(image_b64)
+        frame = self._frames.get(key)
+        if frame is not None and image_b64 == frame.last_capture:
+            self._frames.move_to_end(key)
+            return self._count(ScreenshotDiff("unchanged", frame_size=frame.size))
+
+        if not DIFF_AVAILABLE:
+            return self._count(ScreenshotDiff("full", image_b64, changed_ratio=1.0))
+        try:
+            image = Image.open(BytesIO(base64.b64decode(image_b64)))
+            image.load()
+            gray = np.asarray(image.convert("L"))
+        except Exception as e:
+            logger.debug(f"[ScreenshotDiff] Cannot decode capture, sending in full: {e}")
+            return self._count(ScreenshotDiff("full", image_b64, changed_ratio=1.0))
+
+        if frame is None or gray.shape != frame.pixels.shape:
+            return self._keyframe(key, image_b64, gray, image.size)
+
+        # Compare with what the model currently sees (keyframe + latest crop)
+        if not self._changed_blocks(frame.current, gray).any():
+            frame.last_capture = image_b64
+            self._frames.move_to_end(key)
+            return self._count(ScreenshotDiff("unchanged", frame_size=frame.size))
+
+        mask = self._changed_blocks(frame.pixels, gray)
+        changed_ratio = float(mask.mean())
+        if changed_ratio > self.max_region_ratio or not mask.any():
+            return self._keyframe(key, image_b64, gray, image.size)
+
+        width, height = image.size
+        boxes = self._boxes(mask, width, height)
+        region = (
+            max(0, min(b[0] for b in boxes) - self.padding),
+            max(0, min(b[1] for b in boxes) - self.padding),
+            min(width, max(b[2] for b in boxes) + self.padding),
+            min(height, max(b[3] for b in boxes) + self.padding),
+        )
+        x1, y1, x2, y2 = region
+        if (x2 - x1) * (y2 - y1) > self.max_region_ratio * width * height:
+            return self._keyframe(key, image_b64, gray, image.size)
+
+        frame.current = frame.pixels.copy()
+        frame.current[y1:y2, x1:x2] = gray[y1:y2, x1:x2]
+        frame.last_capture = image_b64
+        self._frames.move_to_end(key)
+        return self._count(ScreenshotDiff(
+            "region",
+            self._encode(image.crop(region)),
+            region=region,
+            boxes=boxes,
+            frame_size=frame.size,
+            changed_ratio=changed_ratio,
+        ))
+
+    def pinned_images(self) -> Set[str]:
+        """Keyframes the model must keep for the region crops to make sense"""
+        return {frame.data for frame in self._frames.values()}
+
+    def reset(self, key: Optional[Hashable] = None):
+        """Forget one window (or all), forcing a full frame next time"""
+        if key is None:
+            self._frames.clear()
+        else:
+            self._frames.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        stats["keyframes"] = len(self._frames)
+        stats["bytes_saved_ratio"] = (
+            1 - stats["bytes_out"] / stats["bytes_in"] if stats["bytes_in"] else 0.0
+        )
+        return stats
+
+    # ========== internals ==========
+
+    def _keyframe(self, key: Hashable, image_b64: str, gray, size: Tuple[int, int]) -> ScreenshotDiff:
+        self._frames[key] = _Keyframe(
+            data=image_b64, pixels=gray, current=gray, last_capture=image_b64, size=size,
+        )
+        self._frames.move_to_end(key)
+        while len(self._frames) > max(self.max_keyframes, 1):
+            self._frames.popitem(last=False)
+        return self._count(ScreenshotDiff("full", image_b64, frame_size=size, changed_ratio=1.0))
+
+    def _count(self, diff: ScreenshotDiff) -> ScreenshotDiff:
+        self._stats[diff.kind] += 1
+        self._stats["bytes_out"] += len(diff.image_base64)
+        if diff.kind != "full":
+            logger.debug(f"[ScreenshotDiff] {diff.kind}: region={diff.region}, changed={diff.changed_ratio:.1%}")
+        return diff
+
+    def _changed_blocks(self, before, after):
+        """Boolean grid, True where the mean block difference exceeds the threshold"""
+        size = self.block_size
+        delta = np.abs(before.astype(np.int16) - after.astype(np.int16))
+        height, width = delta.shape
+        pad_h, pad_w = -height % size, -width % size
+        if pad_h or pad_w:
+            delta = np.pad(delta, ((0, pad_h), (0, pad_w)))
+        rows, cols = delta.shape[0] // size, delta.shape[1] // size
+        return delta.reshape(rows, size, cols, size).mean(axis=(1, 3)) > self.threshold
+
+    def _boxes(self, mask, width: int, height: int) -> List[Box]:
+        """Bounding boxes of 8-connected changed blocks, in frame pixels"""
+        size = self.block_size
+        grid = mask.tolist()
+        rows, cols = len(grid), len(grid[0])
+        seen = [[False] * cols for _ in range(rows)]
+
+        boxes = []
+        for row, col in zip(*np.nonzero(mask)):
+            row, col = int(row), int(col)
+            if seen[row][col]:
+                continue
+            seen[row][col] = True
+            stack = [(row, col)]
+            top, bottom, left, right = row, row, col, col
+            while stack:
+                r, c = stack.pop()
+                top, bottom = min(top, r), max(bottom, r)
+                left, right = min(left, c), max(right, c)
+                for nr in (r - 1, r, r + 1):
+                    if not 0 <= nr < rows:
+                        continue
+                    for nc in (c - 1, c, c + 1):
+                        if 0 <= nc < cols and grid[nr][nc] and not seen[nr][nc]:
+                            seen[nr][nc] = True
+                            stack.append((nr, nc))
+            boxes.append((
+                left * size, top * size,
+                min(width, (right + 1) * size), min(height, (bottom + 1) * size),
+            ))
+        return sorted(boxes, key=lambda b: (b[1], b[0]))
+
+    def _encode(self, image) -> str:
+        if image.mode != "RGB":
+            image = image.convert("RGB")
+        buffer = BytesIO()
+        image.save(buffer, format="JPEG", quality=self.jpeg_quality, optimize=True)
+        return base64.b64encode(buffer.getvalue()).decode("utf-8")
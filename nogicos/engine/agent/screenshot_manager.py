@@ -2,13 +2,18 @@
 NogicOS 截图内存管理
 ====================
 
-防止截图导致的内存泄漏。
+防止截图导致的内存泄漏，并让截图可以按 ID 引用而不是内联 base64。
 
 策略:
 1. 压缩存储 (JPEG 85%)
-2. LRU 淘汰
-3. 内存上限控制
-4. 延迟转换 base64
+2. 分层存储：热层内存 LRU + 磁盘内容寻址段（mmap 读取）
+3. 像素哈希去重（像素完全相同的画面只存一份）
+4. 每个条目缓存 base64 和缩略图
+5. 按 ID 流式读取（WebSocket 帧广播、检查点只传引用）
+
+磁盘布局 (storage_dir):
+    screenshots.seg  - 追加写入的图片/缩略图数据
+    screenshots.idx  - JSON Lines 索引（blob / ref / del 记录），启动时重放
 
 参考:
 - Anthropic Computer Use 截图处理
@@ -16,17 +21,31 @@ NogicOS 截图内存管理
 """
 
 import base64
+import hashlib
+import json
+import mmap
+import os
+import threading
 import uuid
 import asyncio
 import logging
 import time
 from io import BytesIO
-from typing import Dict, Optional
+from typing import Any, AsyncIterator, Dict, List, Optional, Tuple
 from collections import OrderedDict
 from dataclasses import dataclass
 
+from ..observability import spans as tracing
+
 logger = logging.getLogger(__name__)
 
+try:
+    from PIL import Image
+    PIL_AVAILABLE = True
+except ImportError:
+    Image = None
+    PIL_AVAILABLE = False
+
 
 @dataclass
 class ScreenshotEntry:
@@ -38,82 +57,450 @@ class ScreenshotEntry:
     hwnd: int             # 来源窗口
     width: int = 0        # 图片宽度
     height: int = 0       # 图片高度
+    key: str = ""         # 内容键（像素哈希 + 尺寸，相同画面共享）
+    thumbnail: bytes = b""  # JPEG 缩略图
+
+
+@dataclass
+class _BlobInfo:
+    """磁盘段中的一份图片数据"""
+    offset: int
+    length: int
+    thumb_offset: int
+    thumb_length: int
+    width: int
+    height: int
+
+
+@dataclass
+class _RefInfo:
+    """截图 ID -> 内容键"""
+    key: str
+    hwnd: int
+    timestamp: float
+
+
+def sniff_media_type(head: bytes) -> str:
+    """按文件头判断图片 MIME 类型（未压缩存储的截图可能不是 JPEG）"""
+    if head[:8] == b"\x89PNG\r\n\x1a\n":
+        return "image/png"
+    if head[:4] == b"GIF8":
+        return "image/gif"
+    if head[:4] == b"RIFF" and head[8:12] == b"WEBP":
+        return "image/webp"
+    if head[:2] == b"BM":
+        return "image/bmp"
+    return "image/jpeg"
+
+
+def pixel_digest(img) -> str:
+    """精确像素哈希（模式、尺寸和全部像素），像素完全相同才相等"""
+    header = f"{img.mode}:{img.size[0]}x{img.size[1]}:".encode()
+    return hashlib.blake2b(header + img.tobytes(), digest_size=16).hexdigest()
+
+
+class ScreenshotSegment:
+    """
+    磁盘内容寻址段
+
+    - 数据只追加，读取走 mmap（不把整段读进内存）
+    - 同一内容键只写一次，多个截图 ID 引用同一份数据
+    - 超过容量时淘汰最旧的 ID 并重写段（compaction）
+
+    所有方法都是同步的，由 ScreenshotManager 放到线程池执行。
+    """
+
+    SEGMENT_FILE = "screenshots.seg"
+    INDEX_FILE = "screenshots.idx"
+
+    def __init__(self, directory: str, max_bytes: int):
+        self.directory = os.path.expanduser(directory)
+        self.max_bytes = max_bytes
+        os.makedirs(self.directory, exist_ok=True)
+        self.seg_path = os.path.join(self.directory, self.SEGMENT_FILE)
+        self.idx_path = os.path.join(self.directory, self.INDEX_FILE)
+
+        self._lock = threading.Lock()
+        self._blobs: Dict[str, _BlobInfo] = {}
+        self._refs: "OrderedDict[str, _RefInfo]" = OrderedDict()
+        self._key_refs: Dict[str, int] = {}
+        self._size = 0
+        self._mm: Optional[mmap.mmap] = None
+        self._mm_file = None
+        self.compactions = 0
+
+        self._load()
+        self._seg = open(self.seg_path, "ab")
+        self._idx = open(self.idx_path, "a", encoding="utf-8")
+
+    # ---------- 加载 ----------
+
+    def _load(self):
+        if os.path.exists(self.seg_path):
+            self._size = os.path.getsize(self.seg_path)
+        if not os.path.exists(self.idx_path):
+            return
+
+        with open(self.idx_path, "r", encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    continue  # 崩溃时写了一半的最后一行
+                op = record.get("op")
+                if op == "blob":
+                    blob = _BlobInfo(
+                        record["offset"], record["length"],
+                        record["thumb_offset"], record["thumb_length"],
+                        record["width"], record["height"],
+                    )
+                    end = max(blob.offset + blob.length, blob.thumb_offset + blob.thumb_length)
+                    if end <= self._size:
+                        self._blobs[record["key"]] = blob
+                elif op == "ref" and record["key"] in self._blobs:
+                    self._add_ref(record["id"], _RefInfo(record["key"], record["hwnd"], record["ts"]))
+                elif op == "del":
+                    self._drop_ref(record["id"])
+
+        logger.info(f"[ScreenshotSegment] Loaded {len(self._refs)} screenshots ({self._size / 1024 / 1024:.1f} MB)")
+
+    def _add_ref(self, screenshot_id: str, ref: _RefInfo):
+        self._drop_ref(screenshot_id)
+        self._refs[screenshot_id] = ref
+        self._key_refs[ref.key] = self._key_refs.get(ref.key, 0) + 1
+
+    def _drop_ref(self, screenshot_id: str) -> Optional[_RefInfo]:
+        ref = self._refs.pop(screenshot_id, None)
+        if ref is not None:
+            remaining = self._key_refs.get(ref.key, 1) - 1
+            if remaining > 0:
+                self._key_refs[ref.key] = remaining
+            else:
+                self._key_refs.pop(ref.key, None)
+        return ref
+
+    # ---------- 写入 ----------
+
+    def put(self, screenshot_id: str, entry: ScreenshotEntry) -> bool:
+        """
+        写入截图（数据已存在时只追加引用）
+
+        Returns:
+            True 表示内容去重命中，没有写新数据
+        """
+        with self._lock:
+            deduped = entry.key in self._blobs
+            if not deduped:
+                offset = self._size
+                self._seg.write(entry.data)
+                self._seg.write(entry.thumbnail)
+                self._seg.flush()
+                self._size += len(entry.data) + len(entry.thumbnail)
+                blob = _BlobInfo(
+                    offset, len(entry.data),
+                    offset + len(entry.data), len(entry.thumbnail),
+                    entry.width, entry.height,
+                )
+                self._blobs[entry.key] = blob
+                self._write_index({
+                    "op": "blob", "key": entry.key,
+                    "offset": blob.offset, "length": blob.length,
+                    "thumb_offset": blob.thumb_offset, "thumb_length": blob.thumb_length,
+                    "width": blob.width, "height": blob.height,
+                })
+
+            ref = _RefInfo(entry.key, entry.hwnd, entry.timestamp)
+            self._add_ref(screenshot_id, ref)
+            self._write_index({"op": "ref", "id": screenshot_id, "key": ref.key, "hwnd": ref.hwnd, "ts": ref.timestamp})
+            self._idx.flush()
+
+            if self._size > self.max_bytes:
+                self._compact_locked()
+            return deduped
+
+    def delete(self, screenshot_ids: List[str]) -> int:
+        """删除截图引用，返回实际删除的数量"""
+        with self._lock:
+            removed = 0
+            for screenshot_id in screenshot_ids:
+                if self._drop_ref(screenshot_id) is not None:
+                    self._write_index({"op": "del", "id": screenshot_id})
+                    removed += 1
+            self._idx.flush()
+            if removed and self._dead_bytes_locked() > self._size / 2:
+                self._compact_locked()
+            return removed
+
+    def clear(self):
+        """删除所有数据"""
+        with self._lock:
+            self._close_map()
+            self._seg.close()
+            self._idx.close()
+            self._blobs.clear()
+            self._refs.clear()
+            self._key_refs.clear()
+            self._size = 0
+            self._seg = open(self.seg_path, "wb")
+            self._idx = open(self.idx_path, "w", encoding="utf-8")
+
+    def _write_index(self, record: Dict[str, Any]):
+        self._idx.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    # ---------- 读取 ----------
+
+    def get_entry(self, screenshot_id: str, with_data: bool = True) -> Optional[ScreenshotEntry]:
+        """读取截图（data 和 thumbnail 从 mmap 复制）"""
+        with self._lock:
+            ref = self._refs.get(screenshot_id)
+            if ref is None:
+                return None
+            blob = self._blobs[ref.key]
+            data = self._read_locked(blob.offset, blob.length) if with_data else b""
+            thumbnail = self._read_locked(blob.thumb_offset, blob.thumb_length) if with_data else b""
+        return ScreenshotEntry(
+            id=screenshot_id,
+            data=data,
+            size=blob.length,
+            timestamp=ref.timestamp,
+            hwnd=ref.hwnd,
+            width=blob.width,
+            height=blob.height,
+            key=ref.key,
+            thumbnail=thumbnail,
+        )
+
+    def read_range(self, screenshot_id: str, start: int, length: int, thumbnail: bool = False) -> Optional[bytes]:
+        """读取截图数据的一段（流式读取用）"""
+        with self._lock:
+            ref = self._refs.get(screenshot_id)
+            if ref is None:
+                return None
+            blob = self._blobs[ref.key]
+            offset, total = (blob.thumb_offset, blob.thumb_length) if thumbnail else (blob.offset, blob.length)
+            if start >= total:
+                return b""
+            return self._read_locked(offset + start, min(length, total - start))
+
+    def _read_locked(self, offset: int, length: int) -> bytes:
+        if length <= 0:
+            return b""
+        if self._mm is None or len(self._mm) < offset + length:
+            self._remap_locked()
+        return self._mm[offset:offset + length]
+
+    def _remap_locked(self):
+        self._close_map()
+        self._mm_file = open(self.seg_path, "rb")
+        self._mm = mmap.mmap(self._mm_file.fileno(), 0, access=mmap.ACCESS_READ)
+
+    def _close_map(self):
+        if self._mm is not None:
+            self._mm.close()
+            self._mm = None
+        if self._mm_file is not None:
+            self._mm_file.close()
+            self._mm_file = None
+
+    def has(self, screenshot_id: str) -> bool:
+        return screenshot_id in self._refs
+
+    def ids(self) -> List[str]:
+        """所有截图 ID（按写入顺序）"""
+        with self._lock:
+            return list(self._refs)
+
+    def ids_for_hwnd(self, hwnd: int) -> List[str]:
+        with self._lock:
+            return [sid for sid, ref in self._refs.items() if ref.hwnd == hwnd]
+
+    # ---------- 压缩 ----------
+
+    def _live_bytes_locked(self) -> int:
+        return sum(self._blobs[key].length + self._blobs[key].thumb_length for key in self._key_refs)
+
+    def _dead_bytes_locked(self) -> int:
+        return self._size - self._live_bytes_locked()
+
+    def _compact_locked(self):
+        """淘汰最旧的截图直到低于 75% 容量，然后只保留存活数据重写段"""
+        target = int(self.max_bytes * 0.75)
+        live = self._live_bytes_locked()
+        while live > target and self._refs:
+            oldest_id = next(iter(self._refs))
+            ref = self._drop_ref(oldest_id)
+            if ref.key not in self._key_refs:
+                blob = self._blobs[ref.key]
+                live -= blob.length + blob.thumb_length
+
+        tmp_seg = self.seg_path + ".tmp"
+        tmp_idx = self.idx_path + ".tmp"
+        new_blobs: Dict[str, _BlobInfo] = {}
+        with open(tmp_seg, "wb") as seg, open(tmp_idx, "w", encoding="utf-8") as idx:
+            offset = 0
+            for key in self._key_refs:
+                old = self._blobs[key]
+                data = self._read_locked(old.offset, old.length)
+                thumb = self._read_locked(old.thumb_offset, old.thumb_length)
+                seg.write(data)
+                seg.write(thumb)
+                blob = _BlobInfo(offset, old.length, offset + old.length, old.thumb_length, old.width, old.height)
+                offset += old.length + old.thumb_length
+                new_blobs[key] = blob
+                idx.write(json.dumps({
+                    "op": "blob", "key": key,
+                    "offset": blob.offset, "length": blob.length,
+                    "thumb_offset": blob.thumb_offset, "thumb_length": blob.thumb_length,
+                    "width": blob.width, "height": blob.height,
+                }, separators=(",", ":")) + "\n")
+            for screenshot_id, ref in self._refs.items():
+                idx.write(json.dumps(
+                    {"op": "ref", "id": screenshot_id, "key": ref.key, "hwnd": ref.hwnd, "ts": ref.timestamp},
+                    separators=(",", ":"),
+                ) + "\n")
+
+        # Windows 上替换前必须关闭所有句柄
+        self._close_map()
+        self._seg.close()
+        self._idx.close()
+        os.replace(tmp_seg, self.seg_path)
+        os.replace(tmp_idx, self.idx_path)
+        self._seg = open(self.seg_path, "ab")
+        self._idx = open(self.idx_path, "a", encoding="utf-8")
+
+        before = self._size
+        self._blobs = new_blobs
+        self._size = offset
+        self.compactions += 1
+        logger.info(f"[ScreenshotSegment] Compacted {before / 1024 / 1024:.1f} MB -> {offset / 1024 / 1024:.1f} MB")
+
+    def close(self):
+        with self._lock:
+            self._close_map()
+            self._seg.close()
+            self._idx.close()
+
+    def get_stats(self) -> Dict[str, Any]:
+        return {
+            "disk_count": len(self._refs),
+            "disk_blobs": len(self._key_refs),
+            "disk_size_mb": self._size / (1024 * 1024),
+            "disk_max_mb": self.max_bytes / (1024 * 1024),
+            "compactions": self.compactions,
+        }
 
 
 class ScreenshotManager:
     """
     截图管理器 - 内存安全的截图存储
-    
+
     特性:
     - 压缩存储，减少 50-70% 内存
-    - LRU 淘汰策略
-    - 内存上限控制
-    - 按需转换 base64
-    
+    - 热层 LRU + 内存上限控制
+    - 可选磁盘段（storage_dir），重启后按 ID 仍可读取
+    - 像素哈希去重：像素完全相同的画面只保存一份数据
+    - base64 与缩略图缓存，重复读取不再编码
+    - 流式读取 / 按 ID 引用
+
     使用示例:
     ```python
     manager = get_screenshot_manager()
-    
+
     # 存储截图
     screenshot_id = await manager.store(image_bytes, hwnd=12345)
-    
-    # 获取 base64（按需转换）
+
+    # 获取 base64（结果缓存）
     base64_data = await manager.get_base64(screenshot_id)
-    
+
+    # 只传引用，由客户端按需拉取
+    await status_server.broadcast_frame(screenshot_id=screenshot_id)
+    async for chunk in manager.iter_chunks(screenshot_id):
+        ...
+
     # 检查内存使用
     stats = manager.get_stats()
     print(f"Memory usage: {stats['total_size_mb']:.2f} MB")
     ```
     """
-    
+
     # 默认配置
     MAX_MEMORY_MB = 50
     MAX_ENTRIES = 100
+    MAX_DISK_MB = 512
     JPEG_QUALITY = 85
-    
-    def __init__(self, max_memory_mb: int = None, max_entries: int = None):
+    THUMBNAIL_SIZE = (320, 200)
+    THUMBNAIL_QUALITY = 70
+    CHUNK_SIZE = 64 * 1024
+
+    def __init__(
+        self,
+        max_memory_mb: int = None,
+        max_entries: int = None,
+        storage_dir: Optional[str] = None,
+        max_disk_mb: int = None,
+        dedup: bool = True,
+    ):
         """
         初始化截图管理器
-        
+
         Args:
-            max_memory_mb: 最大内存使用 (MB)
-            max_entries: 最大截图数量
+            max_memory_mb: 热层最大内存使用 (MB)，含 base64/缩略图缓存
+            max_entries: 热层最大截图数量
+            storage_dir: 磁盘段目录（None 表示只用内存）
+            max_disk_mb: 磁盘段容量 (MB)
+            dedup: 是否按像素哈希去重（关闭时按压缩后的字节去重）
         """
         self.max_memory_bytes = (max_memory_mb or self.MAX_MEMORY_MB) * 1024 * 1024
         self.max_entries = max_entries or self.MAX_ENTRIES
-        
+        self.dedup = dedup
+
         self._cache: OrderedDict[str, ScreenshotEntry] = OrderedDict()
         self._total_size = 0
         self._lock = asyncio.Lock()
-        
+
+        # 内容键引用计数（相同画面的条目共享数据，只计一次内存）
+        self._key_refs: Dict[str, int] = {}
+        self._b64_cache: Dict[Tuple[str, bool], str] = {}
+
+        self._segment: Optional[ScreenshotSegment] = None
+        if storage_dir:
+            self._segment = ScreenshotSegment(storage_dir, (max_disk_mb or self.MAX_DISK_MB) * 1024 * 1024)
+
         # 统计
         self._store_count = 0
         self._evict_count = 0
-    
+        self._dedup_count = 0
+        self._hot_hits = 0
+        self._disk_hits = 0
+        self._misses = 0
+        self._b64_hits = 0
+
+    @tracing.traced(tracing.SCREENSHOT_ENCODE)
     async def store(
-        self, 
-        image_data: bytes, 
+        self,
+        image_data: bytes,
         hwnd: int = 0,
         compress: bool = True,
+        exact: bool = False,
     ) -> str:
         """
         存储截图
-        
+
         Args:
             image_data: 原始图片数据 (PNG/BMP/JPEG)
             hwnd: 来源窗口句柄
             compress: 是否压缩 (默认 True)
-            
+            exact: 按存储字节去重，读回的数据与存入的完全一致
+                   （检查点等需要原样恢复的场景；配合 compress=False）
+
         Returns:
             截图 ID
         """
-        # 压缩图片
-        if compress:
-            compressed, width, height = await self._compress(image_data)
-        else:
-            compressed = image_data
-            width, height = 0, 0
-        
+        loop = asyncio.get_event_loop()
+        compressed, width, height, key, thumbnail = await loop.run_in_executor(
+            None, self._process, image_data, compress, exact
+        )
+
         screenshot_id = str(uuid.uuid4())[:8]
         entry = ScreenshotEntry(
             id=screenshot_id,
@@ -123,74 +510,266 @@ class ScreenshotManager:
             hwnd=hwnd,
             width=width,
             height=height,
+            key=key,
+            thumbnail=thumbnail,
         )
-        
+
         async with self._lock:
-            # 添加到缓存
-            self._cache[screenshot_id] = entry
-            self._total_size += entry.size
-            
-            # 移动到末尾 (LRU)
-            self._cache.move_to_end(screenshot_id)
-            
-            # 检查并淘汰
-            await self._evict_if_needed()
-            
+            deduped = self._insert_hot(entry)
             self._store_count += 1
-        
-        logger.debug(f"Screenshot stored: {screenshot_id} ({entry.size / 1024:.1f} KB)")
+
+        if self._segment:
+            deduped = await loop.run_in_executor(None, self._segment.put, screenshot_id, entry) or deduped
+        if deduped:
+            self._dedup_count += 1
+
+        logger.debug(f"Screenshot stored: {screenshot_id} ({entry.size / 1024:.1f} KB{', dedup' if deduped else ''})")
         return screenshot_id
-    
-    async def get_base64(self, screenshot_id: str) -> Optional[str]:
+
+    def _insert_hot(self, entry: ScreenshotEntry) -> bool:
+        """放入热层；相同内容键的条目共享数据对象。返回是否去重命中"""
+        shared = None
+        if entry.key in self._key_refs:
+            shared = next((e for e in reversed(self._cache.values()) if e.key == entry.key), None)
+        if shared is not None:
+            entry.data, entry.thumbnail, entry.size = shared.data, shared.thumbnail, shared.size
+
+        self._cache[entry.id] = entry
+        self._cache.move_to_end(entry.id)
+        self._retain_key(entry)
+        self._evict_if_needed()
+        return shared is not None
+
+    def _retain_key(self, entry: ScreenshotEntry):
+        count = self._key_refs.get(entry.key, 0)
+        if count == 0:
+            self._total_size += entry.size + len(entry.thumbnail)
+        self._key_refs[entry.key] = count + 1
+
+    def _release_key(self, entry: ScreenshotEntry):
+        count = self._key_refs.get(entry.key, 0) - 1
+        if count > 0:
+            self._key_refs[entry.key] = count
+            return
+        self._key_refs.pop(entry.key, None)
+        self._total_size -= entry.size + len(entry.thumbnail)
+        for thumb in (False, True):
+            cached = self._b64_cache.pop((entry.key, thumb), None)
+            if cached is not None:
+                self._total_size -= len(cached)
+
+    def _process(self, image_data: bytes, compress: bool, exact: bool = False) -> Tuple[bytes, int, int, str, bytes]:
+        """
+        压缩、计算内容键并生成缩略图（在线程池中执行）
+
+        Returns:
+            (data, width, height, key, thumbnail)
+        """
+        if not PIL_AVAILABLE:
+            if compress:
+                logger.warning("PIL not installed, skipping compression")
+            return image_data, 0, 0, self._content_key(image_data), b""
+
+        try:
+            img = Image.open(BytesIO(image_data))
+            img.load()
+        except Exception as e:
+            logger.debug(f"Screenshot is not a decodable image: {e}")
+            return image_data, 0, 0, self._content_key(image_data), b""
+
+        width, height = img.size
+
+        # 转换为 RGB (JPEG 不支持 RGBA)
+        if img.mode == 'RGBA':
+            background = Image.new('RGB', img.size, (255, 255, 255))
+            background.paste(img, mask=img.split()[3])
+            img = background
+        elif img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        if compress:
+            # 压缩为 JPEG
+            output = BytesIO()
+            img.save(output, format='JPEG', quality=self.JPEG_QUALITY, optimize=True)
+            data = output.getvalue()
+        else:
+            data = image_data
+
+        if self.dedup and not exact:
+            # 解码后的像素相同即可共享（不同编码 / 压缩的同一画面也能命中）
+            key = f"x{pixel_digest(img)}-{width}x{height}"
+        else:
+            key = self._content_key(data)
+
+        thumb = img.copy()
+        thumb.thumbnail(self.THUMBNAIL_SIZE)
+        output = BytesIO()
+        thumb.save(output, format='JPEG', quality=self.THUMBNAIL_QUALITY)
+
+        return data, width, height, key, output.getvalue()
+
+    @staticmethod
+    def _content_key(data: bytes) -> str:
+        """精确字节内容键（exact 存储、无法解码或关闭像素去重时使用）"""
+        return "s" + hashlib.sha1(data).hexdigest()[:24]
+
+    async def _lookup(self, screenshot_id: str, with_data: bool = True) -> Optional[ScreenshotEntry]:
+        """热层命中则更新 LRU；否则从磁盘段读取并提升到热层"""
+        async with self._lock:
+            entry = self._cache.get(screenshot_id)
+            if entry:
+                self._cache.move_to_end(screenshot_id)
+                self._hot_hits += 1
+                return entry
+
+        if not self._segment or not self._segment.has(screenshot_id):
+            self._misses += 1
+            return None
+
+        loop = asyncio.get_event_loop()
+        entry = await loop.run_in_executor(None, self._segment.get_entry, screenshot_id, with_data)
+        if entry is None:
+            self._misses += 1
+            return None
+
+        self._disk_hits += 1
+        if with_data:
+            async with self._lock:
+                if screenshot_id not in self._cache:
+                    self._insert_hot(entry)
+        return entry
+
+    async def get_base64(self, screenshot_id: str, thumbnail: bool = False) -> Optional[str]:
         """
         获取 base64 编码的截图
-        
-        按需转换，避免预先占用内存
-        
+
+        首次读取时编码并缓存（计入热层内存），之后直接返回
+
         Args:
             screenshot_id: 截图 ID
-            
+            thumbnail: 返回缩略图
+
         Returns:
             base64 编码的字符串，或 None
         """
+        entry = await self._lookup(screenshot_id)
+        if not entry:
+            return None
+
+        cache_key = (entry.key, thumbnail)
+        cached = self._b64_cache.get(cache_key)
+        if cached is not None:
+            self._b64_hits += 1
+            return cached
+
+        data = entry.thumbnail if thumbnail else entry.data
+        if thumbnail and not data:
+            return None
+        encoded = base64.b64encode(data).decode('utf-8')
+
         async with self._lock:
-            entry = self._cache.get(screenshot_id)
-            if not entry:
-                return None
-            
-            # 更新 LRU 顺序
-            self._cache.move_to_end(screenshot_id)
-        
-        return base64.b64encode(entry.data).decode('utf-8')
-    
+            if entry.key in self._key_refs and cache_key not in self._b64_cache:
+                self._b64_cache[cache_key] = encoded
+                self._total_size += len(encoded)
+                self._evict_if_needed()
+        return encoded
+
     async def get_raw(self, screenshot_id: str) -> Optional[bytes]:
         """获取原始压缩数据"""
-        async with self._lock:
-            entry = self._cache.get(screenshot_id)
-            if entry:
-                self._cache.move_to_end(screenshot_id)
-                return entry.data
-        return None
-    
+        entry = await self._lookup(screenshot_id)
+        return entry.data if entry else None
+
+    async def get_thumbnail(self, screenshot_id: str) -> Optional[bytes]:
+        """获取 JPEG 缩略图（PIL 不可用时为 None）"""
+        entry = await self._lookup(screenshot_id)
+        if not entry or not entry.thumbnail:
+            return None
+        return entry.thumbnail
+
     async def get_entry(self, screenshot_id: str) -> Optional[ScreenshotEntry]:
         """获取完整的截图条目"""
+        return await self._lookup(screenshot_id)
+
+    async def iter_chunks(
+        self,
+        screenshot_id: str,
+        chunk_size: int = None,
+        thumbnail: bool = False,
+    ) -> AsyncIterator[bytes]:
+        """
+        流式读取截图数据
+
+        热层条目直接切片；只在磁盘上的条目逐块从 mmap 读取，
+        不会把整张图片复制进热层。截图不存在时不产生任何数据。
+        """
+        chunk_size = chunk_size or self.CHUNK_SIZE
+
         async with self._lock:
             entry = self._cache.get(screenshot_id)
             if entry:
                 self._cache.move_to_end(screenshot_id)
-                return entry
-        return None
-    
+                self._hot_hits += 1
+
+        if entry:
+            data = memoryview(entry.thumbnail if thumbnail else entry.data)
+            for start in range(0, len(data), chunk_size):
+                yield bytes(data[start:start + chunk_size])
+            return
+
+        if not self._segment or not self._segment.has(screenshot_id):
+            self._misses += 1
+            return
+
+        self._disk_hits += 1
+        loop = asyncio.get_event_loop()
+        start = 0
+        while True:
+            chunk = await loop.run_in_executor(
+                None, self._segment.read_range, screenshot_id, start, chunk_size, thumbnail
+            )
+            if not chunk:
+                return
+            yield chunk
+            start += len(chunk)
+
+    def has(self, screenshot_id: str) -> bool:
+        """截图是否仍可读取（热层或磁盘）"""
+        return screenshot_id in self._cache or bool(self._segment and self._segment.has(screenshot_id))
+
+    async def make_ref(self, screenshot_id: str) -> Optional[Dict[str, Any]]:
+        """
+        生成截图引用，用于在消息/检查点中代替内联 base64
+
+        Returns:
+            {"screenshot_id", "width", "height", "size", "url", "thumbnail_url"}
+        """
+        entry = await self._lookup(screenshot_id, with_data=False)
+        if not entry:
+            return None
+        return {
+            "screenshot_id": screenshot_id,
+            "width": entry.width,
+            "height": entry.height,
+            "size": entry.size,
+            "url": f"/api/screenshots/{screenshot_id}",
+            "thumbnail_url": f"/api/screenshots/{screenshot_id}?thumbnail=true",
+        }
+
     async def delete(self, screenshot_id: str) -> bool:
         """删除截图"""
         async with self._lock:
             entry = self._cache.pop(screenshot_id, None)
             if entry:
-                self._total_size -= entry.size
-                logger.debug(f"Screenshot deleted: {screenshot_id}")
-                return True
-        return False
-    
+                self._release_key(entry)
+
+        deleted = entry is not None
+        if self._segment:
+            loop = asyncio.get_event_loop()
+            deleted = await loop.run_in_executor(None, self._segment.delete, [screenshot_id]) > 0 or deleted
+        if deleted:
+            logger.debug(f"Screenshot deleted: {screenshot_id}")
+        return deleted
+
     async def delete_by_hwnd(self, hwnd: int) -> int:
         """删除指定窗口的所有截图"""
         async with self._lock:
@@ -198,89 +777,81 @@ class ScreenshotManager:
                 sid for sid, entry in self._cache.items()
                 if entry.hwnd == hwnd
             ]
-            
+
             for sid in to_delete:
-                entry = self._cache.pop(sid)
-                self._total_size -= entry.size
-            
+                self._release_key(self._cache.pop(sid))
+
+        if not self._segment:
             return len(to_delete)
-    
-    async def _compress(self, image_data: bytes) -> tuple[bytes, int, int]:
-        """
-        压缩图片为 JPEG
-        
-        Returns:
-            (compressed_data, width, height)
-        """
-        try:
-            from PIL import Image
-        except ImportError:
-            logger.warning("PIL not installed, skipping compression")
-            return image_data, 0, 0
-        
+
         loop = asyncio.get_event_loop()
-        
-        def _do_compress():
-            img = Image.open(BytesIO(image_data))
-            width, height = img.size
-            
-            # 转换为 RGB (JPEG 不支持 RGBA)
-            if img.mode == 'RGBA':
-                background = Image.new('RGB', img.size, (255, 255, 255))
-                background.paste(img, mask=img.split()[3])
-                img = background
-            elif img.mode != 'RGB':
-                img = img.convert('RGB')
-            
-            # 压缩为 JPEG
-            output = BytesIO()
-            img.save(output, format='JPEG', quality=self.JPEG_QUALITY, optimize=True)
-            return output.getvalue(), width, height
-        
-        return await loop.run_in_executor(None, _do_compress)
-    
-    async def _evict_if_needed(self):
-        """淘汰过期条目"""
+        on_disk = self._segment.ids_for_hwnd(hwnd)
+        await loop.run_in_executor(None, self._segment.delete, on_disk)
+        return len(set(to_delete) | set(on_disk))
+
+    def _evict_if_needed(self):
+        """淘汰热层条目（磁盘段中的数据保留）"""
         evicted = 0
-        
-        # 按数量淘汰
-        while len(self._cache) > self.max_entries:
-            oldest_id, oldest_entry = self._cache.popitem(last=False)
-            self._total_size -= oldest_entry.size
-            evicted += 1
-        
-        # 按内存淘汰
-        while self._total_size > self.max_memory_bytes and self._cache:
-            oldest_id, oldest_entry = self._cache.popitem(last=False)
-            self._total_size -= oldest_entry.size
+
+        # 按数量、内存淘汰
+        while self._cache and (
+            len(self._cache) > self.max_entries or self._total_size > self.max_memory_bytes
+        ):
+            _, oldest_entry = self._cache.popitem(last=False)
+            self._release_key(oldest_entry)
             evicted += 1
-        
+
         if evicted > 0:
             self._evict_count += evicted
             logger.debug(f"Evicted {evicted} screenshots")
-    
+
     def get_stats(self) -> dict:
         """获取统计信息"""
-        return {
+        stats = {
             "count": len(self._cache),
             "total_size_mb": self._total_size / (1024 * 1024),
             "max_size_mb": self.max_memory_bytes / (1024 * 1024),
             "usage_percent": (self._total_size / self.max_memory_bytes * 100) if self.max_memory_bytes > 0 else 0,
             "store_count": self._store_count,
             "evict_count": self._evict_count,
+            "dedup_count": self._dedup_count,
+            "hot_hits": self._hot_hits,
+            "disk_hits": self._disk_hits,
+            "misses": self._misses,
+            "base64_cache_hits": self._b64_hits,
         }
-    
+        if self._segment:
+            stats.update(self._segment.get_stats())
+        return stats
+
     async def clear(self):
         """清空所有截图"""
         async with self._lock:
             self._cache.clear()
+            self._key_refs.clear()
+            self._b64_cache.clear()
             self._total_size = 0
-            logger.info("Screenshot cache cleared")
-    
+        if self._segment:
+            loop = asyncio.get_event_loop()
+            await loop.run_in_executor(None, self._segment.clear)
+        logger.info("Screenshot cache cleared")
+
     def get_recent(self, count: int = 5) -> list[str]:
-        """获取最近的截图 ID 列表"""
+        """
+        获取最近的截图 ID 列表
+
+        启用磁盘段时包含已淘汰出热层的截图；这些 ID 照常可用
+        （get_base64 / get_raw 等会从磁盘读取并提升到热层）。
+        """
+        if self._segment:
+            return self._segment.ids()[-count:]
         return list(self._cache.keys())[-count:]
 
+    def close(self):
+        """关闭磁盘段文件句柄"""
+        if self._segment:
+            self._segment.close()
+
 
 # ========== 单例模式 ==========
 
@@ -288,10 +859,15 @@ _screenshot_manager: Optional[ScreenshotManager] = None
 
 
 def get_screenshot_manager() -> ScreenshotManager:
-    """获取全局截图管理器（单例）"""
+    """获取全局截图管理器（单例，磁盘段目录取自配置）"""
     global _screenshot_manager
     if _screenshot_manager is None:
-        _screenshot_manager = ScreenshotManager()
+        from ..config import get_config
+        config = get_config()
+        _screenshot_manager = ScreenshotManager(
+            storage_dir=config.screenshot_store_dir or None,
+            max_disk_mb=config.screenshot_store_max_mb,
+        )
     return _screenshot_manager
 
 
@@ -382,6 +382,57 @@ class StopReason(Enum):
     STOP_SEQUENCE = "stop_sequence"  # 遇到停止序列
 
 
+@dataclass
+class CallTiming:
+    """
+    单次 LLM 调用计时（毫秒）
+    
+    用于区分慢调用的瓶颈：
+    - queue_ms: 请求发出 → message_start（网络 + 服务端排队）
+    - ttft_ms - queue_ms: message_start → 首个内容 token（预填充）
+    - generation_ms: 首个 → 最后一个内容 token（生成）
+    - retry_ms: 之前失败的尝试 + 退避等待
+    """
+    model: str
+    streaming: bool = True
+    cache: str = "miss"  # hit / write / miss：系统提示词与工具的 prompt cache 状态
+    attempts: int = 1
+    fallback: bool = False  # 流式失败后降级为非流式
+    queue_ms: Optional[float] = None
+    ttft_ms: Optional[float] = None
+    generation_ms: float = 0.0
+    total_ms: float = 0.0  # 成功那次尝试的耗时
+    retry_ms: float = 0.0
+    # 相邻内容增量事件的间隔（一个增量可能包含多个 token）
+    inter_token_ms: List[float] = field(default_factory=list)
+    output_tokens: int = 0
+    
+    @property
+    def tokens_per_second(self) -> Optional[float]:
+        """生成阶段的输出速度"""
+        if self.generation_ms <= 0 or self.output_tokens <= 1:
+            return None
+        return (self.output_tokens - 1) / (self.generation_ms / 1000)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        gaps = self.inter_token_ms
+        return {
+            "model": self.model,
+            "streaming": self.streaming,
+            "cache": self.cache,
+            "attempts": self.attempts,
+            "fallback": self.fallback,
+            "queue_ms": self.queue_ms,
+            "ttft_ms": self.ttft_ms,
+            "generation_ms": self.generation_ms,
+            "total_ms": self.total_ms,
+            "retry_ms": self.retry_ms,
+            "inter_token_avg_ms": sum(gaps) / len(gaps) if gaps else None,
+            "output_tokens": self.output_tokens,
+            "tokens_per_second": self.tokens_per_second,
+        }
+
+
 @dataclass
 class LLMResponse:
     """
@@ -395,6 +446,7 @@ class LLMResponse:
     input_tokens: int = 0
     output_tokens: int = 0
     is_fallback: bool = False  # 是否为流式失败后的回退响应
+    timing: Optional[CallTiming] = None  # 调用计时
     
     @property
     def needs_tool_execution(self) -> bool:
@@ -26,6 +26,8 @@ logger = logging.getLogger(__name__)
 # 核心 Agent
 from .react_agent import ReActAgent, AgentResult
 from .modes import AgentMode
+from .agent_pool import AgentPool
+from .errors import TooManyTasksError
 
 # 已有模块 - 现在要串联起来
 # Plan Cache
@@ -82,6 +84,13 @@ try:
 except ImportError:
     StatusServer = None
 
+# 准入队列（优先级 + 公平共享 + 截止时间）
+try:
+    from ..server.admission import AdmissionController, AdmissionError
+except ImportError:
+    AdmissionController = None
+    AdmissionError = None
+
 
 @dataclass
 class TaskInfo:
@@ -108,14 +117,19 @@ class UnifiedAgentManager:
     
     核心：ReActAgent（已串联 PlanCache、Memory）
     增强：ContextStore 注入、Verification 验证
+    
+    任务通过 AgentPool 调度：目标窗口/会话不相交的任务并行执行，
+    冲突的任务按到达顺序排队，而不是被拒绝。
+    配置了 AdmissionController 时，任务先经过准入队列（优先级、按客户端
+    公平共享、截止时间），排队位置通过 subscribe() 推送。
     """
     
     def __init__(self):
         self._initialized = False
         self._lock = asyncio.Lock()
         
-        # 核心 Agent
-        self._agent: Optional[ReActAgent] = None
+        # 核心 Agent 池
+        self._agent_pool: Optional[AgentPool] = None
         
         # 已有模块
         self._plan_cache: Optional[PlanCache] = None
@@ -125,21 +139,42 @@ class UnifiedAgentManager:
         
         # 任务管理
         self._active_tasks: Dict[str, TaskInfo] = {}
-        self._running_task: Optional[asyncio.Task] = None
+        self._running_tasks: Dict[str, asyncio.Task] = {}
         
         # WebSocket 广播
         self._status_server: Optional[StatusServer] = None
+        
+        # 准入队列与按任务订阅的事件流（/ws/agent/{task_id}）
+        self._admission = None
+        self._admission_tickets: Dict[str, Any] = {}
+        self._subscribers: Dict[str, List[asyncio.Queue]] = {}
     
-    async def initialize(self, status_server=None):
-        """初始化管理器，串联所有模块"""
+    async def initialize(
+        self,
+        status_server=None,
+        agent_pool: Optional[AgentPool] = None,
+        admission=None,
+    ):
+        """
+        初始化管理器，串联所有模块
+        
+        Args:
+            status_server: WebSocket 状态服务器
+            agent_pool: 共享的 Agent 池（与 NogicEngine 共用槽位），None 则新建
+            admission: 共享的 AdmissionController，None 则不做准入控制
+        """
         if self._initialized:
             return
         
         self._status_server = status_server
+        self._admission = admission
         
-        # 1. 初始化核心 Agent
-        self._agent = ReActAgent(status_server=status_server)
-        logger.info("[UnifiedManager] ReActAgent initialized")
+        # 1. 初始化核心 Agent 池
+        if agent_pool is None:
+            agent_pool = AgentPool(lambda: ReActAgent(status_server=status_server))
+            agent_pool.warm(1)
+        self._agent_pool = agent_pool
+        logger.info(f"[UnifiedManager] ReActAgent pool ready (size {agent_pool.size})")
         
         # 2. 串联 PlanCache（ReActAgent 内部已有，但我们也保留引用）
         if PLAN_CACHE_AVAILABLE:
@@ -223,6 +258,9 @@ class UnifiedAgentManager:
         target_hwnds: Optional[List[int]] = None,
         max_iterations: int = 50,
         session_id: str = "default",
+        priority: str = "interactive",
+        client_id: str = "anonymous",
+        deadline_s: Optional[float] = None,
     ) -> Dict[str, Any]:
         """
         启动任务 - 入口方法
@@ -233,43 +271,117 @@ class UnifiedAgentManager:
         3. 执行任务（通过 ReActAgent）
         4. 验证结果（通过 Verification）
         5. 学习（存入 PlanCache）
+        
+        Args:
+            priority: 准入优先级（interactive / background）
+            client_id: 公平共享的客户端标识
+            deadline_s: 排队截止时间（秒），超时未开始的任务被丢弃
+        
+        Raises:
+            AdmissionRejected: 准入队列已满
         """
         if not self._initialized:
             raise RuntimeError("UnifiedAgentManager not initialized")
         
         async with self._lock:
-            # 检查是否有任务正在运行
-            if self._running_task and not self._running_task.done():
-                raise RuntimeError("Agent busy with another task")
-            
             # 生成任务 ID
             task_id = f"task_{uuid.uuid4().hex[:12]}"
             
+            # 准入队列已满时直接拒绝（AdmissionRejected）
+            ticket = None
+            if self._admission is not None:
+                ticket = self._admission.enqueue(
+                    task_id,
+                    client_id=client_id,
+                    priority=priority,
+                    deadline_s=deadline_s,
+                    on_position=lambda position, queued: self._publish(
+                        task_id, "queue_position", {"position": position, "queued": queued},
+                    ),
+                )
+                self._admission_tickets[task_id] = ticket
+            
+            # 槽位已满或资源冲突时排队，而不是拒绝
+            queued = (ticket is not None and not ticket.future.done()) or not self._agent_pool.concurrency.can_start(
+                target_hwnds=set(target_hwnds or ()),
+                session_id=session_id,
+            )
+            
             # 创建任务信息
             task_info = TaskInfo(
                 task_id=task_id,
                 task_text=task,
                 target_hwnds=target_hwnds,
                 session_id=session_id,
-                status="starting",
+                status="queued" if queued else "starting",
             )
             self._active_tasks[task_id] = task_info
             
             # 启动后台任务
-            self._running_task = asyncio.create_task(
-                self._execute_task(task_info),
+            running_task = asyncio.create_task(
+                self._execute_task(task_info, max_iterations),
                 name=f"unified_task_{task_id}"
             )
-            self._running_task.add_done_callback(
+            running_task.add_done_callback(
                 lambda t: self._on_task_done(task_id, t)
             )
+            self._running_tasks[task_id] = running_task
         
         return {
             "task_id": task_id,
-            "status": "running",
+            "status": "queued" if queued else "running",
         }
     
-    async def _execute_task(self, task_info: TaskInfo):
+    async def _execute_task(self, task_info: TaskInfo, max_iterations: Optional[int] = None):
+        """执行任务：等待准入与槽位，租用 Agent"""
+        task_id = task_info.task_id
+        ticket = self._admission_tickets.pop(task_id, None)
+        
+        try:
+            if task_info.status == "queued":
+                await self._broadcast_event(task_id, "queued", {
+                    "task_text": task_info.task_text,
+                    "position": self._get_queue_position(task_id),
+                })
+            if ticket is not None:
+                # 排队超过截止时间的任务在消耗 LLM token 之前被丢弃
+                await self._admission.wait(ticket)
+            async with self._agent_pool.lease(
+                task_id,
+                session_id=task_info.session_id,
+                target_hwnds=set(task_info.target_hwnds or ()),
+                max_iterations=max_iterations,
+                # 槽位等待同样受准入截止时间约束
+                timeout=ticket.remaining_s if ticket is not None else None,
+            ) as agent:
+                await self._run_task(task_info, agent)
+        except asyncio.CancelledError:
+            if task_info.status == "queued":
+                logger.info(f"[UnifiedManager] Task {task_id} cancelled while queued")
+                task_info.status = "cancelled"
+                await self._broadcast_event(task_id, "cancelled", {"reason": "Task cancelled"})
+            raise
+        except Exception as e:
+            if not isinstance(e, TooManyTasksError) and (AdmissionError is None or not isinstance(e, AdmissionError)):
+                raise
+            logger.info(f"[UnifiedManager] Task {task_id} dropped by admission: {e}")
+            task_info.status = "expired"
+            task_info.error = str(e)
+            task_info.completed_at = time.time()
+            await self._broadcast_event(task_id, "expired", {"error": str(e)})
+        finally:
+            if ticket is not None:
+                self._admission.release(ticket)
+    
+    def _get_queue_position(self, task_id: str) -> Optional[int]:
+        """准入队列中的位置，其次是槽位等待队列中的位置"""
+        if self._admission is not None:
+            position = self._admission.get_position(task_id)
+            if position is not None:
+                return position
+        return self._agent_pool.concurrency.get_queue_position(task_id)
+    
+    async def _run_task(self, task_info: TaskInfo, agent: ReActAgent):
         """执行任务的核心流程"""
         task_id = task_info.task_id
         task = task_info.task_text
@@ -312,7 +424,7 @@ class UnifiedAgentManager:
             # - 失败重新规划（第 3137 行调用 planner.replan）
             start_time = time.time()
             
-            result: AgentResult = await self._agent.run_with_planning(
+            result: AgentResult = await agent.run_with_planning(
                 task=task,
                 session_id=task_info.session_id,
                 context=context if context else None,
@@ -403,6 +515,8 @@ class UnifiedAgentManager:
     
     def _on_task_done(self, task_id: str, task: asyncio.Task):
         """任务完成回调"""
+        if self._running_tasks.get(task_id) is task:
+            del self._running_tasks[task_id]
         try:
             exc = task.exception()
             if exc and not isinstance(exc, asyncio.CancelledError):
@@ -410,8 +524,42 @@ class UnifiedAgentManager:
         except asyncio.InvalidStateError:
             pass
     
+    def subscribe(self, task_id: str, maxsize: int = 256) -> asyncio.Queue:
+        """订阅单个任务的事件（/ws/agent/{task_id} 使用）"""
+        queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self._subscribers.setdefault(task_id, []).append(queue)
+        return queue
+    
+    def unsubscribe(self, task_id: str, queue: asyncio.Queue):
+        """取消订阅"""
+        queues = self._subscribers.get(task_id)
+        if queues and queue in queues:
+            queues.remove(queue)
+            if not queues:
+                del self._subscribers[task_id]
+    
+    def _publish(self, task_id: str, event_type: str, data: Dict[str, Any]):
+        """推送事件给该任务的订阅者（队列满时丢弃最旧的事件）"""
+        queues = self._subscribers.get(task_id)
+        if not queues:
+            return
+        event = {
+            "type": event_type,
+            "data": data,
+            "timestamp": time.time(),
+            "task_id": task_id,
+        }
+        for queue in queues:
+            if queue.full():
+                try:
+                    queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    pass
+            queue.put_nowait(event)
+    
     async def _broadcast_event(self, task_id: str, event_type: str, data: Dict[str, Any]):
         """广播事件到 WebSocket"""
+        self._publish(task_id, event_type, data)
         if self._status_server:
             try:
                 await self._status_server.broadcast({
@@ -429,10 +577,11 @@ class UnifiedAgentManager:
             if task_id not in self._active_tasks:
                 return {"success": False, "message": f"Task {task_id} not found"}
             
-            if self._running_task and not self._running_task.done():
-                self._running_task.cancel()
+            running_task = self._running_tasks.get(task_id)
+            if running_task and not running_task.done():
+                running_task.cancel()
                 try:
-                    await self._running_task
+                    await running_task
                 except asyncio.CancelledError:
                     pass
             
@@ -456,6 +605,7 @@ class UnifiedAgentManager:
             "cache_hit": task_info.cache_hit,
             "iterations": task_info.iterations,
             "verification_passed": task_info.verification_passed,
+            "queue_position": self._get_queue_position(task_id) if task_info.status == "queued" else None,
         }
     
     def get_stats(self) -> Dict[str, Any]:
@@ -469,8 +619,16 @@ class UnifiedAgentManager:
                 "verification": VERIFICATION_AVAILABLE,
             },
             "total_tasks": len(self._active_tasks),
+            "running_tasks": sum(1 for t in self._active_tasks.values() if t.status == "running"),
+            "queued_tasks": sum(1 for t in self._active_tasks.values() if t.status == "queued"),
         }
         
+        if self._agent_pool:
+            stats["agent_pool"] = self._agent_pool.get_stats()
+        
+        if self._admission is not None:
+            stats["admission"] = self._admission.get_stats()
+        
         if self._plan_cache:
             stats["plan_cache_stats"] = self._plan_cache.get_stats()
         
@@ -478,12 +636,12 @@ class UnifiedAgentManager:
     
     async def close(self):
         """关闭管理器"""
-        if self._running_task and not self._running_task.done():
-            self._running_task.cancel()
-            try:
-                await self._running_task
-            except asyncio.CancelledError:
-                pass
+        running_tasks = [t for t in self._running_tasks.values() if not t.done()]
+        for running_task in running_tasks:
+            running_task.cancel()
+        if running_tasks:
+            await asyncio.gather(*running_tasks, return_exceptions=True)
+        self._running_tasks.clear()
         
         self._initialized = False
         logger.info("[UnifiedManager] Closed")
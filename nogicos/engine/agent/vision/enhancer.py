@@ -254,6 +254,7 @@ class VisionEnhancer:
         use_ui_detection: bool = False,  # UI 检测需要额外模型
         ocr_extractor: Optional[OCRExtractor] = None,
         generate_description: bool = True,
+        tiled_ocr: bool = True,
     ):
         """
         初始化视觉增强器
@@ -263,8 +264,10 @@ class VisionEnhancer:
             use_ui_detection: 是否检测 UI 元素（需要额外模型）
             ocr_extractor: OCR 提取器实例
             generate_description: 是否生成描述
+            tiled_ocr: 分块 OCR（连续截图只重新识别变化的部分）
         """
         self.use_ocr = use_ocr
+        self.tiled_ocr = tiled_ocr
         self.use_ui_detection = use_ui_detection
         self.generate_description = generate_description
         
@@ -307,7 +310,9 @@ class VisionEnhancer:
         full_text = ""
         if self.use_ocr and self._ocr:
             try:
-                ocr_result = await self._ocr.extract(screenshot_b64, detect_regions=True)
+                ocr_result = await self._ocr.extract(
+                    screenshot_b64, detect_regions=True, tiled=self.tiled_ocr,
+                )
                 text_elements = ocr_result.regions
                 full_text = ocr_result.full_text
             except Exception as e:
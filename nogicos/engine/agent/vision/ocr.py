@@ -7,15 +7,21 @@ NogicOS OCR Extractor - 文本识别
 2. Tesseract OCR (需要安装)
 3. EasyOCR (需要安装，支持多语言)
 
+识别结果按图像内容缓存（engine.ocr_cache）：
+- 整图：像素完全相同时直接复用上次结果
+- 分块（tiled=True）：截图按整宽横条切块，只重新识别发生变化的块
+
 Phase 5c 实现
 """
 
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, replace
 from typing import Optional, List, Dict, Any, Tuple
 import logging
 import base64
 from io import BytesIO
 
+from ...ocr_cache import OCRCache, bytes_digest, get_ocr_cache, image_digest, make_ocr_key
+
 logger = logging.getLogger(__name__)
 
 # 尝试导入各种 OCR 后端
@@ -112,6 +118,9 @@ class OCRResult:
     language: Optional[str] = None
     engine: str = "unknown"
     processing_time_ms: float = 0.0
+    cached: bool = False            # 整个结果来自缓存
+    tiles: int = 0                  # 分块识别的块数
+    tiles_reused: int = 0           # 其中命中缓存的块数
     
     @property
     def has_text(self) -> bool:
@@ -153,6 +162,7 @@ class OCRResult:
             "language": self.language,
             "engine": self.engine,
             "word_count": self.word_count,
+            "cached": self.cached,
         }
 
 
@@ -176,6 +186,9 @@ class OCRExtractor:
         self,
         preferred_engine: Optional[str] = None,
         languages: Optional[List[str]] = None,
+        cache: Optional[OCRCache] = None,
+        tile_height: int = 256,
+        tile_overlap: int = 32,
     ):
         """
         初始化 OCR 提取器
@@ -183,8 +196,15 @@ class OCRExtractor:
         Args:
             preferred_engine: 首选引擎 ("windows", "tesseract", "easyocr")
             languages: 支持的语言列表 (如 ["en", "zh"])
+            cache: OCR 结果缓存，None 则使用全局缓存
+            tile_height: 分块识别的块高度（像素）
+            tile_overlap: 块上下额外识别的重叠高度，需大于半行文字高度，
+                          跨块的文字行只归属于中心点所在的块
         """
         self.languages = languages or ["en", "zh"]
+        self.tile_height = tile_height
+        self.tile_overlap = tile_overlap
+        self._cache = cache if cache is not None else get_ocr_cache()
         self._engine_name = "none"
         
         # 选择引擎
@@ -216,6 +236,7 @@ class OCRExtractor:
         self,
         image_b64: str,
         detect_regions: bool = True,
+        tiled: bool = False,
     ) -> OCRResult:
         """
         从图片中提取文本
@@ -223,6 +244,7 @@ class OCRExtractor:
         Args:
             image_b64: Base64 编码的图片
             detect_regions: 是否检测文本区域
+            tiled: 分块识别（适合整屏截图：只重新识别变化的块）
             
         Returns:
             OCRResult
@@ -242,15 +264,10 @@ class OCRExtractor:
             image_data = base64.b64decode(image_b64)
             image = Image.open(BytesIO(image_data))
             
-            # 根据引擎选择处理方法
-            if self._engine_name == "windows":
-                result = await self._extract_windows(image, detect_regions)
-            elif self._engine_name == "easyocr":
-                result = await self._extract_easyocr(image, detect_regions)
-            elif self._engine_name == "tesseract":
-                result = await self._extract_tesseract(image, detect_regions)
+            if tiled and image.height > self.tile_height + self.tile_overlap:
+                result = await self._extract_tiled(image, detect_regions)
             else:
-                result = self._extract_fallback(image)
+                result = await self._extract_cached(image, detect_regions)
             
             result.processing_time_ms = (time.time() - start_time) * 1000
             return result
@@ -263,6 +280,134 @@ class OCRExtractor:
                 processing_time_ms=(time.time() - start_time) * 1000,
             )
     
+    async def _run_engine(
+        self,
+        image: "Image.Image",
+        detect_regions: bool,
+    ) -> OCRResult:
+        """根据引擎选择处理方法（不经过缓存）"""
+        if self._engine_name == "windows":
+            return await self._extract_windows(image, detect_regions)
+        elif self._engine_name == "easyocr":
+            return await self._extract_easyocr(image, detect_regions)
+        elif self._engine_name == "tesseract":
+            return await self._extract_tesseract(image, detect_regions)
+        else:
+            return self._extract_fallback(image)
+    
+    @staticmethod
+    def _cacheable(result: OCRResult) -> bool:
+        """引擎出错 / 不可用的结果不缓存"""
+        return result.engine not in ("error", "none")
+    
+    async def _extract_cached(
+        self,
+        image: "Image.Image",
+        detect_regions: bool,
+    ) -> OCRResult:
+        """整图识别，像素相同则复用缓存"""
+        key = make_ocr_key(
+            self._engine_name, self.languages, image_digest(image),
+            "regions" if detect_regions else "text",
+        )
+        result, hit = await self._cache.get_or_compute(
+            key, lambda: self._run_engine(image, detect_regions),
+            source="extract", cacheable=self._cacheable,
+        )
+        return replace(result, regions=list(result.regions), cached=hit)
+    
+    async def _extract_tiled(
+        self,
+        image: "Image.Image",
+        detect_regions: bool,
+    ) -> OCRResult:
+        """
+        分块识别
+        
+        按整宽横条切块（文字行是横向的，横条不会把一行切成左右两半），
+        每块上下各多识别 tile_overlap 像素，文字行只保留在中心点所在的块。
+        每块按自身像素缓存，截图局部变化时只有对应的块重新识别。
+        
+        区域没有覆盖块内全部文字时（Tesseract 丢弃 conf<=0 的词、image_to_data
+        失败等），该块改用引擎的整段文本，与上文重复的重叠行去掉。
+        """
+        width, height = image.size
+        raw = memoryview(image.tobytes())
+        row_bytes = len(raw) // height
+        
+        regions: List[TextRegion] = []
+        lines: List[str] = []
+        pending: List[TextRegion] = []  # 尚未拼接的连续块区域（跨块的同一行合并为一行）
+        engine = self._engine_name
+        tiles = reused = 0
+        for top in range(0, height, self.tile_height):
+            bottom = min(height, top + self.tile_height)
+            y0 = max(0, top - self.tile_overlap)
+            y1 = min(height, bottom + self.tile_overlap)
+            
+            key = make_ocr_key(
+                self._engine_name, self.languages,
+                bytes_digest(raw[y0 * row_bytes:y1 * row_bytes]),
+                f"tile:{image.mode}:{width}x{y1 - y0}",
+            )
+            result, hit = await self._cache.get_or_compute(
+                key,
+                lambda y0=y0, y1=y1: self._run_engine(image.crop((0, y0, width, y1)), True),
+                source="tile", cacheable=self._cacheable,
+            )
+            tiles += 1
+            reused += hit
+            engine = result.engine
+            
+            kept = []
+            for region in result.regions:
+                x1, ry1, x2, ry2 = region.bbox
+                if top <= y0 + (ry1 + ry2) // 2 < bottom:
+                    kept.append(replace(region, bbox=(x1, ry1 + y0, x2, ry2 + y0)))
+            regions.extend(kept)
+            
+            region_words = sum(len(region.text.split()) for region in result.regions)
+            if len(result.full_text.split()) > region_words:
+                lines.extend(self._join_lines(pending).splitlines())
+                pending = []
+                tile_lines = [line for line in result.full_text.splitlines() if line.strip()]
+                lines.extend(tile_lines[self._overlap_length(lines, tile_lines):])
+            else:
+                pending.extend(kept)
+        lines.extend(self._join_lines(pending).splitlines())
+        
+        return OCRResult(
+            full_text="\n".join(lines),
+            regions=regions if detect_regions else [],
+            engine=engine,
+            cached=reused == tiles,
+            tiles=tiles,
+            tiles_reused=reused,
+        )
+    
+    @staticmethod
+    def _overlap_length(previous: List[str], lines: List[str]) -> int:
+        """lines 开头与 previous 结尾重复的行数（相邻块的重叠区域）"""
+        for count in range(min(len(previous), len(lines)), 0, -1):
+            if previous[-count:] == lines[:count]:
+                return count
+        return 0
+    
+    @staticmethod
+    def _join_lines(regions: List[TextRegion]) -> str:
+        """按行拼接文本区域（中心点落在同一行高度内的区域视为同一行）"""
+        lines: List[Tuple[int, int, List[TextRegion]]] = []
+        for region in sorted(regions, key=lambda r: (r.bbox[1], r.bbox[0])):
+            center_y = (region.bbox[1] + region.bbox[3]) // 2
+            if lines and lines[-1][0] <= center_y <= lines[-1][1]:
+                lines[-1][2].append(region)
+            else:
+                lines.append((region.bbox[1], region.bbox[3], [region]))
+        return "\n".join(
+            " ".join(r.text for r in sorted(line, key=lambda r: r.bbox[0]))
+            for _, _, line in lines
+        )
+    
     async def _extract_windows(
         self,
         image: "Image.Image",
@@ -124,9 +124,17 @@ class AgentConfig:
     max_concurrent_tasks: int = 3
     max_api_concurrency: int = 2
     
+    # ========== 准入队列 ==========
+    admission_max_queue: int = 64                  # 排队请求上限（超出返回 429）
+    admission_max_queued_per_client: int = 16      # 单个客户端排队上限
+    admission_interactive_deadline_s: float = 120.0  # 交互请求排队截止时间
+    admission_background_deadline_s: float = 1800.0  # 后台（评估）请求排队截止时间
+    
     # ========== 持久化 ==========
     db_path: str = "nogicos_tasks.db"
     checkpoint_interval: int = 5  # 每 N 次迭代保存检查点
+    screenshot_store_dir: str = "~/.nogicos/screenshots"  # 截图磁盘段目录（空字符串表示只用内存）
+    screenshot_store_max_mb: int = 512   # 截图磁盘段容量
     
     # ========== 性能 ==========
     slo: PerformanceSLO = field(default_factory=PerformanceSLO)
@@ -165,9 +173,17 @@ class AgentConfig:
             max_concurrent_tasks=int(os.getenv("NOGICOS_MAX_TASKS", 3)),
             max_api_concurrency=int(os.getenv("NOGICOS_MAX_API_CONCURRENCY", 2)),
             
+            # 准入队列
+            admission_max_queue=int(os.getenv("NOGICOS_ADMISSION_MAX_QUEUE", 64)),
+            admission_max_queued_per_client=int(os.getenv("NOGICOS_ADMISSION_PER_CLIENT", 16)),
+            admission_interactive_deadline_s=float(os.getenv("NOGICOS_ADMISSION_DEADLINE", 120.0)),
+            admission_background_deadline_s=float(os.getenv("NOGICOS_ADMISSION_BG_DEADLINE", 1800.0)),
+            
             # 持久化
             db_path=os.getenv("NOGICOS_DB_PATH", "nogicos_tasks.db"),
             checkpoint_interval=int(os.getenv("NOGICOS_CHECKPOINT_INTERVAL", 5)),
+            screenshot_store_dir=os.getenv("NOGICOS_SCREENSHOT_DIR", "~/.nogicos/screenshots"),
+            screenshot_store_max_mb=int(os.getenv("NOGICOS_SCREENSHOT_MAX_MB", 512)),
             
             # 性能
             enable_performance_monitoring=os.getenv("NOGICOS_ENABLE_METRICS", "true").lower() == "true",
@@ -197,6 +213,9 @@ class AgentConfig:
         if self.max_concurrent_tasks < 1:
             errors.append("max_concurrent_tasks must be >= 1")
         
+        if self.admission_max_queue < 0:
+            errors.append("admission_max_queue must be >= 0")
+        
         if self.screenshot_delay_ms < 0:
             errors.append("screenshot_delay_ms must be >= 0")
         
@@ -206,6 +225,9 @@ class AgentConfig:
         if self.checkpoint_interval < 1:
             errors.append("checkpoint_interval must be >= 1")
         
+        if self.screenshot_store_max_mb < 1:
+            errors.append("screenshot_store_max_mb must be >= 1")
+        
         return errors
     
     def to_dict(self) -> Dict[str, Any]:
@@ -220,8 +242,14 @@ class AgentConfig:
             "max_retries": self.max_retries,
             "max_concurrent_tasks": self.max_concurrent_tasks,
             "max_api_concurrency": self.max_api_concurrency,
+            "admission_max_queue": self.admission_max_queue,
+            "admission_max_queued_per_client": self.admission_max_queued_per_client,
+            "admission_interactive_deadline_s": self.admission_interactive_deadline_s,
+            "admission_background_deadline_s": self.admission_background_deadline_s,
             "db_path": self.db_path,
             "checkpoint_interval": self.checkpoint_interval,
+            "screenshot_store_dir": self.screenshot_store_dir,
+            "screenshot_store_max_mb": self.screenshot_store_max_mb,
             "enable_performance_monitoring": self.enable_performance_monitoring,
             "enable_dual_agent": self.enable_dual_agent,
             "enable_incremental_checkpoint": self.enable_incremental_checkpoint,
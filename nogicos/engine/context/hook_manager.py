@@ -188,6 +188,7 @@ class HookManager:
                 "target": hook.state.target,
                 "connected_at": hook.state.connected_at,
                 "context": hook.state.context.__dict__ if hook.state.context else None,
+                "capture": hook.get_capture_stats(),
             }
         
         return status
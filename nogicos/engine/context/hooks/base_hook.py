@@ -3,16 +3,24 @@
 Base Hook - Hook 基类
 
 所有 Hook 的抽象基类，定义统一接口
+
+捕获节奏：
+- 事件驱动：子类在 _start_event_sources() 中注册变化通知（前台窗口切换、
+  剪贴板、文件事件），通知到达时调用 request_capture() 立即捕获
+- 自适应轮询：作为兜底，上下文没有变化时逐步拉长捕获间隔，有变化时恢复
+- 只有上下文真正变化（忽略 last_updated 等易变字段）才通知 on_context_update
 """
 
 import asyncio
 import logging
+import time
 from abc import ABC, abstractmethod
-from dataclasses import dataclass, field
+from dataclasses import dataclass, field, asdict, is_dataclass
 from datetime import datetime
 from typing import Any, Callable, Dict, Optional
 
 from ..store import HookType, HookStatus, HookState
+from ...observability import spans as tracing
 
 logger = logging.getLogger(__name__)
 
@@ -20,9 +28,23 @@ logger = logging.getLogger(__name__)
 @dataclass
 class HookConfig:
     """Hook 配置"""
-    # 捕获间隔（秒）
+    # 捕获间隔（秒），上下文变化后恢复到该间隔
     capture_interval: float = 1.0
     
+    # 自适应轮询：上下文未变化时间隔乘以 idle_backoff，最长 max_idle_interval
+    # （idle_backoff = 1.0 即固定间隔轮询）
+    idle_backoff: float = 1.5
+    max_idle_interval: float = 8.0
+    
+    # 事件驱动：注册变化通知，通知到达时立即捕获
+    event_driven: bool = True
+    
+    # 事件源可用时，兜底轮询的最长间隔
+    event_fallback_interval: float = 30.0
+    
+    # 合并短时间内的连续通知（秒）
+    event_debounce: float = 0.05
+    
     # 是否启用 Vision 分析
     enable_vision: bool = False
     
@@ -44,8 +66,14 @@ class BaseHook(ABC):
     - start(): 启动 Hook
     - stop(): 停止 Hook
     - capture(): 捕获当前上下文
+    
+    可选：
+    - _start_event_sources() / _stop_event_sources(): 注册/注销变化通知
     """
     
+    # 比较上下文是否变化时忽略的字段
+    VOLATILE_CONTEXT_FIELDS = ("last_updated",)
+    
     def __init__(
         self,
         hook_id: str,
@@ -68,6 +96,20 @@ class BaseHook(ABC):
         self._task: Optional[asyncio.Task] = None
         self._state = HookState(type=hook_type)
         
+        # 捕获调度
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._event_driven = False
+        self._interval = self.config.capture_interval
+        self._last_context_key: Any = None
+        self._capture_stats = {
+            "captures": 0,
+            "changes": 0,
+            "unchanged": 0,
+            "event_wakeups": 0,
+            "capture_time_ms": 0.0,
+        }
+        
         # 回调函数
         self._on_state_change: Optional[Callable[[HookState], None]] = None
         self._on_context_update: Optional[Callable[[Any], None]] = None
@@ -120,8 +162,29 @@ class BaseHook(ABC):
             except Exception as e:
                 logger.error(f"[{self.__class__.__name__}] State change callback error: {e}")
     
-    def _notify_context_update(self, context: Any):
-        """通知上下文更新"""
+    def _context_key(self, context: Any) -> Any:
+        """用于变化比较的上下文快照（去掉易变字段）"""
+        if is_dataclass(context):
+            data = asdict(context)
+            for name in self.VOLATILE_CONTEXT_FIELDS:
+                data.pop(name, None)
+            return data
+        return context
+    
+    def _notify_context_update(self, context: Any) -> bool:
+        """
+        通知上下文更新
+        
+        Returns:
+            上下文是否有变化（无变化时不触发回调）
+        """
+        key = self._context_key(context)
+        if self._last_context_key is not None and key == self._last_context_key:
+            self._capture_stats["unchanged"] += 1
+            return False
+        
+        self._last_context_key = key
+        self._capture_stats["changes"] += 1
         self._state.context = context
         
         if self._on_context_update:
@@ -129,6 +192,29 @@ class BaseHook(ABC):
                 self._on_context_update(context)
             except Exception as e:
                 logger.error(f"[{self.__class__.__name__}] Context update callback error: {e}")
+        return True
+    
+    def request_capture(self):
+        """
+        请求立即捕获（线程安全）
+        
+        供事件源回调使用：Windows 事件线程、watchdog 线程或事件循环本身
+        """
+        loop, wakeup = self._loop, self._wakeup
+        if loop is None or wakeup is None or loop.is_closed():
+            return
+        try:
+            loop.call_soon_threadsafe(wakeup.set)
+        except RuntimeError:
+            pass
+    
+    def get_capture_stats(self) -> Dict[str, Any]:
+        """捕获调度统计"""
+        stats = dict(self._capture_stats)
+        stats["capture_time_ms"] = round(stats["capture_time_ms"], 2)
+        stats["interval"] = round(self._interval, 3)
+        stats["event_driven"] = self._event_driven
+        return stats
     
     async def start(self, target: Optional[str] = None) -> bool:
         """
@@ -154,6 +240,18 @@ class BaseHook(ABC):
                 self._running = True
                 self._update_state(status=HookStatus.CONNECTED)
                 
+                # 注册变化通知
+                self._loop = asyncio.get_running_loop()
+                self._wakeup = asyncio.Event()
+                self._last_context_key = None
+                self._interval = self.config.capture_interval
+                self._event_driven = False
+                if self.config.event_driven:
+                    try:
+                        self._event_driven = await self._start_event_sources()
+                    except Exception as e:
+                        logger.warning(f"[{self.__class__.__name__}] Event sources unavailable, polling only: {e}")
+                
                 # 启动捕获循环
                 self._task = asyncio.create_task(self._capture_loop())
                 
@@ -190,6 +288,12 @@ class BaseHook(ABC):
                     pass
                 self._task = None
             
+            # 总是注销：事件源可能部分启动（_start_event_sources 返回 False 仍可能有监听）
+            await self._stop_event_sources()
+            self._event_driven = False
+            self._wakeup = None
+            self._last_context_key = None
+            
             # 子类实现的断开逻辑
             await self._disconnect()
             
@@ -204,18 +308,66 @@ class BaseHook(ABC):
             return False
     
     async def _capture_loop(self):
-        """捕获循环"""
+        """捕获循环：变化通知立即捕获，否则按自适应间隔轮询"""
         while self._running:
+            changed = False
             try:
-                context = await self.capture()
+                started = time.perf_counter()
+                with tracing.span(tracing.HOOK_CAPTURE, hook=self.hook_id):
+                    context = await self.capture()
+                self._capture_stats["captures"] += 1
+                self._capture_stats["capture_time_ms"] += (time.perf_counter() - started) * 1000
                 if context:
-                    self._notify_context_update(context)
+                    changed = self._notify_context_update(context)
             except asyncio.CancelledError:
                 break
             except Exception as e:
                 logger.error(f"[{self.__class__.__name__}] Capture error: {e}")
             
-            await asyncio.sleep(self.config.capture_interval)
+            self._interval = self._next_interval(changed)
+            await self._wait_for_change(self._interval)
+    
+    def _next_interval(self, changed: bool) -> float:
+        """下一次轮询间隔：有变化时恢复基础间隔，否则退避"""
+        base = self.config.capture_interval
+        if changed:
+            return base
+        ceiling = self.config.event_fallback_interval if self._event_driven else self.config.max_idle_interval
+        return max(base, min(self._interval * self.config.idle_backoff, ceiling))
+    
+    async def _wait_for_change(self, timeout: float):
+        """等待变化通知或超时"""
+        wakeup = self._wakeup
+        if wakeup is None:
+            await asyncio.sleep(timeout)
+            return
+        try:
+            await asyncio.wait_for(wakeup.wait(), timeout)
+        except asyncio.TimeoutError:
+            return
+        
+        # 合并连续通知（如切换窗口时的前台 + 标题事件）
+        self._capture_stats["event_wakeups"] += 1
+        if self.config.event_debounce > 0:
+            await asyncio.sleep(self.config.event_debounce)
+        wakeup.clear()
+        # 有事件说明用户在操作，恢复基础间隔
+        self._interval = self.config.capture_interval
+    
+    async def _start_event_sources(self) -> bool:
+        """
+        注册变化通知（子类可选实现）
+        
+        通知到达时调用 self.request_capture()。
+        
+        Returns:
+            是否有可用事件源（有则兜底轮询可以更稀疏）
+        """
+        return False
+    
+    async def _stop_event_sources(self):
+        """注销变化通知（子类可选实现）"""
+        pass
     
     @abstractmethod
     async def _connect(self, target: Optional[str] = None) -> bool:
@@ -17,6 +17,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 from .base_hook import BaseHook, HookConfig
+from .win_events import WinEventWatcher, EVENT_SYSTEM_FOREGROUND, EVENT_OBJECT_NAMECHANGE
 from ..store import HookType, BrowserContext
 
 logger = logging.getLogger(__name__)
@@ -92,6 +93,11 @@ class BrowserHook(BaseHook):
         self._target_browser: Optional[str] = None  # chrome, firefox, edge, etc.
         self._target_hwnd: Optional[int] = None
         self._last_context: Optional[BrowserContext] = None
+        self._watcher: Optional[WinEventWatcher] = None
+        
+        # 地址栏 OCR 结果缓存：窗口标题和位置不变时不重新 OCR
+        self._ocr_key: Optional[Tuple[int, str, Tuple[int, int, int, int]]] = None
+        self._ocr_url: Optional[str] = None
     
     async def _connect(self, target: Optional[str] = None) -> bool:
         """
@@ -140,8 +146,30 @@ class BrowserHook(BaseHook):
         self._target_hwnd = None
         self._target_browser = None
         self._last_context = None
+        self._ocr_key = None
+        self._ocr_url = None
         return True
     
+    async def _start_event_sources(self) -> bool:
+        """前台窗口切换、浏览器标题变化（导航、切换 tab）时立即捕获"""
+        self._watcher = WinEventWatcher(
+            on_event=self._on_win_event,
+            events=(EVENT_SYSTEM_FOREGROUND, EVENT_OBJECT_NAMECHANGE),
+        )
+        return await asyncio.to_thread(self._watcher.start)
+    
+    async def _stop_event_sources(self):
+        if self._watcher is not None:
+            await asyncio.to_thread(self._watcher.stop)
+            self._watcher = None
+    
+    def _on_win_event(self, event: int, hwnd: int):
+        """Windows 事件线程回调"""
+        if not hwnd:
+            return
+        if hwnd == self._target_hwnd or (event == EVENT_SYSTEM_FOREGROUND and not self._target_hwnd):
+            self.request_capture()
+    
     async def capture(self) -> Optional[BrowserContext]:
         """
         捕获浏览器上下文
@@ -178,13 +206,18 @@ class BrowserHook(BaseHook):
             )
             
             # 如果启用 OCR，尝试提取更多信息
+            # 导航和切换 tab 都会改变窗口标题，标题和位置不变时复用上次结果
             if self.config.enable_ocr:
-                try:
-                    url_from_ocr = await self._ocr_address_bar(window)
-                    if url_from_ocr:
-                        context.url = url_from_ocr
-                except Exception as e:
-                    logger.debug(f"[BrowserHook] OCR failed: {e}")
+                ocr_key = (window.hwnd, window.title, window.rect)
+                if ocr_key != self._ocr_key:
+                    try:
+                        self._ocr_url = await self._ocr_address_bar(window)
+                    except Exception as e:
+                        logger.debug(f"[BrowserHook] OCR failed: {e}")
+                        self._ocr_url = None
+                    self._ocr_key = ocr_key
+                if self._ocr_url:
+                    context.url = self._ocr_url
             
             self._last_context = context
             return context
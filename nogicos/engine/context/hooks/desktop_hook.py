@@ -14,6 +14,7 @@ from datetime import datetime
 from typing import Any, Dict, List, Optional, Tuple
 
 from .base_hook import BaseHook, HookConfig
+from .win_events import WinEventWatcher, EVENT_SYSTEM_FOREGROUND, EVENT_OBJECT_NAMECHANGE
 from ..store import HookType, DesktopContext
 
 logger = logging.getLogger(__name__)
@@ -106,6 +107,7 @@ class DesktopHook(BaseHook):
         
         self._last_context: Optional[DesktopContext] = None
         self._target_hwnd: Optional[int] = None  # 目标窗口 HWND（如果指定则锁定）
+        self._watcher: Optional[WinEventWatcher] = None
     
     async def _connect(self, target: Optional[str] = None) -> bool:
         """
@@ -132,6 +134,33 @@ class DesktopHook(BaseHook):
         self._target_hwnd = None
         return True
     
+    async def _start_event_sources(self) -> bool:
+        """前台窗口切换、窗口标题变化时立即捕获"""
+        self._watcher = WinEventWatcher(
+            on_event=self._on_win_event,
+            events=(EVENT_SYSTEM_FOREGROUND, EVENT_OBJECT_NAMECHANGE),
+        )
+        return await asyncio.to_thread(self._watcher.start)
+    
+    async def _stop_event_sources(self):
+        if self._watcher is not None:
+            await asyncio.to_thread(self._watcher.stop)
+            self._watcher = None
+    
+    def _on_win_event(self, event: int, hwnd: int):
+        """Windows 事件线程回调"""
+        if event == EVENT_SYSTEM_FOREGROUND:
+            # 锁定模式下前台切换不影响上下文
+            if not self._target_hwnd:
+                self.request_capture()
+            return
+        
+        # 标题变化：只关心当前监控的窗口
+        last = self._last_context
+        watched = self._target_hwnd or (last.hwnd if last else 0)
+        if hwnd and hwnd == watched:
+            self.request_capture()
+    
     async def capture(self) -> Optional[DesktopContext]:
         """
         捕获桌面上下文
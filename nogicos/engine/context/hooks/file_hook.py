@@ -9,12 +9,14 @@ import asyncio
 import logging
 import os
 import sys
+import time
 from dataclasses import dataclass
 from datetime import datetime
 from pathlib import Path
-from typing import Any, Dict, List, Optional, Set
+from typing import Any, Dict, List, Optional
 
 from .base_hook import BaseHook, HookConfig
+from .win_events import WinEventWatcher
 from ..store import HookType, FileContext
 
 logger = logging.getLogger(__name__)
@@ -34,11 +36,24 @@ except ImportError:
 
 
 class FileChangeHandler(FileSystemEventHandler):
-    """文件变化处理器"""
+    """
+    文件变化处理器
+    
+    watchdog 在自己的线程里回调，这里不能直接碰 asyncio。
+    callback(path, event_type, dest_path) 由 FileHook 负责切回事件循环。
+    
+    on_index_event 收到每一个事件（不去重）：索引队列自己合并，
+    去重会丢掉同一文件几秒内的第二次保存。
+    """
+    
+    # 同一文件同类事件的去重窗口（秒），只作用于 callback（最近文件等状态）
+    DEDUPE_WINDOW = 5.0
     
-    def __init__(self, callback):
+    def __init__(self, callback, on_directory_change=None, on_index_event=None):
         self.callback = callback
-        self._recent_events: Set[str] = set()
+        self.on_directory_change = on_directory_change
+        self.on_index_event = on_index_event
+        self._recent_events: Dict[str, float] = {}
     
     def on_modified(self, event):
         if not event.is_directory:
@@ -48,18 +63,39 @@ class FileChangeHandler(FileSystemEventHandler):
         if not event.is_directory:
             self._handle_event(event.src_path, "created")
     
-    def _handle_event(self, path: str, event_type: str):
+    def on_deleted(self, event):
+        if event.is_directory:
+            self._directory_changed()
+        else:
+            self._handle_event(event.src_path, "deleted", dedupe=False)
+    
+    def on_moved(self, event):
+        if event.is_directory:
+            self._directory_changed()
+        else:
+            self._handle_event(event.src_path, "moved", dest_path=event.dest_path, dedupe=False)
+    
+    def _directory_changed(self):
+        if self.on_directory_change:
+            self.on_directory_change()
+    
+    def _handle_event(self, path: str, event_type: str, dest_path: Optional[str] = None, dedupe: bool = True):
+        if self.on_index_event:
+            self.on_index_event(path, event_type, dest_path)
+        
         # 去重（同一文件短时间内多次触发）
-        key = f"{path}:{event_type}"
-        if key not in self._recent_events:
-            self._recent_events.add(key)
-            self.callback(path, event_type)
-            
-            # 5秒后清除
-            asyncio.get_event_loop().call_later(
-                5.0,
-                lambda: self._recent_events.discard(key)
-            )
+        if dedupe:
+            key = f"{path}:{event_type}"
+            now = time.monotonic()
+            last = self._recent_events.get(key)
+            if last is not None and now - last < self.DEDUPE_WINDOW:
+                return
+            self._recent_events[key] = now
+            if len(self._recent_events) > 1000:
+                cutoff = now - self.DEDUPE_WINDOW
+                self._recent_events = {k: t for k, t in self._recent_events.items() if t >= cutoff}
+        
+        self.callback(path, event_type, dest_path)
 
 
 class FileHook(BaseHook):
@@ -95,7 +131,12 @@ class FileHook(BaseHook):
         self._recent_files: List[str] = []
         self._max_recent_files = 20
         self._last_clipboard = ""
+        self._clipboard_seq = 0
+        self._clipboard_watcher: Optional[WinEventWatcher] = None
         self._last_context: Optional[FileContext] = None
+        
+        # RAG 实时索引（可选）
+        self._index_queue: Optional[Any] = None  # engine.rag.watcher.IndexUpdateQueue
     
     async def _connect(self, target: Optional[str] = None) -> bool:
         """
@@ -124,12 +165,13 @@ class FileHook(BaseHook):
             return False
         
         self._watched_dirs = valid_dirs
+        self._loop = asyncio.get_running_loop()
         
         # 启动文件监听
         if WATCHDOG_AVAILABLE:
             try:
                 self._observer = Observer()
-                handler = FileChangeHandler(self._on_file_change)
+                handler = self._make_handler()
                 
                 for dir_path in valid_dirs:
                     self._observer.schedule(handler, dir_path, recursive=True)
@@ -139,10 +181,24 @@ class FileHook(BaseHook):
             except Exception as e:
                 logger.error(f"[FileHook] Failed to start file watcher: {e}")
         
+        # 已有全局代码索引时，自动接入实时更新
+        if self._index_queue is None and self.config.extra.get("live_rag_index", True):
+            try:
+                from ...rag import get_codebase_indexer
+                indexer = get_codebase_indexer()
+                if indexer is not None:
+                    self.attach_indexer(indexer)
+            except ImportError as e:
+                logger.debug(f"[FileHook] RAG not available: {e}")
+        
         return True
     
     async def _disconnect(self) -> bool:
         """断开连接"""
+        if self._index_queue is not None:
+            await self._index_queue.stop()
+            self._index_queue = None
+        
         if self._observer:
             try:
                 self._observer.stop()
@@ -156,6 +212,27 @@ class FileHook(BaseHook):
         self._last_context = None
         return True
     
+    async def _start_event_sources(self) -> bool:
+        """
+        文件事件（watchdog）和剪贴板变化时立即捕获
+        
+        Returns:
+            两类变化是否都有通知（否则继续自适应轮询）
+        """
+        files_notified = self._observer is not None
+        
+        clipboard_notified = sys.platform != "win32"  # 其他平台不读剪贴板
+        if sys.platform == "win32":
+            self._clipboard_watcher = WinEventWatcher(on_clipboard=self.request_capture)
+            clipboard_notified = await asyncio.to_thread(self._clipboard_watcher.start)
+        
+        return files_notified and clipboard_notified
+    
+    async def _stop_event_sources(self):
+        if self._clipboard_watcher is not None:
+            await asyncio.to_thread(self._clipboard_watcher.stop)
+            self._clipboard_watcher = None
+    
     async def capture(self) -> Optional[FileContext]:
         """
         捕获文件上下文
@@ -181,8 +258,42 @@ class FileHook(BaseHook):
             logger.error(f"[FileHook] Capture failed: {e}")
             return self._last_context
     
-    def _on_file_change(self, path: str, event_type: str):
-        """文件变化回调"""
+    def _make_handler(self) -> "FileChangeHandler":
+        return FileChangeHandler(
+            self._schedule_file_change,
+            self._on_directory_change,
+            on_index_event=self._submit_index_event,
+        )
+    
+    def _submit_index_event(self, path: str, event_type: str, dest_path: Optional[str] = None):
+        """每个事件都交给索引队列（队列按路径合并，不会重复索引）"""
+        if self._index_queue is not None:
+            if not self._should_ignore(path) or (dest_path and not self._should_ignore(dest_path)):
+                self._index_queue.submit_threadsafe(path, event_type, dest_path)
+    
+    def _schedule_file_change(self, path: str, event_type: str, dest_path: Optional[str] = None):
+        """切回事件循环更新最近文件（已按 DEDUPE_WINDOW 去重）"""
+        if self._loop is not None and not self._loop.is_closed():
+            try:
+                self._loop.call_soon_threadsafe(self._on_file_change, path, event_type, dest_path)
+            except RuntimeError:
+                pass
+    
+    def _on_directory_change(self):
+        """目录被删除/移动：子文件不一定有单独事件，让索引整体增量重扫"""
+        if self._index_queue is not None:
+            self._index_queue.submit_directory_change()
+    
+    def _on_file_change(self, path: str, event_type: str, dest_path: Optional[str] = None):
+        """文件变化回调（事件循环线程）"""
+        if event_type in ("deleted", "moved"):
+            if path in self._recent_files:
+                self._recent_files.remove(path)
+                self.request_capture()
+            if event_type == "deleted" or not dest_path:
+                return
+            path = dest_path
+        
         # 过滤忽略的文件
         if self._should_ignore(path):
             return
@@ -196,8 +307,42 @@ class FileHook(BaseHook):
         if len(self._recent_files) > self._max_recent_files:
             self._recent_files = self._recent_files[:self._max_recent_files]
         
+        self.request_capture()
         logger.debug(f"[FileHook] File {event_type}: {path}")
     
+    def attach_indexer(self, indexer: Any, **queue_options) -> bool:
+        """
+        把文件事件接入 CodebaseIndexer（防抖 + 合并 + 背压）
+        
+        Args:
+            indexer: engine.rag.CodebaseIndexer
+            **queue_options: IndexUpdateQueue 参数（debounce、max_pending 等）
+        
+        Returns:
+            是否成功接入
+        """
+        from ...rag.watcher import IndexUpdateQueue
+        
+        if self._index_queue is not None:
+            return True
+        
+        self._index_queue = IndexUpdateQueue(indexer, **queue_options)
+        self._index_queue.start()
+        
+        # 确保工作区本身在监听范围内
+        workspace = str(indexer.workspace_path)
+        covered = any(
+            os.path.commonpath([os.path.abspath(d), workspace]) == os.path.abspath(d)
+            for d in self._watched_dirs
+        )
+        if not covered:
+            self.add_watched_dir(workspace)
+        return True
+    
+    def get_index_stats(self) -> Optional[Dict[str, Any]]:
+        """实时索引队列统计"""
+        return self._index_queue.get_stats() if self._index_queue is not None else None
+    
     def _should_ignore(self, path: str) -> bool:
         """判断是否应该忽略该文件"""
         # 检查扩展名
@@ -234,10 +379,16 @@ class FileHook(BaseHook):
             
             CF_UNICODETEXT = 13
             
+            # 序列号不变说明剪贴板没变，不需要打开剪贴板读取
+            seq = user32.GetClipboardSequenceNumber()
+            if seq and seq == self._clipboard_seq:
+                return self._last_clipboard
+            
             if not user32.OpenClipboard(0):
                 return self._last_clipboard
             
             try:
+                self._clipboard_seq = seq
                 if not user32.IsClipboardFormatAvailable(CF_UNICODETEXT):
                     return self._last_clipboard
                 
@@ -275,7 +426,7 @@ class FileHook(BaseHook):
         
         if WATCHDOG_AVAILABLE and self._observer:
             try:
-                handler = FileChangeHandler(self._on_file_change)
+                handler = self._make_handler()
                 self._observer.schedule(handler, dir_path, recursive=True)
                 logger.info(f"[FileHook] Added watch: {dir_path}")
                 return True
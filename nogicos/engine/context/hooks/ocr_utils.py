@@ -6,6 +6,8 @@ OCR Utilities - 本地 OCR 支持
 1. Windows OCR (内置)
 2. pytesseract (跨平台)
 3. EasyOCR (AI-based)
+
+识别结果按图像字节缓存（engine.ocr_cache），地址栏等未变化区域不重复 OCR
 """
 
 import asyncio
@@ -14,6 +16,8 @@ import sys
 from dataclasses import dataclass
 from typing import Any, List, Optional, Tuple
 
+from ...ocr_cache import OCRCache, bytes_digest, get_ocr_cache, make_ocr_key
+
 logger = logging.getLogger(__name__)
 
 
@@ -201,8 +205,9 @@ class ScreenshotOCR:
     自动选择可用的 OCR 引擎
     """
     
-    def __init__(self):
+    def __init__(self, cache: Optional[OCRCache] = None):
         self._engines: List[OCREngine] = []
+        self._cache = cache if cache is not None else get_ocr_cache()
         
         # 按优先级添加引擎
         # 1. Windows OCR（最快）
@@ -229,8 +234,23 @@ class ScreenshotOCR:
         """
         识别图像中的文字
         
-        自动使用第一个可用的引擎
+        自动使用第一个可用的引擎。相同的图像字节（同一截图流程编码的
+        相同像素）直接返回缓存结果；空结果不缓存（引擎出错时也返回空）。
         """
+        if not self._engines:
+            return []
+        
+        key = make_ocr_key(
+            "+".join(type(engine).__name__ for engine in self._engines),
+            None, bytes_digest(image_data), "recognize",
+        )
+        results, _ = await self._cache.get_or_compute(
+            key, lambda: self._recognize(image_data), source="recognize", cacheable=bool,
+        )
+        return list(results)
+    
+    async def _recognize(self, image_data: bytes) -> List[OCRResult]:
+        """依次尝试各引擎（不经过缓存）"""
         for engine in self._engines:
             try:
                 results = await engine.recognize(image_data)
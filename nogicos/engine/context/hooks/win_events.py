@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+"""
+Win Events - Windows 变化通知
+
+Hook 的事件源（替代固定间隔轮询）：
+- SetWinEventHook：前台窗口切换（EVENT_SYSTEM_FOREGROUND）、窗口标题变化（EVENT_OBJECT_NAMECHANGE）
+- AddClipboardFormatListener：剪贴板内容变化（WM_CLIPBOARDUPDATE）
+
+两者都要求注册线程运行消息循环，所以 WinEventWatcher 自带一个后台线程。
+回调在该线程中执行，调用方负责切回事件循环（BaseHook.request_capture 是线程安全的）。
+"""
+
+import logging
+import sys
+import threading
+from typing import Callable, Iterable, Optional
+
+logger = logging.getLogger(__name__)
+
+if sys.platform == "win32":
+    try:
+        import ctypes
+        from ctypes import wintypes
+        WINDOWS_AVAILABLE = True
+    except ImportError:
+        WINDOWS_AVAILABLE = False
+else:
+    WINDOWS_AVAILABLE = False
+
+
+EVENT_SYSTEM_FOREGROUND = 0x0003
+EVENT_OBJECT_NAMECHANGE = 0x800C
+WINEVENT_OUTOFCONTEXT = 0x0000
+WINEVENT_SKIPOWNPROCESS = 0x0002
+OBJID_WINDOW = 0
+CHILDID_SELF = 0
+WM_QUIT = 0x0012
+WM_CLIPBOARDUPDATE = 0x031D
+HWND_MESSAGE = -3
+
+
+class WinEventWatcher:
+    """
+    Windows 变化通知监听器
+
+    Args:
+        on_event: callback(event, hwnd)，窗口事件（只转发窗口本身的事件，不含子对象）
+        events: 要监听的 WinEvent 常量
+        on_clipboard: callback()，剪贴板变化
+    """
+
+    def __init__(
+        self,
+        on_event: Optional[Callable[[int, int], None]] = None,
+        events: Iterable[int] = (EVENT_SYSTEM_FOREGROUND,),
+        on_clipboard: Optional[Callable[[], None]] = None,
+    ):
+        self.on_event = on_event
+        self.events = tuple(events) if on_event else ()
+        self.on_clipboard = on_clipboard
+
+        self._thread: Optional[threading.Thread] = None
+        self._thread_id = 0
+        self._ready = threading.Event()
+        self._ok = False
+        self._class_name = ""
+        self._hinstance = None
+        # ctypes 回调必须保持引用，否则会被 GC 导致崩溃
+        self._callbacks = []
+
+    @property
+    def available(self) -> bool:
+        return WINDOWS_AVAILABLE
+
+    def start(self, timeout: float = 2.0) -> bool:
+        """启动监听线程，返回事件源是否注册成功"""
+        if not WINDOWS_AVAILABLE:
+            return False
+        if self._thread is not None:
+            return self._ok
+
+        self._thread = threading.Thread(target=self._run, name="nogicos-win-events", daemon=True)
+        self._thread.start()
+        self._ready.wait(timeout)
+        return self._ok
+
+    def stop(self, timeout: float = 2.0):
+        """退出消息循环并注销事件源"""
+        if self._thread is None:
+            return
+        if self._thread_id:
+            ctypes.windll.user32.PostThreadMessageW(self._thread_id, WM_QUIT, 0, 0)
+        self._thread.join(timeout)
+        self._thread = None
+        self._thread_id = 0
+
+    def _run(self):
+        user32 = ctypes.windll.user32
+        self._thread_id = ctypes.windll.kernel32.GetCurrentThreadId()
+
+        hooks = []
+        clipboard_hwnd = None
+        try:
+            try:
+                if self.events:
+                    hooks = self._register_win_events(user32)
+                if self.on_clipboard:
+                    clipboard_hwnd = self._register_clipboard_listener(user32)
+                self._ok = (not self.events or bool(hooks)) and (not self.on_clipboard or bool(clipboard_hwnd))
+            except Exception as e:
+                logger.error(f"[WinEventWatcher] Failed to register: {e}")
+                self._ok = False
+            finally:
+                self._ready.set()
+
+            if not self._ok:
+                # 注册失败时不进入消息循环，finally 注销已注册的部分
+                return
+
+            msg = wintypes.MSG()
+            while user32.GetMessageW(ctypes.byref(msg), None, 0, 0) > 0:
+                user32.TranslateMessage(ctypes.byref(msg))
+                user32.DispatchMessageW(ctypes.byref(msg))
+        finally:
+            for handle in hooks:
+                user32.UnhookWinEvent(handle)
+            if clipboard_hwnd:
+                user32.RemoveClipboardFormatListener(clipboard_hwnd)
+                user32.DestroyWindow(clipboard_hwnd)
+                user32.UnregisterClassW(self._class_name, self._hinstance)
+
+    def _register_win_events(self, user32) -> list:
+        WINEVENTPROC = ctypes.WINFUNCTYPE(
+            None, wintypes.HANDLE, wintypes.DWORD, wintypes.HWND,
+            wintypes.LONG, wintypes.LONG, wintypes.DWORD, wintypes.DWORD,
+        )
+        user32.SetWinEventHook.restype = wintypes.HANDLE
+        user32.SetWinEventHook.argtypes = [
+            wintypes.DWORD, wintypes.DWORD, wintypes.HMODULE, WINEVENTPROC,
+            wintypes.DWORD, wintypes.DWORD, wintypes.DWORD,
+        ]
+        user32.UnhookWinEvent.argtypes = [wintypes.HANDLE]
+
+        def callback(hook, event, hwnd, id_object, id_child, thread_id, timestamp):
+            if id_object != OBJID_WINDOW or id_child != CHILDID_SELF:
+                return
+            try:
+                self.on_event(event, hwnd or 0)
+            except Exception as e:
+                logger.debug(f"[WinEventWatcher] Event callback error: {e}")
+
+        proc = WINEVENTPROC(callback)
+        self._callbacks.append(proc)
+
+        hooks = []
+        for event in self.events:
+            handle = user32.SetWinEventHook(
+                event, event, None, proc, 0, 0,
+                WINEVENT_OUTOFCONTEXT | WINEVENT_SKIPOWNPROCESS,
+            )
+            if handle:
+                hooks.append(handle)
+            else:
+                logger.warning(f"[WinEventWatcher] SetWinEventHook failed for event {event:#x}")
+        return hooks
+
+    def _register_clipboard_listener(self, user32) -> Optional[int]:
+        """创建 message-only 窗口并注册剪贴板监听"""
+        LRESULT = ctypes.c_ssize_t
+        WNDPROC = ctypes.WINFUNCTYPE(LRESULT, wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM)
+
+        class WNDCLASSW(ctypes.Structure):
+            _fields_ = [
+                ("style", wintypes.UINT),
+                ("lpfnWndProc", WNDPROC),
+                ("cbClsExtra", ctypes.c_int),
+                ("cbWndExtra", ctypes.c_int),
+                ("hInstance", wintypes.HINSTANCE),
+                ("hIcon", wintypes.HICON),
+                ("hCursor", wintypes.HANDLE),
+                ("hbrBackground", wintypes.HBRUSH),
+                ("lpszMenuName", wintypes.LPCWSTR),
+                ("lpszClassName", wintypes.LPCWSTR),
+            ]
+
+        user32.DefWindowProcW.restype = LRESULT
+        user32.DefWindowProcW.argtypes = [wintypes.HWND, wintypes.UINT, wintypes.WPARAM, wintypes.LPARAM]
+        user32.CreateWindowExW.restype = wintypes.HWND
+        user32.CreateWindowExW.argtypes = [
+            wintypes.DWORD, wintypes.LPCWSTR, wintypes.LPCWSTR, wintypes.DWORD,
+            ctypes.c_int, ctypes.c_int, ctypes.c_int, ctypes.c_int,
+            wintypes.HWND, wintypes.HMENU, wintypes.HINSTANCE, wintypes.LPVOID,
+        ]
+
+        def wndproc(hwnd, msg, wparam, lparam):
+            if msg == WM_CLIPBOARDUPDATE:
+                try:
+                    self.on_clipboard()
+                except Exception as e:
+                    logger.debug(f"[WinEventWatcher] Clipboard callback error: {e}")
+                return 0
+            return user32.DefWindowProcW(hwnd, msg, wparam, lparam)
+
+        proc = WNDPROC(wndproc)
+        self._callbacks.append(proc)
+
+        kernel32 = ctypes.windll.kernel32
+        kernel32.GetModuleHandleW.restype = wintypes.HMODULE
+        hinstance = self._hinstance = kernel32.GetModuleHandleW(None)
+        class_name = self._class_name = f"NogicOSClipboardListener{id(self)}"
+        wndclass = WNDCLASSW(lpfnWndProc=proc, hInstance=hinstance, lpszClassName=class_name)
+        if not user32.RegisterClassW(ctypes.byref(wndclass)):
+            logger.warning("[WinEventWatcher] RegisterClassW failed")
+            return None
+
+        hwnd = user32.CreateWindowExW(
+            0, class_name, None, 0, 0, 0, 0, 0,
+            wintypes.HWND(HWND_MESSAGE), None, hinstance, None,
+        )
+        if not hwnd:
+            logger.warning("[WinEventWatcher] CreateWindowExW failed")
+            return None
+        if not user32.AddClipboardFormatListener(hwnd):
+            logger.warning("[WinEventWatcher] AddClipboardFormatListener failed")
+            user32.DestroyWindow(hwnd)
+            return None
+        return hwnd
@@ -13,11 +13,11 @@ from datetime import datetime
 from typing import Optional, List, Dict, Any
 from dataclasses import dataclass, field
 
-import sqlite3
 from pathlib import Path
 
 from .workspace import get_workspace_layout, get_important_files
 from .terminal import get_terminal_tracker
+from ..sqlite_pool import get_sqlite_pool
 
 # Database path (same as cursor_tools.py)
 _MEMORY_DB_PATH = Path(__file__).parent.parent.parent / "data" / "agent_state.db"
@@ -33,7 +33,7 @@ def _get_memories_from_db(namespace: str = "default", limit: int = 5) -> List[Di
         if not _MEMORY_DB_PATH.exists():
             return []
         
-        with sqlite3.connect(str(_MEMORY_DB_PATH)) as conn:
+        with get_sqlite_pool(str(_MEMORY_DB_PATH)).connect() as conn:
             cursor = conn.cursor()
             # Always include default namespace to get user preferences
             # This ensures memories like "prefers pnpm" are always available
@@ -5,19 +5,30 @@ Context Store - 上下文存储系统
 存储 Hook 系统捕获的上下文信息：
 - 当前状态（内存）：实时的连接状态和上下文
 - 历史记录（SQLite）：持久化的事件历史
+
+历史记录的写入路径：
+- record_event() 只写入内存环形缓冲区和待写队列，不碰数据库
+- 后台写线程按时间间隔或批量大小，把待写事件合并为一个事务写入
+- 原始事件保留 raw_retention_hours（默认 24 小时），之后汇总为
+  每分钟计数（context_event_rollups）并删除原始行
+- get_recent_events() 在时间窗口完全落在环形缓冲区内时直接由内存返回
 """
 
 import asyncio
+import atexit
 import json
 import logging
-import sqlite3
 import threading
-from dataclasses import dataclass, field, asdict
-from datetime import datetime
+import time
+from collections import deque
+from dataclasses import dataclass, field, asdict, replace
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import Any, Dict, List, Optional, Callable
 from enum import Enum
 
+from ..sqlite_pool import get_sqlite_pool
+
 logger = logging.getLogger(__name__)
 
 
@@ -159,15 +170,35 @@ class ContextStore:
     上下文存储
     
     - 当前状态：内存中的实时状态
-    - 历史记录：SQLite 持久化
+    - 历史记录：内存环形缓冲区 + 后台批量写入 SQLite
+    
+    事件 id 在内存中分配（从数据库当前最大 id 继续），因此同一个数据库
+    文件只应由一个 ContextStore 实例写入（默认通过 get_context_store() 单例）。
     """
     
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(
+        self,
+        db_path: Optional[str] = None,
+        ring_size: int = 2048,
+        batch_size: int = 256,
+        flush_interval: float = 1.0,
+        max_pending: int = 10000,
+        raw_retention_hours: float = 24,
+        rollup_retention_days: Optional[float] = 30,
+        rollup_interval: float = 300.0,
+    ):
         """
         初始化 Context Store
         
         Args:
             db_path: SQLite 数据库路径，None 则使用默认路径
+            ring_size: 内存中保留的最近事件数
+            batch_size: 待写事件达到该数量时立即唤醒写线程
+            flush_interval: 写线程的最长刷新间隔（秒）
+            max_pending: 待写队列上限（数据库持续不可写时丢弃最旧的事件）
+            raw_retention_hours: 原始事件保留时长，之后汇总为每分钟计数
+            rollup_retention_days: 分钟汇总的保留天数，None 表示永久保留
+            rollup_interval: 汇总/清理的执行间隔（秒）
         """
         self._lock = threading.Lock()
         
@@ -184,13 +215,47 @@ class ContextStore:
             db_path = str(db_dir / "context_history.db")
         
         self._db_path = db_path
+        self._db = get_sqlite_pool(db_path)
         self._init_db()
         
+        # 历史记录（内存环形缓冲区 + 待写队列）
+        # 独立于 self._lock：remove_hook 会在持有 self._lock 时记录事件
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.max_pending = max_pending
+        self.raw_retention_hours = raw_retention_hours
+        self.rollup_retention_days = rollup_retention_days
+        self.rollup_interval = rollup_interval
+        
+        self._events_lock = threading.Lock()
+        self._flush_lock = threading.Lock()
+        self._ring: deque = deque(maxlen=ring_size)
+        self._pending: List[ContextEvent] = []
+        # 环形缓冲区覆盖 (_memory_since, now] 内的全部事件
+        self._memory_since = ""
+        self._next_id = 1
+        self._load_recent()
+        
+        self._writer: Optional[threading.Thread] = None
+        self._wakeup = threading.Event()
+        self._closed = False
+        self._last_rollup = 0.0
+        self._stats = {
+            "recorded": 0,
+            "flushed": 0,
+            "batches": 0,
+            "dropped": 0,
+            "write_errors": 0,
+            "memory_hits": 0,
+            "db_queries": 0,
+            "rolled_up": 0,
+        }
+        
         logger.info(f"[ContextStore] Initialized, db: {db_path}")
     
     def _init_db(self):
         """初始化数据库表"""
-        with sqlite3.connect(self._db_path) as conn:
+        with self._db.connect() as conn:
             conn.execute("""
                 CREATE TABLE IF NOT EXISTS context_events (
                     id INTEGER PRIMARY KEY AUTOINCREMENT,
@@ -204,12 +269,47 @@ class ContextStore:
                 CREATE INDEX IF NOT EXISTS idx_timestamp 
                 ON context_events(timestamp)
             """)
+            # 按 hook_type 过滤的时间窗口查询；取代单列 idx_hook_type
             conn.execute("""
-                CREATE INDEX IF NOT EXISTS idx_hook_type 
-                ON context_events(hook_type)
+                CREATE INDEX IF NOT EXISTS idx_hook_type_timestamp 
+                ON context_events(hook_type, timestamp)
+            """)
+            conn.execute("DROP INDEX IF EXISTS idx_hook_type")
+            conn.execute("""
+                CREATE TABLE IF NOT EXISTS context_event_rollups (
+                    bucket TEXT NOT NULL,
+                    hook_type TEXT NOT NULL,
+                    event_type TEXT NOT NULL,
+                    count INTEGER NOT NULL,
+                    PRIMARY KEY (bucket, hook_type, event_type)
+                )
             """)
             conn.commit()
     
+    def _load_recent(self):
+        """启动时把最近的事件载入环形缓冲区，并确定下一个事件 id"""
+        try:
+            with self._db.connect() as conn:
+                row = conn.execute("SELECT MAX(id) FROM context_events").fetchone()
+                rows = conn.execute(
+                    "SELECT id, timestamp, hook_type, event_type, data FROM context_events "
+                    "ORDER BY timestamp DESC LIMIT ?",
+                    (self._ring.maxlen,)
+                ).fetchall()
+        except Exception as e:
+            logger.error(f"[ContextStore] Failed to load recent events: {e}")
+            self._memory_since = datetime.now().isoformat()
+            return
+        
+        self._next_id = (row[0] or 0) + 1
+        for r in reversed(rows):
+            self._ring.append(ContextEvent(
+                id=r[0], timestamp=r[1], hook_type=r[2], event_type=r[3], data=json.loads(r[4]),
+            ))
+        if len(rows) == self._ring.maxlen:
+            # 更早的事件只在数据库中
+            self._memory_since = rows[-1][1]
+    
     # ============== 状态管理 ==============
     
     def get_hook_state(self, hook_id: str) -> Optional[HookState]:
@@ -292,29 +392,55 @@ class ContextStore:
     # ============== 历史记录 ==============
     
     def record_event(self, event: ContextEvent):
-        """记录事件到历史"""
-        try:
-            with sqlite3.connect(self._db_path) as conn:
-                conn.execute(
-                    "INSERT INTO context_events (timestamp, hook_type, event_type, data) VALUES (?, ?, ?, ?)",
-                    (event.timestamp, event.hook_type, event.event_type, json.dumps(event.data))
-                )
-                conn.commit()
-        except Exception as e:
-            logger.error(f"[ContextStore] Failed to record event: {e}")
+        """记录事件到历史（写入内存，由后台线程批量落盘）"""
+        with self._events_lock:
+            event.id = self._next_id
+            self._next_id += 1
+            
+            if len(self._ring) == self._ring.maxlen:
+                evicted = self._ring[0]
+                self._memory_since = max(self._memory_since, evicted.timestamp)
+            self._ring.append(event)
+            
+            self._pending.append(event)
+            if len(self._pending) > self.max_pending:
+                overflow = len(self._pending) - self.max_pending
+                del self._pending[:overflow]
+                self._stats["dropped"] += overflow
+            self._stats["recorded"] += 1
+            wake = len(self._pending) >= self.batch_size
+        
+        if self._closed:
+            self.flush()
+            return
+        self._ensure_writer()
+        if wake:
+            self._wakeup.set()
     
     def get_recent_events(self, minutes: int = 30, hook_type: Optional[str] = None) -> List[ContextEvent]:
-        """获取最近 N 分钟的历史事件"""
+        """获取最近 N 分钟的历史事件（按时间倒序）"""
+        cutoff = (datetime.now() - timedelta(minutes=minutes)).isoformat()
+        
+        with self._events_lock:
+            if cutoff >= self._memory_since:
+                self._stats["memory_hits"] += 1
+                events = [
+                    replace(e) for e in self._ring
+                    if e.timestamp > cutoff and (not hook_type or e.hook_type == hook_type)
+                ]
+                events.sort(key=lambda e: e.timestamp, reverse=True)
+                return events
+            self._stats["db_queries"] += 1
+        
+        # 窗口超出内存范围：先落盘待写事件，再查数据库
+        self.flush()
         try:
-            from datetime import timedelta
-            cutoff = (datetime.now() - timedelta(minutes=minutes)).isoformat()
-            
-            with sqlite3.connect(self._db_path) as conn:
+            with self._db.connect() as conn:
                 if hook_type:
                     cursor = conn.execute(
                         "SELECT id, timestamp, hook_type, event_type, data FROM context_events "
-                        "WHERE timestamp > ? AND hook_type = ? ORDER BY timestamp DESC",
-                        (cutoff, hook_type)
+                        "WHERE hook_type = ? AND timestamp > ? ORDER BY timestamp DESC",
+                        (hook_type, cutoff)
                     )
                 else:
                     cursor = conn.execute(
@@ -337,6 +463,135 @@ class ContextStore:
             logger.error(f"[ContextStore] Failed to get recent events: {e}")
             return []
     
+    def get_rollups(self, hours: float = 24 * 7, hook_type: Optional[str] = None) -> List[Dict[str, Any]]:
+        """获取每分钟事件计数（已超出原始保留期的历史），按时间倒序"""
+        cutoff = (datetime.now() - timedelta(hours=hours)).isoformat()[:16]
+        sql = ("SELECT bucket, hook_type, event_type, count FROM context_event_rollups "
+               "WHERE bucket >= ?")
+        params: List[Any] = [cutoff]
+        if hook_type:
+            sql += " AND hook_type = ?"
+            params.append(hook_type)
+        sql += " ORDER BY bucket DESC, hook_type, event_type"
+        try:
+            with self._db.connect() as conn:
+                return [
+                    {"bucket": row[0], "hook_type": row[1], "event_type": row[2], "count": row[3]}
+                    for row in conn.execute(sql, params).fetchall()
+                ]
+        except Exception as e:
+            logger.error(f"[ContextStore] Failed to get rollups: {e}")
+            return []
+    
+    # ============== 批量写入 / 保留策略 ==============
+    
+    def _ensure_writer(self):
+        """首次记录事件时启动后台写线程"""
+        if self._writer is not None or self._closed:
+            return
+        with self._events_lock:
+            if self._writer is None and not self._closed:
+                self._writer = threading.Thread(
+                    target=self._writer_loop, name="nogicos-context-writer", daemon=True,
+                )
+                self._writer.start()
+    
+    def _writer_loop(self):
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            self.flush()
+            if time.monotonic() - self._last_rollup >= self.rollup_interval:
+                self.rollup()
+    
+    def flush(self) -> int:
+        """把待写事件合并为一个事务写入数据库，返回写入条数"""
+        with self._flush_lock:
+            with self._events_lock:
+                batch, self._pending = self._pending, []
+            if not batch:
+                return 0
+            
+            try:
+                rows = [
+                    (e.id, e.timestamp, e.hook_type, e.event_type, json.dumps(e.data))
+                    for e in batch
+                ]
+                with self._db.transaction() as conn:
+                    conn.executemany(
+                        "INSERT OR REPLACE INTO context_events (id, timestamp, hook_type, event_type, data) "
+                        "VALUES (?, ?, ?, ?, ?)",
+                        rows
+                    )
+            except Exception as e:
+                logger.error(f"[ContextStore] Failed to record {len(batch)} events: {e}")
+                with self._events_lock:
+                    # 放回队首，下次重试（仍受 max_pending 限制）
+                    self._pending[:0] = batch
+                    overflow = len(self._pending) - self.max_pending
+                    if overflow > 0:
+                        del self._pending[:overflow]
+                        self._stats["dropped"] += overflow
+                    self._stats["write_errors"] += 1
+                return 0
+            
+            with self._events_lock:
+                self._stats["flushed"] += len(batch)
+                self._stats["batches"] += 1
+            return len(batch)
+    
+    def rollup(self, now: Optional[datetime] = None) -> int:
+        """
+        执行保留策略
+        
+        把早于 raw_retention_hours 的原始事件汇总为每分钟计数后删除，
+        并清理超出 rollup_retention_days 的汇总。返回汇总的原始事件数。
+        """
+        now = now or datetime.now()
+        self._last_rollup = time.monotonic()
+        cutoff = (now - timedelta(hours=self.raw_retention_hours)).isoformat()
+        try:
+            with self._db.transaction() as conn:
+                conn.execute("""
+                    INSERT INTO context_event_rollups (bucket, hook_type, event_type, count)
+                    SELECT substr(timestamp, 1, 16), hook_type, event_type, COUNT(*)
+                    FROM context_events WHERE timestamp < ?
+                    GROUP BY 1, 2, 3
+                    ON CONFLICT(bucket, hook_type, event_type) DO UPDATE SET count = count + excluded.count
+                """, (cutoff,))
+                rolled_up = conn.execute(
+                    "DELETE FROM context_events WHERE timestamp < ?", (cutoff,)
+                ).rowcount
+                if self.rollup_retention_days is not None:
+                    rollup_cutoff = (now - timedelta(days=self.rollup_retention_days)).isoformat()[:16]
+                    conn.execute("DELETE FROM context_event_rollups WHERE bucket < ?", (rollup_cutoff,))
+        except Exception as e:
+            logger.error(f"[ContextStore] Failed to roll up events: {e}")
+            return 0
+        
+        with self._events_lock:
+            self._stats["rolled_up"] += rolled_up
+        return rolled_up
+    
+    def close(self):
+        """停止后台写线程并写入剩余事件"""
+        self._closed = True
+        self._wakeup.set()
+        writer = self._writer
+        if writer is not None and writer is not threading.current_thread():
+            writer.join(timeout=5.0)
+        self.flush()
+    
+    def get_stats(self) -> Dict[str, Any]:
+        """历史记录写入统计"""
+        with self._events_lock:
+            return {
+                "buffered": len(self._ring),
+                "pending": len(self._pending),
+                "memory_since": self._memory_since,
+                **self._stats,
+            }
+    
     # ============== Agent 接口 ==============
     
     def get_context_for_agent(self) -> Dict[str, Any]:
@@ -464,5 +719,16 @@ def get_context_store() -> ContextStore:
     with _store_lock:
         if _context_store is None:
             _context_store = ContextStore()
+            # 写线程是 daemon 线程，退出时写入剩余事件
+            atexit.register(close_context_store)
         return _context_store
 
+
+def close_context_store():
+    """关闭 Context Store 单例（写入剩余事件）"""
+    global _context_store
+    with _store_lock:
+        store, _context_store = _context_store, None
+    if store is not None:
+        store.close()
+
@@ -0,0 +1,333 @@
+# -*- coding: utf-8 -*-
+"""
+HTTP Clients - Process-wide outbound connection pools
+
+One registry owns the outbound HTTP clients so calls to the same host reuse
+kept-alive connections instead of paying a TCP + TLS handshake per request:
+
+- `session()`: shared aiohttp.ClientSession for direct REST calls (Tavily).
+  Bounded per host, with DNS caching.
+- `httpx_client()`: shared httpx.AsyncClient for SDKs that accept an
+  `http_client` (Anthropic, OpenAI). Uses HTTP/2 when the `h2` package is
+  installed.
+- `sdk_client()`: builds an SDK client on the shared httpx pool, falling
+  back to the SDK's own transport when it rejects it (SDK releases that
+  vendor a different httpx build raise TypeError for a foreign client).
+
+The FastAPI lifespan calls `start_http_clients()` / `close_http_clients()`.
+Outside the server the clients are created lazily on first use.
+
+Usage:
+    from engine.http_clients import get_http_clients
+
+    session = get_http_clients().session()
+    async with session.post(url, json=payload, timeout=aiohttp.ClientTimeout(total=10)) as resp:
+        data = await resp.json()
+
+    client = sdk_client(anthropic.AsyncAnthropic, api_key=key)
+
+Environment Variables:
+    NOGICOS_HTTP_MAX_CONNECTIONS: Total connection limit (default: 100)
+    NOGICOS_HTTP_MAX_PER_HOST: Connection limit per host (default: 16)
+    NOGICOS_HTTP_KEEPALIVE: Idle keep-alive seconds (default: 30)
+    NOGICOS_HTTP_DNS_TTL: DNS cache TTL seconds (default: 300)
+"""
+
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, Optional, TypeVar
+
+import aiohttp
+
+from engine.observability import get_logger
+
+logger = get_logger("http_clients")
+
+try:
+    import httpx
+    HTTPX_AVAILABLE = True
+except ImportError:
+    HTTPX_AVAILABLE = False
+    httpx = None
+
+try:
+    import h2  # noqa: F401 - enables httpx HTTP/2
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+
+class HTTPClientRegistry:
+    """
+    Shared outbound HTTP clients with keep-alive pools and saturation stats.
+
+    Args:
+        max_connections: Total open connections per client
+        max_per_host: Open connections per host (aiohttp session)
+        keepalive_timeout: Seconds an idle connection is kept
+        dns_ttl: Seconds resolved addresses are cached (aiohttp session)
+        http2: Negotiate HTTP/2 on the httpx client when `h2` is installed
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 100,
+        max_per_host: int = 16,
+        keepalive_timeout: float = 30.0,
+        dns_ttl: int = 300,
+        http2: bool = True,
+    ):
+        self.max_connections = max_connections
+        self.max_per_host = max_per_host
+        self.keepalive_timeout = keepalive_timeout
+        self.dns_ttl = dns_ttl
+        self.http2 = http2 and HTTP2_AVAILABLE
+
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._session_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._httpx: Optional["httpx.AsyncClient"] = None
+        self._httpx_loop: Optional[asyncio.AbstractEventLoop] = None
+
+        self._stats = {
+            "requests": 0,
+            "errors": 0,
+            "connections_created": 0,
+            "connections_reused": 0,
+            "queued": 0,
+            "queue_wait_ms": 0.0,
+            "max_queue_wait_ms": 0.0,
+            "dns_lookups": 0,
+            "dns_cache_hits": 0,
+            "httpx_requests": 0,
+        }
+
+    # ========== clients ==========
+
+    def session(self) -> aiohttp.ClientSession:
+        """The shared aiohttp session (created on first use in the running loop)"""
+        loop = asyncio.get_running_loop()
+        if self._session is None or self._session.closed or self._session_loop is not loop:
+            if self._session is not None and not self._session.closed and self._session_loop is not loop:
+                logger.warning("[HTTP] Event loop changed; creating a new shared session")
+            connector = aiohttp.TCPConnector(
+                limit=self.max_connections,
+                limit_per_host=self.max_per_host,
+                keepalive_timeout=self.keepalive_timeout,
+                use_dns_cache=True,
+                ttl_dns_cache=self.dns_ttl,
+            )
+            self._session = aiohttp.ClientSession(
+                connector=connector,
+                trace_configs=[self._trace_config()],
+            )
+            self._session_loop = loop
+        return self._session
+
+    def httpx_client(self) -> "httpx.AsyncClient":
+        """
+        The shared httpx client, for SDKs that take `http_client=`.
+
+        May be called outside a running loop (SDK clients are often built in
+        sync __init__); the client is tied to the first loop that asks for it
+        and replaced when that loop is closed or a different loop asks.
+        """
+        if not HTTPX_AVAILABLE:
+            raise ImportError("httpx not installed. Run: pip install httpx")
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            loop = None
+
+        stale_loop = self._httpx_loop is not None and (
+            self._httpx_loop.is_closed() or (loop is not None and loop is not self._httpx_loop)
+        )
+        if stale_loop and self._httpx is not None and not self._httpx.is_closed:
+            # Its connections belong to the other loop; they cannot be closed from here
+            logger.warning("[HTTP] Event loop changed; creating a new shared httpx client")
+        if self._httpx is None or self._httpx.is_closed or stale_loop:
+            self._httpx_loop = None
+            self._httpx = httpx.AsyncClient(
+                http2=self.http2,
+                limits=httpx.Limits(
+                    max_connections=self.max_connections,
+                    max_keepalive_connections=self.max_connections,
+                    keepalive_expiry=self.keepalive_timeout,
+                ),
+                # SDKs pass their own per-request timeouts
+                timeout=httpx.Timeout(600.0, connect=10.0),
+                event_hooks={"request": [self._on_httpx_request]},
+            )
+        if self._httpx_loop is None:
+            self._httpx_loop = loop
+        return self._httpx
+
+    async def start(self):
+        """Create the clients up front (called from the server lifespan)"""
+        self.session()
+        if HTTPX_AVAILABLE:
+            self.httpx_client()
+        logger.info(
+            f"[HTTP] Pools ready: max={self.max_connections}, per_host={self.max_per_host}, "
+            f"keepalive={self.keepalive_timeout}s, dns_ttl={self.dns_ttl}s, http2={self.http2}"
+        )
+
+    async def close(self):
+        """Close pooled connections"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+        self._session_loop = None
+        if self._httpx is not None and not self._httpx.is_closed:
+            await self._httpx.aclose()
+        self._httpx = None
+        self._httpx_loop = None
+
+    # ========== stats ==========
+
+    def _trace_config(self) -> aiohttp.TraceConfig:
+        stats = self._stats
+        queued_at: Dict[int, float] = {}
+
+        async def on_request_start(session, ctx, params):
+            stats["requests"] += 1
+
+        async def on_request_exception(session, ctx, params):
+            stats["errors"] += 1
+
+        async def on_connection_create_end(session, ctx, params):
+            stats["connections_created"] += 1
+
+        async def on_connection_reuseconn(session, ctx, params):
+            stats["connections_reused"] += 1
+
+        async def on_connection_queued_start(session, ctx, params):
+            stats["queued"] += 1
+            queued_at[id(ctx)] = time.perf_counter()
+
+        async def on_connection_queued_end(session, ctx, params):
+            started = queued_at.pop(id(ctx), None)
+            if started is not None:
+                waited = (time.perf_counter() - started) * 1000
+                stats["queue_wait_ms"] += waited
+                stats["max_queue_wait_ms"] = max(stats["max_queue_wait_ms"], waited)
+
+        async def on_dns_resolvehost_start(session, ctx, params):
+            stats["dns_lookups"] += 1
+
+        async def on_dns_cache_hit(session, ctx, params):
+            stats["dns_cache_hits"] += 1
+
+        trace = aiohttp.TraceConfig()
+        trace.on_request_start.append(on_request_start)
+        trace.on_request_exception.append(on_request_exception)
+        trace.on_connection_create_end.append(on_connection_create_end)
+        trace.on_connection_reuseconn.append(on_connection_reuseconn)
+        trace.on_connection_queued_start.append(on_connection_queued_start)
+        trace.on_connection_queued_end.append(on_connection_queued_end)
+        trace.on_dns_resolvehost_start.append(on_dns_resolvehost_start)
+        trace.on_dns_cache_hit.append(on_dns_cache_hit)
+        return trace
+
+    async def _on_httpx_request(self, request):
+        self._stats["httpx_requests"] += 1
+
+    def _session_pool(self) -> Dict[str, Any]:
+        connector = self._session.connector if self._session is not None and not self._session.closed else None
+        if connector is None:
+            return {"open": False}
+        # aiohttp has no public accessor for pool occupancy
+        acquired = getattr(connector, "_acquired", ())
+        per_host = getattr(connector, "_acquired_per_host", {})
+        idle = getattr(connector, "_conns", {})
+        waiters = getattr(connector, "_waiters", {})
+        in_use = len(acquired)
+        return {
+            "open": True,
+            "in_use": in_use,
+            "idle": sum(len(conns) for conns in idle.values()),
+            "waiting": sum(len(w) for w in waiters.values()),
+            "saturation": in_use / self.max_connections if self.max_connections else 0.0,
+            "per_host_in_use": {
+                f"{key.host}:{key.port}": len(conns) for key, conns in per_host.items() if conns
+            },
+        }
+
+    def _httpx_pool(self) -> Dict[str, Any]:
+        if self._httpx is None or self._httpx.is_closed:
+            return {"open": False}
+        pool = getattr(getattr(self._httpx, "_transport", None), "_pool", None)
+        connections = list(getattr(pool, "connections", ()))
+        idle = sum(1 for c in connections if c.is_idle())
+        return {
+            "open": True,
+            "http2": self.http2,
+            "connections": len(connections),
+            "idle": idle,
+            "saturation": (len(connections) - idle) / self.max_connections if self.max_connections else 0.0,
+            "waiting": sum(1 for r in getattr(pool, "_requests", ()) if r.is_queued()),
+        }
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        connections = stats["connections_created"] + stats["connections_reused"]
+        stats["reuse_rate"] = stats["connections_reused"] / connections if connections else 0.0
+        stats["avg_queue_wait_ms"] = stats["queue_wait_ms"] / stats["queued"] if stats["queued"] else 0.0
+        stats["limits"] = {
+            "max_connections": self.max_connections,
+            "max_per_host": self.max_per_host,
+            "keepalive_timeout": self.keepalive_timeout,
+            "dns_ttl": self.dns_ttl,
+        }
+        stats["aiohttp"] = self._session_pool()
+        stats["httpx"] = self._httpx_pool()
+        return stats
+
+
+# ========== singleton ==========
+
+_registry: Optional[HTTPClientRegistry] = None
+
+
+def get_http_clients() -> HTTPClientRegistry:
+    """Process-wide HTTP client registry (singleton)"""
+    global _registry
+    if _registry is None:
+        _registry = HTTPClientRegistry(
+            max_connections=int(os.environ.get("NOGICOS_HTTP_MAX_CONNECTIONS", "100")),
+            max_per_host=int(os.environ.get("NOGICOS_HTTP_MAX_PER_HOST", "16")),
+            keepalive_timeout=float(os.environ.get("NOGICOS_HTTP_KEEPALIVE", "30")),
+            dns_ttl=int(os.environ.get("NOGICOS_HTTP_DNS_TTL", "300")),
+        )
+    return _registry
+
+
+ClientT = TypeVar("ClientT")
+
+
+def sdk_client(factory: Callable[..., ClientT], **kwargs) -> ClientT:
+    """
+    Build an SDK client (AsyncAnthropic, AsyncOpenAI, ...) on the shared pool.
+
+    Falls back to the SDK's default transport when httpx is missing or the
+    SDK rejects the shared client (TypeError: it requires its own httpx type).
+    """
+    if HTTPX_AVAILABLE:
+        try:
+            return factory(http_client=get_http_clients().httpx_client(), **kwargs)
+        except TypeError as e:
+            logger.debug(f"[HTTP] {getattr(factory, '__name__', factory)} rejected the shared httpx client: {e}")
+    return factory(**kwargs)
+
+
+async def start_http_clients() -> HTTPClientRegistry:
+    """Open the shared pools (FastAPI lifespan startup)"""
+    registry = get_http_clients()
+    await registry.start()
+    return registry
+
+
+async def close_http_clients():
+    """Close the shared pools (FastAPI lifespan shutdown)"""
+    if _registry is not None:
+        await _registry.close()
@@ -10,15 +10,16 @@ B1: Knowledge Storage Architecture
 """
 
 import os
+import asyncio
 import json
-import sqlite3
+import hashlib
 import uuid
 import logging
 from datetime import datetime
 from typing import List, Optional, Dict, Any
-from contextlib import contextmanager
 
 from .models import UserProfile, Trajectory, LearnedSkill, SQL_SCHEMA
+from ..sqlite_pool import get_sqlite_pool
 
 logger = logging.getLogger("nogicos.knowledge")
 
@@ -49,6 +50,7 @@ class KnowledgeStore:
             db_path = os.path.join(nogicos_dir, "knowledge.db")
         
         self.db_path = db_path
+        self._db = get_sqlite_pool(db_path)
         self._init_database()
         
         logger.info(f"[Knowledge] Initialized store at {db_path}")
@@ -59,15 +61,9 @@ class KnowledgeStore:
             conn.executescript(SQL_SCHEMA)
             conn.commit()
     
-    @contextmanager
     def _get_connection(self):
-        """Get database connection with context manager"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
+        """Get this thread's pooled database connection (context manager)"""
+        return self._db.connect()
     
     # ========================================================================
     # User Profile Management (B1.2)
@@ -385,13 +381,21 @@ class PersistentSessionStore:
     Simple session persistence for cross-session memory.
     
     Stores:
-    - Session history (messages)
+    - Session history (messages), one row per message in session_messages
     - User preferences per session
-    - Last active timestamp
+    - Summary row per session (title, count, preview, last active timestamp),
+      maintained incrementally on every append
+    
+    Saving a history that extends the stored one only inserts the new tail,
+    so a save costs O(new messages) instead of O(total history). Sessions
+    and messages are paginated by keyset (cursor), not OFFSET.
     
     This allows users to "resume" previous sessions and maintain context.
     """
     
+    SCHEMA_VERSION = 2
+    PREVIEW_CHARS = 100
+    
     def __init__(self, db_path: Optional[str] = None):
         """
         Initialize persistent session store.
@@ -407,12 +411,13 @@ class PersistentSessionStore:
             db_path = os.path.join(nogicos_dir, "sessions.db")
         
         self.db_path = db_path
+        self._db = get_sqlite_pool(db_path)
         self._init_database()
         
         logger.info(f"[Sessions] Initialized store at {db_path}")
     
     def _init_database(self):
-        """Initialize session database schema"""
+        """Initialize session database schema (and migrate v1 history blobs)"""
         with self._get_connection() as conn:
             conn.executescript("""
                 CREATE TABLE IF NOT EXISTS sessions (
@@ -422,7 +427,8 @@ class PersistentSessionStore:
                     preferences TEXT NOT NULL DEFAULT '{}',
                     created_at TEXT NOT NULL,
                     updated_at TEXT NOT NULL,
-                    message_count INTEGER DEFAULT 0
+                    message_count INTEGER DEFAULT 0,
+                    preview TEXT
                 );
                 
                 CREATE INDEX IF NOT EXISTS idx_sessions_updated 
@@ -435,23 +441,167 @@ class PersistentSessionStore:
                     content TEXT NOT NULL,
                     tool_calls TEXT,
                     created_at TEXT NOT NULL,
+                    seq INTEGER,
+                    payload TEXT,
+                    digest TEXT,
                     FOREIGN KEY (session_id) REFERENCES sessions(id)
                 );
                 
                 CREATE INDEX IF NOT EXISTS idx_messages_session 
                 ON session_messages(session_id);
             """)
+            
+            version = conn.execute("PRAGMA user_version").fetchone()[0]
+            if version < self.SCHEMA_VERSION:
+                self._migrate_v1(conn)
+            
+            # Keyset pagination indexes
+            conn.executescript("""
+                CREATE INDEX IF NOT EXISTS idx_sessions_updated_id
+                ON sessions(updated_at DESC, id DESC);
+                
+                CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_session_seq
+                ON session_messages(session_id, seq);
+            """)
+            conn.execute(f"PRAGMA user_version = {self.SCHEMA_VERSION}")
             conn.commit()
     
-    @contextmanager
+    def _migrate_v1(self, conn):
+        """
+        Move v1 data to the append-only layout.
+        
+        v1 kept the whole history as a JSON blob in sessions.history, with
+        session_messages only written by add_message(). Blob messages become
+        rows 0..n-1 and any add_message() rows follow in insertion order.
+        """
+        session_columns = {row[1] for row in conn.execute("PRAGMA table_info(sessions)")}
+        if "preview" not in session_columns:
+            conn.execute("ALTER TABLE sessions ADD COLUMN preview TEXT")
+        message_columns = {row[1] for row in conn.execute("PRAGMA table_info(session_messages)")}
+        for column in ("seq INTEGER", "payload TEXT", "digest TEXT"):
+            if column.split()[0] not in message_columns:
+                conn.execute(f"ALTER TABLE session_messages ADD COLUMN {column}")
+        
+        migrated = 0
+        rows = conn.execute("SELECT id, history, created_at FROM sessions").fetchall()
+        for row in rows:
+            try:
+                history = json.loads(row["history"] or "[]")
+            except json.JSONDecodeError:
+                logger.warning(f"[Sessions] Unreadable history blob for {row['id']}, skipping")
+                history = []
+            
+            self._insert_messages(conn, row["id"], history, 0, row["created_at"])
+            
+            legacy = conn.execute(
+                "SELECT id FROM session_messages WHERE session_id = ? AND seq IS NULL ORDER BY id",
+                (row["id"],)
+            ).fetchall()
+            for offset, message in enumerate(legacy):
+                conn.execute(
+                    "UPDATE session_messages SET seq = ? WHERE id = ?",
+                    (len(history) + offset, message["id"])
+                )
+            
+            count = len(history) + len(legacy)
+            conn.execute("""
+                UPDATE sessions SET history = '[]', message_count = ?, preview = ?
+                WHERE id = ?
+            """, (count, self._preview_at(conn, row["id"], count - 1), row["id"]))
+            migrated += 1
+        
+        if migrated:
+            logger.info(f"[Sessions] Migrated {migrated} sessions to append-only storage")
+    
     def _get_connection(self):
-        """Get database connection with context manager"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
+        """Get this thread's pooled database connection (context manager)"""
+        return self._db.connect()
+    
+    # ========== message rows ==========
+    
+    @staticmethod
+    def _encode(message: Dict[str, Any]) -> tuple:
+        """Serialize one message -> (payload, digest)"""
+        payload = json.dumps(message, ensure_ascii=False)
+        return payload, hashlib.sha1(payload.encode("utf-8")).hexdigest()
+    
+    @classmethod
+    def _make_preview(cls, message: Dict[str, Any]) -> str:
+        content = message.get("content", "")
+        if not isinstance(content, str):
+            content = json.dumps(content, ensure_ascii=False)
+        return content[:cls.PREVIEW_CHARS]
+    
+    def _insert_messages(self, conn, session_id: str, messages: List[Dict[str, Any]], start_seq: int, now: str):
+        rows = []
+        for offset, message in enumerate(messages):
+            payload, digest = self._encode(message)
+            content = message.get("content", "")
+            rows.append((
+                session_id,
+                message.get("role", "user"),
+                content if isinstance(content, str) else json.dumps(content, ensure_ascii=False),
+                json.dumps(message["tool_calls"], ensure_ascii=False) if message.get("tool_calls") else None,
+                now,
+                start_seq + offset,
+                payload,
+                digest,
+            ))
+        conn.executemany("""
+            INSERT INTO session_messages
+            (session_id, role, content, tool_calls, created_at, seq, payload, digest)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+    
+    def _preview_at(self, conn, session_id: str, seq: int) -> Optional[str]:
+        if seq < 0:
+            return None
+        row = conn.execute(
+            "SELECT * FROM session_messages WHERE session_id = ? AND seq = ?",
+            (session_id, seq)
+        ).fetchone()
+        return self._make_preview(self._row_to_message(row)) if row else None
+    
+    @staticmethod
+    def _row_to_message(row) -> Dict[str, Any]:
+        if row["payload"] is not None:
+            return json.loads(row["payload"])
+        # Row written by v1 add_message()
+        message = {"role": row["role"], "content": row["content"]}
+        if row["tool_calls"]:
+            message["tool_calls"] = json.loads(row["tool_calls"])
+        return message
+    
+    def _common_prefix(self, conn, session_id: str, history: List[Dict[str, Any]], stored_count: int) -> int:
+        """
+        Number of leading messages already stored unchanged.
+        
+        Fast path: the stored tail digest matches history[stored_count - 1],
+        i.e. the caller appended to what we have (one lookup, one encode).
+        Otherwise compare digests one by one to find where they diverge.
+        """
+        if stored_count == 0:
+            return 0
+        if len(history) >= stored_count:
+            row = conn.execute(
+                "SELECT digest FROM session_messages WHERE session_id = ? AND seq = ?",
+                (session_id, stored_count - 1)
+            ).fetchone()
+            if row is not None and row["digest"] == self._encode(history[stored_count - 1])[1]:
+                return stored_count
+        
+        stored = conn.execute(
+            "SELECT digest FROM session_messages WHERE session_id = ? ORDER BY seq",
+            (session_id,)
+        ).fetchall()
+        prefix = 0
+        for row, message in zip(stored, history):
+            if row["digest"] != self._encode(message)[1]:
+                break
+            prefix += 1
+        return prefix
+    
+    # ========== sessions ==========
     
     def save_session(
         self,
@@ -463,6 +613,10 @@ class PersistentSessionStore:
         """
         Save or update a session.
         
+        Only messages past the already-stored prefix are written. If the
+        history was edited or truncated, rows from the first changed
+        message onwards are replaced.
+        
         Args:
             session_id: Unique session identifier
             history: List of message dictionaries
@@ -483,57 +637,83 @@ class PersistentSessionStore:
         preferences = preferences or {}
         
         with self._get_connection() as conn:
+            # Take the write lock before reading the stored count, so concurrent
+            # saves of one session (executor threads) serialize instead of racing
+            conn.execute("BEGIN IMMEDIATE")
+            
             # Check if session exists
             cursor = conn.execute(
-                "SELECT id, created_at FROM sessions WHERE id = ?",
+                "SELECT message_count FROM sessions WHERE id = ?",
                 (session_id,)
             )
             existing = cursor.fetchone()
+            stored_count = existing["message_count"] if existing else 0
+            
+            prefix = self._common_prefix(conn, session_id, history, stored_count)
+            if prefix < stored_count:
+                conn.execute(
+                    "DELETE FROM session_messages WHERE session_id = ? AND seq >= ?",
+                    (session_id, prefix)
+                )
+            self._insert_messages(conn, session_id, history[prefix:], prefix, now)
             
+            preview = self._make_preview(history[-1]) if history else None
             if existing:
-                # Update existing session
+                # Update summary row
                 conn.execute("""
                     UPDATE sessions 
-                    SET history = ?, preferences = ?, title = ?, 
-                        updated_at = ?, message_count = ?
+                    SET preferences = ?, title = ?, updated_at = ?,
+                        message_count = ?, preview = ?
                     WHERE id = ?
                 """, (
-                    json.dumps(history, ensure_ascii=False),
                     json.dumps(preferences, ensure_ascii=False),
                     title,
                     now,
                     len(history),
+                    preview,
                     session_id,
                 ))
             else:
                 # Insert new session
                 conn.execute("""
                     INSERT INTO sessions 
-                    (id, title, history, preferences, created_at, updated_at, message_count)
+                    (id, title, preferences, created_at, updated_at, message_count, preview)
                     VALUES (?, ?, ?, ?, ?, ?, ?)
                 """, (
                     session_id,
                     title,
-                    json.dumps(history, ensure_ascii=False),
                     json.dumps(preferences, ensure_ascii=False),
                     now,
                     now,
                     len(history),
+                    preview,
                 ))
             
             conn.commit()
         
-        logger.debug(f"[Sessions] Saved session {session_id} ({len(history)} messages)")
+        logger.debug(
+            f"[Sessions] Saved session {session_id} "
+            f"({len(history)} messages, {len(history) - prefix} written)"
+        )
     
-    def load_session(self, session_id: str) -> Dict[str, Any]:
+    def load_session(
+        self,
+        session_id: str,
+        limit: Optional[int] = None,
+        before: Optional[int] = None,
+    ) -> Dict[str, Any]:
         """
         Load a session by ID.
         
         Args:
             session_id: Session ID to load
+            limit: Return only the newest `limit` messages (all if None)
+            before: Keyset cursor - only messages with seq < before,
+                    i.e. the `next_cursor` of the previous page
             
         Returns:
             Dictionary with 'history', 'preferences', 'title', etc.
+            'next_cursor' is set when older messages remain.
             Returns empty history if session doesn't exist.
         """
         with self._get_connection() as conn:
@@ -551,40 +731,75 @@ class PersistentSessionStore:
                     "preferences": {},
                     "created_at": None,
                     "updated_at": None,
+                    "next_cursor": None,
                 }
             
+            upper = row["message_count"] if before is None else min(before, row["message_count"])
+            if limit is None:
+                messages = conn.execute("""
+                    SELECT * FROM session_messages
+                    WHERE session_id = ? AND seq < ?
+                    ORDER BY seq
+                """, (session_id, upper)).fetchall()
+            else:
+                messages = conn.execute("""
+                    SELECT * FROM session_messages
+                    WHERE session_id = ? AND seq < ?
+                    ORDER BY seq DESC
+                    LIMIT ?
+                """, (session_id, upper, limit)).fetchall()[::-1]
+            
+            first_seq = messages[0]["seq"] if messages else upper
             return {
                 "id": row["id"],
                 "title": row["title"],
-                "history": json.loads(row["history"] or "[]"),
+                "history": [self._row_to_message(m) for m in messages],
                 "preferences": json.loads(row["preferences"] or "{}"),
                 "created_at": row["created_at"],
                 "updated_at": row["updated_at"],
                 "message_count": row["message_count"],
+                "next_cursor": first_seq if first_seq > 0 else None,
             }
     
+    @staticmethod
+    def make_cursor(session: Dict[str, Any]) -> str:
+        """Keyset cursor for list_sessions() continuing after `session`"""
+        return f"{session['updated_at']}|{session['id']}"
+    
     def list_sessions(
         self,
         limit: int = 20,
         offset: int = 0,
+        cursor: Optional[str] = None,
     ) -> List[Dict[str, Any]]:
         """
         List recent sessions.
         
         Args:
             limit: Maximum sessions to return
-            offset: Offset for pagination
+            offset: Offset for pagination (prefer `cursor`; OFFSET scans skipped rows)
+            cursor: Keyset cursor from make_cursor() of the last session of the previous page
             
         Returns:
             List of session summaries (without full history)
         """
         with self._get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT id, title, created_at, updated_at, message_count
-                FROM sessions
-                ORDER BY updated_at DESC
-                LIMIT ? OFFSET ?
-            """, (limit, offset))
+            if cursor:
+                updated_at, _, session_id = cursor.partition("|")
+                rows = conn.execute("""
+                    SELECT id, title, created_at, updated_at, message_count, preview
+                    FROM sessions
+                    WHERE (updated_at, id) < (?, ?)
+                    ORDER BY updated_at DESC, id DESC
+                    LIMIT ?
+                """, (updated_at, session_id, limit))
+            else:
+                rows = conn.execute("""
+                    SELECT id, title, created_at, updated_at, message_count, preview
+                    FROM sessions
+                    ORDER BY updated_at DESC, id DESC
+                    LIMIT ? OFFSET ?
+                """, (limit, offset))
             
             return [
                 {
@@ -593,8 +808,9 @@ class PersistentSessionStore:
                     "created_at": row["created_at"],
                     "updated_at": row["updated_at"],
                     "message_count": row["message_count"],
+                    "preview": row["preview"] or "",
                 }
-                for row in cursor.fetchall()
+                for row in rows.fetchall()
             ]
     
     def delete_session(self, session_id: str) -> bool:
@@ -612,6 +828,10 @@ class PersistentSessionStore:
                 "DELETE FROM sessions WHERE id = ?",
                 (session_id,)
             )
+            conn.execute(
+                "DELETE FROM session_messages WHERE session_id = ?",
+                (session_id,)
+            )
             conn.commit()
             
             deleted = cursor.rowcount > 0
@@ -637,27 +857,31 @@ class PersistentSessionStore:
             tool_calls: Optional tool calls for assistant messages
         """
         now = datetime.now().isoformat()
+        message = {"role": role, "content": content}
+        if tool_calls:
+            message["tool_calls"] = tool_calls
         
         with self._get_connection() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            row = conn.execute(
+                "SELECT message_count FROM sessions WHERE id = ?",
+                (session_id,)
+            ).fetchone()
+            if row is None:
+                conn.execute("""
+                    INSERT INTO sessions (id, title, created_at, updated_at, message_count)
+                    VALUES (?, ?, ?, ?, 0)
+                """, (session_id, f"Session {session_id[:8]}", now, now))
+            
             # Insert message
-            conn.execute("""
-                INSERT INTO session_messages 
-                (session_id, role, content, tool_calls, created_at)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                session_id,
-                role,
-                content,
-                json.dumps(tool_calls, ensure_ascii=False) if tool_calls else None,
-                now,
-            ))
+            self._insert_messages(conn, session_id, [message], row["message_count"] if row else 0, now)
             
-            # Update session timestamp and count
+            # Update session summary
             conn.execute("""
                 UPDATE sessions 
-                SET updated_at = ?, message_count = message_count + 1
+                SET updated_at = ?, message_count = message_count + 1, preview = ?
                 WHERE id = ?
-            """, (now, session_id))
+            """, (now, self._make_preview(message), session_id))
             
             conn.commit()
     
@@ -717,13 +941,15 @@ class SemanticMemoryStore:
     
     EMBEDDING_DIM = 1536  # text-embedding-3-small dimension
     
-    def __init__(self, db_path: Optional[str] = None):
+    def __init__(self, db_path: Optional[str] = None, index_mode: Optional[str] = None):
         """
         Initialize semantic memory store.
         
         Args:
             db_path: Path to SQLite database.
                      Defaults to ~/.nogicos/memory.db
+            index_mode: Vector index mode ("flat" or "hnsw").
+                        Defaults to $NOGICOS_MEMORY_INDEX or "flat"
         """
         if db_path is None:
             home = os.path.expanduser("~")
@@ -732,7 +958,11 @@ class SemanticMemoryStore:
             db_path = os.path.join(nogicos_dir, "memory.db")
         
         self.db_path = db_path
+        self._db = get_sqlite_pool(db_path)
+        self.index_mode = index_mode or os.environ.get("NOGICOS_MEMORY_INDEX", "flat")
         self._embedding_client = None
+        self._vector_index = None
+        self._index_open_lock = asyncio.Lock()
         self._init_database()
         
         logger.info(f"[Memory] Initialized store at {db_path}")
@@ -746,15 +976,9 @@ class SemanticMemoryStore:
             conn.executescript(MEMORY_SQL_SCHEMA)
             conn.commit()
     
-    @contextmanager
     def _get_connection(self):
-        """Get database connection with context manager"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row
-        try:
-            yield conn
-        finally:
-            conn.close()
+        """Get this thread's pooled database connection (context manager)"""
+        return self._db.connect()
     
     def _get_embedding_client(self):
         """Lazy-load OpenAI client for embeddings"""
@@ -770,7 +994,9 @@ class SemanticMemoryStore:
                     api_key = os.environ.get("OPENAI_API_KEY")
                 
                 if api_key:
-                    self._embedding_client = openai.OpenAI(api_key=api_key)
+                    from engine.http_clients import sdk_client
+                    # shared keep-alive pool when the SDK accepts it
+                    self._embedding_client = sdk_client(openai.AsyncOpenAI, api_key=api_key)
                 else:
                     logger.warning("[Memory] OPENAI_API_KEY not set, embeddings disabled")
             except ImportError:
@@ -792,7 +1018,7 @@ class SemanticMemoryStore:
             return None
         
         try:
-            response = client.embeddings.create(
+            response = await client.embeddings.create(
                 model="text-embedding-3-small",
                 input=text,
             )
@@ -801,6 +1027,78 @@ class SemanticMemoryStore:
             logger.error(f"[Memory] Embedding error: {e}")
             return None
     
+    async def _get_vector_index(self):
+        """
+        Lazy-open the vector index next to the database.
+        
+        Opening (and any stale rebuild) runs on the database thread so a
+        large rebuild does not block the event loop.
+        Returns None if numpy is unavailable.
+        """
+        if self._vector_index is not None:
+            return self._vector_index
+        async with self._index_open_lock:
+            if self._vector_index is None:
+                self._vector_index = await self._db.run(self._open_vector_index)
+        return self._vector_index
+    
+    def _open_vector_index(self):
+        """
+        Open the index, rebuilding it from SQLite when its source marker
+        does not match memory_embeddings (runs on the database thread).
+        """
+        from .vector_index import MemoryVectorIndex, NUMPY_AVAILABLE
+        if not NUMPY_AVAILABLE:
+            return None
+        
+        base_path = os.path.splitext(self.db_path)[0]
+        try:
+            index = MemoryVectorIndex(base_path, self.EMBEDDING_DIM, mode=self.index_mode)
+        except (OSError, ValueError) as e:
+            logger.error(f"[Memory] Vector index unavailable: {e}")
+            return None
+        
+        with self._get_connection() as conn:
+            marker = self._index_marker(conn)
+            if marker != index.source_marker:
+                logger.info(f"[Memory] Vector index stale ({index.source_marker} != {marker}), rebuilding")
+                cursor = conn.execute("""
+                    SELECT m.id, m.session_id, e.embedding
+                    FROM memories m
+                    JOIN memory_embeddings e ON m.id = e.memory_id
+                    WHERE m.is_active = 1
+                    ORDER BY m.created_at
+                """)
+                index.rebuild((row[0], row[1], row[2]) for row in cursor)
+                index.set_source_marker(marker)
+        return index
+    
+    def _index_marker(self, conn) -> str:
+        """
+        Version marker of the indexed rows: count, max embedding rowid and
+        latest memory update. Re-embedding a memory gets a new rowid and
+        edits bump updated_at, so changes that keep the count are caught.
+        """
+        count, max_rowid, updated_at = conn.execute("""
+            SELECT COUNT(*), MAX(e.rowid), MAX(m.updated_at)
+            FROM memory_embeddings e
+            JOIN memories m ON m.id = e.memory_id
+            WHERE m.is_active = 1
+        """).fetchone()
+        return f"{count}:{max_rowid or 0}:{updated_at or ''}"
+    
+    async def _sync_index_marker(self):
+        """Record that the open index reflects the database after a write"""
+        index = self._vector_index
+        if index is None:
+            return
+        
+        def read_marker() -> str:
+            with self._get_connection() as conn:
+                return self._index_marker(conn)
+        
+        index.set_source_marker(await self._db.run(read_marker))
+    
     def _embedding_to_bytes(self, embedding: List[float]) -> bytes:
         """Convert embedding list to bytes for storage"""
         import struct
@@ -847,57 +1145,76 @@ class SemanticMemoryStore:
         memory_id = str(uuid.uuid4())[:8]
         now = datetime.now().isoformat()
         
-        with self._get_connection() as conn:
-            # Check for conflicting memories (same subject + predicate)
-            cursor = conn.execute("""
-                SELECT id FROM memories 
-                WHERE session_id = ? AND subject = ? AND predicate = ? AND is_active = 1
-            """, (session_id, subject.lower(), predicate.lower()))
-            
-            existing = cursor.fetchall()
-            
-            # Mark existing conflicting memories as inactive
-            if existing:
-                for row in existing:
+        def insert() -> List[str]:
+            with self._get_connection() as conn:
+                # Check for conflicting memories (same subject + predicate)
+                cursor = conn.execute("""
+                    SELECT id FROM memories 
+                    WHERE session_id = ? AND subject = ? AND predicate = ? AND is_active = 1
+                """, (session_id, subject.lower(), predicate.lower()))
+                
+                existing = [row["id"] for row in cursor.fetchall()]
+                
+                # Mark existing conflicting memories as inactive
+                for existing_id in existing:
                     conn.execute("""
                         UPDATE memories SET is_active = 0, updated_at = ?
                         WHERE id = ?
-                    """, (now, row["id"]))
-                logger.debug(f"[Memory] Superseded {len(existing)} existing memories")
-            
-            # Insert new memory
-            conn.execute("""
-                INSERT INTO memories 
-                (id, session_id, subject, predicate, object, memory_type, 
-                 importance, context, source_task, version, is_active, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 1, ?, ?)
-            """, (
-                memory_id,
-                session_id,
-                subject.lower(),
-                predicate.lower(),
-                obj,
-                memory_type,
-                importance,
-                context,
-                source_task,
-                now,
-                now,
-            ))
-            conn.commit()
+                    """, (now, existing_id))
+                
+                # Insert new memory
+                conn.execute("""
+                    INSERT INTO memories 
+                    (id, session_id, subject, predicate, object, memory_type, 
+                     importance, context, source_task, version, is_active, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, 1, 1, ?, ?)
+                """, (
+                    memory_id,
+                    session_id,
+                    subject.lower(),
+                    predicate.lower(),
+                    obj,
+                    memory_type,
+                    importance,
+                    context,
+                    source_task,
+                    now,
+                    now,
+                ))
+                conn.commit()
+            return existing
+        
+        # SQLite work runs off the event loop; the vector index stays on it
+        superseded = await self._db.run(insert)
+        if superseded:
+            index = self._vector_index
+            if index is not None:
+                for existing_id in superseded:
+                    index.remove(existing_id)
+            logger.debug(f"[Memory] Superseded {len(superseded)} existing memories")
         
         # Generate and store embedding asynchronously
         memory_text = f"{subject} {predicate} {obj}"
         embedding = await self.get_embedding(memory_text)
         
         if embedding:
-            with self._get_connection() as conn:
-                conn.execute("""
-                    INSERT OR REPLACE INTO memory_embeddings 
-                    (memory_id, embedding, model, created_at)
-                    VALUES (?, ?, 'text-embedding-3-small', ?)
-                """, (memory_id, self._embedding_to_bytes(embedding), now))
-                conn.commit()
+            def insert_embedding():
+                with self._get_connection() as conn:
+                    conn.execute("""
+                        INSERT OR REPLACE INTO memory_embeddings 
+                        (memory_id, embedding, model, created_at)
+                        VALUES (?, ?, 'text-embedding-3-small', ?)
+                    """, (memory_id, self._embedding_to_bytes(embedding), now))
+                    conn.commit()
+            
+            await self._db.run(insert_embedding)
+            
+            index = await self._get_vector_index()
+            if index is not None:
+                index.add(memory_id, session_id, embedding)
+        
+        if superseded or embedding:
+            await self._sync_index_marker()
         
         logger.debug(f"[Memory] Added: {subject} {predicate} {obj} (id={memory_id})")
         return memory_id
@@ -993,18 +1310,35 @@ class SemanticMemoryStore:
         
         if query_embedding is None:
             # Fallback to keyword search if embeddings unavailable
-            return self._keyword_search(query, session_id, limit)
+            return await self._db.run(self._keyword_search, query, session_id, limit)
         
-        # Get all active memories with embeddings
-        with self._get_connection() as conn:
-            cursor = conn.execute("""
-                SELECT m.*, e.embedding
-                FROM memories m
-                JOIN memory_embeddings e ON m.id = e.memory_id
-                WHERE m.session_id = ? AND m.is_active = 1
-            """, (session_id,))
+        index = await self._get_vector_index()
+        if index is not None:
+            hits = index.search(query_embedding, session_id, limit=limit, threshold=threshold)
+            if not hits:
+                return []
+            
+            rows = await self._db.run(self._fetch_memories, [memory_id for memory_id, _ in hits])
             
-            rows = cursor.fetchall()
+            results = []
+            for memory_id, score in hits:
+                memory_dict = rows.get(memory_id)
+                if memory_dict is not None:
+                    memory_dict["score"] = score
+                    results.append(memory_dict)
+            return results
+        
+        # No numpy: scan all active memories with embeddings
+        def fetch_embedded():
+            with self._get_connection() as conn:
+                return conn.execute("""
+                    SELECT m.*, e.embedding
+                    FROM memories m
+                    JOIN memory_embeddings e ON m.id = e.memory_id
+                    WHERE m.session_id = ? AND m.is_active = 1
+                """, (session_id,)).fetchall()
+        
+        rows = await self._db.run(fetch_embedded)
         
         if not rows:
             return []
@@ -1026,6 +1360,16 @@ class SemanticMemoryStore:
         
         return results[:limit]
     
+    def _fetch_memories(self, memory_ids: List[str]) -> Dict[str, Dict[str, Any]]:
+        """Active memories by ID"""
+        placeholders = ",".join("?" * len(memory_ids))
+        with self._get_connection() as conn:
+            cursor = conn.execute(
+                f"SELECT * FROM memories WHERE id IN ({placeholders}) AND is_active = 1",
+                memory_ids,
+            )
+            return {row["id"]: dict(row) for row in cursor.fetchall()}
+    
     def _keyword_search(
         self,
         query: str,
@@ -1106,7 +1450,12 @@ class SemanticMemoryStore:
             """, (now, memory_id))
             conn.commit()
             
-            return cursor.rowcount > 0
+            # An unopened index is reconciled with SQLite when it is first opened
+            if self._vector_index is not None:
+                self._vector_index.remove(memory_id)
+                self._vector_index.set_source_marker(self._index_marker(conn))
+        
+        return cursor.rowcount > 0
     
     def get_stats(self) -> Dict[str, Any]:
         """Get memory store statistics"""
@@ -1134,6 +1483,11 @@ class SemanticMemoryStore:
             "total_memories": total_count,
             "embeddings": embedding_count,
             "by_importance": by_importance,
+            "vector_index": {
+                "mode": self._vector_index.mode,
+                "vectors": len(self._vector_index),
+                "skipped": self._vector_index.skipped,
+            } if self._vector_index is not None else None,
             "db_path": self.db_path,
         }
 
@@ -0,0 +1,452 @@
+# -*- coding: utf-8 -*-
+"""
+Memory Vector Index - Persistent top-k index for SemanticMemoryStore
+
+Layout (next to memory.db):
+    memory.vec      - float32 matrix, one L2-normalized row per embedding (mmap)
+    memory.vec.log  - append-only row log ("+<TAB>row<TAB>memory_id<TAB>session"
+                      for adds, "-<TAB>memory_id" for removals,
+                      "=<TAB>marker<TAB>skipped" for the source marker)
+
+SQLite stays the source of truth. The store records a marker of the
+memory_embeddings state it last synced (row count, max rowid, latest
+update) after each write; on open the index is rebuilt if the marker does
+not match the database (first run, crash between the DB commit and the
+index write, edits made outside the store, older DBs).
+
+Modes:
+    flat - exact search, one NumPy matmul over the mapped matrix
+    hnsw - approximate search via hnswlib (optional dependency), falls back
+           to flat if hnswlib is not installed
+"""
+
+import os
+import logging
+import threading
+from typing import Dict, Iterable, List, Optional, Tuple
+
+logger = logging.getLogger("nogicos.knowledge")
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+try:
+    import hnswlib
+    HNSWLIB_AVAILABLE = True
+except ImportError:
+    HNSWLIB_AVAILABLE = False
+
+
+INDEX_MODES = ("flat", "hnsw")
+
+
+class MemoryVectorIndex:
+    """
+    Normalized float32 embedding matrix with session-scoped top-k search.
+
+    Rows are only ever appended; removals are tombstones. The matrix file
+    grows geometrically and is compacted when more than half of the rows
+    are dead.
+    """
+
+    INITIAL_CAPACITY = 1024
+    COMPACT_RATIO = 0.5
+    # Below this share of live rows, gather the session's rows before the
+    # matmul instead of scoring the whole matrix and masking.
+    GATHER_RATIO = 0.25
+    # HNSW results are post-filtered by session, so over-fetch candidates
+    HNSW_OVERSAMPLE = 4
+
+    def __init__(self, base_path: str, dim: int, mode: str = "flat"):
+        """
+        Open (or create) the index.
+
+        Args:
+            base_path: Path prefix, e.g. ~/.nogicos/memory -> memory.vec
+            dim: Embedding dimension
+            mode: "flat" or "hnsw"
+        """
+        if not NUMPY_AVAILABLE:
+            raise RuntimeError("numpy is required for MemoryVectorIndex")
+        if mode not in INDEX_MODES:
+            raise ValueError(f"Unknown index mode: {mode} (expected one of {INDEX_MODES})")
+        if mode == "hnsw" and not HNSWLIB_AVAILABLE:
+            logger.warning("[MemoryIndex] hnswlib not installed, using flat index")
+            mode = "flat"
+
+        self.dim = dim
+        self.mode = mode
+        self.vec_path = base_path + ".vec"
+        self.log_path = base_path + ".vec.log"
+
+        self._lock = threading.RLock()
+        self._matrix = None           # np.memmap (capacity, dim)
+        self._capacity = 0
+        self._count = 0               # rows used (live + dead)
+        self._live = np.zeros(0, dtype=bool)
+        self._session_codes = np.zeros(0, dtype=np.int32)
+        self._row_ids: List[str] = []
+        self._id_to_row: Dict[str, int] = {}
+        self._session_to_code: Dict[str, int] = {}
+        self._session_rows: Dict[int, np.ndarray] = {}  # cache, invalidated on write
+        self._hnsw = None
+        self._log_file = None
+        self.source_marker: Optional[str] = None  # DB state the index was last synced with
+        self.skipped = 0                          # Embeddings that could not be indexed (zero norm, bad dim)
+
+        self._load()
+
+    # ========================================================================
+    # Persistence
+    # ========================================================================
+
+    def _load(self):
+        """Load the matrix and replay the row log"""
+        entries: List[Tuple[int, str, str]] = []
+        removed = set()
+        marker, skipped = None, 0
+
+        if os.path.exists(self.log_path) and os.path.exists(self.vec_path):
+            with open(self.log_path, "r", encoding="utf-8") as f:
+                for line in f:
+                    parts = line.rstrip("\n").split("\t")
+                    if parts[0] == "+" and len(parts) == 4:
+                        entries.append((int(parts[1]), parts[2], parts[3]))
+                    elif parts[0] == "-" and len(parts) == 2:
+                        removed.add((parts[1], len(entries)))
+                    elif parts[0] == "=" and len(parts) == 3:
+                        marker, skipped = parts[1], int(parts[2])
+
+        row_bytes = self.dim * 4
+        file_rows = os.path.getsize(self.vec_path) // row_bytes if os.path.exists(self.vec_path) else 0
+
+        # A torn write leaves log rows without matrix data; drop them
+        # (and the marker, which no longer describes the index)
+        complete = [e for e in entries if e[0] < file_rows]
+        if len(complete) != len(entries):
+            marker = None
+        entries = complete
+        if any(row != i for i, (row, _, _) in enumerate(entries)):
+            logger.warning("[MemoryIndex] Row log out of order, resetting index")
+            entries, removed, marker = [], set(), None
+        if not entries:
+            file_rows = 0
+        self.source_marker, self.skipped = marker, skipped
+
+        self._count = len(entries)
+        self._open_matrix(max(file_rows, self.INITIAL_CAPACITY), reset=(file_rows == 0))
+        self._ensure_arrays(self._capacity)
+
+        for row, memory_id, session_id in entries:
+            self._register_row(row, memory_id, session_id)
+        # A removal only kills rows that existed when it was logged
+        for memory_id, added_before in sorted(removed, key=lambda r: r[1]):
+            row = self._id_to_row.get(memory_id)
+            if row is not None and row < added_before:
+                self._live[row] = False
+                del self._id_to_row[memory_id]
+
+        self._log_file = open(self.log_path, "a" if entries or marker else "w", encoding="utf-8")
+        self._build_hnsw()
+
+    def _open_matrix(self, capacity: int, reset: bool = False):
+        """(Re)map the matrix file with at least `capacity` rows"""
+        if self._matrix is not None:
+            self._matrix.flush()
+            self._matrix = None
+        mode = "w+" if reset or not os.path.exists(self.vec_path) else "r+"
+        if mode == "r+":
+            with open(self.vec_path, "r+b") as f:
+                f.truncate(capacity * self.dim * 4)
+        self._matrix = np.memmap(self.vec_path, dtype=np.float32, mode=mode, shape=(capacity, self.dim))
+        self._capacity = capacity
+
+    def _ensure_arrays(self, capacity: int):
+        """Grow the per-row bookkeeping arrays"""
+        if len(self._live) < capacity:
+            live = np.zeros(capacity, dtype=bool)
+            live[:len(self._live)] = self._live
+            codes = np.full(capacity, -1, dtype=np.int32)
+            codes[:len(self._session_codes)] = self._session_codes
+            self._live, self._session_codes = live, codes
+
+    def _register_row(self, row: int, memory_id: str, session_id: str):
+        """Record row metadata in memory (no I/O)"""
+        code = self._session_to_code.setdefault(session_id, len(self._session_to_code))
+        if len(self._row_ids) <= row:
+            self._row_ids.extend([""] * (row + 1 - len(self._row_ids)))
+        self._row_ids[row] = memory_id
+        previous = self._id_to_row.get(memory_id)
+        if previous is not None:
+            self._live[previous] = False
+        self._id_to_row[memory_id] = row
+        self._live[row] = True
+        self._session_codes[row] = code
+
+    def _build_hnsw(self):
+        """Build the optional HNSW graph from live rows"""
+        if self.mode != "hnsw":
+            return
+        self._hnsw = hnswlib.Index(space="ip", dim=self.dim)
+        self._hnsw.init_index(max_elements=self._capacity, ef_construction=200, M=16)
+        self._hnsw.set_ef(64)
+        rows = np.flatnonzero(self._live[:self._count])
+        if len(rows):
+            self._hnsw.add_items(np.asarray(self._matrix[rows]), rows)
+
+    def flush(self):
+        """Flush pending matrix and log writes to disk"""
+        with self._lock:
+            if self._matrix is not None:
+                self._matrix.flush()
+            if self._log_file is not None:
+                self._log_file.flush()
+
+    def close(self):
+        """Flush and release file handles"""
+        with self._lock:
+            self.flush()
+            if self._log_file is not None:
+                self._log_file.close()
+                self._log_file = None
+            self._matrix = None
+
+    def set_source_marker(self, marker: str):
+        """Record the database state the index now reflects"""
+        with self._lock:
+            self.source_marker = marker
+            self._log_file.write(f"=\t{marker}\t{self.skipped}\n")
+            self._log_file.flush()
+
+    # ========================================================================
+    # Mutation
+    # ========================================================================
+
+    def _normalize(self, vector: Iterable[float]) -> Optional["np.ndarray"]:
+        v = np.asarray(vector, dtype=np.float32).reshape(-1)
+        if v.shape[0] != self.dim:
+            logger.warning(f"[MemoryIndex] Dimension mismatch: {v.shape[0]} != {self.dim}")
+            return None
+        norm = float(np.linalg.norm(v))
+        if norm == 0.0:
+            return None
+        return v / norm
+
+    def add(self, memory_id: str, session_id: str, embedding: Iterable[float]) -> bool:
+        """
+        Add (or replace) a memory's vector.
+
+        Returns:
+            True if the vector was indexed
+        """
+        v = self._normalize(embedding)
+        with self._lock:
+            if v is None:
+                self.skipped += 1
+                return False
+            self._append(memory_id, session_id, v)
+            self._log_file.flush()
+        return True
+
+    def _append(self, memory_id: str, session_id: str, v: "np.ndarray"):
+        """Write a normalized vector to the next free row (caller holds the lock)"""
+        row = self._count
+        if row >= self._capacity:
+            new_capacity = self._capacity * 2
+            self._open_matrix(new_capacity)
+            self._ensure_arrays(new_capacity)
+            if self._hnsw is not None:
+                self._hnsw.resize_index(new_capacity)
+
+        previous = self._id_to_row.get(memory_id)
+        if previous is not None:
+            self._session_rows.pop(int(self._session_codes[previous]), None)
+        self._matrix[row] = v
+        self._count += 1
+        self._register_row(row, memory_id, session_id)
+        self._session_rows.pop(int(self._session_codes[row]), None)
+        self._log_file.write(f"+\t{row}\t{memory_id}\t{session_id}\n")
+
+        if self._hnsw is not None:
+            if previous is not None:
+                self._hnsw.mark_deleted(previous)
+            self._hnsw.add_items(v.reshape(1, -1), np.array([row]))
+
+    def remove(self, memory_id: str) -> bool:
+        """Tombstone a memory's vector. Returns True if it was indexed."""
+        with self._lock:
+            row = self._id_to_row.pop(memory_id, None)
+            if row is None:
+                return False
+            self._live[row] = False
+            self._session_rows.pop(int(self._session_codes[row]), None)
+            self._log_file.write(f"-\t{memory_id}\n")
+            self._log_file.flush()
+            if self._hnsw is not None:
+                self._hnsw.mark_deleted(row)
+
+            if self._count and (self._count - len(self._id_to_row)) / self._count > self.COMPACT_RATIO:
+                self._compact()
+        return True
+
+    def _compact(self):
+        """Rewrite the matrix and log with live rows only"""
+        rows = np.flatnonzero(self._live[:self._count])
+        vectors = np.array(self._matrix[rows])
+        entries = []
+        code_to_session = {c: s for s, c in self._session_to_code.items()}
+        for row in rows:
+            entries.append((self._row_ids[row], code_to_session[int(self._session_codes[row])]))
+
+        self._log_file.close()
+        self._matrix = None
+        self._count = 0
+        self._live = np.zeros(0, dtype=bool)
+        self._session_codes = np.zeros(0, dtype=np.int32)
+        self._row_ids = []
+        self._id_to_row = {}
+        self._session_to_code = {}
+        self._session_rows = {}
+
+        capacity = max(self.INITIAL_CAPACITY, len(rows) * 2)
+        self._open_matrix(capacity, reset=True)
+        self._ensure_arrays(capacity)
+        self._matrix[:len(rows)] = vectors
+        tmp_log = self.log_path + ".tmp"
+        with open(tmp_log, "w", encoding="utf-8") as f:
+            for row, (memory_id, session_id) in enumerate(entries):
+                self._register_row(row, memory_id, session_id)
+                f.write(f"+\t{row}\t{memory_id}\t{session_id}\n")
+            if self.source_marker is not None:
+                f.write(f"=\t{self.source_marker}\t{self.skipped}\n")
+        self._count = len(rows)
+        self._matrix.flush()
+        os.replace(tmp_log, self.log_path)
+        self._log_file = open(self.log_path, "a", encoding="utf-8")
+        self._build_hnsw()
+        logger.debug(f"[MemoryIndex] Compacted to {len(rows)} rows")
+
+    def rebuild(self, items: Iterable[Tuple[str, str, bytes]]):
+        """
+        Replace the index contents. The caller records the new source
+        marker afterwards.
+
+        Args:
+            items: (memory_id, session_id, float32 embedding bytes) tuples
+        """
+        with self._lock:
+            self._log_file.close()
+            if os.path.exists(self.log_path):
+                os.remove(self.log_path)
+            self._matrix = None
+            self._count = 0
+            self._live = np.zeros(0, dtype=bool)
+            self._session_codes = np.zeros(0, dtype=np.int32)
+            self._row_ids = []
+            self._id_to_row = {}
+            self._session_to_code = {}
+            self._session_rows = {}
+            self.source_marker = None
+            self.skipped = 0
+            self._open_matrix(self.INITIAL_CAPACITY, reset=True)
+            self._ensure_arrays(self._capacity)
+            self._log_file = open(self.log_path, "a", encoding="utf-8")
+            self._build_hnsw()
+
+            added = 0
+            for memory_id, session_id, blob in items:
+                v = self._normalize(np.frombuffer(blob, dtype=np.float32))
+                if v is not None:
+                    self._append(memory_id, session_id, v)
+                    added += 1
+                else:
+                    self.skipped += 1
+            self.flush()
+        logger.info(f"[MemoryIndex] Rebuilt index with {added} vectors ({self.skipped} skipped)")
+
+    # ========================================================================
+    # Query
+    # ========================================================================
+
+    def __len__(self) -> int:
+        return len(self._id_to_row)
+
+    def __contains__(self, memory_id: str) -> bool:
+        return memory_id in self._id_to_row
+
+    def _rows_for_session(self, code: int) -> "np.ndarray":
+        rows = self._session_rows.get(code)
+        if rows is None:
+            n = self._count
+            rows = np.flatnonzero(self._live[:n] & (self._session_codes[:n] == code))
+            self._session_rows[code] = rows
+        return rows
+
+    def search(
+        self,
+        query: Iterable[float],
+        session_id: str,
+        limit: int = 5,
+        threshold: float = 0.0,
+    ) -> List[Tuple[str, float]]:
+        """
+        Top-k cosine search within a session.
+
+        Returns:
+            (memory_id, score) pairs, highest score first
+        """
+        q = self._normalize(query)
+        if q is None or limit <= 0:
+            return []
+
+        with self._lock:
+            code = self._session_to_code.get(session_id)
+            if code is None:
+                return []
+            if self._hnsw is not None:
+                return self._search_hnsw(q, code, limit, threshold)
+            return self._search_flat(q, code, limit, threshold)
+
+    def _search_flat(self, q, code: int, limit: int, threshold: float) -> List[Tuple[str, float]]:
+        rows = self._rows_for_session(code)
+        if len(rows) == 0:
+            return []
+        n = self._count
+        if len(rows) < n * self.GATHER_RATIO:
+            scores = self._matrix[rows] @ q
+        else:
+            scores = (self._matrix[:n] @ q)[rows]
+
+        k = min(limit, len(rows))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return [
+            (self._row_ids[rows[i]], float(scores[i]))
+            for i in top
+            if scores[i] >= threshold
+        ]
+
+    def _search_hnsw(self, q, code: int, limit: int, threshold: float) -> List[Tuple[str, float]]:
+        live = len(self._id_to_row)
+        if live == 0:
+            return []
+        wanted = min(limit, len(self._rows_for_session(code)))
+        if wanted == 0:
+            return []
+        k = min(live, limit * self.HNSW_OVERSAMPLE)
+        labels, distances = self._hnsw.knn_query(q.reshape(1, -1), k=k)
+        candidates = []
+        for label, distance in zip(labels[0], distances[0]):
+            if self._session_codes[label] != code or not self._live[label]:
+                continue
+            candidates.append((self._row_ids[label], 1.0 - float(distance)))  # "ip" distance is 1 - dot
+            if len(candidates) >= wanted:
+                break
+        if len(candidates) < wanted:
+            # Other sessions crowded the neighbours out; the session's own
+            # rows are few enough here to scan exactly
+            return self._search_flat(q, code, limit, threshold)
+        return [(memory_id, score) for memory_id, score in candidates if score >= threshold]
@@ -7,6 +7,7 @@ Includes:
 - Module tracing (ModuleTracer)
 - LangSmith integration (langsmith_tracer)
 - Performance metrics (PerformanceMetrics, PerformanceSLO)
+- Spans (span, get_tracer, flame_breakdown)
 """
 
 import logging
@@ -123,10 +124,27 @@ class ModuleTracer:
 from .metrics import (
     PerformanceMetrics,
     LatencyHistogram,
+    DDSketch,
+    WindowedSketch,
+    LLMCallStats,
     get_metrics,
     set_metrics,
 )
 
+# Spans - per-step tracing across agent, LLM, tools and I/O
+from .spans import (
+    Span,
+    Tracer,
+    span,
+    traced,
+    current_span,
+    set_task_id,
+    get_tracer,
+    set_tracer,
+    configure_tracing,
+    flame_breakdown,
+)
+
 # PerformanceSLO 从 config 导入（唯一定义）
 from ..config import PerformanceSLO
 
@@ -143,6 +161,20 @@ __all__ = [
     'PerformanceMetrics',
     'PerformanceSLO',
     'LatencyHistogram',
+    'DDSketch',
+    'WindowedSketch',
+    'LLMCallStats',
     'get_metrics',
     'set_metrics',
+    # Spans
+    'Span',
+    'Tracer',
+    'span',
+    'traced',
+    'current_span',
+    'set_task_id',
+    'get_tracer',
+    'set_tracer',
+    'configure_tracing',
+    'flame_breakdown',
 ]
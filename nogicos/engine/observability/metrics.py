@@ -5,20 +5,20 @@ NogicOS 性能指标收集
 用于 SLO 监控和告警。
 
 指标类型:
-1. 延迟分布 (Histogram) - 计算分位数
+1. 延迟分布 (Histogram) - 流式分位数草图（DDSketch），带 1m/5m/1h 窗口，可跨进程合并
 2. 计数器 (Counter) - 累计统计
 3. 仪表盘 (Gauge) - 瞬时值
 
 参考:
 - Prometheus 指标模型
 - OpenTelemetry Metrics
+- DDSketch (Masson et al., VLDB 2019)
 """
 
+import math
 import time
 import logging
-from dataclasses import dataclass, field
-from typing import Dict, List, Optional, Callable, Any, TYPE_CHECKING
-from collections import deque
+from typing import Dict, List, Optional, Callable, Any, Tuple, TYPE_CHECKING
 from enum import Enum
 import asyncio
 
@@ -35,40 +35,306 @@ class MetricType(Enum):
     GAUGE = "gauge"
 
 
-@dataclass
+# ========== 流式分位数草图 ==========
+
+class DDSketch:
+    """
+    对数分桶分位数草图（DDSketch）
+    
+    值 x 落入桶 ceil(log_gamma(x))，任意分位数的相对误差不超过 relative_accuracy。
+    - 记录 O(1)：一次对数 + 一次字典自增
+    - 内存固定：桶数超过 max_buckets 时合并最低的桶（只影响极低分位数）
+    - 可合并：相同精度的草图按桶相加，可跨进程聚合（to_dict / from_dict）
+    """
+    
+    __slots__ = (
+        "relative_accuracy", "max_buckets", "min_value", "gamma", "_log_gamma",
+        "bins", "zero_count", "count", "sum", "min", "max",
+    )
+    
+    def __init__(self, relative_accuracy: float = 0.01, max_buckets: int = 2048, min_value: float = 1e-3):
+        """
+        Args:
+            relative_accuracy: 分位数相对误差上限
+            max_buckets: 桶数上限（固定内存）
+            min_value: 小于等于该值的样本计入零桶（延迟 ms 下即 1µs）
+        """
+        self.relative_accuracy = relative_accuracy
+        self.max_buckets = max_buckets
+        self.min_value = min_value
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self._log_gamma = math.log(self.gamma)
+        self.bins: Dict[int, int] = {}
+        self.zero_count = 0
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+    
+    def add(self, value: float, count: int = 1):
+        """记录样本"""
+        self.count += count
+        self.sum += value * count
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        
+        if value <= self.min_value:
+            self.zero_count += count
+            return
+        index = math.ceil(math.log(value) / self._log_gamma)
+        bins = self.bins
+        if index in bins:
+            bins[index] += count
+        else:
+            bins[index] = count
+            if len(bins) > self.max_buckets:
+                self._collapse()
+    
+    def _collapse(self):
+        """合并最低的两个桶，保持桶数上限"""
+        low, second = sorted(self.bins)[:2]
+        self.bins[second] += self.bins.pop(low)
+    
+    def quantile(self, q: float) -> float:
+        """
+        估算分位数
+        
+        Args:
+            q: 0-1 之间，如 0.99 表示 P99
+        """
+        if self.count == 0:
+            return 0.0
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        
+        rank = q * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return max(self.min, 0.0)
+        for index in sorted(self.bins):
+            seen += self.bins[index]
+            if seen > rank:
+                # 桶中点（对数意义），保证相对误差
+                estimate = 2 * self.gamma ** index / (self.gamma + 1)
+                return min(max(estimate, self.min), self.max)
+        return self.max
+    
+    @property
+    def avg(self) -> float:
+        return self.sum / self.count if self.count else 0.0
+    
+    def merge(self, other: "DDSketch") -> "DDSketch":
+        """把另一个草图合并进来（原地），返回 self"""
+        if not math.isclose(other.gamma, self.gamma):
+            raise ValueError("Cannot merge sketches with different relative accuracy")
+        if other.count == 0:
+            return self
+        for index, count in other.bins.items():
+            self.bins[index] = self.bins.get(index, 0) + count
+        while len(self.bins) > self.max_buckets:
+            self._collapse()
+        self.zero_count += other.zero_count
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        return self
+    
+    def copy(self) -> "DDSketch":
+        return self.empty_like().merge(self)
+    
+    def empty_like(self) -> "DDSketch":
+        return DDSketch(self.relative_accuracy, self.max_buckets, self.min_value)
+    
+    def to_dict(self) -> dict:
+        """可 JSON 序列化的状态（用于跨进程合并）"""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "min_value": self.min_value,
+            "bins": {str(k): v for k, v in self.bins.items()},
+            "zero_count": self.zero_count,
+            "count": self.count,
+            "sum": self.sum,
+            "min": self.min if self.count else None,
+            "max": self.max if self.count else None,
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict, max_buckets: int = 2048) -> "DDSketch":
+        sketch = cls(data["relative_accuracy"], max_buckets, data.get("min_value", 1e-3))
+        sketch.bins = {int(k): v for k, v in data.get("bins", {}).items()}
+        sketch.zero_count = data.get("zero_count", 0)
+        sketch.count = data.get("count", 0)
+        sketch.sum = data.get("sum", 0.0)
+        if sketch.count:
+            sketch.min = data["min"]
+            sketch.max = data["max"]
+        return sketch
+
+
+# 时间窗口: 名称 -> (窗口秒数, 分片数)
+# 每个窗口是一个按墙钟时间分片的环，过期分片在下次写入时被复用；
+# 查询合并仍在窗口内的分片，因此窗口边界的粒度为 窗口 / 分片数。
+DEFAULT_WINDOWS: Dict[str, Tuple[int, int]] = {
+    "1m": (60, 6),
+    "5m": (300, 10),
+    "1h": (3600, 12),
+}
+
+
+class WindowedSketch:
+    """
+    带时间窗口的草图：全量 + 1m / 5m / 1h 滚动窗口
+    
+    每次记录只更新全量草图和每个窗口的当前分片（O(1)），
+    分片按墙钟时间对齐，不同进程导出的状态可以逐分片合并。
+    """
+    
+    def __init__(
+        self,
+        relative_accuracy: float = 0.01,
+        windows: Optional[Dict[str, Tuple[int, int]]] = None,
+        clock: Callable[[], float] = time.time,
+    ):
+        self.relative_accuracy = relative_accuracy
+        self.windows = dict(windows or DEFAULT_WINDOWS)
+        self.clock = clock
+        self.total = DDSketch(relative_accuracy)
+        # 窗口名 -> 分片列表 [epoch, sketch]
+        self._rings: Dict[str, List[list]] = {
+            name: [[-1, None] for _ in range(slots)]
+            for name, (_, slots) in self.windows.items()
+        }
+        self._version = 0
+        self._merged: Dict[str, Tuple[int, int, DDSketch]] = {}
+    
+    def record(self, value: float):
+        """记录样本"""
+        now = self.clock()
+        self.total.add(value)
+        for name, (span, slots) in self.windows.items():
+            epoch = int(now * slots // span)
+            slot = self._rings[name][epoch % slots]
+            if slot[0] != epoch:
+                slot[0] = epoch
+                slot[1] = DDSketch(self.relative_accuracy)
+            slot[1].add(value)
+        self._version += 1
+    
+    def window(self, name: Optional[str] = None) -> DDSketch:
+        """
+        获取窗口内样本合并后的草图
+        
+        Args:
+            name: 窗口名（如 "5m"），None 或 "all" 表示全量
+        """
+        if name is None or name == "all":
+            return self.total
+        if name not in self.windows:
+            raise KeyError(f"Unknown window: {name} (expected one of {list(self.windows)})")
+        
+        span, slots = self.windows[name]
+        current = int(self.clock() * slots // span)
+        cached = self._merged.get(name)
+        if cached and cached[0] == self._version and cached[1] == current:
+            return cached[2]
+        
+        merged = DDSketch(self.relative_accuracy)
+        for epoch, sketch in self._rings[name]:
+            if sketch is not None and current - slots < epoch <= current:
+                merged.merge(sketch)
+        self._merged[name] = (self._version, current, merged)
+        return merged
+    
+    def merge(self, other: "WindowedSketch") -> "WindowedSketch":
+        """合并另一个窗口草图（分片按 epoch 对齐，较旧的分片被忽略）"""
+        self.total.merge(other.total)
+        for name, ring in other._rings.items():
+            if name not in self._rings or self.windows[name] != other.windows[name]:
+                continue
+            slots = self.windows[name][1]
+            for epoch, sketch in ring:
+                if sketch is None:
+                    continue
+                slot = self._rings[name][epoch % slots]
+                if slot[0] == epoch:
+                    slot[1].merge(sketch)
+                elif slot[0] < epoch:
+                    slot[0], slot[1] = epoch, sketch.copy()
+        self._version += 1
+        return self
+    
+    def to_dict(self) -> dict:
+        """可 JSON 序列化的状态（用于跨进程合并）"""
+        return {
+            "relative_accuracy": self.relative_accuracy,
+            "total": self.total.to_dict(),
+            "windows": {
+                name: {
+                    "span": self.windows[name][0],
+                    "slots": [
+                        [epoch, sketch.to_dict()]
+                        for epoch, sketch in ring if sketch is not None
+                    ],
+                }
+                for name, ring in self._rings.items()
+            },
+        }
+    
+    @classmethod
+    def from_dict(cls, data: dict, clock: Callable[[], float] = time.time) -> "WindowedSketch":
+        windows = {
+            name: (info["span"], DEFAULT_WINDOWS.get(name, (info["span"], max(1, len(info["slots"]))))[1])
+            for name, info in data.get("windows", {}).items()
+        }
+        sketch = cls(data["relative_accuracy"], windows or None, clock)
+        sketch.total = DDSketch.from_dict(data["total"])
+        for name, info in data.get("windows", {}).items():
+            slots = sketch.windows[name][1]
+            for epoch, sketch_data in info["slots"]:
+                sketch._rings[name][epoch % slots] = [epoch, DDSketch.from_dict(sketch_data)]
+        return sketch
+
+
 class LatencyHistogram:
     """
     延迟直方图 - 计算分位数
     
-    使用滑动窗口保存最近 N 个样本
+    基于 WindowedSketch：记录 O(1)、内存固定、分位数相对误差 1%。
+    p50/p90/p99 等属性针对 default_window（默认最近 5 分钟）。
     """
     
-    name: str
-    window_size: int = 100  # 滑动窗口大小
-    _samples: deque = field(default_factory=lambda: deque(maxlen=100))
-    
-    def __post_init__(self):
-        self._samples = deque(maxlen=self.window_size)
+    def __init__(
+        self,
+        name: str,
+        relative_accuracy: float = 0.01,
+        default_window: str = "5m",
+        clock: Callable[[], float] = time.time,
+    ):
+        self.name = name
+        self.default_window = default_window
+        self.sketch = WindowedSketch(relative_accuracy, clock=clock)
     
     def record(self, duration_ms: float):
         """记录一个延迟样本"""
-        self._samples.append(duration_ms)
+        self.sketch.record(duration_ms)
     
-    def percentile(self, p: float) -> float:
+    def percentile(self, p: float, window: Optional[str] = None) -> float:
         """
         计算分位数
         
         Args:
             p: 分位数 (0-100)，如 50 表示 P50
+            window: 时间窗口（"1m" / "5m" / "1h" / "all"），默认 default_window
             
         Returns:
             分位数值
         """
-        if not self._samples:
-            return 0
-        sorted_samples = sorted(self._samples)
-        idx = int(len(sorted_samples) * p / 100)
-        return sorted_samples[min(idx, len(sorted_samples) - 1)]
+        return self.sketch.window(window or self.default_window).quantile(p / 100)
     
     @property
     def p50(self) -> float:
@@ -88,34 +354,146 @@ class LatencyHistogram:
     @property
     def avg(self) -> float:
         """平均值"""
-        return sum(self._samples) / len(self._samples) if self._samples else 0
+        return self.sketch.window(self.default_window).avg
     
     @property
     def min(self) -> float:
         """最小值"""
-        return min(self._samples) if self._samples else 0
+        return self.summary()["min"]
     
     @property
     def max(self) -> float:
         """最大值"""
-        return max(self._samples) if self._samples else 0
+        return self.summary()["max"]
     
     @property
     def count(self) -> int:
-        """样本数量"""
-        return len(self._samples)
+        """样本数量（default_window 内）"""
+        return self.sketch.window(self.default_window).count
+    
+    def summary(self, window: Optional[str] = None) -> dict:
+        """一个窗口的统计（只合并一次分片）"""
+        sketch = self.sketch.window(window or self.default_window)
+        return {
+            "count": sketch.count,
+            "p50": sketch.quantile(0.50),
+            "p90": sketch.quantile(0.90),
+            "p99": sketch.quantile(0.99),
+            "avg": sketch.avg,
+            "min": sketch.min if sketch.count else 0,
+            "max": sketch.max if sketch.count else 0,
+        }
+    
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        """合并另一个直方图（如其他进程导出的）"""
+        self.sketch.merge(other.sketch)
+        return self
+    
+    def export(self) -> dict:
+        """导出草图状态（JSON 可序列化，用于跨进程合并）"""
+        return {"name": self.name, "sketch": self.sketch.to_dict()}
+    
+    @classmethod
+    def from_export(cls, data: dict, clock: Callable[[], float] = time.time) -> "LatencyHistogram":
+        histogram = cls(data["name"], clock=clock)
+        histogram.sketch = WindowedSketch.from_dict(data["sketch"], clock=clock)
+        return histogram
     
     def to_dict(self) -> dict:
-        """导出为字典"""
+        """导出为字典（顶层为 default_window，windows 下为各窗口）"""
         return {
             "name": self.name,
-            "count": self.count,
-            "p50": self.p50,
-            "p90": self.p90,
-            "p99": self.p99,
-            "avg": self.avg,
-            "min": self.min,
-            "max": self.max,
+            "window": self.default_window,
+            **self.summary(),
+            "windows": {
+                window: self.summary(window)
+                for window in [*self.sketch.windows, "all"]
+            },
+        }
+
+
+class LLMCallStats:
+    """
+    按 (模型, prompt cache 状态) 聚合的 LLM 调用计时
+    
+    把一次调用拆成四段，用于判断慢调用的瓶颈：
+    - network: 请求发出 → message_start（连接、上传、服务端接收）
+    - queueing: message_start → 首个 token（服务端排队 + 预填充）
+    - generation: 首个 → 最后一个 token
+    - retry: 失败尝试 + 退避等待
+    """
+    
+    PHASES = ("network", "queueing", "generation", "retry")
+    
+    def __init__(self, model: str, cache: str, clock: Callable[[], float] = time.time):
+        self.model = model
+        self.cache = cache
+        prefix = f"llm_{model}_{cache}"
+        self.ttft = LatencyHistogram(f"{prefix}_ttft", clock=clock)
+        self.network = LatencyHistogram(f"{prefix}_network", clock=clock)
+        self.queueing = LatencyHistogram(f"{prefix}_queueing", clock=clock)
+        self.generation = LatencyHistogram(f"{prefix}_generation", clock=clock)
+        self.retry = LatencyHistogram(f"{prefix}_retry", clock=clock)
+        self.total = LatencyHistogram(f"{prefix}_total", clock=clock)
+        self.inter_token = LatencyHistogram(f"{prefix}_inter_token", clock=clock)
+        self.tokens_per_second = LatencyHistogram(f"{prefix}_tokens_per_second", clock=clock)
+        
+        self.calls = 0
+        self.streaming_calls = 0
+        self.retried_calls = 0
+        self.fallbacks = 0
+        self.output_tokens = 0
+    
+    def record(self, timing: Any):
+        """记录一次调用（CallTiming）"""
+        self.calls += 1
+        self.output_tokens += timing.output_tokens
+        if timing.streaming:
+            self.streaming_calls += 1
+        if timing.attempts > 1 or timing.fallback:
+            self.retried_calls += 1
+        if timing.fallback:
+            self.fallbacks += 1
+        
+        self.total.record(timing.total_ms + timing.retry_ms)
+        self.retry.record(timing.retry_ms)
+        if timing.ttft_ms is not None:
+            self.ttft.record(timing.ttft_ms)
+        if timing.queue_ms is not None:
+            self.network.record(timing.queue_ms)
+            if timing.ttft_ms is not None:
+                self.queueing.record(max(0.0, timing.ttft_ms - timing.queue_ms))
+        if timing.streaming and timing.ttft_ms is not None:
+            self.generation.record(timing.generation_ms)
+        for gap in timing.inter_token_ms:
+            self.inter_token.record(gap)
+        tokens_per_second = timing.tokens_per_second
+        if tokens_per_second is not None:
+            self.tokens_per_second.record(tokens_per_second)
+    
+    def to_dict(self, window: Optional[str] = None) -> dict:
+        """窗口内统计，以及各阶段 P50 中耗时最长的一段（bound）"""
+        phases = {
+            "network": self.network.summary(window),
+            "queueing": self.queueing.summary(window),
+            "generation": self.generation.summary(window),
+            "retry": self.retry.summary(window),
+        }
+        p50 = {name: summary["p50"] for name, summary in phases.items() if summary["count"]}
+        return {
+            "model": self.model,
+            "cache": self.cache,
+            "calls": self.calls,
+            "streaming_calls": self.streaming_calls,
+            "retried_calls": self.retried_calls,
+            "fallbacks": self.fallbacks,
+            "output_tokens": self.output_tokens,
+            "ttft_ms": self.ttft.summary(window),
+            "inter_token_ms": self.inter_token.summary(window),
+            "tokens_per_second": self.tokens_per_second.summary(window),
+            "total_ms": self.total.summary(window),
+            "phases_ms": phases,
+            "bound": max(p50, key=p50.get) if any(p50.values()) else None,
         }
 
 
@@ -135,16 +513,32 @@ class PerformanceMetrics:
     async with metrics.measure_latency("llm", "claude_call"):
         response = await call_claude(...)
     
-    # 检查 SLO
+    # 检查 SLO（默认最近 5 分钟）
     violations = metrics.check_slo(slo_config)
+    
+    # 跨进程合并
+    metrics.merge_export(worker_metrics.export())
     ```
     """
     
-    def __init__(self):
+    def __init__(self, slo_window: str = "5m", clock: Callable[[], float] = time.time):
+        """
+        Args:
+            slo_window: check_slo 默认评估的时间窗口（"1m" / "5m" / "1h" / "all"）
+            clock: 墙钟时间来源（窗口轮转用，测试可注入）
+        """
+        self.slo_window = slo_window
+        self._clock = clock
+        
         # 延迟指标
         self._tool_latencies: Dict[str, LatencyHistogram] = {}
-        self._llm_latency = LatencyHistogram("llm_response")
-        self._screenshot_latency = LatencyHistogram("screenshot")
+        self._llm_latency = self._histogram("llm_response")
+        self._screenshot_latency = self._histogram("screenshot")
+        self._llm_calls: Dict[Tuple[str, str], LLMCallStats] = {}
+        self._ocr_latency = self._histogram("ocr")
+        
+        # OCR 缓存命中（按来源：extract / tile / recognize）
+        self._ocr_lookups: Dict[str, Dict[str, int]] = {}
         
         # 计数器
         self._tool_calls = 0
@@ -183,6 +577,9 @@ class PerformanceMetrics:
         """
         return LatencyMeasurer(self, category, name)
     
+    def _histogram(self, name: str) -> LatencyHistogram:
+        return LatencyHistogram(name, clock=self._clock)
+    
     def record_tool_call(
         self, 
         tool_name: str, 
@@ -201,7 +598,7 @@ class PerformanceMetrics:
         """
         # 延迟
         if tool_name not in self._tool_latencies:
-            self._tool_latencies[tool_name] = LatencyHistogram(f"tool_{tool_name}")
+            self._tool_latencies[tool_name] = self._histogram(f"tool_{tool_name}")
         self._tool_latencies[tool_name].record(duration_ms)
         
         # 计数
@@ -215,10 +612,61 @@ class PerformanceMetrics:
         """记录 LLM 调用"""
         self._llm_latency.record(duration_ms)
     
+    def record_llm_timing(self, timing: Any):
+        """
+        记录一次 LLM 调用的分段计时
+        
+        Args:
+            timing: CallTiming（engine.agent.types），按 (model, cache) 分组
+        """
+        key = (timing.model, timing.cache)
+        stats = self._llm_calls.get(key)
+        if stats is None:
+            stats = self._llm_calls[key] = LLMCallStats(timing.model, timing.cache, clock=self._clock)
+        stats.record(timing)
+        self.record_llm_call(timing.total_ms + timing.retry_ms)
+    
+    def get_llm_summary(self, window: Optional[str] = None) -> dict:
+        """LLM 调用计时摘要（按模型和缓存状态）"""
+        window = window or self.slo_window
+        return {
+            "window": window,
+            "calls": [stats.to_dict(window) for stats in self._llm_calls.values()],
+        }
+    
     def record_screenshot(self, duration_ms: float):
         """记录截图操作"""
         self._screenshot_latency.record(duration_ms)
     
+    def record_ocr(self, source: str, hit: Optional[bool] = None, duration_ms: Optional[float] = None):
+        """
+        记录 OCR 缓存查询 / 实际 OCR 耗时
+        
+        Args:
+            source: 来源（extract / tile / recognize）
+            hit: 缓存是否命中（None 表示只记录耗时）
+            duration_ms: 实际执行 OCR 的耗时
+        """
+        if hit is not None:
+            counts = self._ocr_lookups.setdefault(source, {"hits": 0, "misses": 0})
+            counts["hits" if hit else "misses"] += 1
+        if duration_ms is not None:
+            self._ocr_latency.record(duration_ms)
+    
+    def get_ocr_summary(self) -> dict:
+        """OCR 缓存命中率（按来源）与 OCR 耗时"""
+        sources = {}
+        for source, counts in self._ocr_lookups.items():
+            lookups = counts["hits"] + counts["misses"]
+            sources[source] = {**counts, "hit_rate": counts["hits"] / max(1, lookups)}
+        hits = sum(c["hits"] for c in self._ocr_lookups.values())
+        lookups = hits + sum(c["misses"] for c in self._ocr_lookups.values())
+        return {
+            "hit_rate": hits / max(1, lookups),
+            "sources": sources,
+            "latency": self._ocr_latency.to_dict(),
+        }
+    
     def record_task_result(self, success: bool):
         """记录任务结果"""
         if success:
@@ -240,30 +688,35 @@ class PerformanceMetrics:
         self._current_memory_mb = memory_mb
         self._peak_memory_mb = max(self._peak_memory_mb, memory_mb)
     
-    def check_slo(self, slo: "PerformanceSLO") -> Dict[str, bool]:
+    def check_slo(self, slo: "PerformanceSLO", window: Optional[str] = None) -> Dict[str, bool]:
         """
         检查 SLO 是否满足
         
         Args:
             slo: SLO 配置
+            window: 延迟评估窗口，默认 slo_window；窗口内无样本的指标不参与评估
             
         Returns:
             Dict[metric_name, is_passing]
         """
         results = {}
+        window = window or self.slo_window
         
         # 延迟 SLO
         for tool_name, hist in self._tool_latencies.items():
-            if hist.count > 0:
-                results[f"{tool_name}_p50"] = hist.p50 <= slo.tool_execution_p50_ms
-                results[f"{tool_name}_p99"] = hist.p99 <= slo.tool_execution_p99_ms
+            summary = hist.summary(window)
+            if summary["count"] > 0:
+                results[f"{tool_name}_p50"] = summary["p50"] <= slo.tool_execution_p50_ms
+                results[f"{tool_name}_p99"] = summary["p99"] <= slo.tool_execution_p99_ms
         
-        if self._llm_latency.count > 0:
-            results["llm_p50"] = self._llm_latency.p50 <= slo.llm_response_p50_ms
-            results["llm_p99"] = self._llm_latency.p99 <= slo.llm_response_p99_ms
+        summary = self._llm_latency.summary(window)
+        if summary["count"] > 0:
+            results["llm_p50"] = summary["p50"] <= slo.llm_response_p50_ms
+            results["llm_p99"] = summary["p99"] <= slo.llm_response_p99_ms
         
-        if self._screenshot_latency.count > 0:
-            results["screenshot"] = self._screenshot_latency.p50 <= slo.screenshot_capture_ms
+        summary = self._screenshot_latency.summary(window)
+        if summary["count"] > 0:
+            results["screenshot"] = summary["p50"] <= slo.screenshot_capture_ms
         
         # 可靠性 SLO
         total_tasks = self._tasks_completed + self._tasks_failed
@@ -315,7 +768,9 @@ class PerformanceMetrics:
             "task_success_rate": self._tasks_completed / max(1, self._tasks_completed + self._tasks_failed),
             "total_iterations": self._total_iterations,
             "llm_latency": self._llm_latency.to_dict(),
+            "llm_calls": self.get_llm_summary()["calls"],
             "screenshot_latency": self._screenshot_latency.to_dict(),
+            "ocr": self.get_ocr_summary(),
             "tool_latencies": {
                 name: h.to_dict()
                 for name, h in self._tool_latencies.items()
@@ -326,11 +781,64 @@ class PerformanceMetrics:
             "peak_memory_mb": self._peak_memory_mb,
         }
     
+    def export(self) -> dict:
+        """
+        导出延迟草图与计数器（JSON 可序列化）
+        
+        其他进程可用 merge_export 合并，得到全局分位数。
+        """
+        return {
+            "latencies": {
+                "llm": self._llm_latency.export(),
+                "screenshot": self._screenshot_latency.export(),
+                "ocr": self._ocr_latency.export(),
+                "tools": {name: h.export() for name, h in self._tool_latencies.items()},
+            },
+            "ocr_lookups": {source: dict(counts) for source, counts in self._ocr_lookups.items()},
+            "counters": {
+                "tool_calls": self._tool_calls,
+                "tool_errors": self._tool_errors,
+                "tool_retries": self._tool_retries,
+                "tasks_completed": self._tasks_completed,
+                "tasks_failed": self._tasks_failed,
+                "total_iterations": self._total_iterations,
+            },
+        }
+    
+    def merge_export(self, data: dict):
+        """合并另一个进程 export() 的结果"""
+        latencies = data.get("latencies", {})
+        if "llm" in latencies:
+            self._llm_latency.merge(LatencyHistogram.from_export(latencies["llm"]))
+        if "screenshot" in latencies:
+            self._screenshot_latency.merge(LatencyHistogram.from_export(latencies["screenshot"]))
+        if "ocr" in latencies:
+            self._ocr_latency.merge(LatencyHistogram.from_export(latencies["ocr"]))
+        for source, counts in data.get("ocr_lookups", {}).items():
+            mine = self._ocr_lookups.setdefault(source, {"hits": 0, "misses": 0})
+            mine["hits"] += counts.get("hits", 0)
+            mine["misses"] += counts.get("misses", 0)
+        for tool_name, exported in latencies.get("tools", {}).items():
+            if tool_name not in self._tool_latencies:
+                self._tool_latencies[tool_name] = self._histogram(f"tool_{tool_name}")
+            self._tool_latencies[tool_name].merge(LatencyHistogram.from_export(exported))
+        
+        counters = data.get("counters", {})
+        self._tool_calls += counters.get("tool_calls", 0)
+        self._tool_errors += counters.get("tool_errors", 0)
+        self._tool_retries += counters.get("tool_retries", 0)
+        self._tasks_completed += counters.get("tasks_completed", 0)
+        self._tasks_failed += counters.get("tasks_failed", 0)
+        self._total_iterations += counters.get("total_iterations", 0)
+    
     def reset(self):
         """重置所有指标"""
         self._tool_latencies.clear()
-        self._llm_latency = LatencyHistogram("llm_response")
-        self._screenshot_latency = LatencyHistogram("screenshot")
+        self._llm_latency = self._histogram("llm_response")
+        self._screenshot_latency = self._histogram("screenshot")
+        self._llm_calls.clear()
+        self._ocr_latency = self._histogram("ocr")
+        self._ocr_lookups.clear()
         self._tool_calls = 0
         self._tool_errors = 0
         self._tool_retries = 0
@@ -0,0 +1,609 @@
+# -*- coding: utf-8 -*-
+"""
+Spans - Low-overhead tracing for the agent loop
+
+One span API for the agent, LLM, tools, stores and hooks. The active span
+lives in a contextvar, so it follows `await`, `asyncio.gather` and
+`asyncio.to_thread` without being passed around explicitly.
+
+Usage:
+    from engine.observability.spans import span, set_task_id, flame_breakdown
+
+    with span("tool.execute", tool="window_click") as s:
+        ...
+        s.set_attribute("success", True)
+
+    set_task_id("task-1234")           # tags every span of the current trace
+    flame_breakdown("task-1234")       # per-iteration time by span name
+
+Sampling is decided once per trace (head sampling): spans of an unsampled
+trace cost one contextvar lookup. Finished spans go to a ring buffer (always)
+and, when configured, to a file in OTLP/JSON format (one ExportTraceServiceRequest
+per line, readable by the OpenTelemetry Collector `otlpjsonfile` receiver).
+
+Environment Variables:
+    NOGICOS_TRACE_SAMPLE_RATE: Fraction of traces recorded (default: 1.0)
+    NOGICOS_TRACE_BUFFER: Ring buffer capacity in spans (default: 20000)
+    NOGICOS_TRACE_FILE: OTLP/JSON output path (default: disabled)
+"""
+
+import contextvars
+import functools
+import json
+import os
+import random
+import threading
+import time
+from collections import deque
+from inspect import iscoroutinefunction
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+from . import get_logger
+
+logger = get_logger("spans")
+
+# Span names used across the engine
+AGENT_RUN = "agent.run"
+AGENT_ITERATION = "agent.iteration"
+LLM_STREAM = "llm.stream"
+TOOL_EXECUTE = "tool.execute"
+SCREENSHOT_ENCODE = "screenshot.encode"
+CHECKPOINT_SAVE = "checkpoint.save"
+DB_FLUSH = "db.flush"
+HOOK_CAPTURE = "hook.capture"
+
+_current_span: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar(
+    "nogicos_current_span", default=None
+)
+
+
+class _Trace:
+    """State shared by every span of one trace"""
+
+    __slots__ = ("trace_id", "task_id")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.task_id: Optional[str] = None
+
+
+class Span:
+    """
+    A timed operation. Use as a (async) context manager, or call
+    `activate()` / `end()` where a `with` block does not fit.
+    """
+
+    __slots__ = (
+        "name", "trace", "span_id", "parent", "attributes", "events",
+        "status", "error", "start_ns", "end_ns", "_t0", "_tracer",
+    )
+
+    recording = True
+
+    def __init__(self, tracer: "Tracer", name: str, trace: _Trace, parent: Optional["Span"], attributes: dict):
+        self._tracer = tracer
+        self.name = name
+        self.trace = trace
+        self.parent = parent
+        self.span_id = f"{random.getrandbits(64):016x}"
+        self.attributes = attributes
+        self.events: Optional[List[tuple]] = None
+        self.status = "ok"
+        self.error: Optional[str] = None
+        self.start_ns = time.time_ns()
+        self._t0 = time.perf_counter_ns()
+        self.end_ns: Optional[int] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    @property
+    def parent_id(self) -> Optional[str]:
+        return self.parent.span_id if self.parent else None
+
+    @property
+    def duration_ms(self) -> float:
+        end = self.end_ns if self.end_ns is not None else self.start_ns + time.perf_counter_ns() - self._t0
+        return (end - self.start_ns) / 1e6
+
+    def set_attribute(self, key: str, value: Any):
+        self.attributes[key] = value
+
+    def set_attributes(self, **attributes):
+        self.attributes.update(attributes)
+
+    def add_event(self, name: str, **attributes):
+        """Record a point-in-time event on this span"""
+        if self.events is None:
+            self.events = []
+        self.events.append((time.time_ns(), name, attributes))
+
+    def record_error(self, error: BaseException):
+        self.status = "error"
+        self.error = f"{type(error).__name__}: {error}"[:500]
+
+    def activate(self) -> "Span":
+        """Make this the current span for the calling context"""
+        _current_span.set(self)
+        return self
+
+    def end(self):
+        """Finish the span (idempotent) and restore its parent as current"""
+        if self.end_ns is not None:
+            return
+        self.end_ns = self.start_ns + time.perf_counter_ns() - self._t0
+        current = _current_span.get()
+        # Also covers children left open by an exception
+        while current is not None:
+            if current is self:
+                _current_span.set(self.parent)
+                break
+            current = current.parent
+        self._tracer._export(self)
+
+    def __enter__(self) -> "Span":
+        return self.activate()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        if exc_val is not None:
+            self.record_error(exc_val)
+        self.end()
+
+    async def __aenter__(self) -> "Span":
+        return self.activate()
+
+    async def __aexit__(self, exc_type, exc_val, exc_tb):
+        self.__exit__(exc_type, exc_val, exc_tb)
+
+    def to_dict(self) -> dict:
+        return {
+            "name": self.name,
+            "trace_id": self.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "task_id": self.trace.task_id,
+            "start_ns": self.start_ns,
+            "duration_ms": round(self.duration_ms, 3),
+            "status": self.status,
+            "error": self.error,
+            "attributes": self.attributes,
+            "events": [
+                {"time_ns": t, "name": name, "attributes": attrs}
+                for t, name, attrs in self.events or ()
+            ],
+        }
+
+    def to_otlp(self) -> dict:
+        """OTLP/JSON representation (opentelemetry-proto `Span`)"""
+        attributes = dict(self.attributes)
+        if self.trace.task_id:
+            attributes["nogicos.task_id"] = self.trace.task_id
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": _otlp_attributes(attributes),
+            "status": {"code": 2, "message": self.error or ""} if self.status == "error" else {"code": 1},
+        }
+        if self.parent is not None:
+            otlp["parentSpanId"] = self.parent.span_id
+        if self.events:
+            otlp["events"] = [
+                {"timeUnixNano": str(t), "name": name, "attributes": _otlp_attributes(attrs)}
+                for t, name, attrs in self.events
+            ]
+        return otlp
+
+
+class _UnsampledSpan(Span):
+    """Root of a trace that was not sampled: keeps children quiet"""
+
+    __slots__ = ()
+
+    recording = False
+
+    def __init__(self):
+        self.parent = None
+        self.end_ns = None
+        self.attributes = {}
+
+    def set_attribute(self, key, value):
+        pass
+
+    def set_attributes(self, **attributes):
+        pass
+
+    def add_event(self, name, **attributes):
+        pass
+
+    def record_error(self, error):
+        pass
+
+    def end(self):
+        if _current_span.get() is self:
+            _current_span.set(None)
+
+    def __enter__(self):
+        _current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.end()
+
+
+class _NoopSpan(_UnsampledSpan):
+    """Child of an unsampled trace; entering and ending it does nothing"""
+
+    __slots__ = ()
+
+    def activate(self):
+        return self
+
+    def end(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+
+NOOP_SPAN = _NoopSpan()
+
+
+def _otlp_value(value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    if isinstance(value, str):
+        return {"stringValue": value}
+    return {"stringValue": json.dumps(value, default=str, ensure_ascii=False)}
+
+
+def _otlp_attributes(attributes: dict) -> List[dict]:
+    return [{"key": key, "value": _otlp_value(value)} for key, value in attributes.items()]
+
+
+# ===========================================
+# Exporters
+# ===========================================
+
+class RingBufferExporter:
+    """Keeps the most recent finished spans in memory"""
+
+    def __init__(self, capacity: int = 20000):
+        self.capacity = capacity
+        self._spans: deque = deque(maxlen=capacity)
+
+    def export(self, span: Span):
+        self._spans.append(span)
+
+    def spans(self, task_id: Optional[str] = None, trace_id: Optional[str] = None) -> List[Span]:
+        """Finished spans, oldest first, optionally filtered by task or trace"""
+        spans = list(self._spans)
+        if task_id is not None:
+            spans = [s for s in spans if s.trace.task_id == task_id]
+        if trace_id is not None:
+            spans = [s for s in spans if s.trace.trace_id == trace_id]
+        return spans
+
+    def task_ids(self) -> List[str]:
+        seen = {}
+        for s in self._spans:
+            if s.trace.task_id:
+                seen[s.trace.task_id] = None
+        return list(seen)
+
+    def flush(self):
+        pass
+
+    def shutdown(self):
+        pass
+
+    def clear(self):
+        self._spans.clear()
+
+
+class OTLPFileExporter:
+    """
+    Appends spans to a file as OTLP/JSON, one `ExportTraceServiceRequest`
+    per line, written in batches of `batch_size` spans.
+    """
+
+    def __init__(self, path: str, batch_size: int = 256, service_name: str = "nogicos"):
+        self.path = path
+        self.batch_size = batch_size
+        self.service_name = service_name
+        self._pending: List[Span] = []
+        self._lock = threading.Lock()
+        self.spans_written = 0
+        self.write_errors = 0
+
+    def export(self, span: Span):
+        with self._lock:
+            self._pending.append(span)
+            if len(self._pending) < self.batch_size:
+                return
+            batch, self._pending = self._pending, []
+        self._write(batch)
+
+    def flush(self):
+        with self._lock:
+            batch, self._pending = self._pending, []
+        if batch:
+            self._write(batch)
+
+    def shutdown(self):
+        self.flush()
+
+    def _write(self, batch: List[Span]):
+        request = {
+            "resourceSpans": [{
+                "resource": {"attributes": _otlp_attributes({"service.name": self.service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "engine.observability.spans"},
+                    "spans": [span.to_otlp() for span in batch],
+                }],
+            }]
+        }
+        line = json.dumps(request, ensure_ascii=False, default=str) + "\n"
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            with self._lock, open(self.path, "a", encoding="utf-8") as f:
+                f.write(line)
+            self.spans_written += len(batch)
+        except OSError as e:
+            self.write_errors += 1
+            logger.warning(f"[Spans] Failed to write OTLP file {self.path}: {e}")
+
+
+# ===========================================
+# Tracer
+# ===========================================
+
+class Tracer:
+    """
+    Creates spans and hands finished ones to exporters.
+
+    Args:
+        sample_rate: Fraction of traces recorded (0.0 - 1.0)
+        exporters: Exporters receiving finished spans; defaults to a ring buffer
+    """
+
+    def __init__(self, sample_rate: float = 1.0, exporters: Optional[List[Any]] = None):
+        self.sample_rate = sample_rate
+        self.exporters = exporters if exporters is not None else [RingBufferExporter()]
+        self.spans_started = 0
+        self.traces_sampled = 0
+        self.traces_dropped = 0
+        self.export_errors = 0
+
+    @property
+    def ring_buffer(self) -> Optional[RingBufferExporter]:
+        for exporter in self.exporters:
+            if isinstance(exporter, RingBufferExporter):
+                return exporter
+        return None
+
+    def start_span(self, name: str, **attributes) -> Span:
+        """Create a span under the current one (not yet activated)"""
+        parent = _current_span.get()
+        if parent is None:
+            if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+                self.traces_dropped += 1
+                return _UnsampledSpan()
+            self.traces_sampled += 1
+            trace = _Trace(f"{random.getrandbits(128):032x}")
+        elif not parent.recording:
+            return NOOP_SPAN
+        else:
+            trace = parent.trace
+        self.spans_started += 1
+        return Span(self, name, trace, parent, attributes)
+
+    # `with tracer.span(...)` reads better at call sites
+    span = start_span
+
+    def _export(self, span: Span):
+        for exporter in self.exporters:
+            try:
+                exporter.export(span)
+            except Exception as e:
+                self.export_errors += 1
+                logger.debug(f"[Spans] Exporter {type(exporter).__name__} failed: {e}")
+
+    def flush(self):
+        for exporter in self.exporters:
+            exporter.flush()
+
+    def shutdown(self):
+        for exporter in self.exporters:
+            exporter.shutdown()
+
+    def get_stats(self) -> dict:
+        return {
+            "sample_rate": self.sample_rate,
+            "spans_started": self.spans_started,
+            "traces_sampled": self.traces_sampled,
+            "traces_dropped": self.traces_dropped,
+            "export_errors": self.export_errors,
+            "exporters": [type(e).__name__ for e in self.exporters],
+        }
+
+
+# ===========================================
+# Singleton + helpers
+# ===========================================
+
+_tracer: Optional[Tracer] = None
+
+
+def configure_tracing(
+    sample_rate: Optional[float] = None,
+    otlp_path: Optional[str] = None,
+    buffer_size: Optional[int] = None,
+) -> Tracer:
+    """
+    (Re)create the global tracer. Unset arguments fall back to the
+    NOGICOS_TRACE_* environment variables.
+    """
+    global _tracer
+    if sample_rate is None:
+        sample_rate = float(os.environ.get("NOGICOS_TRACE_SAMPLE_RATE", "1.0"))
+    if otlp_path is None:
+        otlp_path = os.environ.get("NOGICOS_TRACE_FILE") or None
+    if buffer_size is None:
+        buffer_size = int(os.environ.get("NOGICOS_TRACE_BUFFER", "20000"))
+
+    exporters: List[Any] = [RingBufferExporter(buffer_size)]
+    if otlp_path:
+        exporters.append(OTLPFileExporter(otlp_path))
+    if _tracer is not None:
+        _tracer.shutdown()
+    _tracer = Tracer(sample_rate=max(0.0, min(1.0, sample_rate)), exporters=exporters)
+    return _tracer
+
+
+def get_tracer() -> Tracer:
+    """Global tracer (singleton)"""
+    if _tracer is None:
+        configure_tracing()
+    return _tracer
+
+
+def set_tracer(tracer: Tracer):
+    """Replace the global tracer (for tests)"""
+    global _tracer
+    _tracer = tracer
+
+
+def span(name: str, **attributes) -> Span:
+    """Start a span on the global tracer; use with `with` / `async with`"""
+    return get_tracer().start_span(name, **attributes)
+
+
+def current_span() -> Span:
+    """The active span, or a no-op span outside any trace"""
+    return _current_span.get() or NOOP_SPAN
+
+
+def set_task_id(task_id: str):
+    """Tag the current trace (every span in it) with a task ID"""
+    current = _current_span.get()
+    if current is not None and current.recording:
+        current.trace.task_id = task_id
+
+
+def traced(name: str, **attributes):
+    """Decorator wrapping a function (sync or async) in a span"""
+    def decorator(func: Callable) -> Callable:
+        if iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                with get_tracer().start_span(name, **attributes):
+                    return await func(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def sync_wrapper(*args, **kwargs):
+            with get_tracer().start_span(name, **attributes):
+                return func(*args, **kwargs)
+        return sync_wrapper
+    return decorator
+
+
+# ===========================================
+# Analysis
+# ===========================================
+
+def flame_breakdown(task_id: str, spans: Optional[Iterable[Span]] = None) -> List[dict]:
+    """
+    Per-iteration time breakdown for a task.
+
+    For every `agent.iteration` span, sums the duration of its descendants
+    by span name (inclusive: a screenshot encoded inside a tool call counts
+    towards both), adds `llm.ttft` from `llm.stream` spans and reports the
+    iteration's own time not covered by any child as `self`.
+
+    Args:
+        task_id: Task ID set with `set_task_id`
+        spans: Spans to analyse (default: the global ring buffer)
+
+    Returns:
+        List of {"iteration", "duration_ms", "breakdown": {name: ms}, "counts": {name: n}}
+    """
+    if spans is None:
+        ring = get_tracer().ring_buffer
+        spans = ring.spans(task_id=task_id) if ring else []
+    spans = [s for s in spans if s.trace.task_id == task_id]
+
+    children: Dict[str, List[Span]] = {}
+    for s in spans:
+        if s.parent is not None:
+            children.setdefault(s.parent.span_id, []).append(s)
+
+    result = []
+    for iteration in spans:
+        if iteration.name != AGENT_ITERATION:
+            continue
+        breakdown: Dict[str, float] = {}
+        counts: Dict[str, int] = {}
+        stack = list(children.get(iteration.span_id, ()))
+        while stack:
+            s = stack.pop()
+            breakdown[s.name] = breakdown.get(s.name, 0.0) + s.duration_ms
+            counts[s.name] = counts.get(s.name, 0) + 1
+            if s.name == LLM_STREAM and "ttft_ms" in s.attributes:
+                breakdown["llm.ttft"] = breakdown.get("llm.ttft", 0.0) + s.attributes["ttft_ms"]
+            stack.extend(children.get(s.span_id, ()))
+        direct = sum(c.duration_ms for c in children.get(iteration.span_id, ()))
+        breakdown["self"] = max(0.0, iteration.duration_ms - direct)
+        result.append({
+            "iteration": iteration.attributes.get("iteration"),
+            "duration_ms": round(iteration.duration_ms, 3),
+            "breakdown": {k: round(v, 3) for k, v in sorted(breakdown.items(), key=lambda kv: -kv[1])},
+            "counts": counts,
+        })
+    result.sort(key=lambda r: (r["iteration"] is None, r["iteration"] or 0))
+    return result
+
+
+def folded_stacks(task_id: str, spans: Optional[Iterable[Span]] = None) -> List[str]:
+    """
+    Spans of a task as folded stacks ("a;b;c <self µs>"), the input format
+    of flamegraph.pl / speedscope.
+    """
+    if spans is None:
+        ring = get_tracer().ring_buffer
+        spans = ring.spans(task_id=task_id) if ring else []
+    spans = [s for s in spans if s.trace.task_id == task_id]
+
+    child_time: Dict[str, float] = {}
+    for s in spans:
+        if s.parent is not None:
+            child_time[s.parent.span_id] = child_time.get(s.parent.span_id, 0.0) + s.duration_ms
+
+    totals: Dict[str, float] = {}
+    for s in spans:
+        names = []
+        node: Optional[Span] = s
+        while node is not None:
+            label = node.name
+            if node.name == AGENT_ITERATION and "iteration" in node.attributes:
+                label = f"{node.name}[{node.attributes['iteration']}]"
+            names.append(label)
+            node = node.parent
+        stack = ";".join(reversed(names))
+        self_ms = max(0.0, s.duration_ms - child_time.get(s.span_id, 0.0))
+        totals[stack] = totals.get(stack, 0.0) + self_ms
+    return [f"{stack} {int(ms * 1000)}" for stack, ms in totals.items()]
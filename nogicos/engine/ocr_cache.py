@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+OCR Cache - Shared OCR result cache keyed by image content
+
+OCR is the most expensive local step in the vision paths (hundreds of ms
+per full screenshot), and most of what gets OCRed does not change between
+calls: the browser address bar, a static toolbar, the unchanged half of a
+window. This module keeps:
+
+- A bounded LRU of OCR results keyed by (engine, language, content hash,
+  variant). The content hash covers the raw pixels of exactly the region
+  that was OCRed, so a hit is always pixel-identical input
+- Single-flight: concurrent lookups of the same key share one OCR run
+  (per event loop, since the cache is shared by the whole process)
+- Hit / miss counters per source (whole image, tile, hook recognize),
+  mirrored into PerformanceMetrics
+
+The hash is xxh3_128 when the optional `xxhash` package is installed and
+blake2b otherwise; either is a few ms for a full-HD frame.
+
+Usage:
+    from engine.ocr_cache import get_ocr_cache, make_ocr_key, image_digest
+
+    key = make_ocr_key("tesseract", ["en"], image_digest(image))
+    result, hit = await get_ocr_cache().get_or_compute(key, run_ocr, source="extract")
+
+Environment Variables:
+    NOGICOS_OCR_CACHE_ENTRIES: Max cached results (default: 512, 0 disables)
+"""
+
+import asyncio
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, Optional, Tuple, Union
+
+from engine.observability import get_logger
+
+logger = get_logger("ocr_cache")
+
+try:
+    import xxhash
+    HAS_XXHASH = True
+except ImportError:
+    xxhash = None
+    HAS_XXHASH = False
+
+
+def bytes_digest(data: Union[bytes, bytearray, memoryview]) -> str:
+    """Content hash of a byte buffer"""
+    if HAS_XXHASH:
+        return xxhash.xxh3_128_hexdigest(data)
+    return hashlib.blake2b(data, digest_size=16).hexdigest()
+
+
+def image_digest(image: Any) -> str:
+    """Content hash of a PIL image's pixels (mode and size included)"""
+    header = f"{image.mode}:{image.size[0]}x{image.size[1]}:".encode()
+    return bytes_digest(header + image.tobytes())
+
+
+def make_ocr_key(
+    engine: str,
+    languages: Union[str, Iterable[str], None],
+    digest: str,
+    variant: str = "",
+) -> Tuple[str, str, str, str]:
+    """Cache key: results depend on the engine, its languages and options"""
+    if languages is None:
+        languages = ""
+    elif not isinstance(languages, str):
+        languages = ",".join(languages)
+    return (engine, languages, digest, variant)
+
+
+class OCRCache:
+    """
+    LRU cache of OCR results.
+
+    Values are stored as returned by the compute function; callers that
+    hand results out should copy them (OCRResult objects are mutable).
+
+    Args:
+        max_entries: Maximum number of cached results (0 disables caching)
+        metrics: PerformanceMetrics-like object with record_ocr(); None uses
+                 the global metrics instance
+    """
+
+    def __init__(self, max_entries: int = 512, metrics: Optional[Any] = None):
+        self.max_entries = max_entries
+        self._metrics = metrics
+
+        self._entries: "OrderedDict[Hashable, Tuple[Any, float]]" = OrderedDict()
+        # Futures belong to the loop that created them: keyed by (loop, key)
+        self._inflight: Dict[Tuple[asyncio.AbstractEventLoop, Hashable], asyncio.Future] = {}
+        self._lock = threading.Lock()
+        self._stats: Dict[str, Dict[str, float]] = {}
+
+    # ========== lookups ==========
+
+    def _lookup(self, key: Hashable) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+            return entry
+
+    def get(self, key: Hashable, source: str = "ocr") -> Optional[Any]:
+        """Cached value or None (counts a hit or a miss)"""
+        entry = self._lookup(key)
+        if entry is None:
+            self._record(source, hit=False)
+            return None
+        self._record(source, hit=True, saved_ms=entry[1])
+        return entry[0]
+
+    def put(self, key: Hashable, value: Any, compute_ms: float = 0.0):
+        if self.max_entries <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (value, compute_ms)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        compute: Callable[[], Awaitable[Any]],
+        source: str = "ocr",
+        cacheable: Optional[Callable[[Any], bool]] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Cached value, or run `compute` once for all concurrent callers.
+
+        Args:
+            key: make_ocr_key(...)
+            compute: Coroutine function running the OCR
+            source: Stats bucket ("extract", "tile", "recognize", ...)
+            cacheable: Predicate; results it rejects (e.g. engine errors)
+                       are returned but not stored
+
+        Returns:
+            (value, hit)
+        """
+        entry = self._lookup(key)
+        if entry is not None:
+            self._record(source, hit=True, saved_ms=entry[1])
+            return entry[0], True
+
+        loop = asyncio.get_running_loop()
+        flight_key = (loop, key)
+        with self._lock:
+            inflight = self._inflight.get(flight_key)
+            if inflight is None:
+                future = self._inflight[flight_key] = loop.create_future()
+        if inflight is not None:
+            # Same region already being OCRed (e.g. parallel enhance calls)
+            self._record(source, hit=True)
+            return await asyncio.shield(inflight), True
+
+        self._record(source, hit=False)
+        started = time.perf_counter()
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # retrieved: waiters re-raise, no "never retrieved" warning
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(flight_key, None)
+
+        compute_ms = (time.perf_counter() - started) * 1000
+        if cacheable is None or cacheable(value):
+            self.put(key, value, compute_ms)
+        self._record_compute(source, compute_ms)
+        future.set_result(value)
+        return value, False
+
+    def invalidate(self, key: Optional[Hashable] = None):
+        """Drop one entry, or everything (e.g. after switching OCR language)"""
+        with self._lock:
+            if key is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(key, None)
+
+    # ========== stats ==========
+
+    def _bucket(self, source: str) -> Dict[str, float]:
+        bucket = self._stats.get(source)
+        if bucket is None:
+            bucket = self._stats[source] = {"hits": 0, "misses": 0, "saved_ms": 0.0, "ocr_ms": 0.0}
+        return bucket
+
+    def _record(self, source: str, hit: bool, saved_ms: float = 0.0):
+        with self._lock:
+            bucket = self._bucket(source)
+            if hit:
+                bucket["hits"] += 1
+                bucket["saved_ms"] += saved_ms
+            else:
+                bucket["misses"] += 1
+        metrics = self._get_metrics()
+        if metrics is not None:
+            metrics.record_ocr(source, hit=hit)
+
+    def _record_compute(self, source: str, compute_ms: float):
+        with self._lock:
+            self._bucket(source)["ocr_ms"] += compute_ms
+        metrics = self._get_metrics()
+        if metrics is not None:
+            metrics.record_ocr(source, duration_ms=compute_ms)
+
+    def _get_metrics(self):
+        if self._metrics is None:
+            try:
+                from engine.observability.metrics import get_metrics
+                self._metrics = get_metrics()
+            except Exception:
+                return None
+        return self._metrics
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            sources = {}
+            hits = misses = 0
+            for source, bucket in self._stats.items():
+                lookups = bucket["hits"] + bucket["misses"]
+                hits += bucket["hits"]
+                misses += bucket["misses"]
+                sources[source] = {
+                    "hits": int(bucket["hits"]),
+                    "misses": int(bucket["misses"]),
+                    "hit_rate": bucket["hits"] / lookups if lookups else 0.0,
+                    "saved_ms": round(bucket["saved_ms"], 1),
+                    "ocr_ms": round(bucket["ocr_ms"], 1),
+                }
+            return {
+                "entries": len(self._entries),
+                "max_entries": self.max_entries,
+                "hash": "xxh3_128" if HAS_XXHASH else "blake2b",
+                "hits": hits,
+                "misses": misses,
+                "hit_rate": hits / (hits + misses) if hits + misses else 0.0,
+                "sources": sources,
+            }
+
+
+# ========== singleton ==========
+
+_ocr_cache: Optional[OCRCache] = None
+_ocr_cache_lock = threading.Lock()
+
+
+def get_ocr_cache() -> OCRCache:
+    """Process-wide OCR cache shared by the agent OCR extractor and the hooks"""
+    global _ocr_cache
+    if _ocr_cache is None:
+        with _ocr_cache_lock:
+            if _ocr_cache is None:
+                _ocr_cache = OCRCache(max_entries=int(os.environ.get("NOGICOS_OCR_CACHE_ENTRIES", "512")))
+    return _ocr_cache
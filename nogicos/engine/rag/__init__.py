@@ -8,15 +8,18 @@ enabling Cursor-style code-aware responses.
 Components:
 - CodebaseIndexer: Indexes code files using LangChain + Chroma
 - CodeSearcher: Searches indexed code for relevant snippets
+- IndexUpdateQueue: Debounced live re-indexing from file-watcher events
 """
 
 from .indexer import CodebaseIndexer, get_codebase_indexer
 from .searcher import CodeSearcher, search_codebase
+from .watcher import IndexUpdateQueue
 
 __all__ = [
     "CodebaseIndexer",
     "get_codebase_indexer",
     "CodeSearcher",
     "search_codebase",
+    "IndexUpdateQueue",
 ]
 
@@ -6,14 +6,29 @@ Uses LangChain's RecursiveCharacterTextSplitter for language-aware chunking
 and Chroma for vector storage.
 
 P2 Optimization: Enables Cursor-style codebase search.
+
+Incremental indexing:
+- A manifest (path -> size, mtime, hash, chunk ids) is persisted next to
+  the Chroma collection, so restarts only re-embed files that changed.
+- Files are only read and hashed when size/mtime differ from the manifest.
+- Reading, hashing and splitting run in a process pool; embedding is
+  batched across files.
+- Chunks of changed and deleted files are removed from Chroma.
+- A manifest written with a different chunk_size/chunk_overlap triggers
+  a full re-index.
 """
 
 import os
+import json
+import time
+import asyncio
 import hashlib
 import logging
-from pathlib import Path
-from typing import Optional, List, Dict, Any
-from dataclasses import dataclass
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from pathlib import Path, PurePath
+from typing import Optional, List, Dict, Any, Tuple
+from dataclasses import dataclass, field, asdict
 
 logger = logging.getLogger("nogicos.rag.indexer")
 
@@ -40,6 +55,62 @@ class IndexedFile:
     chunks: int
     language: str
     last_indexed: float
+    size: int = 0
+    mtime: float = 0.0
+    chunk_ids: List[str] = field(default_factory=list)
+
+
+# Per-process splitter cache for pool workers
+_worker_splitters: Dict[Tuple[str, int, int], Any] = {}
+
+
+def _make_splitter(language: str, chunk_size: int, chunk_overlap: int):
+    """Build a language-aware splitter, falling back to the generic one"""
+    if language in ["PYTHON", "TS", "JS", "GO", "RUST", "JAVA", "CPP", "C", "CSHARP", "RUBY", "PHP", "MARKDOWN", "HTML"]:
+        try:
+            return RecursiveCharacterTextSplitter.from_language(
+                language=getattr(Language, language),
+                chunk_size=chunk_size,
+                chunk_overlap=chunk_overlap,
+            )
+        except (AttributeError, ValueError):
+            pass
+    return RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size,
+        chunk_overlap=chunk_overlap,
+    )
+
+
+def _read_and_split(
+    path: str,
+    language: str,
+    chunk_size: int,
+    chunk_overlap: int,
+    previous_hash: Optional[str],
+) -> Tuple[str, Optional[List[str]]]:
+    """
+    Read a file once, hash it, and split it if the content changed.
+    
+    Runs in a worker process, so it must stay a module-level function.
+    
+    Returns:
+        (content hash, chunks) - chunks is None when the hash equals
+        previous_hash (only the mtime changed)
+    """
+    data = Path(path).read_bytes()
+    content_hash = hashlib.md5(data).hexdigest()
+    if content_hash == previous_hash:
+        return content_hash, None
+    
+    content = data.decode("utf-8", errors="ignore")
+    if not content.strip():
+        return content_hash, []
+    
+    key = (language, chunk_size, chunk_overlap)
+    splitter = _worker_splitters.get(key)
+    if splitter is None:
+        splitter = _worker_splitters[key] = _make_splitter(language, chunk_size, chunk_overlap)
+    return content_hash, splitter.split_text(content)
 
 
 class CodebaseIndexer:
@@ -89,12 +160,18 @@ class CodebaseIndexer:
         "*.pyc", "*.pyo", "*.egg-info",
     }
     
+    # Chunks per add_texts call (one embedding batch)
+    EMBED_BATCH_SIZE = 256
+    # Below this many changed files, skip process pool start-up
+    POOL_MIN_FILES = 8
+    
     def __init__(
         self,
         workspace_path: str,
         persist_dir: Optional[str] = None,
         chunk_size: int = 1000,
         chunk_overlap: int = 200,
+        max_workers: Optional[int] = None,
     ):
         """
         Initialize codebase indexer.
@@ -104,19 +181,74 @@ class CodebaseIndexer:
             persist_dir: Directory to store vector database (default: ~/.nogicos/rag)
             chunk_size: Maximum chunk size in characters
             chunk_overlap: Overlap between chunks
+            max_workers: Process pool size for reading/splitting (default: CPU count)
         """
         self.workspace_path = Path(workspace_path).resolve()
         self.persist_dir = Path(persist_dir or os.path.expanduser("~/.nogicos/rag"))
         self.chunk_size = chunk_size
         self.chunk_overlap = chunk_overlap
+        self.max_workers = max_workers
         
-        # Track indexed files
-        self._indexed_files: Dict[str, IndexedFile] = {}
+        self._collection_id = hashlib.md5(str(self.workspace_path).encode()).hexdigest()[:16]
+        self._manifest_path = self.persist_dir / f"manifest_{self._collection_id}.json"
+        self._last_scan: Optional[float] = None
+        self._index_lock = asyncio.Lock()
+        
+        # Track indexed files (restored from the manifest)
+        self._indexed_files: Dict[str, IndexedFile] = self._load_manifest()
+        # Without a manifest the collection may hold untracked chunks from
+        # older versions; resolved on first use of the vectorstore
+        self._legacy_chunks: Optional[bool] = False if self._indexed_files else None
         
         # Initialize components (lazy)
         self._embeddings = None
         self._vectorstore = None
         self._splitters: Dict[str, Any] = {}
+        self._executor: Optional[ProcessPoolExecutor] = None
+    
+    # ========================================================================
+    # Manifest
+    # ========================================================================
+    
+    def _load_manifest(self) -> Dict[str, IndexedFile]:
+        """
+        Load the persisted manifest (empty if missing or unreadable).
+        
+        Sets _config_changed when the manifest was written with other chunk
+        settings; its entries are kept so the old chunks can be deleted.
+        """
+        self._config_changed = False
+        try:
+            with open(self._manifest_path, "r", encoding="utf-8") as f:
+                data = json.load(f)
+            files = {path: IndexedFile(**entry) for path, entry in data.get("files", {}).items()}
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError, TypeError) as e:
+            logger.warning(f"[RAG] Ignoring unreadable manifest {self._manifest_path}: {e}")
+            return {}
+        
+        if files and (data.get("chunk_size"), data.get("chunk_overlap")) != (self.chunk_size, self.chunk_overlap):
+            logger.info(
+                f"[RAG] Chunk settings changed ({data.get('chunk_size')}/{data.get('chunk_overlap')} -> "
+                f"{self.chunk_size}/{self.chunk_overlap}), next index() re-indexes everything"
+            )
+            self._config_changed = True
+        return files
+    
+    def _save_manifest(self):
+        """Atomically persist the manifest"""
+        self.persist_dir.mkdir(parents=True, exist_ok=True)
+        data = {
+            "workspace": str(self.workspace_path),
+            "chunk_size": self.chunk_size,
+            "chunk_overlap": self.chunk_overlap,
+            "files": {path: asdict(entry) for path, entry in self._indexed_files.items()},
+        }
+        tmp_path = self._manifest_path.with_suffix(".json.tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, self._manifest_path)
     
     def _get_embeddings(self):
         """Get or create embeddings model (lazy initialization)"""
@@ -137,10 +269,9 @@ class CodebaseIndexer:
         """Get or create vector store (lazy initialization)"""
         if self._vectorstore is None:
             self.persist_dir.mkdir(parents=True, exist_ok=True)
-            collection_name = hashlib.md5(str(self.workspace_path).encode()).hexdigest()[:16]
             
             self._vectorstore = Chroma(
-                collection_name=f"codebase_{collection_name}",
+                collection_name=f"codebase_{self._collection_id}",
                 embedding_function=self._get_embeddings(),
                 persist_directory=str(self.persist_dir),
             )
@@ -150,27 +281,7 @@ class CodebaseIndexer:
     def _get_splitter(self, language: str):
         """Get language-specific text splitter"""
         if language not in self._splitters:
-            if language in ["PYTHON", "TS", "JS", "GO", "RUST", "JAVA", "CPP", "C", "CSHARP", "RUBY", "PHP", "MARKDOWN", "HTML"]:
-                # Use language-aware splitter
-                try:
-                    lang_enum = getattr(Language, language)
-                    self._splitters[language] = RecursiveCharacterTextSplitter.from_language(
-                        language=lang_enum,
-                        chunk_size=self.chunk_size,
-                        chunk_overlap=self.chunk_overlap,
-                    )
-                except (AttributeError, ValueError):
-                    # Fallback to generic splitter
-                    self._splitters[language] = RecursiveCharacterTextSplitter(
-                        chunk_size=self.chunk_size,
-                        chunk_overlap=self.chunk_overlap,
-                    )
-            else:
-                # Generic splitter
-                self._splitters[language] = RecursiveCharacterTextSplitter(
-                    chunk_size=self.chunk_size,
-                    chunk_overlap=self.chunk_overlap,
-                )
+            self._splitters[language] = _make_splitter(language, self.chunk_size, self.chunk_overlap)
         return self._splitters[language]
     
     def _should_index(self, path: Path) -> bool:
@@ -185,120 +296,354 @@ class CodebaseIndexer:
         # Check if it's a code file
         return path.suffix.lower() in self.LANGUAGE_MAP
     
-    def _get_file_hash(self, path: Path) -> str:
-        """Get hash of file contents for change detection"""
-        content = path.read_bytes()
-        return hashlib.md5(content).hexdigest()
-    
     def _get_language(self, path: Path) -> str:
         """Get language from file extension"""
         return self.LANGUAGE_MAP.get(path.suffix.lower(), "TEXT")
     
-    async def index_file(self, file_path: Path) -> int:
+    def _scan(self) -> Dict[str, os.stat_result]:
+        """Walk the workspace, pruning ignored directories, and stat code files"""
+        found: Dict[str, os.stat_result] = {}
+        for root, dirs, files in os.walk(self.workspace_path):
+            root_path = Path(root)
+            dirs[:] = [d for d in dirs if self._should_descend(root_path / d)]
+            for name in files:
+                path = root_path / name
+                if not self._should_index(path):
+                    continue
+                try:
+                    st = path.stat()
+                except OSError:
+                    continue
+                found[path.relative_to(self.workspace_path).as_posix()] = st
+        return found
+    
+    def _should_descend(self, path: Path) -> bool:
+        """Check if a directory should be walked"""
+        name = path.name
+        for pattern in self.IGNORE_PATTERNS:
+            if name == pattern or path.match(pattern):
+                return False
+        return True
+    
+    def _chunk_ids(self, rel_path: str, content_hash: str, count: int) -> List[str]:
+        """Deterministic Chroma ids for a file's chunks"""
+        return [f"{rel_path}::{content_hash[:12]}::{i}" for i in range(count)]
+    
+    def _has_legacy_chunks(self) -> bool:
+        """True if the collection predates the manifest and is not empty"""
+        if self._legacy_chunks is None:
+            self._legacy_chunks = bool(self._get_vectorstore().get(limit=1)["ids"])
+        return self._legacy_chunks
+    
+    def _delete_chunks(self, rel_path: str, entry: Optional[IndexedFile]):
+        """Remove a file's chunks from the vectorstore"""
+        vectorstore = self._get_vectorstore()
+        if entry is not None and entry.chunk_ids:
+            vectorstore.delete(ids=entry.chunk_ids)
+        else:
+            # Chunks written before ids were tracked; older versions stored
+            # the native path form (backslashes on Windows)
+            vectorstore.delete(where={"source": rel_path})
+            legacy_source = str(PurePath(rel_path))
+            if legacy_source != rel_path:
+                vectorstore.delete(where={"source": legacy_source})
+    
+    def _get_executor(self) -> ProcessPoolExecutor:
+        """Process pool for reading/splitting, kept for the indexer's lifetime"""
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+        return self._executor
+    
+    def close(self):
+        """Shut down the worker processes"""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False)
+            self._executor = None
+    
+    def _add_chunks(self, pending: List[Tuple[str, str, List[str], List[str]]]) -> List[str]:
         """
-        Index a single file.
+        Embed and store chunks for several files in fixed-size batches.
+        
+        Stops at the first failed batch; files with chunks in that batch or
+        later are left out of the result.
         
         Args:
-            file_path: Path to file to index
+            pending: (rel_path, language, chunks, chunk_ids) tuples
             
         Returns:
-            Number of chunks created
+            Relative paths whose chunks were all stored
         """
-        if not LANGCHAIN_AVAILABLE:
-            logger.warning("[RAG] LangChain not available, skipping indexing")
-            return 0
+        vectorstore = self._get_vectorstore()
+        texts: List[str] = []
+        metadatas: List[Dict[str, Any]] = []
+        ids: List[str] = []
+        queued: List[str] = []  # files fully queued but not yet flushed
+        stored: List[str] = []
+        
+        def flush():
+            if texts:
+                vectorstore.add_texts(texts=list(texts), metadatas=list(metadatas), ids=list(ids))
+                texts.clear()
+                metadatas.clear()
+                ids.clear()
+            stored.extend(queued)
+            queued.clear()
         
         try:
-            # Read file content
-            content = file_path.read_text(encoding="utf-8", errors="ignore")
-            if not content.strip():
-                return 0
-            
-            # Get language and splitter
-            language = self._get_language(file_path)
-            splitter = self._get_splitter(language)
-            
-            # Split into chunks
-            chunks = splitter.split_text(content)
-            
-            if not chunks:
-                return 0
-            
-            # Create documents with metadata
-            rel_path = file_path.relative_to(self.workspace_path)
-            documents = []
-            metadatas = []
+            for rel_path, language, chunks, chunk_ids in pending:
+                for i, chunk in enumerate(chunks):
+                    texts.append(chunk)
+                    metadatas.append({
+                        "source": rel_path,
+                        "language": language,
+                        "chunk_index": i,
+                        "total_chunks": len(chunks),
+                        "workspace": str(self.workspace_path),
+                    })
+                    ids.append(chunk_ids[i])
+                    if len(texts) >= self.EMBED_BATCH_SIZE:
+                        flush()
+                queued.append(rel_path)
+            flush()
+        except Exception as e:
+            logger.warning(f"[RAG] Failed to store chunks: {e}")
+        return stored
+    
+    async def _process_files(
+        self,
+        candidates: Dict[str, os.stat_result],
+        force: bool,
+        stats: Dict[str, int],
+    ):
+        """Read/split changed candidates in parallel, then replace their chunks"""
+        jobs = []
+        for rel_path, st in candidates.items():
+            previous = self._indexed_files.get(rel_path)
+            previous_hash = previous.hash if previous is not None and not force else None
+            jobs.append((
+                rel_path,
+                st,
+                str(self.workspace_path / rel_path),
+                self._get_language(Path(rel_path)),
+                previous_hash,
+            ))
+        if not jobs:
+            return
+        
+        loop = asyncio.get_running_loop()
+        executor = self._get_executor() if len(jobs) >= self.POOL_MIN_FILES else None
+        futures = [
+            loop.run_in_executor(
+                executor,
+                _read_and_split,
+                abs_path, language, self.chunk_size, self.chunk_overlap, previous_hash,
+            )
+            for _, _, abs_path, language, previous_hash in jobs
+        ]
+        results = await asyncio.gather(*futures, return_exceptions=True)
+        if any(isinstance(result, BrokenProcessPool) for result in results):
+            # A worker died; start a fresh pool next time
+            self.close()
+        
+        # New manifest entries are committed only once their chunks are stored
+        new_entries: Dict[str, IndexedFile] = {}
+        pending: List[Tuple[str, str, List[str], List[str]]] = []
+        now = time.time()
+        for (rel_path, st, _, language, _), result in zip(jobs, results):
+            if isinstance(result, Exception):
+                logger.warning(f"[RAG] Failed to index {rel_path}: {result}")
+                stats["errors"] += 1
+                continue
+            content_hash, chunks = result
+            previous = self._indexed_files.get(rel_path)
             
-            for i, chunk in enumerate(chunks):
-                documents.append(chunk)
-                metadatas.append({
-                    "source": str(rel_path),
-                    "language": language,
-                    "chunk_index": i,
-                    "total_chunks": len(chunks),
-                    "workspace": str(self.workspace_path),
-                })
+            if chunks is None:
+                # Same content, only metadata changed
+                previous.size, previous.mtime = st.st_size, st.st_mtime
+                stats["skipped"] += 1
+                continue
             
-            # Add to vectorstore
-            vectorstore = self._get_vectorstore()
-            vectorstore.add_texts(texts=documents, metadatas=metadatas)
+            if previous is not None or force or self._has_legacy_chunks():
+                try:
+                    await asyncio.to_thread(self._delete_chunks, rel_path, previous)
+                except Exception as e:
+                    logger.warning(f"[RAG] Failed to delete chunks for {rel_path}: {e}")
+                    stats["errors"] += 1
+                    continue
             
-            # Track indexed file
-            self._indexed_files[str(rel_path)] = IndexedFile(
-                path=str(rel_path),
-                hash=self._get_file_hash(file_path),
+            entry = new_entries[rel_path] = IndexedFile(
+                path=rel_path,
+                hash=content_hash,
                 chunks=len(chunks),
                 language=language,
-                last_indexed=os.path.getmtime(file_path),
+                last_indexed=now,
+                size=st.st_size,
+                mtime=st.st_mtime,
+                chunk_ids=self._chunk_ids(rel_path, content_hash, len(chunks)),
             )
+            if chunks:
+                pending.append((rel_path, language, chunks, entry.chunk_ids))
+            else:
+                self._indexed_files[rel_path] = entry
+        
+        if pending:
+            stored = set(await asyncio.to_thread(self._add_chunks, pending))
+            for rel_path, _, _, _ in pending:
+                if rel_path in stored:
+                    self._indexed_files[rel_path] = new_entries[rel_path]
+                    stats["indexed"] += 1
+                    stats["chunks"] += new_entries[rel_path].chunks
+                else:
+                    # Old chunks are gone; forget the file so the next run retries it
+                    self._indexed_files.pop(rel_path, None)
+                    stats["errors"] += 1
+    
+    async def index_file(self, file_path: Path) -> int:
+        """
+        Index (or re-index) a single file.
+        
+        Args:
+            file_path: Path to file to index
             
-            logger.debug(f"[RAG] Indexed {rel_path}: {len(chunks)} chunks")
-            return len(chunks)
-            
-        except Exception as e:
-            logger.warning(f"[RAG] Failed to index {file_path}: {e}")
+        Returns:
+            Number of chunks created
+        """
+        if not LANGCHAIN_AVAILABLE:
+            logger.warning("[RAG] LangChain not available, skipping indexing")
             return 0
+        
+        stats = await self.update_files([Path(file_path)])
+        logger.debug(f"[RAG] Indexed {file_path}: {stats['chunks']} chunks")
+        return stats["chunks"]
+    
+    async def remove_file(self, file_path: Path) -> bool:
+        """
+        Remove a file's chunks from the index.
+        
+        Returns:
+            True if the file was indexed
+        """
+        file_path = Path(file_path)
+        if file_path.is_absolute():
+            file_path = file_path.resolve()
+            rel_path = file_path.relative_to(self.workspace_path).as_posix()
+        else:
+            rel_path = file_path.as_posix()
+        
+        async with self._index_lock:
+            removed = await self._remove_paths([rel_path])
+            if removed:
+                self._save_manifest()
+        return removed > 0
+    
+    async def _remove_paths(self, rel_paths: List[str]) -> int:
+        """Drop files from Chroma and the manifest (caller holds the lock)"""
+        removed = 0
+        for rel_path in rel_paths:
+            entry = self._indexed_files.pop(rel_path, None)
+            if entry is None:
+                continue
+            if LANGCHAIN_AVAILABLE:
+                try:
+                    await asyncio.to_thread(self._delete_chunks, rel_path, entry)
+                except Exception as e:
+                    logger.warning(f"[RAG] Failed to delete chunks for {rel_path}: {e}")
+            removed += 1
+        return removed
+    
+    async def update_files(self, paths: List[Path]) -> Dict[str, int]:
+        """
+        Re-index or remove specific files (used by live file-watcher updates).
+        
+        Existing files are re-indexed if their size/mtime/hash changed;
+        missing files are removed. Paths outside the workspace or not
+        matching the indexable file types are ignored.
+        
+        Args:
+            paths: Absolute or workspace-relative paths
+            
+        Returns:
+            Statistics dict with indexed/skipped/removed/error counts
+        """
+        stats = {"indexed": 0, "skipped": 0, "removed": 0, "chunks": 0, "errors": 0}
+        if not LANGCHAIN_AVAILABLE:
+            return stats
+        
+        async with self._index_lock:
+            candidates: Dict[str, os.stat_result] = {}
+            missing: List[str] = []
+            for path in paths:
+                path = Path(path)
+                abs_path = path if path.is_absolute() else self.workspace_path / path
+                try:
+                    rel_path = abs_path.resolve().relative_to(self.workspace_path).as_posix()
+                except ValueError:
+                    continue
+                try:
+                    st = abs_path.stat()
+                except OSError:
+                    missing.append(rel_path)
+                    continue
+                if not self._should_index(abs_path):
+                    continue
+                entry = self._indexed_files.get(rel_path)
+                if entry is not None and entry.size == st.st_size and entry.mtime == st.st_mtime:
+                    stats["skipped"] += 1
+                    continue
+                candidates[rel_path] = st
+            
+            stats["removed"] = await self._remove_paths(missing)
+            await self._process_files(candidates, False, stats)
+            if candidates or stats["removed"]:
+                self._save_manifest()
+        
+        return stats
     
     async def index(self, force: bool = False) -> Dict[str, int]:
         """
         Index all code files in workspace.
         
+        Only files whose size/mtime differ from the manifest are read;
+        of those, only files whose content hash changed are re-embedded.
+        
         Args:
             force: If True, re-index all files even if unchanged
+                (implied when the chunk settings changed since the last run)
             
         Returns:
-            Statistics dict with indexed/skipped/error counts
+            Statistics dict with indexed/skipped/removed/error counts
         """
         if not LANGCHAIN_AVAILABLE:
             return {"error": "LangChain not available"}
         
-        stats = {"indexed": 0, "skipped": 0, "chunks": 0, "errors": 0}
+        stats = {"indexed": 0, "skipped": 0, "removed": 0, "chunks": 0, "errors": 0}
         
-        # Find all code files
-        for file_path in self.workspace_path.rglob("*"):
-            if not file_path.is_file():
-                continue
-            
-            if not self._should_index(file_path):
-                continue
+        async with self._index_lock:
+            config_changed = self._config_changed
+            force = force or config_changed
+            found = await asyncio.to_thread(self._scan)
             
-            # Check if file changed
-            rel_path = str(file_path.relative_to(self.workspace_path))
-            if not force and rel_path in self._indexed_files:
-                current_hash = self._get_file_hash(file_path)
-                if current_hash == self._indexed_files[rel_path].hash:
+            candidates: Dict[str, os.stat_result] = {}
+            for rel_path, st in found.items():
+                entry = self._indexed_files.get(rel_path)
+                if (
+                    not force
+                    and entry is not None
+                    and entry.size == st.st_size
+                    and entry.mtime == st.st_mtime
+                ):
                     stats["skipped"] += 1
                     continue
+                candidates[rel_path] = st
             
-            # Index file
-            try:
-                chunks = await self.index_file(file_path)
-                if chunks > 0:
-                    stats["indexed"] += 1
-                    stats["chunks"] += chunks
-            except Exception as e:
-                logger.error(f"[RAG] Error indexing {file_path}: {e}")
-                stats["errors"] += 1
+            deleted = [path for path in self._indexed_files if path not in found]
+            stats["removed"] = await self._remove_paths(deleted)
+            
+            await self._process_files(candidates, force, stats)
+            self._save_manifest()
+            self._last_scan = time.time()
+            if config_changed and not stats["errors"]:
+                self._config_changed = False
         
         logger.info(f"[RAG] Indexing complete: {stats}")
         return stats
@@ -360,6 +705,8 @@ class CodebaseIndexer:
             "indexed_files": len(self._indexed_files),
             "total_chunks": sum(f.chunks for f in self._indexed_files.values()),
             "languages": list(set(f.language for f in self._indexed_files.values())),
+            "last_scan": self._last_scan,
+            "manifest": str(self._manifest_path),
         }
 
 
@@ -52,8 +52,9 @@ class CodeSearcher:
             logger.warning("[CodeSearcher] No indexer configured")
             return False
         
+        # Incremental: after a restart only changed files are re-embedded
         stats = self._indexer.get_stats()
-        if stats["indexed_files"] == 0:
+        if stats["indexed_files"] == 0 or stats.get("last_scan") is None:
             logger.info("[CodeSearcher] Indexing codebase...")
             await self._indexer.index()
         
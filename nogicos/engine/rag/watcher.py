@@ -0,0 +1,247 @@
+# -*- coding: utf-8 -*-
+"""
+Index Update Queue - Keep the codebase index fresh from file events
+
+Receives file-system events (from FileHook's watchdog observer) and feeds
+them to CodebaseIndexer as debounced, coalesced batches:
+
+- Events are buffered thread-safely; the event loop is woken at most once
+  per burst, so watchdog threads never block on it.
+- Repeated events for the same path collapse to the latest operation.
+- A batch is flushed once no new event arrived for `debounce` seconds
+  (or after `max_delay` seconds of continuous activity).
+- Backpressure: past `max_pending` distinct paths (e.g. a git checkout),
+  per-path tracking is dropped and one manifest-driven incremental
+  index() pass runs instead.
+"""
+
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from pathlib import Path
+from typing import Any, Deque, Dict, Optional, Tuple
+
+logger = logging.getLogger("nogicos.rag.watcher")
+
+
+class IndexUpdateQueue:
+    """
+    Debounced, coalescing re-index queue for a CodebaseIndexer.
+
+    Usage:
+        queue = IndexUpdateQueue(indexer)
+        queue.start()
+        queue.submit_threadsafe("/ws/app.py", "modified")   # any thread
+        await queue.stop()
+    """
+
+    UPSERT = "upsert"
+    DELETE = "delete"
+
+    def __init__(
+        self,
+        indexer: Any,
+        debounce: float = 1.0,
+        max_delay: float = 10.0,
+        max_pending: int = 500,
+        batch_size: int = 64,
+    ):
+        """
+        Args:
+            indexer: CodebaseIndexer to update
+            debounce: Quiet period before a batch is flushed (seconds)
+            max_delay: Upper bound on how long a busy stream can defer a flush
+            max_pending: Distinct paths before falling back to a full rescan
+            batch_size: Files per update_files() call
+        """
+        self.indexer = indexer
+        self.debounce = debounce
+        self.max_delay = max_delay
+        self.max_pending = max_pending
+        self.batch_size = batch_size
+
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._wakeup: Optional[asyncio.Event] = None
+
+        # Filled from watchdog threads, drained on the loop
+        self._inbox: Deque[Tuple[str, str]] = deque()
+        self._inbox_lock = threading.Lock()
+        self._wakeup_pending = False
+
+        # Coalesced state (loop thread only)
+        self._pending: Dict[str, str] = {}
+        self._overflow = False
+        self._first_event_at: Optional[float] = None
+        self._last_event_at = 0.0
+
+        self._stats = {
+            "events": 0,
+            "coalesced": 0,
+            "files_indexed": 0,
+            "files_removed": 0,
+            "full_rescans": 0,
+            "batches": 0,
+            "errors": 0,
+        }
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self):
+        """Start the flush worker on the running event loop"""
+        if self.is_running:
+            return
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"[RAG] Live index updates enabled for {self.indexer.workspace_path}")
+
+    async def stop(self, flush: bool = True):
+        """Stop the worker, optionally flushing what is queued"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        if flush:
+            self._drain_inbox()
+            await self._flush()
+
+    # ========================================================================
+    # Event intake
+    # ========================================================================
+
+    def submit_threadsafe(self, path: str, event_type: str, dest_path: Optional[str] = None):
+        """
+        Queue a file event from any thread.
+
+        Args:
+            path: Affected path
+            event_type: created / modified / deleted / moved
+            dest_path: New path for moves
+        """
+        with self._inbox_lock:
+            if event_type == "moved":
+                self._inbox.append((path, "deleted"))
+                if dest_path:
+                    self._inbox.append((dest_path, "created"))
+            else:
+                self._inbox.append((path, event_type))
+            if self._wakeup_pending or self._loop is None:
+                return
+            self._wakeup_pending = True
+        try:
+            self._loop.call_soon_threadsafe(self._drain_inbox)
+        except RuntimeError:
+            # Loop closed during shutdown
+            pass
+
+    def submit_directory_change(self):
+        """A directory was moved/deleted; children may not get their own events"""
+        with self._inbox_lock:
+            self._inbox.append(("", "rescan"))
+            if self._wakeup_pending or self._loop is None:
+                return
+            self._wakeup_pending = True
+        try:
+            self._loop.call_soon_threadsafe(self._drain_inbox)
+        except RuntimeError:
+            pass
+
+    def _drain_inbox(self):
+        """Move buffered events into the coalesced map (loop thread)"""
+        with self._inbox_lock:
+            events = list(self._inbox)
+            self._inbox.clear()
+            self._wakeup_pending = False
+        if not events:
+            return
+
+        now = time.monotonic()
+        for path, event_type in events:
+            self._stats["events"] += 1
+            if event_type == "rescan":
+                self._overflow = True
+                continue
+            if self._overflow:
+                continue
+            op = self.DELETE if event_type == "deleted" else self.UPSERT
+            if path in self._pending:
+                self._stats["coalesced"] += 1
+            self._pending[path] = op
+            if len(self._pending) > self.max_pending:
+                logger.info(f"[RAG] {len(self._pending)} pending file events, switching to full rescan")
+                self._overflow = True
+                self._pending.clear()
+
+        if self._first_event_at is None:
+            self._first_event_at = now
+        self._last_event_at = now
+        if self._wakeup is not None:
+            self._wakeup.set()
+
+    # ========================================================================
+    # Flushing
+    # ========================================================================
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # Debounce: wait for a quiet period, bounded by max_delay
+            while True:
+                now = time.monotonic()
+                quiet_at = self._last_event_at + self.debounce
+                deadline = (self._first_event_at or now) + self.max_delay
+                wait = min(quiet_at, deadline) - now
+                if wait <= 0:
+                    break
+                await asyncio.sleep(wait)
+
+            await self._flush()
+
+    async def _flush(self):
+        """Apply the coalesced batch to the indexer"""
+        overflow, pending = self._overflow, self._pending
+        self._overflow, self._pending = False, {}
+        self._first_event_at = None
+
+        try:
+            if overflow:
+                self._stats["full_rescans"] += 1
+                await self.indexer.index()
+                return
+
+            items = list(pending.items())
+            for start in range(0, len(items), self.batch_size):
+                batch = items[start:start + self.batch_size]
+                stats = await self.indexer.update_files(
+                    [Path(path) for path, _ in batch]
+                )
+                self._stats["batches"] += 1
+                self._stats["files_indexed"] += stats.get("indexed", 0)
+                self._stats["files_removed"] += stats.get("removed", 0)
+                # Let other tasks run between batches
+                await asyncio.sleep(0)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self._stats["errors"] += 1
+            logger.error(f"[RAG] Live index update failed: {e}")
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue counters"""
+        return {
+            **self._stats,
+            "pending": len(self._pending) + len(self._inbox),
+            "overflow": self._overflow,
+            "running": self.is_running,
+        }
@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 """
-Server Module - WebSocket status broadcast
+Server Module - WebSocket status broadcast and request admission
 """
 
 from engine.server.websocket import (
@@ -12,6 +12,14 @@ from engine.server.websocket import (
     get_server,
     start_server,
 )
+from engine.server.client_channel import ClientChannel
+from engine.server.admission import (
+    AdmissionController,
+    AdmissionPriority,
+    AdmissionError,
+    AdmissionRejected,
+    AdmissionExpired,
+)
 
 __all__ = [
     "StatusServer",
@@ -21,5 +29,11 @@ __all__ = [
     "FullStatus",
     "get_server",
     "start_server",
+    "ClientChannel",
+    "AdmissionController",
+    "AdmissionPriority",
+    "AdmissionError",
+    "AdmissionRejected",
+    "AdmissionExpired",
 ]
 
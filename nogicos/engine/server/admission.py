@@ -0,0 +1,474 @@
+# -*- coding: utf-8 -*-
+"""
+Admission Control - Bounded, prioritized request queue for the agent API
+
+Sits in front of the agent pool for /v2/execute and /api/agent/start:
+
+- Bounded: past `max_queue` waiting requests new ones are rejected (429);
+  interactive requests shed the newest queued background request first.
+- Priority classes: interactive chat is always dispatched before
+  background work such as evaluation runs.
+- Per-client fair share: within a class, clients are served round-robin
+  and each client may only hold `max_queued_per_client` queued requests.
+- Deadlines: a request still queued at its deadline is dropped before it
+  reaches the agent, so stale work never spends LLM tokens.
+- Queue positions are pushed to an optional per-request callback.
+
+Usage:
+    admission = AdmissionController(max_active=3)
+
+    async with admission.admit(request_id, client_id="127.0.0.1"):
+        await run_task()
+
+    # Or split, to reject synchronously and wait in the background:
+    ticket = admission.enqueue(request_id, client_id, AdmissionPriority.BACKGROUND)
+    await admission.wait(ticket)
+    try:
+        ...
+    finally:
+        admission.release(ticket)
+"""
+
+import asyncio
+import logging
+import time
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from enum import IntEnum
+from typing import Any, Callable, Deque, Dict, Iterator, Optional, Union
+
+logger = logging.getLogger("nogicos.server.admission")
+
+# Prometheus metrics (optional)
+try:
+    from monitoring.prometheus.metrics import get_metrics
+except ImportError:
+    get_metrics = None
+
+
+class AdmissionPriority(IntEnum):
+    """Priority classes (lower value is served first)"""
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+    @classmethod
+    def parse(cls, value: Union[str, int, "AdmissionPriority", None]) -> "AdmissionPriority":
+        """Accept 'interactive' / 'background' (or 'eval'), ints or members"""
+        if isinstance(value, cls):
+            return value
+        if isinstance(value, int):
+            return cls(value)
+        name = (value or "interactive").strip().lower()
+        if name in ("background", "batch", "eval", "evaluation"):
+            return cls.BACKGROUND
+        return cls.INTERACTIVE
+
+
+class AdmissionError(Exception):
+    """Base class for admission failures"""
+
+
+class AdmissionRejected(AdmissionError):
+    """Queue full (or request shed); the client should retry later"""
+
+    def __init__(self, message: str, retry_after: float = 1.0):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionExpired(AdmissionError):
+    """Request deadline passed while it was still queued"""
+
+
+@dataclass
+class AdmissionTicket:
+    """A request waiting for (or holding) admission"""
+    request_id: str
+    client_id: str
+    priority: AdmissionPriority
+    future: "asyncio.Future"
+    enqueued_at: float = field(default_factory=time.monotonic)
+    deadline: Optional[float] = None
+    on_position: Optional[Callable[[int, int], None]] = None
+    admitted_at: Optional[float] = None
+    position: Optional[int] = None
+
+    @property
+    def waited_s(self) -> float:
+        end = self.admitted_at if self.admitted_at is not None else time.monotonic()
+        return end - self.enqueued_at
+
+    @property
+    def remaining_s(self) -> Optional[float]:
+        """Time left until the deadline (None without one), for later waits such as the slot queue"""
+        if self.deadline is None:
+            return None
+        return max(0.0, self.deadline - time.monotonic())
+
+
+class AdmissionController:
+    """Priority + fair-share admission queue with deadlines"""
+
+    def __init__(
+        self,
+        max_active: int = 3,
+        max_queue: int = 64,
+        max_queued_per_client: int = 16,
+        default_deadlines: Optional[Dict[AdmissionPriority, Optional[float]]] = None,
+    ):
+        """
+        Args:
+            max_active: Requests admitted at once (normally the agent pool size)
+            max_queue: Requests allowed to wait
+            max_queued_per_client: Waiting requests per client
+            default_deadlines: Queue deadline per priority in seconds (None = no deadline)
+        """
+        self.max_active = max_active
+        self.max_queue = max_queue
+        self.max_queued_per_client = max_queued_per_client
+        self.default_deadlines: Dict[AdmissionPriority, Optional[float]] = {
+            AdmissionPriority.INTERACTIVE: 120.0,
+            AdmissionPriority.BACKGROUND: 1800.0,
+        }
+        if default_deadlines:
+            self.default_deadlines.update(default_deadlines)
+
+        # priority -> client -> FIFO of tickets; client order is the round-robin order
+        self._queues: Dict[AdmissionPriority, "OrderedDict[str, Deque[AdmissionTicket]]"] = {
+            priority: OrderedDict() for priority in AdmissionPriority
+        }
+        self._queued = 0
+        self._active: Dict[str, AdmissionTicket] = {}
+
+        self._stats: Dict[str, Any] = {
+            "admitted": 0,
+            "admitted_immediately": 0,
+            "rejected": 0,
+            "shed": 0,
+            "expired": 0,
+            "cancelled": 0,
+        }
+        self._wait_totals = {priority: [0, 0.0, 0.0] for priority in AdmissionPriority}  # count, sum, max
+
+        self._metrics = get_metrics() if get_metrics else None
+        self._update_gauges()
+
+    # ========================================================================
+    # Public API
+    # ========================================================================
+
+    def enqueue(
+        self,
+        request_id: str,
+        client_id: str = "anonymous",
+        priority: Union[str, int, AdmissionPriority, None] = AdmissionPriority.INTERACTIVE,
+        deadline_s: Optional[float] = None,
+        on_position: Optional[Callable[[int, int], None]] = None,
+    ) -> AdmissionTicket:
+        """
+        Register a request. Admits it immediately when capacity allows.
+
+        Args:
+            request_id: Unique request / task ID
+            client_id: Fair-share key (client IP or X-NogicOS-Client header)
+            priority: Priority class
+            deadline_s: Max seconds to wait; defaults per priority
+            on_position: Called with (position, queued) whenever the position changes
+
+        Raises:
+            AdmissionRejected: Queue or the client's share is full
+        """
+        priority = AdmissionPriority.parse(priority)
+        if deadline_s is None:
+            deadline_s = self.default_deadlines.get(priority)
+        now = time.monotonic()
+        ticket = AdmissionTicket(
+            request_id=request_id,
+            client_id=client_id,
+            priority=priority,
+            future=asyncio.get_running_loop().create_future(),
+            enqueued_at=now,
+            deadline=now + deadline_s if deadline_s is not None and deadline_s > 0 else None,
+            on_position=on_position,
+        )
+
+        if self._queued == 0 and len(self._active) < self.max_active:
+            self._admit(ticket)
+            self._stats["admitted_immediately"] += 1
+            self._update_gauges()
+            return ticket
+
+        client_queue = self._queues[priority].get(client_id)
+        if client_queue is not None and len(client_queue) >= self.max_queued_per_client:
+            self._reject(priority, "client_share")
+            raise AdmissionRejected(
+                f"Client {client_id} already has {len(client_queue)} queued requests",
+                retry_after=self._retry_after(),
+            )
+
+        if self._queued >= self.max_queue:
+            victim = None
+            if priority == AdmissionPriority.INTERACTIVE:
+                victim = self._newest(AdmissionPriority.BACKGROUND)
+            if victim is None:
+                self._reject(priority, "queue_full")
+                raise AdmissionRejected(
+                    f"Admission queue full ({self._queued}/{self.max_queue})",
+                    retry_after=self._retry_after(),
+                )
+            self._remove_queued(victim)
+            self._stats["shed"] += 1
+            self._record_wait(victim, "shed")
+            self._reject(victim.priority, "shed")
+            victim.future.set_exception(AdmissionRejected(
+                "Shed in favour of interactive requests", retry_after=self._retry_after(),
+            ))
+            logger.info(f"[Admission] Shed background request {victim.request_id}")
+
+        self._queues[priority].setdefault(client_id, deque()).append(ticket)
+        self._queued += 1
+        self._publish_positions()
+        self._update_gauges()
+        logger.debug(
+            f"[Admission] Queued {request_id} ({priority.name.lower()}, client={client_id}, "
+            f"position={ticket.position}/{self._queued})"
+        )
+        return ticket
+
+    async def wait(self, ticket: AdmissionTicket):
+        """
+        Wait until the ticket is admitted.
+
+        Raises:
+            AdmissionExpired: Deadline passed while queued
+            AdmissionRejected: Shed from the queue
+        """
+        timeout = None
+        if ticket.deadline is not None:
+            timeout = max(0.0, ticket.deadline - time.monotonic())
+        try:
+            await asyncio.wait_for(asyncio.shield(ticket.future), timeout=timeout)
+        except asyncio.TimeoutError:
+            future = ticket.future
+            if future.done() and not future.cancelled():
+                if future.exception() is not None:
+                    raise future.exception()  # shed or dropped at the deadline
+                return  # admitted at the deadline
+            self._expire(ticket)
+            raise AdmissionExpired(
+                f"Request {ticket.request_id} waited {ticket.waited_s:.1f}s and expired before admission"
+            )
+        except asyncio.CancelledError:
+            self.release(ticket)
+            raise
+
+    def release(self, ticket: AdmissionTicket):
+        """Release an admitted ticket, or withdraw a queued one"""
+        if self._active.pop(ticket.request_id, None) is not None:
+            self._dispatch()
+        elif not ticket.future.done():
+            self._remove_queued(ticket)
+            self._stats["cancelled"] += 1
+            self._record_wait(ticket, "cancelled")
+            ticket.future.cancel()
+            self._publish_positions()
+        self._update_gauges()
+
+    @asynccontextmanager
+    async def admit(
+        self,
+        request_id: str,
+        client_id: str = "anonymous",
+        priority: Union[str, int, AdmissionPriority, None] = AdmissionPriority.INTERACTIVE,
+        deadline_s: Optional[float] = None,
+        on_position: Optional[Callable[[int, int], None]] = None,
+    ):
+        """enqueue() + wait(); releases the slot on exit"""
+        ticket = self.enqueue(request_id, client_id, priority, deadline_s, on_position)
+        await self.wait(ticket)
+        try:
+            yield ticket
+        finally:
+            self.release(ticket)
+
+    def get_position(self, request_id: str) -> Optional[int]:
+        """1-based dispatch position of a queued request, None if not queued"""
+        for position, ticket in enumerate(self._ordered(), 1):
+            if ticket.request_id == request_id:
+                return position
+        return None
+
+    @property
+    def queued(self) -> int:
+        return self._queued
+
+    @property
+    def active(self) -> int:
+        return len(self._active)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Queue counters and wait times per priority"""
+        waits = {}
+        for priority, (count, total, longest) in self._wait_totals.items():
+            waits[priority.name.lower()] = {
+                "count": count,
+                "avg_s": round(total / count, 4) if count else 0.0,
+                "max_s": round(longest, 4),
+            }
+        return {
+            **self._stats,
+            "active": len(self._active),
+            "max_active": self.max_active,
+            "queued": self._queued,
+            "max_queue": self.max_queue,
+            "queued_by_priority": {
+                priority.name.lower(): sum(len(q) for q in clients.values())
+                for priority, clients in self._queues.items()
+            },
+            "queued_by_client": self._queued_by_client(),
+            "wait": waits,
+        }
+
+    # ========================================================================
+    # Internals
+    # ========================================================================
+
+    def _admit(self, ticket: AdmissionTicket):
+        ticket.admitted_at = time.monotonic()
+        ticket.position = None
+        self._active[ticket.request_id] = ticket
+        self._stats["admitted"] += 1
+        self._record_wait(ticket, "admitted")
+        ticket.future.set_result(True)
+
+    def _pop_next(self) -> Optional[AdmissionTicket]:
+        """Highest priority first; round-robin across clients within a class"""
+        for priority in AdmissionPriority:
+            clients = self._queues[priority]
+            for client_id in clients:
+                tickets = clients[client_id]
+                ticket = tickets.popleft()
+                if tickets:
+                    clients.move_to_end(client_id)
+                else:
+                    del clients[client_id]
+                self._queued -= 1
+                return ticket
+        return None
+
+    def _dispatch(self):
+        now = time.monotonic()
+        changed = False
+        while len(self._active) < self.max_active:
+            ticket = self._pop_next()
+            if ticket is None:
+                break
+            changed = True
+            if ticket.future.done():
+                continue
+            if ticket.deadline is not None and ticket.deadline <= now:
+                # Stale: drop before it reaches the agent
+                self._stats["expired"] += 1
+                self._record_wait(ticket, "expired")
+                self._reject(ticket.priority, "expired")
+                ticket.future.set_exception(AdmissionExpired(
+                    f"Request {ticket.request_id} expired before admission"
+                ))
+                continue
+            self._admit(ticket)
+        if changed:
+            self._publish_positions()
+
+    def _expire(self, ticket: AdmissionTicket):
+        if ticket.future.done():
+            return  # already dropped by _dispatch
+        self._remove_queued(ticket)
+        self._stats["expired"] += 1
+        self._record_wait(ticket, "expired")
+        self._reject(ticket.priority, "expired")
+        ticket.future.cancel()
+        self._publish_positions()
+        self._update_gauges()
+        logger.info(f"[Admission] Dropped stale request {ticket.request_id} after {ticket.waited_s:.1f}s")
+
+    def _remove_queued(self, ticket: AdmissionTicket):
+        clients = self._queues[ticket.priority]
+        tickets = clients.get(ticket.client_id)
+        if tickets is None:
+            return
+        try:
+            tickets.remove(ticket)
+        except ValueError:
+            return
+        self._queued -= 1
+        if not tickets:
+            del clients[ticket.client_id]
+
+    def _newest(self, priority: AdmissionPriority) -> Optional[AdmissionTicket]:
+        newest = None
+        for tickets in self._queues[priority].values():
+            if tickets and (newest is None or tickets[-1].enqueued_at > newest.enqueued_at):
+                newest = tickets[-1]
+        return newest
+
+    def _ordered(self) -> Iterator[AdmissionTicket]:
+        """Queued tickets in the order _pop_next would hand them out"""
+        for priority in AdmissionPriority:
+            lanes = [list(tickets) for tickets in self._queues[priority].values()]
+            depth = max((len(lane) for lane in lanes), default=0)
+            for round_index in range(depth):
+                for lane in lanes:
+                    if round_index < len(lane):
+                        yield lane[round_index]
+
+    def _publish_positions(self):
+        total = self._queued
+        for position, ticket in enumerate(self._ordered(), 1):
+            if ticket.position == position:
+                continue
+            ticket.position = position
+            if ticket.on_position is not None:
+                try:
+                    ticket.on_position(position, total)
+                except Exception as e:
+                    logger.debug(f"[Admission] Position callback failed: {e}")
+
+    def _queued_by_client(self) -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        for clients in self._queues.values():
+            for client_id, tickets in clients.items():
+                counts[client_id] = counts.get(client_id, 0) + len(tickets)
+        return counts
+
+    def _retry_after(self) -> float:
+        """Rough hint: average admitted wait, at least one second"""
+        count = sum(c for c, _, _ in self._wait_totals.values())
+        total = sum(t for _, t, _ in self._wait_totals.values())
+        return max(1.0, round(total / count, 1) if count else 1.0)
+
+    def _record_wait(self, ticket: AdmissionTicket, outcome: str):
+        waited = ticket.waited_s
+        if outcome == "admitted":
+            totals = self._wait_totals[ticket.priority]
+            totals[0] += 1
+            totals[1] += waited
+            totals[2] = max(totals[2], waited)
+        if self._metrics is not None:
+            self._metrics.record_admission_wait(ticket.priority.name.lower(), outcome, waited)
+
+    def _reject(self, priority: AdmissionPriority, reason: str):
+        if reason in ("queue_full", "client_share"):
+            self._stats["rejected"] += 1
+        if self._metrics is not None:
+            self._metrics.record_admission_rejected(priority.name.lower(), reason)
+
+    def _update_gauges(self):
+        if self._metrics is not None:
+            self._metrics.set_admission_state(
+                {
+                    priority.name.lower(): sum(len(q) for q in clients.values())
+                    for priority, clients in self._queues.items()
+                },
+                len(self._active),
+            )
@@ -0,0 +1,257 @@
+# -*- coding: utf-8 -*-
+"""
+Client Channel - Bounded outbound queue per WebSocket client
+
+StatusServer used to await `send` on every client for every broadcast, so a
+single slow Electron window stalled all broadcasts and screenshot frames
+piled up without bound. Each client now gets a ClientChannel: broadcasts
+enqueue an already-serialized payload and return, and a dedicated writer
+task drains the queue at the client's own pace.
+
+Queue policy:
+    latest-wins  - frame, cursor_move and status replace the pending message
+                   of the same type (the client only needs the newest one)
+    drop-oldest  - when the queue is full the oldest droppable message goes;
+                   only coalescible and explicitly lossy types are droppable
+    must-deliver - everything else (streamed answer chunks, tool/cdp traffic,
+                   task lifecycle) is kept; a client that lets the queue grow
+                   past HARD_LIMIT_FACTOR x max_queue is disconnected
+
+Usage:
+    channel = ClientChannel(websocket, max_queue=256)
+    channel.start()
+    channel.enqueue(json.dumps(message), "status")
+    stats = channel.get_stats()
+    await channel.close()
+"""
+
+import asyncio
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from typing import Any, Deque, Dict, Optional, Union
+
+logger = logging.getLogger("nogicos.server")
+
+# Only the newest pending message of these types is worth sending
+COALESCE_TYPES = frozenset({"frame", "cursor_move", "status"})
+
+# Periodic metrics the next message supersedes anyway
+LOSSY_TYPES = frozenset({"performance"})
+
+# The only types a full queue may discard; all others must be delivered
+DROPPABLE_TYPES = COALESCE_TYPES | LOSSY_TYPES
+
+
+@dataclass
+class _Outbound:
+    payload: Union[str, bytes]
+    msg_type: str
+    enqueued_at: float
+
+
+class ClientChannel:
+    """Outbound queue and writer task for one WebSocket client"""
+
+    HARD_LIMIT_FACTOR = 4
+    LAG_EWMA_ALPHA = 0.2
+
+    def __init__(self, websocket: Any, max_queue: int = 256, binary_frames: bool = False):
+        """
+        Args:
+            websocket: Connection with an async `send(str | bytes)`
+            max_queue: Pending messages before dropping starts
+            binary_frames: Client accepts frames as binary messages
+        """
+        self.websocket = websocket
+        self.max_queue = max_queue
+        self.binary_frames = binary_frames
+
+        self._queue: Deque[_Outbound] = deque()
+        self._pending: Dict[str, _Outbound] = {}  # msg_type -> queued coalescible message
+        self._wakeup = asyncio.Event()
+        self._idle = asyncio.Event()
+        self._idle.set()
+        self._writer: Optional[asyncio.Task] = None
+        self._closed = False
+
+        self.connected_at = time.time()
+        self._stats = {
+            "sent": 0,
+            "bytes_sent": 0,
+            "dropped": 0,
+            "coalesced": 0,
+            "send_errors": 0,
+            "max_depth": 0,
+        }
+        self._lag_ewma_ms = 0.0
+        self._last_lag_ms = 0.0
+        self._max_lag_ms = 0.0
+
+    # ------------------------------------------------------------------
+    # Lifecycle
+    # ------------------------------------------------------------------
+
+    def start(self):
+        """Start the writer task"""
+        if self._writer is None:
+            self._writer = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stop the writer; pending messages are discarded"""
+        self._closed = True
+        self._wakeup.set()
+        if self._writer:
+            self._writer.cancel()
+            try:
+                await self._writer
+            except (asyncio.CancelledError, Exception):
+                pass
+            self._writer = None
+        self._queue.clear()
+        self._pending.clear()
+        self._idle.set()
+
+    @property
+    def closed(self) -> bool:
+        return self._closed
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    async def drain(self, timeout: Optional[float] = None) -> bool:
+        """Wait until everything queued so far has been sent"""
+        try:
+            await asyncio.wait_for(self._idle.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
+
+    # ------------------------------------------------------------------
+    # Enqueue
+    # ------------------------------------------------------------------
+
+    def enqueue(self, payload: Union[str, bytes], msg_type: str = "") -> bool:
+        """
+        Queue a serialized message without waiting for the client.
+
+        Returns:
+            False if the channel is closed or the message was discarded
+        """
+        if self._closed:
+            return False
+        now = time.perf_counter()
+
+        if msg_type in COALESCE_TYPES:
+            queued = self._pending.get(msg_type)
+            if queued is not None:
+                # Latest wins: keep the queue slot, replace the content
+                queued.payload = payload
+                self._stats["coalesced"] += 1
+                return True
+
+        if len(self._queue) >= self.max_queue and not self._drop_oldest():
+            if msg_type in DROPPABLE_TYPES:
+                self._stats["dropped"] += 1
+                return False
+            if len(self._queue) >= self.max_queue * self.HARD_LIMIT_FACTOR:
+                logger.warning(
+                    f"[Server] Client {id(self.websocket)} is {len(self._queue)} messages behind, disconnecting"
+                )
+                self._stats["dropped"] += 1
+                asyncio.ensure_future(self._disconnect())
+                return False
+
+        item = _Outbound(payload, msg_type, now)
+        self._queue.append(item)
+        if msg_type in COALESCE_TYPES:
+            self._pending[msg_type] = item
+
+        self._stats["max_depth"] = max(self._stats["max_depth"], len(self._queue))
+        self._idle.clear()
+        self._wakeup.set()
+        return True
+
+    def _drop_oldest(self) -> bool:
+        """Remove the oldest droppable message; False if all are must-deliver"""
+        for item in self._queue:
+            if item.msg_type in DROPPABLE_TYPES:
+                self._queue.remove(item)
+                if self._pending.get(item.msg_type) is item:
+                    del self._pending[item.msg_type]
+                self._stats["dropped"] += 1
+                return True
+        return False
+
+    # ------------------------------------------------------------------
+    # Writer
+    # ------------------------------------------------------------------
+
+    async def _run(self):
+        while not self._closed:
+            if not self._queue:
+                self._idle.set()
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+
+            item = self._queue.popleft()
+            if self._pending.get(item.msg_type) is item:
+                del self._pending[item.msg_type]
+
+            try:
+                await self.websocket.send(item.payload)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                self._stats["send_errors"] += 1
+                logger.debug(f"[Server] Send to client {id(self.websocket)} failed: {e}")
+                if _is_connection_closed(e):
+                    self._closed = True
+                    break
+                continue
+
+            lag_ms = (time.perf_counter() - item.enqueued_at) * 1000
+            self._last_lag_ms = lag_ms
+            self._max_lag_ms = max(self._max_lag_ms, lag_ms)
+            self._lag_ewma_ms += self.LAG_EWMA_ALPHA * (lag_ms - self._lag_ewma_ms)
+            self._stats["sent"] += 1
+            self._stats["bytes_sent"] += len(item.payload)
+
+        self._queue.clear()
+        self._pending.clear()
+        self._idle.set()
+
+    async def _disconnect(self):
+        self._closed = True
+        self._wakeup.set()
+        try:
+            await self.websocket.close()
+        except Exception:
+            pass
+
+    # ------------------------------------------------------------------
+    # Metrics
+    # ------------------------------------------------------------------
+
+    def get_stats(self) -> Dict[str, Any]:
+        """Per-client queue and lag metrics"""
+        oldest_age_ms = (time.perf_counter() - self._queue[0].enqueued_at) * 1000 if self._queue else 0.0
+        return {
+            "client_id": id(self.websocket),
+            "connected_s": round(time.time() - self.connected_at, 1),
+            "binary_frames": self.binary_frames,
+            "depth": len(self._queue),
+            "oldest_pending_ms": round(oldest_age_ms, 2),
+            "lag_ms": round(self._last_lag_ms, 2),
+            "lag_avg_ms": round(self._lag_ewma_ms, 2),
+            "lag_max_ms": round(self._max_lag_ms, 2),
+            **self._stats,
+        }
+
+
+def _is_connection_closed(error: Exception) -> bool:
+    """websockets raises ConnectionClosed (and subclasses) once the peer is gone"""
+    return any(cls.__name__.startswith("ConnectionClosed") for cls in type(error).__mro__)
@@ -10,6 +10,16 @@ Message Types:
     - action: Current action being executed
     - result: Task completion result
     - error: Error notification
+    - frame: Screenshot frame (JSON with base64, or binary for clients that
+      sent {"type": "hello", "binary_frames": true})
+
+Delivery:
+    Every client has a bounded ClientChannel with its own writer task, so a
+    slow client never stalls broadcasts to the others. Messages are
+    serialized once per broadcast.
+
+Binary frame layout:
+    4-byte big-endian header length | UTF-8 JSON header | image bytes
 
 Usage:
     server = StatusServer()
@@ -18,12 +28,16 @@ Usage:
 """
 
 import asyncio
+import base64
 import json
 import logging
-from typing import Set, Dict, Any, Optional, AsyncGenerator, List
+import struct
+from typing import Set, Dict, Any, Optional, AsyncGenerator, List, Union
 from dataclasses import dataclass, asdict, field
 from datetime import datetime
 
+from .client_channel import ClientChannel
+
 logger = logging.getLogger("nogicos.server")
 
 # Import stream protocol
@@ -118,10 +132,15 @@ class StatusServer:
     WebSocket server for broadcasting status to Electron client
     """
     
-    def __init__(self, host: str = "localhost", port: int = 8765):
+    # Pending outbound messages per client before dropping/coalescing
+    MAX_CLIENT_QUEUE = 256
+    
+    def __init__(self, host: str = "localhost", port: int = 8765, max_client_queue: int = None):
         self.host = host
         self.port = port
         self._clients: Set = set()
+        self._channels: Dict[Any, ClientChannel] = {}
+        self.max_client_queue = max_client_queue or self.MAX_CLIENT_QUEUE
         self._server = None
         self._running = False
         
@@ -152,6 +171,10 @@ class StatusServer:
     def client_count(self) -> int:
         return len(self._clients)
     
+    def get_client_stats(self) -> List[Dict[str, Any]]:
+        """Per-client queue depth, drops and send lag"""
+        return [channel.get_stats() for channel in self._channels.values()]
+    
     @property
     def is_running(self) -> bool:
         return self._running
@@ -241,6 +264,10 @@ class StatusServer:
         self._tool_response_handlers.clear()
         self._tool_handler_timestamps.clear()
 
+        for channel in list(self._channels.values()):
+            await channel.close()
+        self._channels.clear()
+        
         # Close all client connections with timeout
         if self._clients:
             try:
@@ -265,6 +292,9 @@ class StatusServer:
     
     async def _handle_client(self, websocket):
         """Handle new client connection"""
+        channel = ClientChannel(websocket, max_queue=self.max_client_queue)
+        channel.start()
+        self._channels[websocket] = channel
         self._clients.add(websocket)
         client_id = id(websocket)
         logger.info(f"[Server] Client connected: {client_id} (total: {len(self._clients)})")
@@ -283,6 +313,9 @@ class StatusServer:
             logger.error(f"[Server] Client error: {e}")
         finally:
             self._clients.discard(websocket)
+            channel = self._channels.pop(websocket, None)
+            if channel:
+                await channel.close()
             logger.info(f"[Server] Client removed: {client_id} (remaining: {len(self._clients)})")
     
     # Security: Maximum message size (1MB) to prevent DoS
@@ -328,7 +361,7 @@ class StatusServer:
         # Security: Check message size
         if len(message) > self.MAX_MESSAGE_SIZE:
             logger.warning(f"[Server] Message too large: {len(message)} bytes (max: {self.MAX_MESSAGE_SIZE})")
-            await websocket.send(json.dumps({"type": "error", "message": "Message too large"}))
+            await self._send(websocket, json.dumps({"type": "error", "message": "Message too large"}), "error")
             return
 
         try:
@@ -338,12 +371,18 @@ class StatusServer:
             # [P0-3 FIX] Validate JSON nesting depth to prevent stack overflow
             if not self._check_json_depth(data, max_depth=self.MAX_JSON_DEPTH):
                 logger.warning(f"[Server] JSON nesting depth exceeds limit: {self.MAX_JSON_DEPTH}")
-                await websocket.send(json.dumps({"type": "error", "message": "JSON too deeply nested"}))
+                await self._send(websocket, json.dumps({"type": "error", "message": "JSON too deeply nested"}), "error")
                 return
             msg_type = data.get("type", "")
             
             if msg_type == "ping":
-                await websocket.send(json.dumps({"type": "pong"}))
+                await self._send(websocket, json.dumps({"type": "pong"}), "pong")
+            
+            elif msg_type == "hello":
+                # Capability negotiation: binary screenshot frames
+                channel = self._channels.get(websocket)
+                if channel:
+                    channel.binary_frames = bool(data.get("binary_frames", False))
             
             elif msg_type == "get_status":
                 await self._send_full_status(websocket)
@@ -389,17 +428,12 @@ class StatusServer:
     async def _forward_cdp_message(self, sender, data: dict):
         """Forward CDP messages to all other clients"""
         msg_str = json.dumps(data)
+        msg_type = data.get("type")
         
         # Send to all clients except sender
-        for client in self._clients:
-            if client != sender:
-                try:
-                    await client.send(msg_str)
-                except Exception as e:
-                    logger.error(f"[Server] CDP forward error: {e}")
+        await self._fanout(msg_str, msg_type, exclude=sender)
         
         # If cdp_response, also notify internal handlers
-        msg_type = data.get("type")
         if msg_type == "cdp_response":
             request_id = data.get("requestId")
             if request_id and request_id in self._cdp_response_handlers:
@@ -557,7 +591,41 @@ class StatusServer:
             learning=self._learning_status,
             knowledge=self._knowledge_stats,
         )
-        await websocket.send(json.dumps(status.to_dict()))
+        await self._send(websocket, json.dumps(status.to_dict()), "status")
+    
+    async def _send(self, websocket, payload: Union[str, bytes], msg_type: str = ""):
+        """Queue a payload for one client (direct send if it has no channel)"""
+        channel = self._channels.get(websocket)
+        if channel is not None:
+            channel.enqueue(payload, msg_type)
+        else:
+            await websocket.send(payload)
+    
+    async def _fanout(self, payload: Union[str, bytes], msg_type: str = "", exclude=None):
+        """
+        Queue an already-serialized payload for every client.
+        
+        Returns immediately for clients with a channel; each channel's writer
+        delivers at that client's pace.
+        """
+        direct = []
+        for client in list(self._clients):
+            if client is exclude:
+                continue
+            channel = self._channels.get(client)
+            if channel is not None:
+                channel.enqueue(payload, msg_type)
+            else:
+                direct.append(client)
+        
+        if direct:
+            results = await asyncio.gather(
+                *[client.send(payload) for client in direct],
+                return_exceptions=True
+            )
+            for i, result in enumerate(results):
+                if isinstance(result, Exception):
+                    logger.error(f"[Server] Broadcast error to client {i}: {result}")
     
     async def broadcast(self, message: dict):
         """Broadcast message to all connected clients"""
@@ -565,19 +633,11 @@ class StatusServer:
             logger.warning(f"[Server] No clients to broadcast: {message.get('type')}")
             return
         
-        msg_str = json.dumps(message)
         msg_type = message.get('type', 'unknown')
         logger.debug(f"[Server] Broadcasting {msg_type} to {len(self._clients)} clients")
         
-        results = await asyncio.gather(
-            *[client.send(msg_str) for client in self._clients],
-            return_exceptions=True
-        )
-        
-        # Check for any send errors
-        for i, result in enumerate(results):
-            if isinstance(result, Exception):
-                logger.error(f"[Server] Broadcast error to client {i}: {result}")
+        # Serialized once, shared by every client queue
+        await self._fanout(json.dumps(message), msg_type)
     
     async def broadcast_status(self):
         """Broadcast current status to all clients"""
@@ -647,40 +707,85 @@ class StatusServer:
     
     async def broadcast_frame(
         self,
-        image_base64: str,
+        image_base64: str = None,
         action: str = None,
         step: int = 0,
         total_steps: int = 0,
+        screenshot_id: str = None,
+        image_bytes: bytes = None,
     ):
         """
         Broadcast screenshot frame to all clients.
         
         Used by screenshot streamer to send real-time browser visuals.
+        Pass `screenshot_id` (a ScreenshotManager ID) to send a reference
+        plus a small inline thumbnail instead of the full base64 image;
+        clients fetch the full frame from /api/screenshots/{id}.
+        
+        Clients that negotiated binary frames receive the image bytes as a
+        binary message; the others get base64-in-JSON. Each encoding is
+        built at most once per frame. Pending frames are latest-wins per
+        client, so a slow client skips stale frames instead of queueing.
         
         Args:
             image_base64: JPEG image as base64 string
             action: Current action description
             step: Current step number
             total_steps: Total steps in task
+            screenshot_id: Stored screenshot to reference instead of inlining
+            image_bytes: Raw JPEG bytes (alternative to image_base64)
         """
         if not self._clients:
             return
         
-        message = {
-            "type": "frame",
-            "data": {
-                "image": image_base64,
-                "action": action,
-                "step": step,
-                "total_steps": total_steps,
-            }
+        data = {
+            "action": action,
+            "step": step,
+            "total_steps": total_steps,
         }
+        if screenshot_id:
+            from engine.agent.screenshot_manager import get_screenshot_manager
+            manager = get_screenshot_manager()
+            ref = await manager.make_ref(screenshot_id)
+            if ref is None:
+                logger.debug(f"[Server] Frame {screenshot_id} no longer stored, skipping")
+                return
+            data.update(ref)
+            data["thumbnail"] = await manager.get_base64(screenshot_id, thumbnail=True)
+            await self._fanout(json.dumps({"type": "frame", "data": data}), "frame")
+            return
         
-        msg_str = json.dumps(message)
-        await asyncio.gather(
-            *[client.send(msg_str) for client in self._clients],
-            return_exceptions=True
-        )
+        encoded = {}
+        
+        def as_json() -> str:
+            if "json" not in encoded:
+                image = image_base64 if image_base64 is not None else base64.b64encode(image_bytes).decode("ascii")
+                encoded["json"] = json.dumps({"type": "frame", "data": {**data, "image": image}})
+            return encoded["json"]
+        
+        def as_binary() -> bytes:
+            if "binary" not in encoded:
+                raw = image_bytes if image_bytes is not None else base64.b64decode(image_base64)
+                header = json.dumps({"type": "frame", "data": data}).encode("utf-8")
+                encoded["binary"] = struct.pack(">I", len(header)) + header + raw
+            return encoded["binary"]
+        
+        direct = []
+        for client in list(self._clients):
+            channel = self._channels.get(client)
+            if channel is None:
+                direct.append(client)
+            elif channel.binary_frames:
+                channel.enqueue(as_binary(), "frame")
+            else:
+                channel.enqueue(as_json(), "frame")
+        
+        if direct:
+            payload = as_json()
+            await asyncio.gather(
+                *[client.send(payload) for client in direct],
+                return_exceptions=True
+            )
     
     async def broadcast_action(self, action: str, step: int = 0, total_steps: int = 0):
         """Broadcast action update (without frame)"""
@@ -789,11 +894,7 @@ class StatusServer:
             return
         
         # Send JSON serialized chunk
-        msg_str = chunk.to_json()
-        await asyncio.gather(
-            *[client.send(msg_str) for client in self._clients],
-            return_exceptions=True
-        )
+        await self._fanout(chunk.to_json(), "stream")
     
     async def stream_thinking(
         self,
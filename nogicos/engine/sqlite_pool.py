@@ -0,0 +1,231 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite Pool - Shared access layer for the SQLite-backed stores
+
+Every store used to open a fresh `sqlite3.connect` per call. That cost
+connection setup plus schema parsing, and threw away sqlite3's per-connection
+prepared-statement cache each time. It also ran in rollback-journal mode with
+full fsync. This module keeps:
+
+- One connection per (database, thread), reused across calls, so the
+  statement cache (`cached_statements`) stays warm
+- WAL journaling with tuned pragmas (synchronous=NORMAL, busy_timeout,
+  in-memory temp store, larger page cache, mmap)
+- A small thread pool so async callers can run queries off the event loop
+
+Usage:
+    from engine.sqlite_pool import get_sqlite_pool
+
+    db = get_sqlite_pool(db_path)
+    with db.connect() as conn:          # caller commits, as with sqlite3
+        conn.execute("INSERT ...")
+        conn.commit()
+
+    with db.transaction() as conn:      # commit on success, rollback on error
+        conn.execute("UPDATE ...")
+
+    rows = await db.run(fetch_rows, session_id)   # off the event loop
+
+Environment Variables:
+    NOGICOS_SQLITE_THREADS: Executor threads for async callers (default: 4)
+    NOGICOS_SQLITE_SYNCHRONOUS: synchronous pragma (default: NORMAL)
+"""
+
+import asyncio
+import functools
+import os
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from engine.observability import get_logger
+
+logger = get_logger("sqlite_pool")
+
+DEFAULT_PRAGMAS: Tuple[Tuple[str, Any], ...] = (
+    ("journal_mode", "WAL"),
+    ("synchronous", os.environ.get("NOGICOS_SQLITE_SYNCHRONOUS", "NORMAL")),
+    ("busy_timeout", 5000),
+    ("temp_store", "MEMORY"),
+    ("cache_size", -8192),  # KiB
+    ("mmap_size", 64 * 1024 * 1024),
+)
+
+
+class SQLitePool:
+    """
+    Per-thread pooled connections to one SQLite database.
+
+    A connection is only ever used by the thread that opened it. Connections
+    of threads that have exited are closed the next time a connection is
+    opened.
+
+    Args:
+        db_path: Database file
+        pragmas: (name, value) pairs applied to every new connection
+        cached_statements: sqlite3 prepared-statement cache size per connection
+        row_factory: Row factory for new connections (sqlite3.Row supports
+                     both index and name access)
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        pragmas: Tuple[Tuple[str, Any], ...] = DEFAULT_PRAGMAS,
+        cached_statements: int = 256,
+        row_factory: Optional[Callable] = sqlite3.Row,
+    ):
+        self.db_path = db_path
+        self.pragmas = pragmas
+        self.cached_statements = cached_statements
+        self.row_factory = row_factory
+
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self._stats = {"opened": 0, "closed": 0, "acquired": 0, "rollbacks": 0}
+
+    def _open(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(
+            self.db_path,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,  # only close() touches another thread's connection
+        )
+        conn.row_factory = self.row_factory
+        for name, value in self.pragmas:
+            conn.execute(f"PRAGMA {name} = {value}")
+
+        with self._lock:
+            alive = []
+            for thread, other in self._connections:
+                if thread.is_alive():
+                    alive.append((thread, other))
+                else:
+                    other.close()
+                    self._stats["closed"] += 1
+            alive.append((threading.current_thread(), conn))
+            self._connections = alive
+            self._stats["opened"] += 1
+        return conn
+
+    def connection(self) -> sqlite3.Connection:
+        """This thread's connection (opened on first use)"""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._open()
+            self._local.depth = 0
+        return conn
+
+    @contextmanager
+    def connect(self) -> Iterator[sqlite3.Connection]:
+        """
+        Borrow this thread's connection.
+
+        Drop-in for the `with self._get_connection() as conn` pattern: the
+        caller commits. On leaving the outermost block, an uncommitted
+        transaction is rolled back, as closing a fresh connection would have.
+        """
+        conn = self.connection()
+        self._local.depth += 1
+        self._stats["acquired"] += 1
+        try:
+            yield conn
+        finally:
+            self._local.depth -= 1
+            if self._local.depth == 0 and conn.in_transaction:
+                conn.rollback()
+                self._stats["rollbacks"] += 1
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Borrow the connection; commit on success, roll back on error"""
+        with self.connect() as conn:
+            try:
+                yield conn
+            except BaseException:
+                if conn.in_transaction:
+                    conn.rollback()
+                raise
+            if conn.in_transaction:
+                conn.commit()
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking database function on the shared DB executor"""
+        return await run_db(fn, *args, **kwargs)
+
+    def close(self):
+        """Close all connections (call when no other thread is using the pool)"""
+        with self._lock:
+            for _, conn in self._connections:
+                conn.close()
+                self._stats["closed"] += 1
+            self._connections = []
+        self._local = threading.local()
+
+    def get_stats(self) -> Dict[str, Any]:
+        with self._lock:
+            open_connections = len(self._connections)
+        return {"db_path": self.db_path, "open_connections": open_connections, **self._stats}
+
+
+# ========== registry ==========
+
+_pools: Dict[str, SQLitePool] = {}
+_pools_lock = threading.Lock()
+_executor: Optional[ThreadPoolExecutor] = None
+
+
+def get_sqlite_pool(db_path: str, **kwargs) -> SQLitePool:
+    """Shared pool for a database file (one per absolute path)"""
+    key = os.path.abspath(db_path)
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                pool = _pools[key] = SQLitePool(db_path, **kwargs)
+    return pool
+
+
+def close_sqlite_pool(db_path: str):
+    """Close and forget the pool for a database (e.g. before deleting the file)"""
+    with _pools_lock:
+        pool = _pools.pop(os.path.abspath(db_path), None)
+    if pool is not None:
+        pool.close()
+
+
+def close_sqlite_pools():
+    """Close every pool and the DB executor (server shutdown)"""
+    global _executor
+    # Let queued and running queries finish before their connections close
+    with _pools_lock:
+        executor, _executor = _executor, None
+    if executor is not None:
+        executor.shutdown(wait=True)
+    with _pools_lock:
+        pools = list(_pools.values())
+        _pools.clear()
+    for pool in pools:
+        pool.close()
+
+
+def get_db_executor() -> ThreadPoolExecutor:
+    """Thread pool used by run_db()"""
+    global _executor
+    if _executor is None:
+        with _pools_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=int(os.environ.get("NOGICOS_SQLITE_THREADS", "4")),
+                    thread_name_prefix="nogicos-sqlite",
+                )
+    return _executor
+
+
+async def run_db(fn: Callable, *args, **kwargs) -> Any:
+    """Run a blocking database call off the event loop"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_db_executor(), functools.partial(fn, *args, **kwargs))
@@ -20,6 +20,8 @@ from typing import (
 )
 from inspect import signature, Parameter, iscoroutinefunction
 
+from ..observability import spans as tracing
+
 # Import ToolDescription for type checking
 try:
     from .descriptions import ToolDescription
@@ -324,6 +326,19 @@ class ToolRegistry:
         Returns:
             ToolResult with success status and output
         """
+        with tracing.span(tracing.TOOL_EXECUTE, tool=name) as span:
+            result = await self._execute(name, args, max_retries, timeout_seconds)
+            span.set_attribute("success", result.success)
+            return result
+
+    async def _execute(
+        self,
+        name: str,
+        args: Dict[str, Any],
+        max_retries: Optional[int],
+        timeout_seconds: Optional[float],
+    ) -> ToolResult:
+        """Retry and timeout handling behind execute()"""
         # Use defaults from environment variables if not specified
         if max_retries is None:
             max_retries = self.DEFAULT_MAX_RETRIES
@@ -345,6 +360,8 @@ class ToolRegistry:
         
         # D1.1: Retry logic
         for attempt in range(max_retries):
+            if attempt:
+                tracing.current_span().set_attribute("attempts", attempt + 1)
             try:
                 # Inject required context
                 call_args = dict(args)
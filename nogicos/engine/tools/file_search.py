@@ -0,0 +1,342 @@
+# -*- coding: utf-8 -*-
+"""
+File Search - Off-loop glob and grep engine for the local tools
+
+Used by glob_search / grep_search in local.py. Searches run in a small
+dedicated thread pool so the FastAPI event loop never blocks on disk I/O.
+
+- Walks with os.scandir and prunes ignored directories (node_modules,
+  .git, virtualenvs, build output) instead of expanding **/* first
+- Sniffs the first block of each file and skips binaries
+- Scans large files through mmap with a bytes regex
+- Streams matches as they are found and stops at max_results
+"""
+
+import asyncio
+import fnmatch
+import mmap
+import os
+import re
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import AsyncIterator, Iterator, List, Optional, Pattern, Tuple
+
+# Directories never descended into (matched by name)
+IGNORED_DIRS = frozenset({
+    ".git", ".svn", ".hg", "node_modules", "__pycache__",
+    ".venv", "venv", ".tox", ".mypy_cache", ".pytest_cache", ".ruff_cache",
+    "dist", "build", ".next", ".nuxt", ".cache", "coverage", ".idea",
+})
+
+# Bytes read to decide whether a file is binary
+SNIFF_BYTES = 8192
+# Files at least this large are scanned through mmap
+MMAP_THRESHOLD = 1024 * 1024
+# Files larger than this are skipped by grep
+MAX_GREP_FILE_BYTES = 256 * 1024 * 1024
+
+_executor: Optional[ThreadPoolExecutor] = None
+_executor_lock = threading.Lock()
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    """Shared worker pool for searches (bounded, created lazily)"""
+    global _executor
+    if _executor is None:
+        with _executor_lock:
+            if _executor is None:
+                _executor = ThreadPoolExecutor(
+                    max_workers=min(4, os.cpu_count() or 1),
+                    thread_name_prefix="file-search",
+                )
+    return _executor
+
+
+# ============================================================================
+# Walking and glob matching
+# ============================================================================
+
+def _translate_segment(segment: str) -> str:
+    """Translate one path segment of a glob ('*', '?', '[...]') to a regex"""
+    out = []
+    i, n = 0, len(segment)
+    while i < n:
+        c = segment[i]
+        i += 1
+        if c == "*":
+            out.append("[^/]*")
+        elif c == "?":
+            out.append("[^/]")
+        elif c == "[":
+            j = segment.find("]", i + 1 if i < n and segment[i] in "!]" else i)
+            if j == -1:
+                out.append(re.escape(c))
+                continue
+            body = segment[i:j].replace("\\", "\\\\")
+            if body.startswith("!"):
+                body = "^" + body[1:]
+            out.append(f"[{body}]")
+            i = j + 1
+        else:
+            out.append(re.escape(c))
+    regex = "".join(out)
+    # Wildcards do not match a leading '.'
+    if segment[:1] in ("*", "?", "["):
+        regex = r"(?!\.)" + regex
+    return regex
+
+
+def compile_glob(pattern: str) -> Pattern:
+    """
+    Translate a glob pattern to a regex over '/'-separated relative paths.
+
+    Follows glob.glob(recursive=True): '*' and '?' do not cross '/',
+    '**' spans any number of directories, and wildcards do not match a
+    leading '.'.
+    """
+    segments = pattern.replace("\\", "/").strip("/").split("/")
+    parts = []
+    for i, segment in enumerate(segments):
+        last = i == len(segments) - 1
+        if segment == "**":
+            if last:
+                parts.append(r"(?!\.)[^/]*(?:/(?!\.)[^/]*)*")
+            else:
+                parts.append(r"(?:(?!\.)[^/]*/)*")
+        else:
+            parts.append(_translate_segment(segment) + ("" if last else "/"))
+    return re.compile("".join(parts) + r"\Z", re.DOTALL)
+
+
+def _max_depth(pattern: str) -> Optional[int]:
+    """Directory depth a pattern can reach, None if unbounded ('**')"""
+    segments = pattern.replace("\\", "/").strip("/").split("/")
+    if "**" in segments:
+        return None
+    return len(segments) - 1
+
+
+def walk_files(root: str, max_depth: Optional[int] = None) -> Iterator[Tuple[str, str]]:
+    """
+    Yield (absolute_or_root_joined_path, relative_posix_path) for files under root.
+
+    Ignored directories are pruned before descending.
+    """
+    stack = [(root, "", 0)]
+    while stack:
+        directory, rel_dir, depth = stack.pop()
+        try:
+            with os.scandir(directory) as it:
+                entries = sorted(it, key=lambda e: e.name)
+        except OSError:
+            continue
+        subdirs = []
+        for entry in entries:
+            rel = f"{rel_dir}{entry.name}"
+            try:
+                if entry.is_dir(follow_symlinks=False):
+                    if entry.name in IGNORED_DIRS:
+                        continue
+                    if max_depth is None or depth < max_depth:
+                        subdirs.append((entry.path, rel + "/", depth + 1))
+                elif entry.is_file():
+                    yield entry.path, rel
+            except OSError:
+                continue
+        # Depth-first in name order
+        stack.extend(reversed(subdirs))
+
+
+def iter_glob(root: str, pattern: str, cancel: Optional[threading.Event] = None) -> Iterator[str]:
+    """Yield files under root matching a glob pattern (relative or absolute)"""
+    full = os.path.join(root, pattern)
+    if not any(ch in full for ch in "*?["):
+        if os.path.isfile(full):
+            yield full
+        return
+
+    # Walk from the deepest directory that contains no wildcard
+    first_wild = min(full.find(ch) for ch in "*?[" if ch in full)
+    base = full[:first_wild]
+    cut = max(base.rfind("/"), base.rfind(os.sep))
+    if cut == -1:
+        walk_root, rest, prefix = ".", full, ""
+    else:
+        walk_root, rest, prefix = full[:cut] or os.sep, full[cut + 1:], full[:cut + 1]
+
+    matcher = compile_glob(rest)
+    for path, rel in walk_files(walk_root, _max_depth(rest)):
+        if cancel is not None and cancel.is_set():
+            return
+        if matcher.match(rel):
+            yield prefix + rel.replace("/", os.sep)
+
+
+# ============================================================================
+# Grep
+# ============================================================================
+
+def _is_binary(head: bytes) -> bool:
+    return b"\0" in head
+
+
+def _grep_text(path: str, regex: Pattern) -> Iterator[Tuple[int, str]]:
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line_num, line in enumerate(f, 1):
+            if regex.search(line):
+                yield line_num, line.strip()
+
+
+def _grep_mmap(path: str, regex: Pattern) -> Iterator[Tuple[int, str]]:
+    """Scan a large file in place; regex is a bytes pattern compiled with MULTILINE"""
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        line_num = 1
+        counted_to = 0
+        pos = 0
+        size = len(mm)
+        while pos <= size:
+            match = regex.search(mm, pos)
+            if match is None:
+                return
+            start = mm.rfind(b"\n", 0, match.start()) + 1
+            end = mm.find(b"\n", match.start())
+            if end == -1:
+                end = size
+            line_num += mm[counted_to:start].count(b"\n")
+            counted_to = start
+            yield line_num, mm[start:end].decode("utf-8", errors="replace").strip()
+            pos = end + 1
+
+
+def iter_grep(
+    path: str,
+    pattern: str,
+    file_pattern: str = "*",
+    cancel: Optional[threading.Event] = None,
+) -> Iterator[Tuple[str, int, str]]:
+    """
+    Yield (file, line_number, line) for lines matching a regex (case-insensitive).
+
+    Args:
+        path: File or directory to search
+        pattern: Regular expression
+        file_pattern: Glob on file names (or relative paths if it has '/')
+        cancel: Set to stop the walk early
+    """
+    regex = re.compile(pattern, re.IGNORECASE)
+    bytes_regex = None
+    if pattern.isascii():
+        bytes_regex = re.compile(pattern.encode(), re.IGNORECASE | re.MULTILINE)
+
+    if os.path.isfile(path):
+        files: Iterator[Tuple[str, str]] = iter([(path, os.path.basename(path))])
+        file_matcher = None
+    else:
+        files = walk_files(path)
+        if "/" in file_pattern.replace("\\", "/"):
+            glob_regex = compile_glob(file_pattern)
+            file_matcher = lambda rel: glob_regex.match(rel) is not None
+        else:
+            file_matcher = lambda rel: fnmatch.fnmatch(rel.rsplit("/", 1)[-1], file_pattern)
+
+    for filepath, rel in files:
+        if cancel is not None and cancel.is_set():
+            return
+        if file_matcher is not None and not file_matcher(rel):
+            continue
+        try:
+            size = os.path.getsize(filepath)
+            if size == 0 or size > MAX_GREP_FILE_BYTES:
+                continue
+            with open(filepath, "rb") as f:
+                if _is_binary(f.read(SNIFF_BYTES)):
+                    continue
+            if size >= MMAP_THRESHOLD and bytes_regex is not None:
+                matches = _grep_mmap(filepath, bytes_regex)
+            else:
+                matches = _grep_text(filepath, regex)
+            for line_num, line in matches:
+                yield filepath, line_num, line
+                if cancel is not None and cancel.is_set():
+                    return
+        except (IOError, OSError, ValueError):
+            continue
+
+
+# ============================================================================
+# Async streaming
+# ============================================================================
+
+async def stream(iterator_factory, max_results: int) -> AsyncIterator:
+    """
+    Run a blocking iterator in the search pool and stream its items.
+
+    Stops the worker as soon as max_results items were produced or the
+    consumer stops iterating.
+
+    Args:
+        iterator_factory: Callable taking a cancel Event and returning an iterator
+        max_results: Maximum items to yield
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    cancel = threading.Event()
+    done = object()
+
+    def produce():
+        count = 0
+        try:
+            for item in iterator_factory(cancel):
+                loop.call_soon_threadsafe(queue.put_nowait, item)
+                count += 1
+                if count >= max_results or cancel.is_set():
+                    break
+        except BaseException as e:  # surface errors to the consumer
+            loop.call_soon_threadsafe(queue.put_nowait, e)
+        finally:
+            loop.call_soon_threadsafe(queue.put_nowait, done)
+
+    future = loop.run_in_executor(_get_executor(), produce)
+    try:
+        yielded = 0
+        while yielded < max_results:
+            item = await queue.get()
+            if item is done:
+                break
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+            yielded += 1
+    finally:
+        cancel.set()
+        await asyncio.shield(future)
+
+
+async def glob_files(root: str, pattern: str, max_results: int) -> Tuple[List[str], bool]:
+    """
+    Find files matching a glob pattern without blocking the event loop.
+
+    Returns:
+        (paths, truncated)
+    """
+    paths = [p async for p in stream(lambda cancel: iter_glob(root, pattern, cancel), max_results + 1)]
+    return paths[:max_results], len(paths) > max_results
+
+
+async def grep_files(
+    path: str,
+    pattern: str,
+    file_pattern: str,
+    max_results: int,
+) -> Tuple[List[Tuple[str, int, str]], bool]:
+    """
+    Search file contents without blocking the event loop.
+
+    Returns:
+        ([(file, line_number, line)], truncated)
+    """
+    re.compile(pattern)  # raise re.error on the caller's side
+    matches = [
+        m async for m in stream(lambda cancel: iter_grep(path, pattern, file_pattern, cancel), max_results + 1)
+    ]
+    return matches[:max_results], len(matches) > max_results
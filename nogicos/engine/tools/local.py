@@ -7,7 +7,6 @@ Reference: open-interpreter/interpreter/core/computer/files/files.py
 """
 
 import os
-import glob as glob_module
 import subprocess
 import asyncio
 import logging
@@ -16,6 +15,7 @@ from typing import Optional, List
 from pathlib import Path
 
 from .base import ToolRegistry, ToolCategory, get_registry
+from .file_search import glob_files, grep_files
 from .descriptions import (
     APPEND_FILE, GET_CWD, PATH_EXISTS, COPY_FILE
 )
@@ -531,17 +531,9 @@ Returns: Matching file paths (max 100)""",
             if not _is_path_allowed(root):
                 return f"Error: Access denied to path: {root}"
             
-            # Use glob to find files
-            search_path = os.path.join(root, pattern)
-            matches = glob_module.glob(search_path, recursive=True)
-            
-            # Limit results
+            # Walk off the event loop, pruning ignored dirs, stop at the cap
             max_results = 100
-            if len(matches) > max_results:
-                matches = matches[:max_results]
-                truncated = True
-            else:
-                truncated = False
+            matches, truncated = await glob_files(root, pattern, max_results)
             
             if not matches:
                 return f"No files found matching pattern: {pattern}"
@@ -585,34 +577,10 @@ Returns: Matching lines as file:line:content (max 50)""",
             if not _is_path_allowed(path):
                 return f"Error: Access denied to path: {path}"
             
-            results = []
+            # Scan off the event loop; binaries are skipped, large files mmapped
             max_results = 50
-            
-            # Find files to search
-            if os.path.isfile(path):
-                files = [path]
-            else:
-                search_path = os.path.join(path, "**", file_pattern)
-                files = glob_module.glob(search_path, recursive=True)
-            
-            regex = re.compile(pattern, re.IGNORECASE)
-            
-            for filepath in files:
-                if not os.path.isfile(filepath):
-                    continue
-                    
-                try:
-                    with open(filepath, 'r', encoding='utf-8', errors='replace') as f:
-                        for line_num, line in enumerate(f, 1):
-                            if regex.search(line):
-                                results.append(f"{filepath}:{line_num}: {line.strip()}")
-                                if len(results) >= max_results:
-                                    break
-                except (IOError, OSError, UnicodeDecodeError, PermissionError):
-                    continue
-                
-                if len(results) >= max_results:
-                    break
+            matches, truncated = await grep_files(path, pattern, file_pattern, max_results)
+            results = [f"{filepath}:{line_num}: {line}" for filepath, line_num, line in matches]
             
             if not results:
                 return f"No matches found for pattern: {pattern}"
@@ -620,7 +588,7 @@ Returns: Matching lines as file:line:content (max 50)""",
             result = f"Found {len(results)} matches:\n"
             result += '\n'.join(results)
             
-            if len(results) >= max_results:
+            if truncated:
                 result += f"\n... (showing first {max_results} results)"
             
             return result
@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+NogicOS Search Cache - quick-search / smart-search 结果缓存
+
+相同查询（归一化后）直接复用结果，避免每次都花 1-3 秒调用 Tavily + LLM:
+
+- TTL + LRU: 新鲜期内直接命中，超出容量淘汰最久未用
+- Single-flight: 并发的相同请求只触发一次上游调用，其余等待同一结果
+- Negative caching: 上游错误短时间缓存，避免故障时反复打上游
+- Stale-while-revalidate: 过期但仍在 stale 窗口内的结果先返回，后台刷新
+
+Environment Variables:
+    NOGICOS_SEARCH_CACHE_SIZE: 最大条目数 (default: 512)
+    NOGICOS_SEARCH_CACHE_TTL: 新鲜期秒数 (default: 300)
+    NOGICOS_SEARCH_CACHE_STALE: 过期后仍可返回的秒数 (default: 1800)
+    NOGICOS_SEARCH_CACHE_NEGATIVE_TTL: 错误缓存秒数 (default: 30)
+"""
+
+import asyncio
+import hashlib
+import json
+import os
+import time
+import unicodedata
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+from engine.observability import get_logger
+
+logger = get_logger("search_cache")
+
+# get_or_compute 返回的状态
+HIT = "hit"
+STALE = "stale"
+MISS = "miss"
+COALESCED = "coalesced"
+NEGATIVE = "negative"
+
+
+def normalize_query(query: str) -> str:
+    """归一化查询: NFKC、大小写折叠、合并空白"""
+    return " ".join(unicodedata.normalize("NFKC", query).casefold().split())
+
+
+def make_key(kind: str, query: str, **options) -> str:
+    """缓存 key = 接口类型 + 归一化查询 + 排序后的选项"""
+    raw = json.dumps([kind, normalize_query(query), sorted(options.items())], ensure_ascii=False)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    value: Any
+    fresh_until: float
+    stale_until: float
+    cost_ms: float              # 上游调用耗时（命中即节省的延迟）
+    error: Optional[BaseException] = None
+
+
+class SearchResultCache:
+    """
+    TTL + LRU 搜索结果缓存，带 single-flight 和 stale-while-revalidate
+
+    Args:
+        max_entries: 最大条目数
+        ttl: 新鲜期（秒）
+        stale_ttl: 过期后仍可返回旧结果并后台刷新的时长（秒）
+        negative_ttl: 上游错误的缓存时长（秒）
+        clock: 时间源（测试可注入）
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 512,
+        ttl: float = 300.0,
+        stale_ttl: float = 1800.0,
+        negative_ttl: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.stale_ttl = stale_ttl
+        self.negative_ttl = negative_ttl
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Task] = {}
+        self._stats = {
+            "hits": 0,
+            "stale_hits": 0,
+            "misses": 0,
+            "coalesced": 0,
+            "negative_hits": 0,
+            "upstream_errors": 0,
+            "refreshes": 0,
+            "refresh_errors": 0,
+            "evictions": 0,
+            "latency_saved_ms": 0.0,
+        }
+
+    async def get_or_compute(
+        self,
+        key: str,
+        compute: Callable[[], Awaitable[Any]],
+        is_error: Optional[Callable[[Any], bool]] = None,
+    ) -> Tuple[Any, str]:
+        """
+        读取缓存，未命中时调用 compute()
+
+        compute 抛出的异常、或 is_error(result) 为真的结果会被短时间缓存
+        （negative caching），期间相同请求直接重放该错误。
+
+        Returns:
+            (结果, 状态) - 状态为 hit / stale / miss / coalesced / negative
+        """
+        now = self._clock()
+        entry = self._entries.get(key)
+
+        if entry is not None:
+            if now < entry.fresh_until:
+                self._entries.move_to_end(key)
+                self._stats["latency_saved_ms"] += entry.cost_ms
+                if entry.error is not None:
+                    self._stats["negative_hits"] += 1
+                    raise entry.error
+                if is_error is not None and is_error(entry.value):
+                    self._stats["negative_hits"] += 1
+                    return entry.value, NEGATIVE
+                self._stats["hits"] += 1
+                return entry.value, HIT
+            if now < entry.stale_until and entry.error is None:
+                # 先返回旧结果，后台刷新
+                self._entries.move_to_end(key)
+                self._stats["stale_hits"] += 1
+                self._stats["latency_saved_ms"] += entry.cost_ms
+                if key not in self._inflight:
+                    self._stats["refreshes"] += 1
+                    self._start(key, compute, is_error, refresh=True)
+                return entry.value, STALE
+
+        task = self._inflight.get(key)
+        if task is not None:
+            self._stats["coalesced"] += 1
+            status = COALESCED
+        else:
+            self._stats["misses"] += 1
+            task = self._start(key, compute, is_error, refresh=False)
+            status = MISS
+        # shield: 单个调用方取消不影响其他等待者
+        return await asyncio.shield(task), status
+
+    def _start(self, key, compute, is_error, refresh: bool) -> asyncio.Task:
+        task = asyncio.ensure_future(self._run(key, compute, is_error, refresh))
+        self._inflight[key] = task
+        task.add_done_callback(lambda t: self._on_done(key, t))
+        return task
+
+    def _on_done(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        if not task.cancelled():
+            task.exception()  # 后台刷新的异常已记录，避免 "never retrieved" 警告
+
+    async def _run(self, key, compute, is_error, refresh: bool):
+        started = time.perf_counter()
+        try:
+            value = await compute()
+        except Exception as e:
+            cost_ms = (time.perf_counter() - started) * 1000
+            self._on_error(key, refresh, cost_ms, error=e)
+            raise
+        cost_ms = (time.perf_counter() - started) * 1000
+        if is_error is not None and is_error(value):
+            self._on_error(key, refresh, cost_ms, value=value)
+        else:
+            now = self._clock()
+            self._store(key, _Entry(value, now + self.ttl, now + self.ttl + self.stale_ttl, cost_ms))
+        return value
+
+    def _on_error(self, key: str, refresh: bool, cost_ms: float, value: Any = None, error: Optional[BaseException] = None):
+        if refresh:
+            # 刷新失败: 保留旧结果直到 stale 窗口结束
+            self._stats["refresh_errors"] += 1
+            logger.warning(f"[SearchCache] Refresh failed, serving stale result: {error or 'upstream error'}")
+            return
+        self._stats["upstream_errors"] += 1
+        now = self._clock()
+        self._store(key, _Entry(value, now + self.negative_ttl, now + self.negative_ttl, cost_ms, error))
+
+    def _store(self, key: str, entry: _Entry):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self._stats["evictions"] += 1
+
+    def invalidate(self, key: Optional[str] = None):
+        """删除单个条目，或清空全部"""
+        if key is None:
+            self._entries.clear()
+        else:
+            self._entries.pop(key, None)
+
+    def get_stats(self) -> Dict[str, Any]:
+        stats = dict(self._stats)
+        served = stats["hits"] + stats["stale_hits"] + stats["negative_hits"] + stats["coalesced"]
+        lookups = served + stats["misses"]
+        stats["entries"] = len(self._entries)
+        stats["inflight"] = len(self._inflight)
+        stats["lookups"] = lookups
+        stats["hit_ratio"] = round(served / lookups, 4) if lookups else 0.0
+        stats["latency_saved_ms"] = round(stats["latency_saved_ms"], 1)
+        return stats
+
+
+# Singleton instance
+_search_cache: Optional[SearchResultCache] = None
+
+def get_search_cache() -> SearchResultCache:
+    global _search_cache
+    if _search_cache is None:
+        _search_cache = SearchResultCache(
+            max_entries=int(os.environ.get("NOGICOS_SEARCH_CACHE_SIZE", "512")),
+            ttl=float(os.environ.get("NOGICOS_SEARCH_CACHE_TTL", "300")),
+            stale_ttl=float(os.environ.get("NOGICOS_SEARCH_CACHE_STALE", "1800")),
+            negative_ttl=float(os.environ.get("NOGICOS_SEARCH_CACHE_NEGATIVE_TTL", "30")),
+        )
+    return _search_cache
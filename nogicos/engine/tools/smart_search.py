@@ -15,6 +15,8 @@ import aiohttp
 import anthropic
 
 from engine.observability import get_logger
+from engine.http_clients import get_http_clients, sdk_client
+from engine.tools.search_cache import get_search_cache, make_key
 
 logger = get_logger("smart_search")
 
@@ -85,7 +87,10 @@ class SmartSearch:
         
         # 与 Cursor 保持一致，使用 Opus 4.5 保证质量
         self.optimizer_model = "claude-opus-4-5-20250514"  # 质量优先
-        self.client = anthropic.AsyncAnthropic(api_key=self.anthropic_api_key) if self.anthropic_api_key else None
+        self.client = sdk_client(
+            anthropic.AsyncAnthropic,  # 复用进程级连接池（SDK 不接受时用其默认传输）
+            api_key=self.anthropic_api_key,
+        ) if self.anthropic_api_key else None
     
     def should_search(self, user_input: str) -> tuple[bool, str]:
         """
@@ -173,23 +178,23 @@ Query:"""
         
         try:
             start = time.time()
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.tavily.com/search",
-                    json={
-                        "api_key": self.tavily_api_key,
-                        "query": query,
-                        "max_results": max_results,
-                        "include_answer": True,
-                        "include_raw_content": False,
-                        "search_depth": "basic",  # basic 更快
-                    },
-                    timeout=aiohttp.ClientTimeout(total=10)
-                ) as response:
-                    response.raise_for_status()
-                    data = await response.json()
-                    logger.info(f"[TavilySearch] {time.time()-start:.2f}s: {len(data.get('results', []))} results")
-                    return data
+            session = get_http_clients().session()  # keep-alive 连接复用
+            async with session.post(
+                "https://api.tavily.com/search",
+                json={
+                    "api_key": self.tavily_api_key,
+                    "query": query,
+                    "max_results": max_results,
+                    "include_answer": True,
+                    "include_raw_content": False,
+                    "search_depth": "basic",  # basic 更快
+                },
+                timeout=aiohttp.ClientTimeout(total=10)
+            ) as response:
+                response.raise_for_status()
+                data = await response.json()
+                logger.info(f"[TavilySearch] {time.time()-start:.2f}s: {len(data.get('results', []))} results")
+                return data
         except Exception as e:
             logger.error(f"Tavily search failed: {e}")
             return {"error": str(e)}
@@ -353,8 +358,17 @@ def get_smart_search() -> SmartSearch:
 
 
 async def smart_search(query: str, max_results: int = 5, force_search: bool = False) -> Dict[str, Any]:
-    """Convenience function for smart search"""
-    return await get_smart_search().search(query, max_results, force_search)
+    """Convenience function for smart search (相同查询走结果缓存)"""
+    key = make_key("smart", query, max_results=max_results, force_search=force_search)
+    result, status = await get_search_cache().get_or_compute(
+        key,
+        lambda: get_smart_search().search(query, max_results, force_search),
+        is_error=lambda r: not r.get("success"),
+    )
+    result = {**result, "cache": status}
+    if "query" in result:
+        result["query"] = query  # key 是归一化后的查询，回显调用方原文
+    return result
 
 
 # CLI for testing
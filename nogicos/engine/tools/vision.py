@@ -74,7 +74,9 @@ class VisionAnalyzer:
                 api_key = os.environ.get("ANTHROPIC_API_KEY")
             
             if api_key:
-                self.client = anthropic.Anthropic(api_key=api_key)
+                from engine.http_clients import sdk_client
+                # shared keep-alive pool when the SDK accepts it
+                self.client = sdk_client(anthropic.AsyncAnthropic, api_key=api_key)
         
         if self.client:
             logger.info(f"[Vision] Initialized with model: {model}")
@@ -107,7 +109,7 @@ class VisionAnalyzer:
             if image_b64.startswith("/9j/"):  # JPEG magic bytes
                 media_type = "image/jpeg"
             
-            response = self.client.messages.create(
+            response = await self.client.messages.create(
                 model=self.model,
                 max_tokens=max_tokens,
                 messages=[{
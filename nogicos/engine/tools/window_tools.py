@@ -911,6 +911,7 @@ def register_window_tools(registry):
             pass
         return {
             "type": "window_screenshot",
+            "hwnd": hwnd,
             "success": result.success,
             "image_base64": result.base64_image,
             "error": result.error,
@@ -34,6 +34,7 @@ import os
 import sys
 import json
 import time
+import uuid
 import logging
 import aiohttp
 from typing import Optional, List, Dict, Any
@@ -54,6 +55,11 @@ sys.path.insert(0, os.path.dirname(__file__))
 
 # Setup logging
 from engine.observability import setup_logging, get_logger
+from engine.observability import spans as tracing
+from engine.observability.metrics import get_metrics as get_performance_metrics
+from engine.http_clients import get_http_clients, start_http_clients, close_http_clients
+from engine.sqlite_pool import run_db, close_sqlite_pools
+from engine.ocr_cache import get_ocr_cache
 setup_logging(level="INFO")
 logger = get_logger("hive_server")
 
@@ -83,7 +89,16 @@ except ImportError:
 # V2 imports
 from engine.server.websocket import StatusServer
 from engine.agent.react_agent import ReActAgent
+from engine.agent.agent_pool import AgentPool
+from engine.agent.concurrency import ConcurrencyConfig, get_concurrency_manager
+from engine.agent.errors import TooManyTasksError
+from engine.agent.screenshot_manager import get_screenshot_manager, sniff_media_type
+from engine.config import get_config
+from engine.server.admission import (
+    AdmissionController, AdmissionPriority, AdmissionRejected, AdmissionExpired,
+)
 from engine.tools import create_full_registry
+from engine.tools.search_cache import get_search_cache, make_key as make_search_cache_key
 from engine.watchdog import start_watchdog, get_watchdog, ConnectionState
 from engine.knowledge.store import get_session_store
 
@@ -117,6 +132,9 @@ class ExecuteRequest(BaseModel):
     max_steps: int = 20
     mode: str = "agent"             # Agent mode: "agent", "ask", "plan"
     confirmed_plan: Optional[dict] = None  # Confirmed plan for Plan mode execution
+    priority: str = "interactive"   # Admission class: "interactive" or "background" (eval runs)
+    deadline_s: Optional[float] = None  # Drop the request if still queued after this many seconds
+    target_hwnds: Optional[List[int]] = None  # Windows the task operates on (others may run in parallel)
     
     @property
     def task_content(self) -> str:
@@ -134,6 +152,8 @@ class AgentStartRequest(BaseModel):
     target_hwnds: Optional[List[int]] = None  # 目标窗口句柄列表
     max_iterations: int = 50           # 最大迭代次数
     session_id: str = "default"        # 会话 ID
+    priority: str = "interactive"      # 准入优先级: interactive / background（评估任务）
+    deadline_s: Optional[float] = None  # 排队截止时间（秒），超时未开始则丢弃
     
     model_config = {"extra": "allow"}  # 允许扩展字段
 
@@ -196,6 +216,7 @@ class StatsResponse(BaseModel):
     tasks_succeeded: int
     tasks_failed: int
     uptime_seconds: float
+    search_cache: Optional[Dict[str, Any]] = None  # hit ratio / latency saved
 
 
 # ============================================================================
@@ -208,10 +229,11 @@ class NogicEngine:
     def __init__(self):
         self.status_server: Optional[StatusServer] = None
         self.chatkit_server: Optional["NogicOSChatServer"] = None  # ChatKit 服务器
-        self.agent: Optional[ReActAgent] = None  # Reusable agent instance
-        self._agent_lock = asyncio.Lock()  # Lock for agent access
-        self._executing = False
-        self._current_task: Optional[str] = None
+        # Pool of reusable agents; tasks on disjoint sessions/windows run in parallel
+        self.agent_pool: Optional[AgentPool] = None
+        # Bounded, prioritized admission queue in front of the pool
+        self.admission: Optional[AdmissionController] = None
+        self._current_tasks: Dict[str, str] = {}  # task_id -> task preview
         self._stats = {
             "executed": 0,
             "succeeded": 0,
@@ -219,15 +241,80 @@ class NogicEngine:
         }
         self._start_time = time.time()
 
-    async def get_agent(self) -> ReActAgent:
-        """Get agent instance with lock protection for thread safety"""
-        async with self._agent_lock:
-            if self.agent is None:
-                self.agent = ReActAgent(
-                    status_server=self.status_server,
-                    max_iterations=20,
-                )
-            return self.agent
+    def _create_agent(self) -> ReActAgent:
+        return ReActAgent(
+            status_server=self.status_server,
+            max_iterations=20,
+        )
+
+    def _ensure_agent_pool(self) -> AgentPool:
+        if self.agent_pool is None:
+            concurrency = get_concurrency_manager(
+                ConcurrencyConfig(max_concurrent_tasks=get_config().max_concurrent_tasks)
+            )
+            self.agent_pool = AgentPool(self._create_agent, concurrency=concurrency)
+        return self.agent_pool
+
+    def _ensure_admission(self) -> AdmissionController:
+        if self.admission is None:
+            config = get_config()
+            self.admission = AdmissionController(
+                max_active=self._ensure_agent_pool().size,
+                max_queue=config.admission_max_queue,
+                max_queued_per_client=config.admission_max_queued_per_client,
+                default_deadlines={
+                    AdmissionPriority.INTERACTIVE: config.admission_interactive_deadline_s,
+                    AdmissionPriority.BACKGROUND: config.admission_background_deadline_s,
+                },
+            )
+        return self.admission
+
+    @asynccontextmanager
+    async def lease_agent(
+        self,
+        task_content: str,
+        session_id: str,
+        max_iterations: Optional[int] = None,
+        target_hwnds: Optional[List[int]] = None,
+        task_id: Optional[str] = None,
+        desktop: bool = True,
+        timeout: Optional[float] = None,
+    ):
+        """
+        Lease an agent from the pool for one task.
+
+        Waits (FIFO) while all agents are busy or another task holds the
+        same session or windows, instead of rejecting the request.
+        A desktop task without target_hwnds holds the whole desktop;
+        read-only tasks (desktop=False) only wait for their own session.
+
+        Raises:
+            TooManyTasksError: No slot within `timeout` (the admission deadline)
+        """
+        task_id = task_id or f"exec_{uuid.uuid4().hex[:12]}"
+        async with self._ensure_agent_pool().lease(
+            task_id,
+            session_id=session_id,
+            target_hwnds=set(target_hwnds or ()),
+            max_iterations=max_iterations,
+            desktop=desktop,
+            timeout=timeout,
+        ) as agent:
+            self._current_tasks[task_id] = task_content[:100]
+            try:
+                yield agent
+            finally:
+                self._current_tasks.pop(task_id, None)
+
+    @property
+    def active_tasks(self) -> List[str]:
+        """Previews of tasks currently running"""
+        return list(self._current_tasks.values())
+
+    @property
+    def is_busy(self) -> bool:
+        """Every agent slot is in use (new tasks will queue)"""
+        return self.agent_pool is not None and self.agent_pool.is_saturated
 
     async def start_websocket(self):
         """Start WebSocket server"""
@@ -235,14 +322,16 @@ class NogicEngine:
         await self.status_server.start()
         logger.info("WebSocket server started on port 8765")
         
-        # Initialize reusable ReAct Agent (avoids 1-2s init overhead per request)
-        logger.info("Initializing ReAct Agent...")
+        # Pre-initialize one pooled ReAct Agent (avoids 1-2s init overhead per request);
+        # further agents are created on demand up to max_concurrent_tasks
+        logger.info("Initializing ReAct Agent pool...")
         init_start = time.time()
-        self.agent = ReActAgent(
-            status_server=self.status_server,
-            max_iterations=20,
+        self._ensure_agent_pool().warm(1)
+        self._ensure_admission()
+        logger.info(
+            f"ReAct Agent initialized in {time.time() - init_start:.2f}s "
+            f"(pool size {self.agent_pool.size})"
         )
-        logger.info(f"ReAct Agent initialized in {time.time() - init_start:.2f}s")
         
         # 初始化 ChatKit 服务器
         if CHATKIT_AVAILABLE and create_chatkit_server:
@@ -256,31 +345,52 @@ class NogicEngine:
             await self.status_server.stop()
             logger.info("WebSocket server stopped")
     
-    async def execute(self, request: ExecuteRequest) -> ExecuteResponse:
-        """Execute task using ReAct Agent with mode support"""
-        # [P0-5 FIX] Use lock for thread-safe execution check with guaranteed cleanup
-        async with self._agent_lock:
-            if self._executing:
-                raise HTTPException(status_code=429, detail="Another task is executing")
-            self._executing = True
+    async def execute(self, request: ExecuteRequest, client_id: str = "anonymous") -> ExecuteResponse:
+        """
+        Execute task using ReAct Agent with mode support.
 
+        The request first waits in the admission queue (priority class,
+        per-client fair share). A full queue is rejected with 429, and a
+        request still queued at its deadline gets 503 without reaching
+        the agent.
+        """
         task_content = request.task_content
-        self._current_task = task_content[:100]
         start_time = time.time()
-
-        # [P0-5 FIX] Wrap everything in try-finally to ensure state cleanup
+        task_id = f"exec_{uuid.uuid4().hex[:12]}"
         try:
-            return await self._execute_task(request, task_content, start_time)
-        finally:
-            # [P0-5 FIX] Always reset execution state, even on unexpected errors
-            self._executing = False
-            self._current_task = None
+            async with self._ensure_admission().admit(
+                task_id,
+                client_id=client_id,
+                priority=request.priority,
+                deadline_s=request.deadline_s,
+            ) as ticket:
+                # The slot wait counts against the same deadline
+                return await self._execute_task(
+                    request, task_content, start_time, task_id, slot_timeout=ticket.remaining_s,
+                )
+        except TooManyTasksError as e:
+            raise HTTPException(status_code=503, detail=f"No agent slot before the request deadline: {e}")
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(int(e.retry_after + 0.5))},
+            )
+        except AdmissionExpired as e:
+            raise HTTPException(status_code=503, detail=str(e))
 
-    async def _execute_task(self, request: ExecuteRequest, task_content: str, start_time: float) -> ExecuteResponse:
+    async def _execute_task(
+        self,
+        request: ExecuteRequest,
+        task_content: str,
+        start_time: float,
+        task_id: Optional[str] = None,
+        slot_timeout: Optional[float] = None,
+    ) -> ExecuteResponse:
         """Internal task execution logic - separated for clean error handling"""
         
         # Parse mode
-        from engine.agent.modes import AgentMode
+        from engine.agent.modes import AgentMode, get_mode_router
         try:
             mode = AgentMode(request.mode)
         except ValueError:
@@ -311,42 +421,49 @@ class NogicEngine:
                 logger.warning(f"[Engine] Failed to parse confirmed plan: {e}")
         
         try:
-            # [P1 FIX] Reuse existing agent instance instead of creating new one each time
+            # [P1 FIX] Reuse pooled agent instances instead of creating new ones each time
             # This saves 1-2s initialization overhead per request
-            agent = await self.get_agent()
-            # Update max_iterations if different from default
-            if agent.max_iterations != request.max_steps:
-                agent.max_iterations = request.max_steps
-
-            # Execute based on mode
-            if confirmed_plan:
-                # Execute confirmed plan
-                result = await agent.run(
-                    task=task_content,
-                    session_id=request.session_id,
-                    mode=AgentMode.AGENT,
-                    confirmed_plan=confirmed_plan,
-                )
-            elif mode == AgentMode.PLAN:
-                # Plan mode: generate plan without executing
-                result = await agent.run(
-                    task=task_content,
-                    session_id=request.session_id,
-                    mode=mode,
-                )
-            elif mode == AgentMode.ASK:
-                # Ask mode: read-only exploration
-                result = await agent.run(
-                    task=task_content,
-                    session_id=request.session_id,
-                    mode=mode,
-                )
-            else:
-                # Agent mode: full execution
-                result = await agent.run_with_planning(
-                    task=task_content,
-                    session_id=request.session_id,
-                )
+            # Read-only modes (ASK/PLAN) never drive the mouse/keyboard and
+            # overlap with desktop tasks of other sessions
+            drives_desktop = confirmed_plan is not None or not get_mode_router().is_read_only(mode)
+            async with self.lease_agent(
+                task_content,
+                request.session_id,
+                max_iterations=request.max_steps,
+                target_hwnds=request.target_hwnds,
+                task_id=task_id,
+                desktop=drives_desktop,
+                timeout=slot_timeout,
+            ) as agent:
+                # Execute based on mode
+                if confirmed_plan:
+                    # Execute confirmed plan
+                    result = await agent.run(
+                        task=task_content,
+                        session_id=request.session_id,
+                        mode=AgentMode.AGENT,
+                        confirmed_plan=confirmed_plan,
+                    )
+                elif mode == AgentMode.PLAN:
+                    # Plan mode: generate plan without executing
+                    result = await agent.run(
+                        task=task_content,
+                        session_id=request.session_id,
+                        mode=mode,
+                    )
+                elif mode == AgentMode.ASK:
+                    # Ask mode: read-only exploration
+                    result = await agent.run(
+                        task=task_content,
+                        session_id=request.session_id,
+                        mode=mode,
+                    )
+                else:
+                    # Agent mode: full execution
+                    result = await agent.run_with_planning(
+                        task=task_content,
+                        session_id=request.session_id,
+                    )
             
             elapsed = time.time() - start_time
             
@@ -365,6 +482,8 @@ class NogicEngine:
                 error=result.error,
             )
             
+        except TooManyTasksError:
+            raise  # deadline passed while waiting for a slot (503)
         except Exception as e:
             logger.error(f"Execution error: {e}", exc_info=True)
             self._stats["executed"] += 1
@@ -376,7 +495,6 @@ class NogicEngine:
                 time_seconds=time.time() - start_time,
                 error=str(e),
             )
-        # [P0-5 FIX] finally block removed - cleanup now handled in outer execute() method
     
     def get_stats(self) -> StatsResponse:
         """Get server statistics"""
@@ -385,6 +503,7 @@ class NogicEngine:
             tasks_succeeded=self._stats["succeeded"],
             tasks_failed=self._stats["failed"],
             uptime_seconds=time.time() - self._start_time,
+            search_cache=get_search_cache().get_stats(),
         )
 
 
@@ -1135,6 +1254,19 @@ def get_real_client_ip(request_or_websocket) -> str:
     return direct_ip or "unknown"
 
 
+def get_admission_client_id(request: Request) -> str:
+    """
+    准入队列公平共享的客户端标识
+    
+    本地客户端（UI、评估脚本）共用 127.0.0.1，可通过 X-NogicOS-Client
+    头区分；否则使用真实客户端 IP。
+    """
+    client = request.headers.get("X-NogicOS-Client", "").strip()
+    if client:
+        return f"{get_real_client_ip(request)}/{client[:64]}"
+    return get_real_client_ip(request)
+
+
 def verify_agent_api_auth(request: Request) -> str:
     """
     验证 Agent API 鉴权 - Phase 6 Security Fix v5
@@ -1226,6 +1358,9 @@ async def lifespan(app: FastAPI):
     
     server_start_time = time.time()
     
+    # Shared outbound HTTP pools (Tavily, Anthropic, OpenAI)
+    await start_http_clients()
+    
     # Initialize engine
     engine = NogicEngine()
     await engine.start_websocket()
@@ -1233,7 +1368,11 @@ async def lifespan(app: FastAPI):
     # Initialize UnifiedAgentManager (唯一的 Agent 管理器)
     if UNIFIED_AGENT_AVAILABLE:
         unified_agent_manager = UnifiedAgentManager()
-        await unified_agent_manager.initialize(status_server=engine.status_server)
+        await unified_agent_manager.initialize(
+            status_server=engine.status_server,
+            agent_pool=engine.agent_pool,  # share slots with /v2/execute and /api/chat
+            admission=engine.admission,
+        )
         stats = unified_agent_manager.get_stats()
         logger.info("=" * 40)
         logger.info("UnifiedAgentManager initialized!")
@@ -1276,6 +1415,26 @@ async def lifespan(app: FastAPI):
     if watchdog:
         await watchdog.stop()
     
+    # Flush pending event handlers (WebSocket forwarding, tracing)
+    event_bus = get_event_bus()
+    if hasattr(event_bus, "stop"):
+        await event_bus.drain(timeout=2.0)
+        await event_bus.stop()
+    
+    # Write out buffered spans (OTLP file exporter)
+    tracing.get_tracer().shutdown()
+    
+    # Close pooled outbound connections
+    await close_http_clients()
+    
+    # Write out buffered hook context events before the pools close
+    if HOOK_SYSTEM_AVAILABLE:
+        from engine.context.store import close_context_store
+        close_context_store()
+    
+    # Close pooled SQLite connections and the DB executor
+    close_sqlite_pools()
+    
     if engine:
         await engine.stop_websocket()
     logger.info("Shutdown complete")
@@ -1288,6 +1447,13 @@ app = FastAPI(
     lifespan=lifespan,
 )
 
+# Prometheus endpoint (/metrics): agent, tool and admission queue metrics
+try:
+    from monitoring.prometheus.metrics import setup_metrics_endpoint
+    setup_metrics_endpoint(app)
+except ImportError:
+    logger.info("Prometheus metrics endpoint disabled (monitoring package not available)")
+
 # CORS - Security: Limit allowed origins
 # In production, set ALLOWED_ORIGINS env var
 # Note: file:// removed for security - use proper Electron protocol handling
@@ -1380,7 +1546,7 @@ async def get_stats():
 
 @app.post("/v2/execute", response_model=ExecuteResponse)
 @app.post("/execute", response_model=ExecuteResponse)  # Legacy route alias
-async def execute_v2(request: ExecuteRequest):
+async def execute_v2(request: ExecuteRequest, req: Request):
     """
     Execute task using Pure ReAct Agent.
     
@@ -1393,7 +1559,7 @@ async def execute_v2(request: ExecuteRequest):
     if not engine:
         raise HTTPException(status_code=503, detail="Engine not ready")
     
-    return await engine.execute(request)
+    return await engine.execute(request, client_id=get_admission_client_id(req))
 
 
 @app.get("/v2/tools")
@@ -1451,12 +1617,14 @@ async def quick_search(request: QuickSearchRequest, req: Request):
     if not api_key:
         raise HTTPException(status_code=500, detail="TAVILY_API_KEY not configured")
     
-    # [P1 FIX] Direct Tavily API call with enhanced error handling and timeout
-    try:
-        timeout = aiohttp.ClientTimeout(total=30)  # 30 second timeout
-        async with aiohttp.ClientSession(timeout=timeout) as session:
+    async def fetch():
+        # [P1 FIX] Direct Tavily API call with enhanced error handling and timeout
+        try:
+            timeout = aiohttp.ClientTimeout(total=30)  # 30 second timeout
+            session = get_http_clients().session()  # shared keep-alive pool
             async with session.post(
                 "https://api.tavily.com/search",
+                timeout=timeout,
                 json={
                     "api_key": api_key,
                     "query": request.query[:500],  # [P1 FIX] Limit query length
@@ -1470,12 +1638,16 @@ async def quick_search(request: QuickSearchRequest, req: Request):
                     error_text = await resp.text()
                     logger.error(f"[Tavily] API error {resp.status}: {error_text[:200]}")
                     raise HTTPException(status_code=502, detail="External search service error")
-                data = await resp.json()
-    except asyncio.TimeoutError:
-        raise HTTPException(status_code=504, detail="Search request timeout")
-    except aiohttp.ClientError as e:
-        logger.error(f"[Tavily] Client error: {e}")
-        raise HTTPException(status_code=502, detail="Search service unavailable")
+                return await resp.json()
+        except asyncio.TimeoutError:
+            raise HTTPException(status_code=504, detail="Search request timeout")
+        except aiohttp.ClientError as e:
+            logger.error(f"[Tavily] Client error: {e}")
+            raise HTTPException(status_code=502, detail="Search service unavailable")
+    
+    # 相同查询复用结果；并发相同请求只打一次 Tavily，上游错误短时缓存
+    cache_key = make_search_cache_key("quick", request.query[:500], max_results=min(request.max_results, 10))
+    data, cache_status = await get_search_cache().get_or_compute(cache_key, fetch)
     
     elapsed = time.time() - start
     
@@ -1492,6 +1664,7 @@ async def quick_search(request: QuickSearchRequest, req: Request):
             for r in data.get("results", [])
         ],
         "time_seconds": round(elapsed, 2),
+        "cache": cache_status,
     }
 
 
@@ -1659,7 +1832,8 @@ async def save_session(request: SaveSessionRequest):
     """
     try:
         store = get_session_store()
-        store.save_session(
+        await run_db(
+            store.save_session,
             session_id=request.session_id,
             history=request.history,
             preferences=request.preferences,
@@ -1676,15 +1850,17 @@ async def save_session(request: SaveSessionRequest):
 
 
 @app.get("/v2/sessions/{session_id}")
-async def load_session(session_id: str):
+async def load_session(session_id: str, limit: Optional[int] = None, before: Optional[int] = None):
     """
     Load a saved session by ID.
     
     Returns session history, preferences, and metadata.
+    With `limit`, returns the newest messages only; pass the returned
+    `next_cursor` as `before` to page back through older messages.
     """
     try:
         store = get_session_store()
-        session = store.load_session(session_id)
+        session = await run_db(store.load_session, session_id, limit=limit, before=before)
         return session
     except Exception as e:
         logger.error(f"Failed to load session: {e}")
@@ -1692,20 +1868,22 @@ async def load_session(session_id: str):
 
 
 @app.get("/v2/sessions")
-async def list_sessions(limit: int = 20, offset: int = 0):
+async def list_sessions(limit: int = 20, offset: int = 0, cursor: Optional[str] = None):
     """
     List recent sessions.
     
     Returns session summaries without full history for performance.
+    Pass the returned `next_cursor` as `cursor` for the next page.
     """
     try:
         store = get_session_store()
-        sessions = store.list_sessions(limit=limit, offset=offset)
-        stats = store.get_session_stats()
+        sessions = await run_db(store.list_sessions, limit=limit, offset=offset, cursor=cursor)
+        stats = await run_db(store.get_session_stats)
         
         return {
             "sessions": sessions,
             "total": stats["session_count"],
+            "next_cursor": store.make_cursor(sessions[-1]) if len(sessions) == limit else None,
             "stats": stats,
         }
     except Exception as e:
@@ -1718,7 +1896,7 @@ async def delete_session(session_id: str):
     """Delete a saved session"""
     try:
         store = get_session_store()
-        deleted = store.delete_session(session_id)
+        deleted = await run_db(store.delete_session, session_id)
         
         if not deleted:
             raise HTTPException(status_code=404, detail="Session not found")
@@ -1926,6 +2104,8 @@ async def generate_ai_sdk_stream(
     session_id: str, 
     conversation_history: list = None,
     file_context: dict = None,  # NEW: Current file context
+    mode: str = "agent",
+    target_hwnds: Optional[List[int]] = None,
 ):
     """
     Generate SSE stream compatible with Vercel AI SDK 5.0 Data Stream Protocol.
@@ -1951,8 +2131,18 @@ async def generate_ai_sdk_stream(
                 "cursorColumn": 10,
                 "visibleRange": [30, 60]
             }
+        mode: "agent" (default), or a read-only mode ("ask"/"plan") that
+            never drives the desktop
+        target_hwnds: Windows an agent-mode chat operates on
     """
     import uuid
+    from engine.agent.modes import AgentMode, get_mode_router
+
+    try:
+        agent_mode = AgentMode(mode)
+    except ValueError:
+        agent_mode = AgentMode.AGENT
+    read_only = get_mode_router().is_read_only(agent_mode)
 
     # #region debug log D
     import json as json_lib
@@ -1960,27 +2150,27 @@ async def generate_ai_sdk_stream(
         f.write(json_lib.dumps({"location":"hive_server.py:1953","message":"Getting agent instance","data":{"engineExists":engine is not None},"timestamp":int(time.time()*1000),"sessionId":"debug-session","runId":"run1","hypothesisId":"D"})+'\n')
     # #endregion
 
-    # Reuse global agent instance with lock protection
-    # This avoids 1-2s initialization overhead per request
-    if engine:
-        agent = await engine.get_agent()
-        # #region debug log D
-        with open(r'c:\Users\TE\532-CorporateHell-Git\nogicos\.cursor\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json_lib.dumps({"location":"hive_server.py:1957","message":"Agent retrieved from engine","data":{"agentExists":agent is not None},"timestamp":int(time.time()*1000),"sessionId":"debug-session","runId":"run1","hypothesisId":"D"})+'\n')
-        # #endregion
-    else:
-        # #region debug log D
-        with open(r'c:\Users\TE\532-CorporateHell-Git\nogicos\.cursor\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json_lib.dumps({"location":"hive_server.py:1959","message":"Creating new ReActAgent","data":{},"timestamp":int(time.time()*1000),"sessionId":"debug-session","runId":"run1","hypothesisId":"D"})+'\n')
-        # #endregion
-        agent = ReActAgent(
-            status_server=None,
-            max_iterations=20,
-        )
-        # #region debug log D
-        with open(r'c:\Users\TE\532-CorporateHell-Git\nogicos\.cursor\debug.log', 'a', encoding='utf-8') as f:
-            f.write(json_lib.dumps({"location":"hive_server.py:1963","message":"ReActAgent created","data":{"agentExists":agent is not None},"timestamp":int(time.time()*1000),"sessionId":"debug-session","runId":"run1","hypothesisId":"D"})+'\n')
-        # #endregion
+    # Lease a pooled agent per request (avoids 1-2s initialization overhead).
+    # The same session waits its turn. Read-only chats in other sessions run
+    # in parallel with anything; agent-mode chats hold their target windows,
+    # or the whole desktop when none are given. The slot wait is bounded by
+    # the interactive admission deadline.
+    @asynccontextmanager
+    async def acquire_agent():
+        if engine:
+            async with engine.lease_agent(
+                task,
+                session_id,
+                target_hwnds=target_hwnds,
+                desktop=not read_only,
+                timeout=get_config().admission_interactive_deadline_s,
+            ) as pooled_agent:
+                yield pooled_agent
+        else:
+            yield ReActAgent(
+                status_server=None,
+                max_iterations=20,
+            )
     
     message_id = str(uuid.uuid4())
     text_id = f"text_{uuid.uuid4().hex[:8]}"
@@ -2140,15 +2330,28 @@ async def generate_ai_sdk_stream(
             # 使用 run_with_planning() 激活 Plan-and-Execute 架构
             # - 简单任务：直接执行
             # - 复杂任务：生成计划，逐步执行，失败时重新规划
-            result = await agent.run_with_planning(
-                task=task,
-                session_id=session_id,
-                context=context,  # Pass conversation history as context
-                on_text_delta=text_callback,
-                on_thinking_delta=thinking_callback,
-                on_tool_start=tool_start_callback,
-                on_tool_end=tool_end_callback,
-            )
+            async with acquire_agent() as agent:
+                if read_only:
+                    result = await agent.run(
+                        task=task,
+                        session_id=session_id,
+                        context=context,
+                        mode=agent_mode,
+                        on_text_delta=text_callback,
+                        on_thinking_delta=thinking_callback,
+                        on_tool_start=tool_start_callback,
+                        on_tool_end=tool_end_callback,
+                    )
+                else:
+                    result = await agent.run_with_planning(
+                        task=task,
+                        session_id=session_id,
+                        context=context,  # Pass conversation history as context
+                        on_text_delta=text_callback,
+                        on_thinking_delta=thinking_callback,
+                        on_tool_start=tool_start_callback,
+                        on_tool_end=tool_end_callback,
+                    )
             
             # #region debug log E
             with open(r'c:\Users\TE\532-CorporateHell-Git\nogicos\.cursor\debug.log', 'a', encoding='utf-8') as f:
@@ -2233,6 +2436,9 @@ async def chat_endpoint(request: Request):
     1. New format: { text: "message" }
     2. Traditional: { messages: [{ role: "user", content: "..." }] }
     
+    Optional fields: mode ("agent" / "ask" / "plan") and target_hwnds,
+    which decide what the chat may run in parallel with.
+    
     Returns SSE stream with:
     - Text deltas (type 0)
     - Reasoning/thinking deltas (type g, h)
@@ -2341,7 +2547,11 @@ async def chat_endpoint(request: Request):
     # #endregion
     
     return StreamingResponse(
-        generate_ai_sdk_stream(user_message, session_id, conversation_history, file_context),
+        generate_ai_sdk_stream(
+            user_message, session_id, conversation_history, file_context,
+            mode=body.get("mode") or "agent",
+            target_hwnds=body.get("target_hwnds"),
+        ),
         media_type="text/event-stream",
         headers={
             "Cache-Control": "no-cache, no-store, must-revalidate",
@@ -2844,8 +3054,17 @@ async def start_agent(request: AgentStartRequest, req: Request):
                 target_hwnds=request.target_hwnds,
                 max_iterations=request.max_iterations,
                 session_id=request.session_id,
+                priority=request.priority,
+                client_id=get_admission_client_id(req),
+                deadline_s=request.deadline_s,
             )
             return result
+        except AdmissionRejected as e:
+            raise HTTPException(
+                status_code=429,
+                detail=str(e),
+                headers={"Retry-After": str(int(e.retry_after + 0.5))},
+            )
         except RuntimeError as e:
             raise HTTPException(status_code=409, detail=str(e))
         except Exception as e:
@@ -3170,6 +3389,17 @@ async def get_agent_stats(req: Request):
         stats = unified_agent_manager.get_stats()
         stats["manager_type"] = "UnifiedAgentManager"
         stats["core_agent"] = "ReActAgent"
+        stats["event_bus"] = get_event_bus().get_stats()
+        # TTFT / inter-token / tokens-per-second / retry time per model and cache state
+        stats["llm"] = get_performance_metrics().get_llm_summary()
+        # Outbound connection pool saturation
+        stats["http_pool"] = get_http_clients().get_stats()
+        # OCR result cache (whole images, screenshot tiles, hook address-bar OCR)
+        stats["ocr_cache"] = get_ocr_cache().get_stats()
+        # Hook context event journal (ring buffer, batch writer, rollups)
+        if HOOK_SYSTEM_AVAILABLE:
+            from engine.context import get_context_store
+            stats["context_events"] = get_context_store().get_stats()
         return stats
     
     # Legacy
@@ -3188,6 +3418,69 @@ async def get_agent_stats(req: Request):
     raise HTTPException(status_code=501, detail="No Agent available")
 
 
+@app.get("/api/agent/trace/{task_id}")
+async def get_agent_trace(task_id: str, req: Request, spans: bool = False):
+    """
+    Per-iteration time breakdown for a task.
+    
+    Built from the in-memory span ring buffer: for every agent iteration,
+    time spent in LLM streaming (and TTFT), tool calls, screenshot encoding,
+    checkpoints and DB flushes. `folded` is flamegraph.pl / speedscope input.
+    
+    Security:
+        - 需要 API Key 鉴权（或仅允许本地请求）
+    """
+    verify_agent_api_auth(req)
+    
+    tracer = tracing.get_tracer()
+    ring = tracer.ring_buffer
+    task_spans = ring.spans(task_id=task_id) if ring else []
+    if not task_spans:
+        raise HTTPException(status_code=404, detail="No spans recorded for this task")
+    
+    result = {
+        "task_id": task_id,
+        "iterations": tracing.flame_breakdown(task_id, task_spans),
+        "folded": tracing.folded_stacks(task_id, task_spans),
+        "tracer": tracer.get_stats(),
+    }
+    if spans:
+        result["spans"] = [s.to_dict() for s in task_spans]
+    return result
+
+
+@app.get("/api/screenshots/{screenshot_id}")
+async def get_screenshot(screenshot_id: str, req: Request, thumbnail: bool = False):
+    """
+    Stream a stored screenshot by ID.
+    
+    Frames and checkpoints reference screenshots by ID instead of inlining
+    base64; clients fetch the bytes (or the thumbnail) here.
+    
+    Security:
+        - 需要 API Key 鉴权（或仅允许本地请求）
+    """
+    verify_agent_api_auth(req)
+    
+    manager = get_screenshot_manager()
+    chunks = manager.iter_chunks(screenshot_id, thumbnail=thumbnail)
+    first = await anext(chunks, None)
+    if first is None:
+        raise HTTPException(status_code=404, detail="Screenshot not found")
+    
+    async def body():
+        yield first
+        async for chunk in chunks:
+            yield chunk
+    
+    return StreamingResponse(
+        body(),
+        media_type="image/jpeg" if thumbnail else sniff_media_type(first),
+        # IDs are never reused for different content
+        headers={"Cache-Control": "private, max-age=86400, immutable"},
+    )
+
+
 # ============================================================================
 # Phase 6: WebSocket Agent Event Stream
 # ============================================================================
@@ -3232,6 +3525,8 @@ async def agent_event_stream(websocket: WebSocket, task_id: str, token: Optional
     - failed: 任务失败
     - cancelled: 任务取消
     - stopped: 任务停止
+    - queued / queue_position: 排队中及排队位置变化
+    - expired: 排队超过截止时间，任务被丢弃
     - backpressure_warning: 事件队列积压警告
     - heartbeat: 心跳
     
@@ -3317,10 +3612,12 @@ async def agent_event_stream(websocket: WebSocket, task_id: str, token: Optional
             await reject_with_error(4003, "Local access only", "local_only")
             return
     
-    # 检查 HostAgent 可用性
-    if not HOST_AGENT_AVAILABLE or not host_agent_manager:
-        await reject_with_error(1011, "HostAgent not available", "service_unavailable")
+    # 检查 Agent 管理器可用性（优先 UnifiedAgentManager）
+    use_unified = UNIFIED_AGENT_AVAILABLE and unified_agent_manager is not None
+    if not use_unified and (not HOST_AGENT_AVAILABLE or not host_agent_manager):
+        await reject_with_error(1011, "Agent manager not available", "service_unavailable")
         return
+    event_source = unified_agent_manager if use_unified else host_agent_manager
     
     # 鉴权成功，接受连接
     await websocket.accept()
@@ -3333,8 +3630,8 @@ async def agent_event_stream(websocket: WebSocket, task_id: str, token: Optional
         "timestamp": time.time(),
     })
     
-    # 订阅任务事件
-    event_queue = host_agent_manager.subscribe(task_id)
+    # 订阅任务事件（含排队位置 queue_position）
+    event_queue = event_source.subscribe(task_id)
     
     # Review Fix v8: 注册消息速率限制器
     connection_id = f"{task_id}:{client_host}:{time.time()}"
@@ -3343,7 +3640,12 @@ async def agent_event_stream(websocket: WebSocket, task_id: str, token: Optional
     try:
         # 发送当前状态
         try:
-            status = host_agent_manager.get_status(task_id)
+            if use_unified:
+                status = await unified_agent_manager.get_task_status(task_id)
+                if "error" in status:
+                    raise ValueError(status["error"])
+            else:
+                status = host_agent_manager.get_status(task_id)
             await websocket.send_json({
                 "type": "status",
                 "data": status,
@@ -3358,14 +3660,15 @@ async def agent_event_stream(websocket: WebSocket, task_id: str, token: Optional
             })
         
         # 发送待确认的操作（如果有）
-        pending = host_agent_manager.get_pending_confirmations()
-        task_pending = [p for p in pending if p.get("task_id") == task_id]
-        if task_pending:
-            await websocket.send_json({
-                "type": "pending_confirmations",
-                "data": task_pending,
-                "timestamp": time.time(),
-            })
+        if not use_unified:
+            pending = host_agent_manager.get_pending_confirmations()
+            task_pending = [p for p in pending if p.get("task_id") == task_id]
+            if task_pending:
+                await websocket.send_json({
+                    "type": "pending_confirmations",
+                    "data": task_pending,
+                    "timestamp": time.time(),
+                })
         
         # 持续推送事件
         while True:
@@ -3398,7 +3701,7 @@ async def agent_event_stream(websocket: WebSocket, task_id: str, token: Optional
                 await websocket.send_json(event)
                 
                 # 检查是否任务结束
-                if event_type in ("completed", "failed", "cancelled", "stopped"):
+                if event_type in ("completed", "failed", "cancelled", "stopped", "expired"):
                     logger.info(f"[Agent WS] Task {task_id} ended ({event_type}), closing")
                     # 发送最终状态
                     await websocket.send_json({
@@ -3432,7 +3735,7 @@ async def agent_event_stream(websocket: WebSocket, task_id: str, token: Optional
         except Exception:
             pass
     finally:
-        host_agent_manager.unsubscribe(task_id, event_queue)
+        event_source.unsubscribe(task_id, event_queue)
         # Review Fix v7: 释放连接配额
         if connection_acquired:
             await _ws_connection_limiter.release(client_host)
@@ -3501,7 +3804,7 @@ async def health():
     status = "healthy"
     if engine is None:
         status = "unhealthy"
-    elif engine._executing:
+    elif engine.is_busy:
         status = "busy"
     elif memory_mb > 1024:
         status = "degraded"
@@ -3520,8 +3823,12 @@ async def health():
     return {
         "status": status,
         "engine": engine is not None,
-        "executing": engine._executing if engine else False,
-        "current_task": engine._current_task[:50] if engine and engine._current_task else None,
+        "executing": bool(engine.active_tasks) if engine else False,
+        "current_task": engine.active_tasks[0][:50] if engine and engine.active_tasks else None,
+        "active_tasks": len(engine.active_tasks) if engine else 0,
+        "queued_requests": engine.admission.queued if engine and engine.admission else 0,
+        "agent_pool": engine.agent_pool.get_stats() if engine and engine.agent_pool else None,
+        "websocket_clients": engine.status_server.get_client_stats() if engine and engine.status_server else [],
         "uptime_seconds": round(uptime, 1),
         "memory_mb": round(memory_mb, 1),
         "watchdog": watchdog_status,
@@ -142,6 +142,35 @@ class AgentMetrics:
             registry=self.registry,
         )
         
+        # Admission queue metrics
+        self.admission_queue_depth = Gauge(
+            "nogicos_admission_queue_depth",
+            "Requests waiting for admission",
+            ["priority"],
+            registry=self.registry,
+        )
+        
+        self.admission_active = Gauge(
+            "nogicos_admission_active",
+            "Requests currently admitted",
+            registry=self.registry,
+        )
+        
+        self.admission_wait = Histogram(
+            "nogicos_admission_wait_seconds",
+            "Time spent in the admission queue",
+            ["priority", "outcome"],
+            buckets=(0.01, 0.05, 0.1, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0),
+            registry=self.registry,
+        )
+        
+        self.admission_rejected_total = Counter(
+            "nogicos_admission_rejected_total",
+            "Requests rejected or dropped by the admission queue",
+            ["priority", "reason"],
+            registry=self.registry,
+        )
+        
         # Internal tracking for success rate calculation
         self._request_counts = {}
         self._success_counts = {}
@@ -233,6 +262,29 @@ class AgentMetrics:
         
         self.errors_total.labels(error_type=error_type).inc()
     
+    def set_admission_state(self, queued_by_priority: dict, active: int):
+        """Set admission queue depth per priority and the admitted count"""
+        if not self._enabled:
+            return
+        
+        for priority, depth in queued_by_priority.items():
+            self.admission_queue_depth.labels(priority=priority).set(depth)
+        self.admission_active.set(active)
+    
+    def record_admission_wait(self, priority: str, outcome: str, duration_seconds: float):
+        """Record time a request spent queued (outcome: admitted/expired/cancelled/shed)"""
+        if not self._enabled:
+            return
+        
+        self.admission_wait.labels(priority=priority, outcome=outcome).observe(duration_seconds)
+    
+    def record_admission_rejected(self, priority: str, reason: str):
+        """Record a request rejected or dropped by admission control"""
+        if not self._enabled:
+            return
+        
+        self.admission_rejected_total.labels(priority=priority, reason=reason).inc()
+    
     def set_browser_sessions(self, count: int):
         """Set the number of active browser sessions"""
         if not self._enabled:
@@ -0,0 +1,177 @@
+# -*- coding: utf-8 -*-
+"""
+Incremental Checkpoint Benchmark
+
+Simulates a ReAct run where every iteration appends an assistant tool_use
+and a tool_result carrying a screenshot, then checkpoints the state. The
+previous checkpointer (JSON round-trip deep copy, hard-coded key diff,
+screenshots inline) is compared with the structural JSON-patch diff that
+stores screenshots by reference. Reports save time and bytes written per
+iteration, and restore time at the end of the run.
+
+Usage:
+    python -m tests.benchmark.bench_checkpoint
+    python -m tests.benchmark.bench_checkpoint --iterations 60 --image-size 1280x800
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import os
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.agent.incremental_checkpoint import IncrementalCheckpointer
+from engine.agent.screenshot_manager import ScreenshotManager, PIL_AVAILABLE
+
+
+class MemoryTaskStore:
+    """Keeps serialized checkpoint rows and counts bytes written"""
+
+    def __init__(self):
+        self.rows = []
+        self.bytes_written = 0
+
+    async def save_checkpoint(self, task_id, iteration, state, screenshot_id=None, is_full=True, state_json=None):
+        if state_json is None:
+            state_json = json.dumps(state)
+        self.bytes_written += len(state_json)
+        self.rows.append((state_json, is_full))
+
+    async def get_all_checkpoints(self, task_id):
+        return [{"state": json.loads(s), "is_full": full} for s, full in self.rows]
+
+    async def get_latest_checkpoints(self, task_id):
+        start = max((i for i, (_, full) in enumerate(self.rows) if full), default=0)
+        return [{"state": json.loads(s), "is_full": full} for s, full in self.rows[start:]]
+
+
+class LegacyCheckpointer:
+    """The previous implementation: JSON deep copy, fixed keys, inline screenshots"""
+
+    FULL_CHECKPOINT_INTERVAL = 10
+    KEYS = ["status", "iteration", "last_tool_result", "current_hwnd", "agent_status"]
+
+    def __init__(self, task_store):
+        self.task_store = task_store
+        self._last_state = None
+        self._delta_count = 0
+
+    async def save(self, task_id, state):
+        if self._last_state is None or self._delta_count >= self.FULL_CHECKPOINT_INTERVAL:
+            await self.task_store.save_checkpoint(task_id, state["iteration"], state, is_full=True)
+            self._last_state = json.loads(json.dumps(state))
+            self._delta_count = 0
+            return
+        delta = {}
+        old_messages = self._last_state.get("messages", [])
+        if len(state["messages"]) > len(old_messages):
+            delta["new_messages"] = state["messages"][len(old_messages):]
+        for key in self.KEYS:
+            if state.get(key) != self._last_state.get(key):
+                delta[key] = state.get(key)
+        await self.task_store.save_checkpoint(task_id, state["iteration"], delta, is_full=False)
+        self._last_state.setdefault("messages", []).extend(delta.get("new_messages", []))
+        for key in self.KEYS:
+            if key in delta:
+                self._last_state[key] = delta[key]
+        self._delta_count += 1
+
+    async def restore(self, task_id):
+        checkpoints = await self.task_store.get_all_checkpoints(task_id)
+        deltas = []
+        for cp in reversed(checkpoints):
+            if cp["is_full"]:
+                state = json.loads(json.dumps(cp["state"]))
+                break
+            deltas.insert(0, cp["state"])
+        for delta in deltas:
+            state["messages"].extend(delta.get("new_messages", []))
+            for key in self.KEYS:
+                if key in delta:
+                    state[key] = delta[key]
+        return state
+
+
+def screenshot(size):
+    from PIL import Image
+    img = Image.frombytes("RGB", size, os.urandom(size[0] * size[1] * 3))
+    buf = BytesIO()
+    img.save(buf, format="JPEG", quality=70)
+    return base64.b64encode(buf.getvalue()).decode()
+
+
+async def run(checkpointer, store, iterations, images):
+    state = {"iteration": 0, "status": "running", "messages": [{"role": "user", "content": "task"}]}
+    save_ms = []
+    for i in range(iterations):
+        state["iteration"] = i + 1
+        state["messages"].append({"role": "assistant", "content": [
+            {"type": "text", "text": f"Step {i}: looking at the window"},
+            {"type": "tool_use", "id": f"t{i}", "name": "window_screenshot", "input": {"hwnd": 1}},
+        ]})
+        state["messages"].append({"role": "user", "content": [{
+            "type": "tool_result", "tool_use_id": f"t{i}", "content": [
+                {"type": "text", "text": "Screenshot captured"},
+                {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": images[i]}},
+            ],
+        }]})
+        state["last_tool_result"] = {"tool": "window_screenshot", "ok": True, "step": i}
+        t0 = time.perf_counter()
+        await checkpointer.save("bench", state)
+        save_ms.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    restored = await checkpointer.restore("bench")
+    restore_ms = (time.perf_counter() - t0) * 1000
+    assert len(restored["messages"]) == len(state["messages"])
+    return save_ms, restore_ms
+
+
+async def main_async(args):
+    width, height = (int(v) for v in args.image_size.split("x"))
+    images = [screenshot((width, height)) for _ in range(args.iterations)]
+    print(f"{args.iterations} iterations, {width}x{height} screenshots "
+          f"(~{len(images[0]) // 1024} KB base64 each)\n")
+    print(f"{'checkpointer':>14} {'save ms':>9} {'last save':>10} {'KB/iter':>9} {'restore ms':>11}")
+
+    legacy_store = MemoryTaskStore()
+    save_ms, restore_ms = await run(LegacyCheckpointer(legacy_store), legacy_store, args.iterations, images)
+    print(f"{'legacy':>14} {sum(save_ms) / len(save_ms):9.2f} {save_ms[-1]:10.2f} "
+          f"{legacy_store.bytes_written / args.iterations / 1024:9.1f} {restore_ms:11.2f}")
+
+    # Inline variant isolates the diff cost from screenshot processing
+    for label, by_reference in (("patch inline", False), ("patch by-ref", True)):
+        store = MemoryTaskStore()
+        checkpointer = IncrementalCheckpointer(
+            store,
+            screenshot_manager=ScreenshotManager(max_memory_mb=512),
+            store_screenshots=by_reference,
+        )
+        save_ms, restore_ms = await run(checkpointer, store, args.iterations, images)
+        print(f"{label:>14} {sum(save_ms) / len(save_ms):9.2f} {save_ms[-1]:10.2f} "
+              f"{store.bytes_written / args.iterations / 1024:9.1f} {restore_ms:11.2f}")
+    stats = checkpointer.get_stats()
+    print(f"\nfull saves {stats['full_saves']}, deltas {stats['delta_saves']}, "
+          f"compactions {stats['compactions']}, screenshots stored {stats['screenshots_stored']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=40)
+    parser.add_argument("--image-size", default="640x400")
+    args = parser.parse_args()
+    if not PIL_AVAILABLE:
+        print("Pillow not installed")
+        return
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
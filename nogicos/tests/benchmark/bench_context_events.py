@@ -0,0 +1,118 @@
+# -*- coding: utf-8 -*-
+"""
+Context Event Journal Benchmark
+
+Hook events recorded from the capture loop, comparing the previous
+behaviour (one INSERT + commit per event on the calling thread) against the
+ring buffer with the background batch writer:
+
+- record_event latency on the calling thread (the event loop in the server)
+- SQLite transactions needed to persist --events events
+- get_recent_events(minutes=30) latency, per-hook_type and unfiltered
+
+Usage:
+    python -m tests.benchmark.bench_context_events
+    python -m tests.benchmark.bench_context_events --events 20000 --history 200000
+"""
+
+import argparse
+import logging
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.context.store import ContextEvent, ContextStore
+from engine.sqlite_pool import close_sqlite_pools
+
+HOOK_TYPES = ("browser", "desktop", "file")
+
+
+class PerEventCommitStore(ContextStore):
+    """Previous behaviour: commit every event, always query SQLite"""
+
+    def record_event(self, event):
+        super().record_event(event)
+        self.flush()
+
+    def get_recent_events(self, minutes=30, hook_type=None):
+        with self._events_lock:
+            self._memory_since = datetime.max.isoformat()
+        return super().get_recent_events(minutes, hook_type)
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def seed_history(db_path, count):
+    """Older events (outside the 30 minute window) already on disk"""
+    store = ContextStore(db_path=db_path, ring_size=16)
+    start = datetime.now() - timedelta(hours=20)
+    for i in range(count):
+        store.record_event(ContextEvent(
+            timestamp=(start + timedelta(seconds=i * 0.25)).isoformat(),
+            hook_type=HOOK_TYPES[i % 3], event_type="updated", data={"n": i},
+        ))
+        if i % 5000 == 4999:
+            store.flush()
+    store.close()
+
+
+def bench(store_cls, db_path, events):
+    store = store_cls(db_path=db_path)
+    samples = []
+    for i in range(events):
+        event = ContextEvent(
+            hook_type=HOOK_TYPES[i % 3], event_type="updated",
+            data={"window": f"w{i}", "hwnd": i, "title": "x" * 80},
+        )
+        t0 = time.perf_counter()
+        store.record_event(event)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    store.flush()
+    record = percentiles(samples)
+    batches = store.get_stats()["batches"]
+
+    queries = {}
+    for label, hook_type in (("all", None), ("desktop", "desktop")):
+        times = []
+        for _ in range(20):
+            t0 = time.perf_counter()
+            store.get_recent_events(minutes=30, hook_type=hook_type)
+            times.append((time.perf_counter() - t0) * 1000)
+        queries[label] = percentiles(times)[0]
+    store.close()
+    return record, batches, queries
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=2000)
+    parser.add_argument("--history", type=int, default=50000, help="older events already in the database")
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, store_cls in (("per-event commit", PerEventCommitStore), ("ring + batch", ContextStore)):
+            db_path = os.path.join(tmp, name.replace(" ", "_") + ".db")
+            seed_history(db_path, args.history)
+            results[name] = bench(store_cls, db_path, args.events)
+        close_sqlite_pools()
+
+    print(f"{args.events} events recorded, {args.history} older events on disk\n")
+    print(f"{'journal':>17} {'record p50 µs':>14} {'record p99 µs':>14} {'transactions':>13} "
+          f"{'recent ms':>10} {'recent/hook ms':>15}")
+    for name, ((p50, p99), batches, queries) in results.items():
+        print(f"{name:>17} {p50:14.1f} {p99:14.1f} {batches:13d} {queries['all']:10.2f} {queries['desktop']:15.2f}")
+
+
+if __name__ == "__main__":
+    main()
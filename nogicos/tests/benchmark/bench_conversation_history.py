@@ -0,0 +1,93 @@
+# -*- coding: utf-8 -*-
+"""
+Conversation History Benchmark
+
+Measures the per-iteration cost of preparing messages for the API in the
+ReAct loop: the legacy full rescan + copy.deepcopy of the conversation
+versus incremental pruning with ConversationHistory. Each turn appends an
+assistant tool_use and a tool_result carrying one screenshot.
+
+Usage:
+    python -m tests.benchmark.bench_conversation_history
+    python -m tests.benchmark.bench_conversation_history --turns 40 --image-kb 2048
+"""
+
+import argparse
+import copy
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.agent.conversation import ConversationHistory, PRUNED_IMAGE_TEXT, find_image_blocks
+
+
+def legacy_prune(messages, max_screenshots=2):
+    """The pre-ConversationHistory implementation: rescan and deepcopy"""
+    locations = [
+        (msg_idx, content_idx, inner_idx)
+        for msg_idx, msg in enumerate(messages)
+        for content_idx, inner_idx in find_image_blocks(msg)
+    ]
+    if len(locations) <= max_screenshots:
+        return messages
+    pruned = copy.deepcopy(messages)
+    for msg_idx, content_idx, inner_idx in locations[:len(locations) - max_screenshots]:
+        content = pruned[msg_idx]["content"]
+        if inner_idx is None:
+            content[content_idx] = {"type": "text", "text": PRUNED_IMAGE_TEXT}
+        else:
+            content[content_idx]["content"][inner_idx] = {"type": "text", "text": PRUNED_IMAGE_TEXT}
+    return pruned
+
+
+def make_turn(i, payload):
+    return [
+        {"role": "assistant", "content": [
+            {"type": "text", "text": f"Taking screenshot {i}"},
+            {"type": "tool_use", "id": f"t{i}", "name": "window_screenshot", "input": {"hwnd": 1}},
+        ]},
+        {"role": "user", "content": [{
+            "type": "tool_result",
+            "tool_use_id": f"t{i}",
+            "content": [
+                {"type": "text", "text": "Screenshot captured"},
+                {"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": payload + str(i)}},
+            ],
+        }]},
+    ]
+
+
+def run(container, prune, turns, payload):
+    """Return per-turn prune times in ms"""
+    messages = container([{"role": "user", "content": "task"}])
+    timings = []
+    for i in range(turns):
+        messages.extend(make_turn(i, payload))
+        t0 = time.perf_counter()
+        prune(messages)
+        timings.append((time.perf_counter() - t0) * 1000)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--turns", type=int, default=25)
+    parser.add_argument("--image-kb", type=int, default=1024, help="Base64 payload size per screenshot")
+    args = parser.parse_args()
+
+    payload = "A" * (args.image_kb * 1024)
+    legacy = run(list, legacy_prune, args.turns, payload)
+    incremental = run(ConversationHistory, lambda h: h.prune_images(2), args.turns, payload)
+
+    print(f"{args.turns} turns, {args.image_kb} KB per screenshot\n")
+    print(f"{'turn':>5} {'legacy ms':>10} {'history ms':>11}")
+    for turn in sorted({1, 5, 10, args.turns // 2, args.turns} & set(range(1, args.turns + 1))):
+        print(f"{turn:5d} {legacy[turn - 1]:10.3f} {incremental[turn - 1]:11.4f}")
+    print(f"{'total':>5} {sum(legacy):10.1f} {sum(incremental):11.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+# -*- coding: utf-8 -*-
+"""
+Event Bus Benchmark
+
+Measures what publishing an event costs the agent loop when subscribers
+are slow: the inline EventBus awaits every handler in the publisher's
+coroutine, while DispatchEventBus only enqueues. Subscribers simulate a
+tracing exporter (async, a few ms per event) and a logger (sync, cheap).
+
+Usage:
+    python -m tests.benchmark.bench_event_bus
+    python -m tests.benchmark.bench_event_bus --events 500 --handler-ms 5
+"""
+
+import argparse
+import asyncio
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.agent.event_bus import EventBus, DispatchEventBus
+from engine.agent.events import AgentEvent, EventType
+
+
+async def run(bus, events, handler_ms, tasks):
+    """Return (per-publish times in ms, total wall time in s)"""
+    async def tracer(event):
+        await asyncio.sleep(handler_ms / 1000)
+
+    options = {"workers": 4} if isinstance(bus, DispatchEventBus) else {}
+    bus.subscribe_all(tracer, name="tracer", **options)
+    bus.subscribe_all(lambda event: None, name="logger")
+
+    timings = []
+    started = time.perf_counter()
+    for i in range(events):
+        event = AgentEvent.create(EventType.TOOL_END, task_id=f"task-{i % tasks}", payload={"i": i})
+        t0 = time.perf_counter()
+        await bus.publish(event)
+        timings.append((time.perf_counter() - t0) * 1000)
+    if isinstance(bus, DispatchEventBus):
+        await bus.drain(timeout=60)
+        await bus.stop()
+    return timings, time.perf_counter() - started
+
+
+def summarize(label, timings, wall):
+    ordered = sorted(timings)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    print(f"{label:>10} {statistics.mean(timings):10.4f} {p99:10.4f} {wall:9.2f}")
+
+
+async def main_async(args):
+    inline, inline_wall = await run(EventBus(), args.events, args.handler_ms, args.tasks)
+    dispatch, dispatch_wall = await run(
+        DispatchEventBus(max_queue=args.events), args.events, args.handler_ms, args.tasks
+    )
+
+    print(f"{args.events} events, {args.tasks} tasks, {args.handler_ms} ms async handler\n")
+    print(f"{'bus':>10} {'publish ms':>10} {'p99 ms':>10} {'wall s':>9}")
+    summarize("inline", inline, inline_wall)
+    summarize("dispatch", dispatch, dispatch_wall)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--events", type=int, default=200)
+    parser.add_argument("--handler-ms", type=float, default=2.0, help="Simulated tracing handler latency")
+    parser.add_argument("--tasks", type=int, default=4, help="Distinct task_ids (ordering shards)")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
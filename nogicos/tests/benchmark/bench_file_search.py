@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+File Search Benchmark
+
+Compares glob_search / grep_search backends on a synthetic workspace:
+the off-loop file_search engine versus the legacy glob.glob + open loop
+that ran on the event loop. Also reports the worst event-loop stall seen
+by a heartbeat task during each search.
+
+Usage:
+    python -m tests.benchmark.bench_file_search
+    python -m tests.benchmark.bench_file_search --files 20000 --node-modules 0.5
+"""
+
+import argparse
+import asyncio
+import glob as glob_module
+import os
+import random
+import re
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.tools.file_search import glob_files, grep_files
+
+
+def build_tree(root: str, n_files: int, node_modules_ratio: float):
+    """Create n_files small source files, a share of them under node_modules"""
+    rng = random.Random(0)
+    words = ["alpha", "beta", "gamma", "delta", "render", "config", "handler", "index"]
+    for i in range(n_files):
+        top = "node_modules" if rng.random() < node_modules_ratio else "src"
+        directory = os.path.join(root, top, f"pkg{i % 200}", f"mod{i % 7}")
+        os.makedirs(directory, exist_ok=True)
+        ext = rng.choice([".py", ".ts", ".js", ".md"])
+        lines = [" ".join(rng.choice(words) for _ in range(8)) for _ in range(30)]
+        if i % 997 == 0:
+            lines[rng.randrange(30)] = "def find_me_here(): pass"
+        with open(os.path.join(directory, f"file{i}{ext}"), "w") as f:
+            f.write("\n".join(lines))
+
+
+def legacy_glob(root: str, pattern: str, max_results: int):
+    return glob_module.glob(os.path.join(root, pattern), recursive=True)[:max_results]
+
+
+def legacy_grep(path: str, pattern: str, file_pattern: str, max_results: int):
+    results = []
+    files = glob_module.glob(os.path.join(path, "**", file_pattern), recursive=True)
+    regex = re.compile(pattern, re.IGNORECASE)
+    for filepath in files:
+        if not os.path.isfile(filepath):
+            continue
+        try:
+            with open(filepath, "r", encoding="utf-8", errors="replace") as f:
+                for line_num, line in enumerate(f, 1):
+                    if regex.search(line):
+                        results.append(f"{filepath}:{line_num}: {line.strip()}")
+                        if len(results) >= max_results:
+                            return results
+        except OSError:
+            continue
+    return results
+
+
+async def measure(coro_factory):
+    """Run a search; return (elapsed ms, worst heartbeat gap ms, result)"""
+    worst_gap = 0.0
+    running = True
+
+    async def heartbeat():
+        nonlocal worst_gap
+        last = time.perf_counter()
+        while running:
+            await asyncio.sleep(0.001)
+            now = time.perf_counter()
+            worst_gap = max(worst_gap, now - last)
+            last = now
+
+    beat = asyncio.create_task(heartbeat())
+    await asyncio.sleep(0)
+    t0 = time.perf_counter()
+    result = await coro_factory()
+    elapsed = time.perf_counter() - t0
+    running = False
+    await beat
+    return elapsed * 1000, worst_gap * 1000, result
+
+
+async def run(root: str):
+    async def on_loop(fn, *args):
+        return fn(*args)
+
+    cases = [
+        ("glob **/*.py", lambda: on_loop(legacy_glob, root, "**/*.py", 100),
+         lambda: glob_files(root, "**/*.py", 100)),
+        ("grep rare (full scan)", lambda: on_loop(legacy_grep, root, "find_me_here", "*.py", 50),
+         lambda: grep_files(root, "find_me_here", "*.py", 50)),
+        ("grep common (early stop)", lambda: on_loop(legacy_grep, root, "render", "*", 50),
+         lambda: grep_files(root, "render", "*", 50)),
+    ]
+
+    print(f"{'case':<26} {'legacy ms':>10} {'stall ms':>9} {'new ms':>9} {'stall ms':>9}")
+    for name, legacy, new in cases:
+        legacy_ms, legacy_stall, _ = await measure(legacy)
+        new_ms, new_stall, _ = await measure(new)
+        print(f"{name:<26} {legacy_ms:10.1f} {legacy_stall:9.1f} {new_ms:9.1f} {new_stall:9.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=100000)
+    parser.add_argument("--node-modules", type=float, default=0.3,
+                        help="Share of files placed under node_modules")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        t0 = time.perf_counter()
+        build_tree(tmp, args.files, args.node_modules)
+        print(f"Built {args.files} files in {time.perf_counter() - t0:.1f}s\n")
+        asyncio.run(run(tmp))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+"""
+Hook Idle CPU Benchmark
+
+CPU spent by a hook's capture loop on an idle desktop (nothing changes),
+for three schedules:
+
+- fixed:    previous behaviour, capture() every capture_interval
+- adaptive: polling that backs off while the context is unchanged
+- events:   change notifications plus a sparse fallback poll
+
+capture() is simulated with --capture-ms of CPU work per call (window
+enumeration plus address-bar OCR costs tens of ms on a real desktop).
+--events injects that many context changes spread over the run (announced
+through request_capture() from another thread for the events schedule,
+left for the poll to find otherwise) and reports how quickly each was
+picked up.
+
+Usage:
+    python -m tests.benchmark.bench_hook_idle                 # 10 minutes per schedule
+    python -m tests.benchmark.bench_hook_idle --duration 60 --events 5
+"""
+
+import argparse
+import asyncio
+import hashlib
+import logging
+import sys
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.context.hooks.base_hook import BaseHook, HookConfig
+from engine.context.store import DesktopContext, HookType
+
+_BUFFER = b"x" * 65536
+
+
+def burn(ms):
+    """Spend about `ms` of CPU time"""
+    end = time.process_time() + ms / 1000
+    while time.process_time() < end:
+        hashlib.sha256(_BUFFER).digest()
+
+
+class SimulatedHook(BaseHook):
+
+    def __init__(self, config, capture_ms, event_sources):
+        super().__init__("bench", HookType.DESKTOP, config)
+        self.capture_ms = capture_ms
+        self.event_sources = event_sources
+        self.window = "Editor"
+
+    async def _connect(self, target=None):
+        return True
+
+    async def _disconnect(self):
+        return True
+
+    async def _start_event_sources(self):
+        return self.event_sources
+
+    async def capture(self):
+        burn(self.capture_ms)
+        return DesktopContext(hwnd=1, active_window=self.window, last_updated=datetime.now().isoformat())
+
+
+SCHEDULES = {
+    "fixed": dict(idle_backoff=1.0, event_driven=False),
+    "adaptive": dict(event_driven=False),
+    "events": dict(event_driven=True),
+}
+
+
+async def run(schedule, duration, capture_ms, events):
+    hook = SimulatedHook(HookConfig(**SCHEDULES[schedule]), capture_ms, event_sources=schedule == "events")
+    seen = {}
+    hook.set_callbacks(on_context_update=lambda ctx: seen.setdefault(ctx.active_window, time.perf_counter()))
+
+    sent = {}
+
+    def change(name):
+        hook.window = name
+        sent[name] = time.perf_counter()
+        if hook.event_sources:
+            hook.request_capture()
+
+    loop = asyncio.get_running_loop()
+    for i in range(events):
+        delay = duration * (i + 0.5) / events
+        loop.call_later(delay, lambda i=i: threading.Thread(target=change, args=(f"Window {i}",)).start())
+
+    cpu0 = time.process_time()
+    await hook.start()
+    await asyncio.sleep(duration)
+    await hook.stop()
+    cpu = time.process_time() - cpu0
+
+    latencies = sorted((seen[name] - t) * 1000 for name, t in sent.items() if name in seen)
+    stats = hook.get_capture_stats()
+    return {
+        "cpu_s": cpu,
+        "cpu_pct": cpu / duration * 100,
+        "captures": stats["captures"],
+        "notified": stats["changes"],
+        "pickup_p50": latencies[len(latencies) // 2] if latencies else 0.0,
+        "pickup_max": latencies[-1] if latencies else 0.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--duration", type=float, default=600, help="seconds per schedule")
+    parser.add_argument("--capture-ms", type=float, default=20, help="CPU cost of one capture()")
+    parser.add_argument("--events", type=int, default=0, help="context changes during the run")
+    parser.add_argument("--schedules", nargs="+", default=list(SCHEDULES), choices=list(SCHEDULES))
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    results = {s: asyncio.run(run(s, args.duration, args.capture_ms, args.events)) for s in args.schedules}
+
+    print(f"{args.duration:.0f} s per schedule, capture() = {args.capture_ms:.0f} ms CPU, {args.events} changes\n")
+    print(f"{'schedule':>9} {'cpu s':>7} {'cpu %':>6} {'captures':>9} {'notified':>9} "
+          f"{'pickup p50 ms':>14} {'pickup max ms':>14}")
+    for name, r in results.items():
+        print(f"{name:>9} {r['cpu_s']:7.2f} {r['cpu_pct']:6.2f} {r['captures']:9d} {r['notified']:9d} "
+              f"{r['pickup_p50']:14.0f} {r['pickup_max']:14.0f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+# -*- coding: utf-8 -*-
+"""
+Outbound HTTP Pool Benchmark
+
+Starts a local stub search server and compares a new aiohttp.ClientSession
+per request (the old quick_search / tavily_search pattern) against the
+shared HTTPClientRegistry session, at a fixed concurrency. With --tls the
+stub serves HTTPS using a throwaway self-signed certificate (requires the
+`openssl` binary), so the per-request handshake cost is included.
+
+Usage:
+    python -m tests.benchmark.bench_http_pool
+    python -m tests.benchmark.bench_http_pool --requests 2000 --concurrency 32 --tls
+"""
+
+import argparse
+import asyncio
+import os
+import ssl
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import aiohttp
+from aiohttp import web
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.http_clients import HTTPClientRegistry
+
+PAYLOAD = {"query": "latest ai news", "max_results": 5, "include_answer": True}
+
+
+def make_cert(directory):
+    cert, key = os.path.join(directory, "cert.pem"), os.path.join(directory, "key.pem")
+    subprocess.run(
+        ["openssl", "req", "-x509", "-newkey", "rsa:2048", "-nodes", "-days", "1",
+         "-subj", "/CN=127.0.0.1", "-keyout", key, "-out", cert],
+        check=True, capture_output=True,
+    )
+    context = ssl.create_default_context(ssl.Purpose.CLIENT_AUTH)
+    context.load_cert_chain(cert, key)
+    return context
+
+
+async def start_stub(ssl_context):
+    async def search(request):
+        await request.json()
+        return web.json_response({"answer": "ok", "results": [{"title": "t", "url": "u", "content": "c"}] * 5})
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0, ssl_context=ssl_context)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    scheme = "https" if ssl_context else "http"
+    return runner, f"{scheme}://127.0.0.1:{port}/search"
+
+
+async def run(url, requests, concurrency, make_call):
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one():
+        async with semaphore:
+            t0 = time.perf_counter()
+            await make_call(url)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+    t0 = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    elapsed = time.perf_counter() - t0
+    latencies.sort()
+    return {
+        "rps": requests / elapsed,
+        "p50": latencies[len(latencies) // 2],
+        "p99": latencies[min(len(latencies) - 1, int(len(latencies) * 0.99))],
+    }
+
+
+async def main_async(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        ssl_context = make_cert(tmp) if args.tls else None
+        runner, url = await start_stub(ssl_context)
+        timeout = aiohttp.ClientTimeout(total=30)
+        opened = {"per_request": 0}
+
+        async def per_request(url):
+            # old pattern: new session, new connection, new handshake
+            async with aiohttp.ClientSession(timeout=timeout) as session:
+                async with session.post(url, json=PAYLOAD, ssl=False) as resp:
+                    await resp.json()
+            opened["per_request"] += 1
+
+        registry = HTTPClientRegistry(max_per_host=args.concurrency)
+
+        async def shared(url):
+            async with registry.session().post(url, json=PAYLOAD, timeout=timeout, ssl=False) as resp:
+                await resp.json()
+
+        # warm up both paths
+        await run(url, 20, 4, per_request)
+        await run(url, 20, 4, shared)
+        opened["per_request"] = 0
+        registry._stats["connections_created"] = 0
+
+        results = {}
+        results["session per request"] = (
+            await run(url, args.requests, args.concurrency, per_request), opened["per_request"])
+        shared_result = await run(url, args.requests, args.concurrency, shared)
+        stats = registry.get_stats()
+        results["shared registry"] = (shared_result, stats["connections_created"])
+
+        await registry.close()
+        await runner.cleanup()
+
+    scheme = "HTTPS" if args.tls else "HTTP"
+    print(f"{args.requests} {scheme} POSTs, concurrency {args.concurrency}\n")
+    print(f"{'client':>20} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} {'conns':>6}")
+    for name, (r, conns) in results.items():
+        print(f"{name:>20} {r['rps']:8.0f} {r['p50']:8.2f} {r['p99']:8.2f} {conns:6d}")
+    print(f"\nshared pool reuse rate: {stats['reuse_rate']:.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--tls", action="store_true", help="serve the stub over HTTPS")
+    args = parser.parse_args()
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
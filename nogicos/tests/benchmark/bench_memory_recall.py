@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Memory Recall Benchmark
+
+Compares SemanticMemoryStore.search_memories recall latency between the
+MemoryVectorIndex (single matmul) and the legacy per-row Python cosine loop.
+
+Usage:
+    python -m tests.benchmark.bench_memory_recall
+    python -m tests.benchmark.bench_memory_recall --sizes 1000 10000 100000 --legacy-max 10000
+"""
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.knowledge.store import SemanticMemoryStore
+
+
+def populate(store: SemanticMemoryStore, n: int, dim: int, session_id: str = "bench"):
+    """Bulk-insert n memories with random embeddings straight into SQLite"""
+    rng = np.random.default_rng(0)
+    now = "2026-01-01T00:00:00"
+    with store._get_connection() as conn:
+        for start in range(0, n, 5000):
+            count = min(5000, n - start)
+            vectors = rng.standard_normal((count, dim)).astype(np.float32)
+            conn.executemany(
+                """INSERT INTO memories (id, session_id, subject, predicate, object,
+                   is_active, created_at, updated_at) VALUES (?, ?, 'user', ?, ?, 1, ?, ?)""",
+                [(f"m{start + i}", session_id, f"p{start + i}", f"o{start + i}", now, now) for i in range(count)],
+            )
+            conn.executemany(
+                "INSERT INTO memory_embeddings (memory_id, embedding, created_at) VALUES (?, ?, ?)",
+                [(f"m{start + i}", vectors[i].tobytes(), now) for i in range(count)],
+            )
+        conn.commit()
+
+
+def timed(store: SemanticMemoryStore, query, repeats: int) -> float:
+    """Median search latency in milliseconds"""
+    async def fixed_embedding(text):
+        return query
+
+    store.get_embedding = fixed_embedding
+    samples = []
+    for _ in range(repeats):
+        t0 = time.perf_counter()
+        asyncio.run(store.search_memories("q", session_id="bench", limit=5, threshold=0.0))
+        samples.append((time.perf_counter() - t0) * 1000)
+    samples.sort()
+    return samples[len(samples) // 2]
+
+
+async def no_index():
+    """Stand-in for _get_vector_index that forces the legacy full scan"""
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--dim", type=int, default=SemanticMemoryStore.EMBEDDING_DIM)
+    parser.add_argument("--repeats", type=int, default=20)
+    parser.add_argument("--legacy-max", type=int, default=10000,
+                        help="Skip the legacy loop above this size (it takes minutes)")
+    parser.add_argument("--mode", choices=["flat", "hnsw"], default="flat")
+    args = parser.parse_args()
+
+    SemanticMemoryStore.EMBEDDING_DIM = args.dim
+    query = np.random.default_rng(1).standard_normal(args.dim).tolist()
+
+    print(f"{'memories':>10} {'index ms':>10} {'legacy ms':>10} {'speedup':>8}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            db_path = os.path.join(tmp, "memory.db")
+            store = SemanticMemoryStore(db_path=db_path, index_mode=args.mode)
+            populate(store, n, args.dim)
+
+            t0 = time.perf_counter()
+            asyncio.run(store._get_vector_index())
+            build_ms = (time.perf_counter() - t0) * 1000
+            index_ms = timed(store, query, args.repeats)
+
+            legacy_ms = None
+            if n <= args.legacy_max:
+                store._vector_index.close()
+                legacy = SemanticMemoryStore(db_path=db_path)
+                legacy._get_vector_index = no_index
+                legacy_ms = timed(legacy, query, max(3, args.repeats // 5))
+            else:
+                store._vector_index.close()
+
+        legacy_col = f"{legacy_ms:10.2f}" if legacy_ms is not None else f"{'-':>10}"
+        speedup = f"{legacy_ms / index_ms:7.1f}x" if legacy_ms is not None else f"{'-':>8}"
+        print(f"{n:>10} {index_ms:10.2f} {legacy_col} {speedup}   (index build {build_ms:.0f} ms)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+"""
+OCR Cache Benchmark
+
+Replays a sequence of 1920x1080 screenshots through OCRExtractor where each
+frame changes only a small area (a ticking clock in the taskbar, a caret
+blinking in one text field) and reports OCR time per frame:
+
+- uncached: every frame is OCRed in full (previous behaviour)
+- whole-image cache: hits only when the frame is pixel-identical
+- tiled cache: only the bands that changed are re-OCRed
+
+The OCR engine is simulated with a cost proportional to the pixel count
+(--ms-per-mpx, default 120 ms per megapixel, in line with Tesseract on a
+full-HD frame), so the numbers isolate the cache and hashing overhead.
+
+Usage:
+    python -m tests.benchmark.bench_ocr_cache
+    python -m tests.benchmark.bench_ocr_cache --frames 60 --ms-per-mpx 300
+"""
+
+import argparse
+import asyncio
+import base64
+import logging
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.agent.vision.ocr import OCRExtractor, OCRResult
+from engine.ocr_cache import OCRCache
+
+
+class SimulatedExtractor(OCRExtractor):
+    def __init__(self, ms_per_mpx, **kwargs):
+        super().__init__(**kwargs)
+        self._engine_name = "simulated"
+        self.ms_per_mpx = ms_per_mpx
+        self.ocr_ms = 0.0
+
+    async def _run_engine(self, image, detect_regions):
+        cost = image.width * image.height / 1e6 * self.ms_per_mpx
+        self.ocr_ms += cost
+        time.sleep(cost / 1000)
+        return OCRResult(full_text="", engine=self._engine_name)
+
+
+def frames(count):
+    base = Image.new("RGB", (1920, 1080), "white")
+    draw = ImageDraw.Draw(base)
+    for y in range(40, 1000, 24):
+        draw.text((20, y), "lorem ipsum dolor sit amet " * 8, fill="black")
+    for i in range(count):
+        frame = base.copy()
+        draw = ImageDraw.Draw(frame)
+        if i % 2:
+            draw.rectangle((400, 300, 401, 318), fill="black")  # caret
+        draw.text((1840, 1055), f"12:{i // 10:02d}", fill="black")  # clock
+        buffer = BytesIO()
+        frame.save(buffer, format="PNG")
+        yield base64.b64encode(buffer.getvalue()).decode()
+
+
+async def run(images, ms_per_mpx, cached, tiled):
+    extractor = SimulatedExtractor(ms_per_mpx, cache=OCRCache(max_entries=512 if cached else 0))
+    started = time.perf_counter()
+    for image in images:
+        await extractor.extract(image, tiled=tiled)
+    elapsed = (time.perf_counter() - started) * 1000
+    return elapsed / len(images), extractor.ocr_ms / len(images)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--frames", type=int, default=30)
+    parser.add_argument("--ms-per-mpx", type=float, default=120.0)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    images = list(frames(args.frames))
+    print(f"{args.frames} frames, 1920x1080, ms per frame\n")
+    print(f"{'mode':>18} {'total':>8} {'ocr':>8}")
+    for name, cached, tiled in (
+        ("uncached", False, False),
+        ("whole-image cache", True, False),
+        ("tiled cache", True, True),
+    ):
+        total, ocr = asyncio.run(run(images, args.ms_per_mpx, cached, tiled))
+        print(f"{name:>18} {total:8.1f} {ocr:8.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Screenshot Diff Benchmark
+
+Replays a typical desktop-agent session on one 1280x800 window: typing
+into a text field, a caret blink, an idle check, opening a small menu,
+then a dialog covering most of the window. Reports what the ReAct loop
+would ship to the model per screenshot, with and without the diff stage:
+
+- base64 bytes uploaded
+- image tokens (width * height / 750, the Anthropic vision estimate)
+- diff time per capture
+
+Usage:
+    python -m tests.benchmark.bench_screenshot_diff
+    python -m tests.benchmark.bench_screenshot_diff --steps 100
+"""
+
+import argparse
+import base64
+import logging
+import sys
+import time
+from io import BytesIO
+from pathlib import Path
+
+from PIL import Image, ImageDraw
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.agent.screenshot_diff import ScreenshotDiffer
+
+
+def session(steps):
+    base = Image.new("RGB", (1280, 800), "white")
+    draw = ImageDraw.Draw(base)
+    draw.rectangle((0, 0, 1279, 40), fill=(230, 230, 230))
+    for y in range(60, 780, 22):
+        draw.text((20, y), "The quick brown fox jumps over the lazy dog. " * 5, fill="black")
+
+    typed = ""
+    for step in range(steps):
+        frame = base.copy()
+        draw = ImageDraw.Draw(frame)
+        phase = step % 10
+        if phase < 6:
+            typed += "hello "[step % 6]
+        draw.rectangle((200, 300, 900, 330), fill="white", outline="gray")
+        draw.text((205, 310), typed[-100:], fill="black")
+        if phase == 3:
+            draw.rectangle((206 + 6 * len(typed[-100:]), 306, 207 + 6 * len(typed[-100:]), 326), fill="black")
+        if phase in (6, 7):
+            draw.rectangle((20, 40, 220, 260), fill=(245, 245, 245), outline="gray")  # menu
+        if phase == 8:
+            draw.rectangle((40, 40, 1240, 760), fill=(250, 250, 250))  # dialog
+        buffer = BytesIO()
+        frame.save(buffer, format="JPEG", quality=60, optimize=True)
+        yield base64.b64encode(buffer.getvalue()).decode()
+
+
+def tokens(image_b64):
+    if not image_b64:
+        return 0
+    width, height = Image.open(BytesIO(base64.b64decode(image_b64))).size
+    return width * height / 750
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--steps", type=int, default=50)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    captures = list(session(args.steps))
+    differ = ScreenshotDiffer()
+    sent, elapsed = [], 0.0
+    for image_b64 in captures:
+        t0 = time.perf_counter()
+        sent.append(differ.diff(1, image_b64).image_base64)
+        elapsed += time.perf_counter() - t0
+
+    stats = differ.get_stats()
+    before_bytes = sum(map(len, captures)) / len(captures)
+    after_bytes = sum(map(len, sent)) / len(sent)
+    before_tokens = sum(map(tokens, captures)) / len(captures)
+    after_tokens = sum(map(tokens, sent)) / len(sent)
+    print(f"{args.steps} screenshots: {stats['full']} full, {stats['region']} region, {stats['unchanged']} unchanged\n")
+    print(f"{'per screenshot':>16} {'before':>9} {'after':>9}")
+    print(f"{'base64 bytes':>16} {before_bytes:9.0f} {after_bytes:9.0f}")
+    print(f"{'image tokens':>16} {before_tokens:9.0f} {after_tokens:9.0f}")
+    print(f"\ndiff time: {elapsed / len(captures) * 1000:.1f} ms per capture")
+
+
+if __name__ == "__main__":
+    main()
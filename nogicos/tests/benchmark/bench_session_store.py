@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+Session Save Benchmark
+
+Grows a session one message at a time up to --messages, saving the full
+history after each append (what /v2/sessions/save receives from the UI).
+Compares the v1 layout (whole history re-serialized into sessions.history)
+against the append-only PersistentSessionStore, and reports save latency
+near the end of the session plus the cost of loading it back.
+
+Usage:
+    python -m tests.benchmark.bench_session_store
+    python -m tests.benchmark.bench_session_store --messages 2000 --size 800
+"""
+
+import argparse
+import json
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.knowledge.store import PersistentSessionStore
+
+
+class BlobSessionStore:
+    """v1 behaviour: one JSON blob column rewritten on every save"""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        conn = sqlite3.connect(db_path)
+        conn.execute("""
+            CREATE TABLE sessions (
+                id TEXT PRIMARY KEY, title TEXT, history TEXT NOT NULL DEFAULT '[]',
+                preferences TEXT NOT NULL DEFAULT '{}', created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL, message_count INTEGER DEFAULT 0
+            )
+        """)
+        conn.commit()
+        conn.close()
+
+    def save_session(self, session_id, history, preferences=None, title=None):
+        now = datetime.now().isoformat()
+        conn = sqlite3.connect(self.db_path)
+        try:
+            conn.execute("""
+                INSERT INTO sessions (id, title, history, preferences, created_at, updated_at, message_count)
+                VALUES (?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(id) DO UPDATE SET history = excluded.history, preferences = excluded.preferences,
+                    title = excluded.title, updated_at = excluded.updated_at, message_count = excluded.message_count
+            """, (session_id, title or "Session", json.dumps(history, ensure_ascii=False),
+                  json.dumps(preferences or {}), now, now, len(history)))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def load_session(self, session_id, limit=None):
+        conn = sqlite3.connect(self.db_path)
+        try:
+            row = conn.execute("SELECT history FROM sessions WHERE id = ?", (session_id,)).fetchone()
+            history = json.loads(row[0])
+            return {"history": history[-limit:] if limit else history}
+        finally:
+            conn.close()
+
+
+def percentile(values, p):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+def run(store, count, size):
+    history = []
+    latencies = []
+    for i in range(count):
+        history.append({
+            "role": "user" if i % 2 == 0 else "assistant",
+            "content": f"message {i} " + "x" * size,
+            "timestamp": time.time(),
+        })
+        t0 = time.perf_counter()
+        store.save_session("bench", history, {"language": "zh"})
+        latencies.append((time.perf_counter() - t0) * 1000)
+
+    tail = latencies[-100:]
+    t0 = time.perf_counter()
+    store.load_session("bench")
+    load_all = (time.perf_counter() - t0) * 1000
+    t0 = time.perf_counter()
+    store.load_session("bench", limit=50)
+    load_page = (time.perf_counter() - t0) * 1000
+    return {
+        "total_s": sum(latencies) / 1000,
+        "tail_p50": percentile(tail, 0.5),
+        "tail_p99": percentile(tail, 0.99),
+        "load_all": load_all,
+        "load_page": load_page,
+        "db_mb": os.path.getsize(store.db_path) / 1024 / 1024,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--messages", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=500, help="characters per message")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {
+            "v1 JSON blob": run(BlobSessionStore(os.path.join(tmp, "blob.db")), args.messages, args.size),
+            "append-only": run(PersistentSessionStore(os.path.join(tmp, "rows.db")), args.messages, args.size),
+        }
+
+    print(f"{args.messages} saves of a growing session, {args.size} chars/message\n")
+    print(f"{'layout':>14} {'total s':>8} {'save p50 ms':>12} {'save p99 ms':>12} "
+          f"{'load all ms':>12} {'last 50 ms':>11} {'db MB':>7}")
+    for name, r in results.items():
+        print(f"{name:>14} {r['total_s']:8.2f} {r['tail_p50']:12.2f} {r['tail_p99']:12.2f} "
+              f"{r['load_all']:12.2f} {r['load_page']:11.2f} {r['db_mb']:7.1f}")
+    print("\nsave p50/p99 are over the last 100 saves (history ~= --messages long)")
+
+
+if __name__ == "__main__":
+    main()
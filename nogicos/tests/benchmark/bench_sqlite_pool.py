@@ -0,0 +1,130 @@
+# -*- coding: utf-8 -*-
+"""
+SQLite Access Layer Benchmark
+
+Per-operation latency of the hot store calls with the shared pool (one
+connection per thread, WAL, synchronous=NORMAL, warm statement cache)
+against the previous behaviour (a fresh sqlite3.connect per call in the
+default rollback-journal mode):
+
+- ContextStore.record_event + flush (one event per transaction)
+- SemanticMemoryStore.search_memories (keyword path, no embedding API)
+- PersistentSessionStore.save_session (append one message to a 200-message session)
+
+Usage:
+    python -m tests.benchmark.bench_sqlite_pool
+    python -m tests.benchmark.bench_sqlite_pool --ops 2000
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import sqlite3
+import sys
+import tempfile
+import time
+from contextlib import contextmanager
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine import sqlite_pool
+from engine.context.store import ContextEvent, ContextStore
+from engine.knowledge.store import PersistentSessionStore, SemanticMemoryStore
+from engine.sqlite_pool import SQLitePool
+
+
+class FreshConnectionPool(SQLitePool):
+    """Previous behaviour: new connection per call, library-default pragmas"""
+
+    @contextmanager
+    def connect(self):
+        conn = sqlite3.connect(self.db_path)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+
+def percentiles(samples):
+    samples = sorted(samples)
+    return samples[len(samples) // 2], samples[min(len(samples) - 1, int(len(samples) * 0.99))]
+
+
+def timed(fn, ops):
+    samples = []
+    for i in range(ops):
+        t0 = time.perf_counter()
+        fn(i)
+        samples.append((time.perf_counter() - t0) * 1e6)
+    return percentiles(samples)
+
+
+def bench(directory, ops, legacy):
+    def path(name):
+        db_path = os.path.join(directory, ("legacy_" if legacy else "pooled_") + name)
+        if legacy:
+            sqlite_pool._pools[os.path.abspath(db_path)] = FreshConnectionPool(db_path)
+        return db_path
+
+    results = {}
+
+    context = ContextStore(db_path=path("context.db"))
+
+    def record(i):
+        context.record_event(ContextEvent(
+            hook_type="desktop", event_type="updated", data={"window": f"w{i}", "hwnd": i},
+        ))
+        context.flush()
+
+    results["record_event"] = timed(record, ops)
+    context.close()
+
+    memory = SemanticMemoryStore(db_path=path("memory.db"))
+    memory.get_embedding = _no_embedding
+    loop = asyncio.new_event_loop()
+    for i in range(200):
+        loop.run_until_complete(memory.add_memory("user", f"likes{i}", f"thing {i}", session_id="s1"))
+    results["search_memories"] = timed(
+        lambda i: loop.run_until_complete(memory.search_memories(f"likes{i % 200}", session_id="s1")), ops)
+    loop.close()
+
+    sessions = PersistentSessionStore(db_path=path("sessions.db"))
+    history = [{"role": "user", "content": "m" * 200} for _ in range(200)]
+    sessions.save_session("s1", history)
+
+    def save(i):
+        history.append({"role": "assistant", "content": f"reply {i}"})
+        sessions.save_session("s1", history)
+
+    results["save_session"] = timed(save, ops)
+    return results
+
+
+async def _no_embedding(text):
+    return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--ops", type=int, default=1000)
+    args = parser.parse_args()
+    logging.disable(logging.WARNING)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        before = bench(tmp, args.ops, legacy=True)
+        after = bench(tmp, args.ops, legacy=False)
+        sqlite_pool.close_sqlite_pools()
+
+    print(f"{args.ops} ops per call, latency in µs\n")
+    print(f"{'call':>16} {'before p50':>11} {'before p99':>11} {'after p50':>10} {'after p99':>10} {'speedup':>8}")
+    for name in before:
+        (b50, b99), (a50, a99) = before[name], after[name]
+        print(f"{name:>16} {b50:11.0f} {b99:11.0f} {a50:10.0f} {a99:10.0f} {b50 / a50:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
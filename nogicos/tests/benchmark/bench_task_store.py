@@ -0,0 +1,119 @@
+# -*- coding: utf-8 -*-
+"""
+Task Store Benchmark
+
+Drives AsyncTaskStore with checkpoints at a fixed rate (default 1k/s) and
+as a burst, and compares against the previous write path: one `execute`
+per buffered row, flushed every 10 rows. Reports save latency seen by the
+agent loop, flush count/latency and sustained rows/s.
+
+Usage:
+    python -m tests.benchmark.bench_task_store
+    python -m tests.benchmark.bench_task_store --rate 2000 --seconds 3 --state-kb 4
+"""
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Add project root to path
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from engine.agent.async_db import AsyncTaskStore, HAS_AIOSQLITE
+
+
+class RowAtATimeStore(AsyncTaskStore):
+    """The pre-batching write path: execute per row, flush every 10 rows"""
+
+    def __init__(self, db_path):
+        super().__init__(db_path, durable=False, flush_interval=5.0)
+        self._rows = []
+
+    async def save_checkpoint(self, task_id, iteration, state, screenshot_id=None, is_full=True):
+        self._rows.append((task_id, iteration, json.dumps(state), screenshot_id, 1, "now"))
+        if len(self._rows) >= 10:
+            await self._flush_rows()
+
+    async def _flush_rows(self):
+        rows, self._rows = self._rows, []
+        async with self._get_connection() as conn:
+            for row in rows:
+                await conn.execute(
+                    """INSERT INTO checkpoints
+                       (task_id, iteration, state_json, screenshot_id, is_full, created_at)
+                       VALUES (?, ?, ?, ?, ?, ?)""",
+                    row,
+                )
+            await conn.commit()
+
+    async def close(self):
+        if self._rows:
+            await self._flush_rows()
+        await super().close()
+
+
+async def drive(store, total, rate, state):
+    """Save `total` checkpoints at `rate`/s (0 = as fast as possible)"""
+    latencies = []
+    started = time.perf_counter()
+    for i in range(total):
+        if rate:
+            target = started + i / rate
+            delay = target - time.perf_counter()
+            if delay > 0:
+                await asyncio.sleep(delay)
+        t0 = time.perf_counter()
+        await store.save_checkpoint(f"task-{i % 8}", i, state)
+        latencies.append((time.perf_counter() - t0) * 1000)
+    await store.close()
+    return latencies, time.perf_counter() - started
+
+
+def report(label, latencies, wall, total, stats=None):
+    ordered = sorted(latencies)
+    p99 = ordered[min(len(ordered) - 1, int(len(ordered) * 0.99))]
+    flushes = f"{stats['flushes']:7d} {stats['avg_flush_ms']:9.2f}" if stats else f"{'-':>7} {'-':>9}"
+    print(f"{label:>20} {statistics.mean(latencies):9.4f} {p99:9.4f} {max(latencies):9.2f} "
+          f"{flushes} {total / wall:9.0f}")
+
+
+async def main_async(args):
+    state = {"messages": ["x" * 256] * max(1, args.state_kb * 4), "iteration": 0}
+    total = int(args.rate * args.seconds)
+
+    print(f"{total} checkpoints, ~{args.state_kb} KB state\n")
+    print(f"{'store':>20} {'mean ms':>9} {'p99 ms':>9} {'max ms':>9} {'flushes':>7} {'flush ms':>9} {'rows/s':>9}")
+
+    for label, rate in ((f"paced {args.rate}/s", args.rate), ("burst", 0)):
+        with tempfile.TemporaryDirectory() as tmp:
+            legacy = RowAtATimeStore(str(Path(tmp) / "legacy.db"))
+            await legacy.initialize()
+            latencies, wall = await drive(legacy, total, rate, state)
+            report(f"row-at-a-time {label.split()[0]}", latencies, wall, total)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            store = AsyncTaskStore(str(Path(tmp) / "tasks.db"))
+            await store.initialize()
+            latencies, wall = await drive(store, total, rate, state)
+            report(f"batched {label.split()[0]}", latencies, wall, total, store.get_stats())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rate", type=int, default=1000, help="Checkpoints per second in paced mode")
+    parser.add_argument("--seconds", type=float, default=2.0)
+    parser.add_argument("--state-kb", type=int, default=2, help="Approximate checkpoint state size")
+    args = parser.parse_args()
+    if not HAS_AIOSQLITE:
+        print("aiosqlite not installed")
+        return
+    asyncio.run(main_async(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,168 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the agent API admission queue
+
+Tests cover:
+- Interactive requests are admitted before background ones
+- Round-robin fair share between clients
+- Bounded queue: rejection, per-client cap, background shedding
+- Deadlines drop stale requests before admission, including tickets
+  withdrawn or shed as the deadline fires
+- Queue position callbacks
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.server import admission
+from engine.server.admission import (
+    AdmissionController, AdmissionPriority, AdmissionRejected, AdmissionExpired,
+)
+
+
+async def occupy(controller, request_id="holder"):
+    """Admit one request and keep it active"""
+    ticket = controller.enqueue(request_id, "holder-client")
+    await controller.wait(ticket)
+    return ticket
+
+
+async def admitted_order(controller, tickets, holder):
+    """Release the holder and record the order tickets are admitted in"""
+    order = []
+
+    async def run(ticket):
+        await controller.wait(ticket)
+        order.append(ticket.request_id)
+        controller.release(ticket)
+
+    waiters = [asyncio.create_task(run(t)) for t in tickets]
+    controller.release(holder)
+    await asyncio.gather(*waiters)
+    return order
+
+
+class TestAdmissionOrdering:
+
+    @pytest.mark.asyncio
+    async def test_interactive_before_background(self):
+        controller = AdmissionController(max_active=1)
+        holder = await occupy(controller)
+        tickets = [
+            controller.enqueue("bg1", "eval", AdmissionPriority.BACKGROUND),
+            controller.enqueue("ui1", "ui", "interactive"),
+            controller.enqueue("bg2", "eval", "background"),
+            controller.enqueue("ui2", "ui", "interactive"),
+        ]
+        assert await admitted_order(controller, tickets, holder) == ["ui1", "ui2", "bg1", "bg2"]
+
+    @pytest.mark.asyncio
+    async def test_fair_share_round_robin(self):
+        controller = AdmissionController(max_active=1)
+        holder = await occupy(controller)
+        tickets = [controller.enqueue(f"a{i}", "client-a") for i in range(3)]
+        tickets.append(controller.enqueue("b0", "client-b"))
+        assert controller.get_position("b0") == 2
+        assert await admitted_order(controller, tickets, holder) == ["a0", "b0", "a1", "a2"]
+
+    @pytest.mark.asyncio
+    async def test_position_callbacks(self):
+        controller = AdmissionController(max_active=1)
+        holder = await occupy(controller)
+        positions = []
+        first = controller.enqueue("first", "c")
+        second = controller.enqueue("second", "c", on_position=lambda pos, total: positions.append(pos))
+        assert positions == [2]
+
+        waiter = asyncio.create_task(controller.wait(first))
+        controller.release(holder)
+        await waiter
+        assert positions == [2, 1]
+        controller.release(first)
+        await controller.wait(second)
+        controller.release(second)
+
+
+class TestAdmissionBounds:
+
+    @pytest.mark.asyncio
+    async def test_queue_full_rejects(self):
+        controller = AdmissionController(max_active=1, max_queue=2)
+        await occupy(controller)
+        controller.enqueue("q1", "a")
+        controller.enqueue("q2", "b")
+        with pytest.raises(AdmissionRejected):
+            controller.enqueue("q3", "c")
+        assert controller.get_stats()["rejected"] == 1
+
+    @pytest.mark.asyncio
+    async def test_per_client_cap(self):
+        controller = AdmissionController(max_active=1, max_queued_per_client=1)
+        await occupy(controller)
+        controller.enqueue("q1", "greedy")
+        with pytest.raises(AdmissionRejected):
+            controller.enqueue("q2", "greedy")
+        controller.enqueue("q3", "polite")
+
+    @pytest.mark.asyncio
+    async def test_interactive_sheds_background(self):
+        controller = AdmissionController(max_active=1, max_queue=1)
+        await occupy(controller)
+        background = controller.enqueue("bg", "eval", "background")
+        controller.enqueue("ui", "ui", "interactive")
+        with pytest.raises(AdmissionRejected):
+            await controller.wait(background)
+        assert controller.get_stats()["shed"] == 1
+        assert controller.queued == 1
+
+
+class TestAdmissionDeadlines:
+
+    @pytest.mark.asyncio
+    async def test_stale_request_expires_in_queue(self):
+        controller = AdmissionController(max_active=1)
+        holder = await occupy(controller)
+        ticket = controller.enqueue("stale", "c", deadline_s=0.02)
+        with pytest.raises(AdmissionExpired):
+            await controller.wait(ticket)
+        assert controller.queued == 0
+
+        # The freed slot goes to the next request, not the expired one
+        controller.release(holder)
+        stats = controller.get_stats()
+        assert stats["expired"] == 1
+        assert stats["active"] == 0
+
+    @pytest.mark.asyncio
+    async def test_ticket_settled_at_deadline(self, monkeypatch):
+        controller = AdmissionController(max_active=1)
+        await occupy(controller)
+        withdrawn = controller.enqueue("withdrawn", "c", deadline_s=5)
+        shed = controller.enqueue("shed", "c", deadline_s=5)
+
+        async def settle_then_time_out(awaitable, timeout):
+            awaitable.cancel()
+            withdrawn.future.cancel()
+            if not shed.future.done():
+                shed.future.set_exception(AdmissionRejected("shed", retry_after=1))
+            raise asyncio.TimeoutError()
+
+        monkeypatch.setattr(admission.asyncio, "wait_for", settle_then_time_out)
+        with pytest.raises(AdmissionExpired):
+            await controller.wait(withdrawn)
+        with pytest.raises(AdmissionRejected):
+            await controller.wait(shed)
+
+    @pytest.mark.asyncio
+    async def test_admit_context_releases(self):
+        controller = AdmissionController(max_active=1)
+        async with controller.admit("one", "c"):
+            assert controller.active == 1
+        assert controller.active == 0
+        assert controller.get_stats()["admitted_immediately"] == 1
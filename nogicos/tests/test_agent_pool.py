@@ -0,0 +1,185 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for AgentPool and ConcurrencyManager task scheduling
+
+Tests cover:
+- Disjoint tasks run in parallel up to the slot count
+- Tasks that declare no windows or files take the whole desktop
+- Tasks that do not drive the desktop (read-only modes) overlap across sessions
+- Conflicting tasks (same session / window) queue in FIFO order
+- Queued tasks do not starve behind later disjoint tasks
+- Timeouts and cancellation while queued release their place
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.agent_pool import AgentPool
+from engine.agent.concurrency import ConcurrencyConfig, ConcurrencyManager
+from engine.agent.errors import TooManyTasksError
+
+
+class FakeAgent:
+    def __init__(self):
+        self.max_iterations = 20
+
+
+def make_pool(slots=3):
+    manager = ConcurrencyManager(ConcurrencyConfig(max_concurrent_tasks=slots))
+    return AgentPool(FakeAgent, concurrency=manager)
+
+
+async def run_task(pool, log, name, release, **claims):
+    async with pool.lease(name, **claims) as agent:
+        log.append(("start", name))
+        await release.wait()
+        log.append(("end", name))
+        return agent
+
+
+class TestAgentPool:
+
+    @pytest.mark.asyncio
+    async def test_disjoint_tasks_run_in_parallel(self):
+        pool = make_pool(slots=3)
+        release = asyncio.Event()
+        log = []
+        tasks = [
+            asyncio.create_task(run_task(pool, log, f"t{i}", release, session_id=f"s{i}", target_hwnds={i}))
+            for i in range(3)
+        ]
+        await asyncio.sleep(0.01)
+        assert sorted(log) == [("start", "t0"), ("start", "t1"), ("start", "t2")]
+
+        release.set()
+        agents = await asyncio.gather(*tasks)
+        assert len({id(a) for a in agents}) == 3
+        assert pool.get_stats()["idle"] == 3
+
+    @pytest.mark.asyncio
+    async def test_same_session_queues_fifo(self):
+        pool = make_pool(slots=3)
+        releases = [asyncio.Event() for _ in range(3)]
+        log = []
+        tasks = []
+        for i in range(3):
+            tasks.append(asyncio.create_task(run_task(pool, log, f"t{i}", releases[i], session_id="same")))
+            await asyncio.sleep(0)
+        await asyncio.sleep(0.01)
+        assert log == [("start", "t0")]
+        assert pool.concurrency.get_queue_position("t2") == 2
+
+        for release in releases:
+            release.set()
+        await asyncio.gather(*tasks)
+        assert log == [
+            ("start", "t0"), ("end", "t0"),
+            ("start", "t1"), ("end", "t1"),
+            ("start", "t2"), ("end", "t2"),
+        ]
+        # One agent was enough for serialized work
+        assert pool.get_stats()["created"] == 1
+
+    @pytest.mark.asyncio
+    async def test_undeclared_tasks_take_whole_desktop(self):
+        pool = make_pool(slots=3)
+        release = asyncio.Event()
+        log = []
+        tasks = [
+            asyncio.create_task(run_task(pool, log, "desktop1", release, session_id="s1")),
+            asyncio.create_task(run_task(pool, log, "desktop2", release, session_id="s2")),
+            asyncio.create_task(run_task(pool, log, "window", release, target_hwnds={7})),
+            asyncio.create_task(run_task(pool, log, "files", release, target_files={"/tmp/a.txt"})),
+        ]
+        await asyncio.sleep(0.01)
+        assert sorted(log) == [("start", "desktop1"), ("start", "files")]
+
+        release.set()
+        await asyncio.gather(*tasks)
+        assert len(log) == 8
+
+    @pytest.mark.asyncio
+    async def test_non_desktop_tasks_overlap_whole_desktop(self):
+        pool = make_pool(slots=3)
+        release = asyncio.Event()
+        log = []
+        tasks = [
+            asyncio.create_task(run_task(pool, log, "desktop", release, session_id="s1")),
+            asyncio.create_task(run_task(pool, log, "ask1", release, session_id="s2", desktop=False)),
+            asyncio.create_task(run_task(pool, log, "ask2", release, session_id="s3", desktop=False)),
+        ]
+        await asyncio.sleep(0.01)
+        assert sorted(log) == [("start", "ask1"), ("start", "ask2"), ("start", "desktop")]
+
+        release.set()
+        await asyncio.gather(*tasks)
+
+    @pytest.mark.asyncio
+    async def test_duplicate_task_id_keeps_holder_slot(self):
+        manager = ConcurrencyManager(ConcurrencyConfig(max_concurrent_tasks=2))
+        async with manager.task_slot("t", target_hwnds={1}):
+            async with manager.task_slot("t", target_hwnds={1}):
+                pass
+            assert "t" in manager.get_active_tasks()
+        assert "t" not in manager.get_active_tasks()
+
+    @pytest.mark.asyncio
+    async def test_window_conflict_does_not_starve(self):
+        pool = make_pool(slots=2)
+        hold, later = asyncio.Event(), asyncio.Event()
+        log = []
+
+        first = asyncio.create_task(run_task(pool, log, "a", hold, target_hwnds={1}))
+        await asyncio.sleep(0)
+        blocked = asyncio.create_task(run_task(pool, log, "b", later, target_hwnds={1, 2}))
+        await asyncio.sleep(0)
+        # Disjoint from running 'a' but wants window 2 reserved by queued 'b'
+        jumper = asyncio.create_task(run_task(pool, log, "c", later, target_hwnds={2}))
+        await asyncio.sleep(0.01)
+        assert log == [("start", "a")]
+
+        hold.set()
+        await asyncio.sleep(0.01)
+        assert ("start", "b") in log and ("start", "c") not in log
+
+        later.set()
+        await asyncio.gather(first, blocked, jumper)
+        assert log.index(("end", "b")) < log.index(("start", "c"))
+
+    @pytest.mark.asyncio
+    async def test_max_iterations_override_is_restored(self):
+        pool = make_pool(slots=1)
+        async with pool.lease("t", max_iterations=5) as agent:
+            assert agent.max_iterations == 5
+        assert agent.max_iterations == 20
+
+    @pytest.mark.asyncio
+    async def test_timeout_and_cancel_leave_queue(self):
+        pool = make_pool(slots=1)
+        release = asyncio.Event()
+        holder = asyncio.create_task(run_task(pool, [], "holder", release))
+        await asyncio.sleep(0)
+
+        with pytest.raises(TooManyTasksError):
+            async with pool.lease("late", timeout=0.01):
+                pass
+
+        waiting = asyncio.create_task(run_task(pool, [], "waiting", release))
+        await asyncio.sleep(0.01)
+        assert pool.concurrency.waiting_tasks == 1
+        waiting.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiting
+        assert pool.concurrency.waiting_tasks == 0
+
+        release.set()
+        await holder
+        stats = pool.concurrency.get_stats()
+        assert stats["active_tasks"] == 0
+        assert stats["slot_timeouts"] == 1
@@ -0,0 +1,174 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for AsyncTaskStore write batching and the append log
+
+Tests cover:
+- Size-triggered flushes group rows per statement type
+- Time-triggered flushes
+- update_status coalescing and read-your-writes
+- Reads during an in-flight flush see the batch being committed
+- Crash recovery: unflushed operations are replayed exactly once
+- Truncated log records are ignored
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.async_db import AsyncTaskStore, AppendLog, HAS_AIOSQLITE, _WriteBatch
+
+pytestmark = pytest.mark.skipif(not HAS_AIOSQLITE, reason="aiosqlite not installed")
+
+
+async def open_store(tmp_path, **kwargs):
+    kwargs.setdefault("flush_interval", 60)
+    store = AsyncTaskStore(str(tmp_path / "tasks.db"), pool_size=1, **kwargs)
+    await store.initialize()
+    return store
+
+
+async def crash(store):
+    """Drop the in-memory buffer and connections without flushing"""
+    store._batch = _WriteBatch()
+    store._flush_task.cancel()
+    try:
+        await store._flush_task
+    except asyncio.CancelledError:
+        pass
+    store._log.close()
+    for conn in store._pool:
+        await conn.close()
+
+
+async def count_rows(store, table):
+    async with store._get_connection() as conn:
+        async with conn.execute(f"SELECT COUNT(*) FROM {table}") as cursor:
+            return (await cursor.fetchone())[0]
+
+
+class TestBatching:
+
+    @pytest.mark.asyncio
+    async def test_size_triggered_flushes(self, tmp_path):
+        store = await open_store(tmp_path, flush_size=100)
+        await store.create_task("t1", "task")
+        for i in range(499):
+            await store.save_checkpoint("t1", i, {"i": i})
+        for _ in range(50):
+            await asyncio.sleep(0.01)
+            if store.get_stats()["pending_rows"] == 0:
+                break
+
+        stats = store.get_stats()
+        assert stats["pending_rows"] == 0
+        assert stats["rows_written"] == 500
+        assert 1 <= stats["flushes"] <= 5
+        assert len(await store.get_all_checkpoints("t1")) == 499
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_time_triggered_flush(self, tmp_path):
+        store = await open_store(tmp_path, flush_interval=0.05)
+        await store.save_message("t1", "user", "hello")
+        assert store.get_stats()["pending_rows"] == 1
+        await asyncio.sleep(0.2)
+        assert store.get_stats()["pending_rows"] == 0
+        assert await count_rows(store, "messages") == 1
+        await store.close()
+
+    @pytest.mark.asyncio
+    async def test_status_coalescing(self, tmp_path):
+        store = await open_store(tmp_path)
+        await store.create_task("t1", "task", [42])
+        for status in ("running", "needs_help", "running", "completed"):
+            await store.update_status("t1", status)
+
+        task = await store.get_task("t1")
+        assert task["status"] == "completed"
+        assert task["target_hwnds"] == [42]
+        assert store.get_stats()["pending_rows"] == 1
+
+        assert await store._flush_buffer()
+        await store.update_status("t1", "running")
+        await store.update_status("t1", "failed")
+        assert (await store.get_task("t1"))["status"] == "failed"
+        assert store.get_stats()["pending_rows"] == 1
+        assert store.get_stats()["status_coalesced"] == 5
+        await store.close()
+
+
+    @pytest.mark.asyncio
+    async def test_reads_during_inflight_flush(self, tmp_path):
+        store = await open_store(tmp_path)
+        commit = asyncio.Event()
+        write_batch = store._write_batch
+
+        async def slow_write_batch(conn, batch, sealed):
+            await commit.wait()
+            await write_batch(conn, batch, sealed)
+
+        store._write_batch = slow_write_batch
+        await store.create_task("t1", "task")
+        await store.save_checkpoint("t1", 0, {"i": 0})
+        flush = asyncio.create_task(store._flush_buffer())
+        await asyncio.sleep(0.01)
+
+        assert not await store.create_task("t1", "task")
+        await store.update_status("t1", "running")
+        assert (await store.get_task("t1"))["status"] == "running"
+
+        checkpoints = asyncio.create_task(store.get_all_checkpoints("t1"))
+        await asyncio.sleep(0.01)
+        assert not checkpoints.done()
+
+        commit.set()
+        assert await flush
+        assert len(await checkpoints) == 1
+        assert (await store.get_task("t1"))["status"] == "running"
+        await store.close()
+
+class TestAppendLog:
+
+    @pytest.mark.asyncio
+    async def test_replay_after_crash(self, tmp_path):
+        store = await open_store(tmp_path)
+        await store.create_task("t1", "task")
+        await store.save_checkpoint("t1", 1, {"step": 1})
+        await store._flush_buffer()
+        await store.save_checkpoint("t1", 2, {"step": 2})
+        await store.save_message("t1", "assistant", "done")
+        await store.update_status("t1", "completed")
+        await crash(store)
+
+        recovered = await open_store(tmp_path)
+        assert recovered.get_stats()["replayed"] == 3
+        assert await recovered.restore_checkpoint("t1") == {"step": 2}
+        assert (await recovered.get_task("t1"))["status"] == "completed"
+        assert len(await recovered.get_messages("t1")) == 1
+        await recovered.close()
+
+        # Replayed operations are applied exactly once
+        reopened = await open_store(tmp_path)
+        assert reopened.get_stats()["replayed"] == 0
+        assert await count_rows(reopened, "checkpoints") == 2
+        await reopened.close()
+        assert AppendLog(str(tmp_path / "tasks.db.oplog")).segments() == []
+
+    @pytest.mark.asyncio
+    async def test_truncated_record_ignored(self, tmp_path):
+        store = await open_store(tmp_path)
+        await store.save_checkpoint("t1", 1, {"step": 1})
+        await crash(store)
+        (_, path), = AppendLog(str(tmp_path / "tasks.db.oplog")).segments()
+        with open(path, "ab") as f:
+            f.write(b'["checkpoint", ["t1", 2')
+
+        recovered = await open_store(tmp_path)
+        assert recovered.get_stats()["replayed"] == 1
+        assert await recovered.restore_checkpoint("t1") == {"step": 1}
+        await recovered.close()
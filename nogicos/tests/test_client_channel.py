@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for per-client outbound queues in StatusServer
+
+Tests cover:
+- A slow client does not stall broadcasts to fast clients
+- Frames, cursor moves and status are coalesced latest-wins
+- The queue is bounded; only coalescible and lossy types are dropped
+- Must-deliver traffic past the hard limit disconnects the client
+- Binary frames for clients that negotiate them
+- Per-client lag metrics
+"""
+
+import asyncio
+import json
+import os
+import struct
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.server.client_channel import ClientChannel
+from engine.server.websocket import StatusServer
+
+
+class FakeSocket:
+    def __init__(self, delay=0.0):
+        self.delay = delay
+        self.sent = []
+        self.gate = None
+
+    async def send(self, payload):
+        if self.gate is not None:
+            await self.gate.wait()
+        if self.delay:
+            await asyncio.sleep(self.delay)
+        self.sent.append(payload)
+
+    async def close(self):
+        pass
+
+
+def connect(server, socket, binary=False):
+    channel = ClientChannel(socket, max_queue=server.max_client_queue, binary_frames=binary)
+    channel.start()
+    server._channels[socket] = channel
+    server._clients.add(socket)
+    return channel
+
+
+class TestClientChannel:
+
+    @pytest.mark.asyncio
+    async def test_slow_client_does_not_block_broadcast(self):
+        server = StatusServer()
+        slow, fast = FakeSocket(), FakeSocket()
+        slow.gate = asyncio.Event()
+        connect(server, slow)
+        fast_channel = connect(server, fast)
+
+        for i in range(5):
+            await asyncio.wait_for(server.broadcast({"type": "action", "data": {"i": i}}), timeout=0.1)
+        assert await fast_channel.drain(timeout=1)
+        assert len(fast.sent) == 5
+        assert slow.sent == []
+
+        slow.gate.set()
+        assert await server._channels[slow].drain(timeout=1)
+        assert slow.sent == fast.sent
+        for channel in server._channels.values():
+            await channel.close()
+
+    @pytest.mark.asyncio
+    async def test_frames_and_status_are_latest_wins(self):
+        socket = FakeSocket()
+        socket.gate = asyncio.Event()
+        channel = ClientChannel(socket)
+        channel.start()
+        channel.enqueue("first-action", "action")
+        await asyncio.sleep(0)  # writer picks up the first message and blocks
+        for i in range(10):
+            channel.enqueue(f"frame-{i}", "frame")
+            channel.enqueue(f"status-{i}", "status")
+        channel.enqueue("cursor-a", "cursor_move")
+        channel.enqueue("cursor-b", "cursor_move")
+        assert channel.depth == 3
+
+        socket.gate.set()
+        await channel.drain(timeout=1)
+        assert socket.sent == ["first-action", "frame-9", "status-9", "cursor-b"]
+        assert channel.get_stats()["coalesced"] == 19
+        await channel.close()
+
+    @pytest.mark.asyncio
+    async def test_bounded_queue_keeps_must_deliver(self):
+        socket = FakeSocket()
+        socket.gate = asyncio.Event()
+        channel = ClientChannel(socket, max_queue=3)
+        channel.start()
+        await asyncio.sleep(0)
+        channel.enqueue("status", "status")
+        channel.enqueue("perf-0", "performance")
+        channel.enqueue("perf-1", "performance")
+        for i in range(5):
+            channel.enqueue(f"chunk-{i}", "stream")
+        channel.enqueue("tool", "tool_call")
+        assert not channel.enqueue("perf-2", "performance")
+        assert channel.depth == 6
+        assert channel.get_stats()["dropped"] == 4
+
+        socket.gate.set()
+        await channel.drain(timeout=1)
+        assert socket.sent == [f"chunk-{i}" for i in range(5)] + ["tool"]
+        await channel.close()
+
+    @pytest.mark.asyncio
+    async def test_hard_limit_disconnects(self):
+        socket = FakeSocket()
+        socket.gate = asyncio.Event()
+        channel = ClientChannel(socket, max_queue=1)
+        channel.start()
+        await asyncio.sleep(0)
+        assert all(channel.enqueue(f"chunk-{i}", "stream") for i in range(4))
+        assert not channel.enqueue("chunk-4", "stream")
+        await asyncio.sleep(0)
+        assert channel.closed
+        await channel.close()
+
+    @pytest.mark.asyncio
+    async def test_binary_frames_and_lag_stats(self):
+        server = StatusServer()
+        json_client, binary_client = FakeSocket(), FakeSocket(delay=0.01)
+        connect(server, json_client)
+        binary_channel = connect(server, binary_client, binary=True)
+
+        await server.broadcast_frame(image_bytes=b"\xff\xd8jpeg-bytes", action="click", step=1)
+        for channel in server._channels.values():
+            await channel.drain(timeout=1)
+
+        message = json.loads(json_client.sent[0])
+        assert message["type"] == "frame" and message["data"]["action"] == "click"
+
+        payload = binary_client.sent[0]
+        header_len = struct.unpack(">I", payload[:4])[0]
+        header = json.loads(payload[4:4 + header_len])
+        assert header["data"]["step"] == 1 and "image" not in header["data"]
+        assert payload[4 + header_len:] == b"\xff\xd8jpeg-bytes"
+
+        stats = {s["client_id"]: s for s in server.get_client_stats()}
+        assert stats[id(binary_client)]["lag_ms"] >= 10
+        assert stats[id(binary_client)]["sent"] == 1
+        await binary_channel.close()
+        await server._channels[json_client].close()
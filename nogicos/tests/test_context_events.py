@@ -0,0 +1,165 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the ContextStore event journal
+
+Tests cover:
+- record_event() buffers in memory; the writer commits events in batches
+- get_recent_events() is served from the ring buffer while it covers the window
+- Falling back to SQLite once older events have been evicted
+- Retention: raw events past the cutoff become per-minute rollups
+- (hook_type, timestamp) index; ids and the buffer carry over across restarts
+"""
+
+import os
+import sqlite3
+import sys
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.context.store import ContextEvent, ContextStore
+from engine.sqlite_pool import close_sqlite_pool
+
+
+def db_count(db_path, table="context_events"):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+    finally:
+        conn.close()
+
+
+def event(i, hook_type="desktop", **kwargs):
+    return ContextEvent(hook_type=hook_type, event_type="updated", data={"n": i}, **kwargs)
+
+
+@pytest.fixture
+def make_store(tmp_path):
+    stores = []
+
+    def make(**kwargs):
+        kwargs.setdefault("flush_interval", 60.0)
+        store = ContextStore(db_path=str(tmp_path / "context.db"), **kwargs)
+        stores.append(store)
+        return store
+
+    yield make
+    for store in stores:
+        store.close()
+    close_sqlite_pool(str(tmp_path / "context.db"))
+
+
+class TestBatching:
+
+    def test_events_are_written_in_batches(self, make_store):
+        store = make_store(batch_size=50)
+        for i in range(10):
+            store.record_event(event(i))
+        assert db_count(store._db_path) == 0  # nothing on disk until the writer runs
+
+        assert store.flush() == 10
+        assert db_count(store._db_path) == 10
+        assert store.get_stats()["batches"] == 1
+
+    def test_batch_size_wakes_writer(self, make_store):
+        store = make_store(batch_size=20)
+        for i in range(20):
+            store.record_event(event(i))
+        deadline = time.monotonic() + 5
+        while db_count(store._db_path) < 20 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert db_count(store._db_path) == 20
+
+    def test_close_flushes_and_ids_continue(self, make_store):
+        store = make_store()
+        for i in range(3):
+            store.record_event(event(i))
+        store.close()
+        assert db_count(store._db_path) == 3
+
+        reopened = make_store()
+        reopened.record_event(event(3))
+        reopened.flush()
+        assert [e.id for e in reopened.get_recent_events(minutes=5)] == [4, 3, 2, 1]
+        assert reopened.get_stats()["db_queries"] == 0  # recent history preloaded into memory
+
+
+class TestRecentEvents:
+
+    def test_served_from_memory(self, make_store):
+        store = make_store()
+        for i in range(5):
+            store.record_event(event(i, hook_type="browser" if i % 2 else "desktop"))
+
+        events = store.get_recent_events(minutes=5)
+        assert [e.data["n"] for e in events] == [4, 3, 2, 1, 0]
+        assert [e.data["n"] for e in store.get_recent_events(minutes=5, hook_type="browser")] == [3, 1]
+        assert store.get_stats()["memory_hits"] == 2
+        assert db_count(store._db_path) == 0
+
+        events[0].data = {}  # callers get copies
+        assert store.get_recent_events(minutes=5)[0].data == {"n": 4}
+
+    def test_falls_back_to_db_after_eviction(self, make_store):
+        store = make_store(ring_size=4)
+        for i in range(10):
+            store.record_event(event(i))
+        time.sleep(0.01)
+
+        events = store.get_recent_events(minutes=1)
+        assert [e.data["n"] for e in events] == list(reversed(range(10)))
+        assert store.get_stats()["db_queries"] == 1
+
+
+class TestRetention:
+
+    def test_old_events_roll_up_per_minute(self, make_store):
+        store = make_store(raw_retention_hours=24)
+        old = datetime.now() - timedelta(hours=30)
+        for i in range(3):
+            store.record_event(event(i, timestamp=old.replace(second=i).isoformat()))
+        store.record_event(event(3, hook_type="browser", timestamp=old.isoformat()))
+        store.record_event(event(4))
+        store.flush()
+
+        assert store.rollup() == 4
+        assert db_count(store._db_path) == 1
+
+        rollups = store.get_rollups(hours=48)
+        bucket = old.isoformat()[:16]
+        assert {(r["bucket"], r["hook_type"], r["count"]) for r in rollups} == {
+            (bucket, "desktop", 3), (bucket, "browser", 1),
+        }
+
+        # A second pass merges into the existing minute buckets
+        store.record_event(event(5, timestamp=old.isoformat()))
+        store.flush()
+        store.rollup()
+        assert store.get_rollups(hours=48, hook_type="desktop")[0]["count"] == 4
+
+    def test_rollups_expire(self, make_store):
+        store = make_store(rollup_retention_days=1)
+        store.record_event(event(0, timestamp=(datetime.now() - timedelta(days=3)).isoformat()))
+        store.flush()
+        store.rollup()
+        assert db_count(store._db_path, "context_event_rollups") == 0
+
+
+class TestSchema:
+
+    def test_hook_type_timestamp_index(self, make_store):
+        store = make_store()
+        conn = sqlite3.connect(store._db_path)
+        try:
+            plan = conn.execute(
+                "EXPLAIN QUERY PLAN SELECT id FROM context_events "
+                "WHERE hook_type = ? AND timestamp > ? ORDER BY timestamp DESC",
+                ("desktop", "2025-01-01")
+            ).fetchall()
+        finally:
+            conn.close()
+        assert "idx_hook_type_timestamp" in " ".join(str(row[-1]) for row in plan)
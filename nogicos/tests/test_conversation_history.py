@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for ConversationHistory screenshot pruning
+
+Tests cover:
+- Only the newest images are kept (direct and inside tool_result)
+- Pruning copies on write and never mutates caller-owned messages
+- Pruning matches the legacy full-scan behaviour
+- Repeated pruning only touches newly expired images
+"""
+
+import os
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.conversation import ConversationHistory, PRUNED_IMAGE_TEXT
+
+
+def image(tag):
+    return {"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": tag}}
+
+
+def tool_turn(i, images=1):
+    return [
+        {"role": "assistant", "content": [{"type": "tool_use", "id": f"t{i}", "name": "window_screenshot", "input": {}}]},
+        {"role": "user", "content": [{
+            "type": "tool_result",
+            "tool_use_id": f"t{i}",
+            "content": [{"type": "text", "text": f"shot {i}"}] + [image(f"img{i}-{k}") for k in range(images)],
+        }]},
+    ]
+
+
+def image_tags(messages):
+    tags = []
+    for msg in messages:
+        content = msg["content"]
+        if not isinstance(content, list):
+            continue
+        for block in content:
+            if block.get("type") == "image":
+                tags.append(block["source"]["data"])
+            elif block.get("type") == "tool_result" and isinstance(block["content"], list):
+                tags.extend(b["source"]["data"] for b in block["content"] if b.get("type") == "image")
+    return tags
+
+
+class TestConversationHistory:
+
+    def test_keeps_newest_images(self):
+        history = ConversationHistory([{"role": "user", "content": [image("first"), {"type": "text", "text": "task"}]}])
+        for i in range(4):
+            history.extend(tool_turn(i))
+        assert history.image_count == 5
+
+        history.prune_images(max_images=2)
+        assert image_tags(history) == ["img2-0", "img3-0"]
+        assert history.image_count == 2
+        assert history.images_pruned == 3
+        assert history[0]["content"][0] == {"type": "text", "text": PRUNED_IMAGE_TEXT}
+
+    def test_does_not_mutate_appended_messages(self):
+        turns = tool_turn(0, images=2) + tool_turn(1)
+        original_result = turns[1]["content"][0]
+        history = ConversationHistory(turns)
+        history.prune_images(max_images=1)
+
+        assert image_tags(turns) == ["img0-0", "img0-1", "img1-0"]
+        assert history[1] is not turns[1]
+        assert original_result["content"][1]["type"] == "image"
+        # Untouched messages are shared, not copied
+        assert history[0] is turns[0]
+        assert history[3] is turns[3]
+
+    def test_incremental_prune_matches_full_scan(self):
+        incremental = ConversationHistory()
+        for i in range(10):
+            incremental.extend(tool_turn(i, images=1 + i % 2))
+            incremental.prune_images(max_images=2)
+
+        full = ConversationHistory()
+        for i in range(10):
+            full.extend(tool_turn(i, images=1 + i % 2))
+        full.prune_images(max_images=2)
+
+        assert list(incremental) == list(full)
+        assert image_tags(incremental) == ["img9-0", "img9-1"]
+
+    def test_prune_touches_only_new_messages(self):
+        history = ConversationHistory()
+        history.extend(tool_turn(0))
+        history.extend(tool_turn(1))
+        history.prune_images(max_images=1)
+        pruned_first = history[1]
+
+        history.extend(tool_turn(2))
+        history.prune_images(max_images=1)
+        assert history[1] is pruned_first
+        assert image_tags(history) == ["img2-0"]
+
+    def test_list_mutation_reindexes(self):
+        history = ConversationHistory(tool_turn(0) + tool_turn(1))
+        del history[0:2]
+        assert history.image_count == 1
+        history.prune_images(max_images=0)
+        assert image_tags(history) == []
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the per-subscriber dispatch event bus
+
+Tests cover:
+- publish returns without waiting for slow handlers
+- Per-task_id ordering with multiple workers
+- Handler timeouts and errors are counted per subscriber
+- Overflow policies (drop_oldest, drop_newest, block) and never-drop events
+- get_event_bus() defaults to dispatch mode
+"""
+
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent import event_bus as event_bus_module
+from engine.agent.event_bus import DispatchEventBus, OverflowPolicy
+from engine.agent.events import AgentEvent, EventType, EventPriority
+
+
+def make_event(task_id="t1", event_type=EventType.AGENT_THINKING, index=0, priority=EventPriority.NORMAL):
+    return AgentEvent.create(event_type, task_id=task_id, payload={"i": index}, priority=priority)
+
+
+def subscriber_stats(bus, name):
+    return next(s for s in bus.get_stats()["subscribers"] if s["name"] == name)
+
+
+class TestDispatch:
+
+    @pytest.mark.asyncio
+    async def test_publish_does_not_wait_for_slow_handler(self):
+        bus = DispatchEventBus()
+        seen = []
+
+        async def slow(event):
+            await asyncio.sleep(0.05)
+            seen.append(event.payload["i"])
+
+        bus.subscribe_all(slow, name="slow")
+        started = time.perf_counter()
+        for i in range(5):
+            assert await bus.publish(make_event(index=i))
+        assert time.perf_counter() - started < 0.05
+        assert seen == []
+
+        assert await bus.drain(timeout=2.0)
+        assert seen == [0, 1, 2, 3, 4]
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_per_task_ordering_with_workers(self):
+        bus = DispatchEventBus(workers=4)
+        seen = {}
+
+        async def record(event):
+            # Jitter so unordered dispatch would interleave
+            await asyncio.sleep(0.001 * (event.payload["i"] % 3))
+            seen.setdefault(event.task_id, []).append(event.payload["i"])
+
+        bus.subscribe(EventType.TOOL_END, record, name="record")
+        for i in range(20):
+            for task_id in ("a", "b", "c", "d", "e"):
+                await bus.publish(make_event(task_id, EventType.TOOL_END, i))
+
+        assert await bus.drain(timeout=5.0)
+        assert set(seen) == {"a", "b", "c", "d", "e"}
+        for order in seen.values():
+            assert order == list(range(20))
+        assert subscriber_stats(bus, "record")["processed"] == 100
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_slow_subscriber_does_not_delay_others(self):
+        bus = DispatchEventBus()
+        fast_seen = []
+        release = asyncio.Event()
+
+        async def stuck(event):
+            await release.wait()
+
+        bus.subscribe_all(stuck, name="stuck", timeout=0)
+        bus.subscribe_all(lambda e: fast_seen.append(e.payload["i"]), name="fast")
+        for i in range(3):
+            await bus.publish(make_event(index=i))
+        await asyncio.sleep(0.01)
+        assert fast_seen == [0, 1, 2]
+
+        release.set()
+        assert await bus.drain(timeout=2.0)
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_timeouts_and_errors_counted(self):
+        bus = DispatchEventBus(handler_timeout=0.01)
+
+        async def hangs(event):
+            await asyncio.sleep(1)
+
+        def fails(event):
+            raise RuntimeError("boom")
+
+        bus.subscribe_all(hangs, name="hangs")
+        bus.subscribe_all(fails, name="fails")
+        await bus.publish(make_event())
+        assert await bus.drain(timeout=2.0)
+
+        stats = bus.get_stats()
+        assert stats["mode"] == "dispatch"
+        assert stats["timeouts"] == 1
+        assert stats["error_count"] == 2
+        assert subscriber_stats(bus, "hangs")["timeouts"] == 1
+        assert subscriber_stats(bus, "fails")["errors"] == 1
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_unsubscribe_stops_delivery(self):
+        bus = DispatchEventBus()
+        seen = []
+        unsubscribe = bus.subscribe(EventType.TOOL_END, lambda e: seen.append(e), name="once")
+        await bus.publish(make_event(event_type=EventType.TOOL_END))
+        assert await bus.drain()
+        unsubscribe()
+        await bus.publish(make_event(event_type=EventType.TOOL_END))
+        assert await bus.drain()
+        assert len(seen) == 1
+        assert bus.get_stats()["subscribers"] == []
+
+
+class TestOverflow:
+
+    async def _blocked_bus(self, overflow):
+        bus = DispatchEventBus(max_queue=2, overflow=overflow)
+        release = asyncio.Event()
+        seen = []
+
+        async def gated(event):
+            await release.wait()
+            seen.append(event.payload["i"])
+
+        bus.subscribe_all(gated, name="gated", timeout=0)
+        # First event is picked up by the worker and blocks it
+        await bus.publish(make_event(index=0))
+        await asyncio.sleep(0)
+        return bus, release, seen
+
+    @pytest.mark.asyncio
+    async def test_drop_oldest(self):
+        bus, release, seen = await self._blocked_bus("drop_oldest")
+        for i in range(1, 5):
+            assert await bus.publish(make_event(index=i))
+        release.set()
+        assert await bus.drain()
+        assert seen == [0, 3, 4]
+        assert subscriber_stats(bus, "gated")["dropped"] == 2
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_drop_newest(self):
+        bus, release, seen = await self._blocked_bus(OverflowPolicy.DROP_NEWEST)
+        results = [await bus.publish(make_event(index=i)) for i in range(1, 5)]
+        assert results == [True, True, False, False]
+        release.set()
+        assert await bus.drain()
+        assert seen == [0, 1, 2]
+        assert bus.get_stats()["events_dropped"] == 2
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_critical_events_never_dropped(self):
+        bus, release, seen = await self._blocked_bus("drop_newest")
+        for i in range(1, 5):
+            await bus.publish(make_event(index=i, event_type=EventType.TASK_FAILED))
+        release.set()
+        assert await bus.drain()
+        assert seen == [0, 1, 2, 3, 4]
+        assert subscriber_stats(bus, "gated")["overflow"] == 2
+        await bus.stop()
+
+    @pytest.mark.asyncio
+    async def test_block_waits_for_space(self):
+        bus, release, seen = await self._blocked_bus("block")
+        await bus.publish(make_event(index=1))
+        await bus.publish(make_event(index=2))
+        publisher = asyncio.create_task(bus.publish(make_event(index=3)))
+        await asyncio.sleep(0.01)
+        assert not publisher.done()
+
+        release.set()
+        assert await publisher
+        assert await bus.drain()
+        assert seen == [0, 1, 2, 3]
+        assert subscriber_stats(bus, "gated")["blocked"] == 1
+        await bus.stop()
+
+
+class TestDefaultBus:
+
+    def test_default_mode_is_dispatch(self, monkeypatch):
+        monkeypatch.setattr(event_bus_module, "_default_bus", None)
+        monkeypatch.setattr(event_bus_module, "_bus_mode", "dispatch")
+        monkeypatch.setattr(event_bus_module, "_bus_options", {})
+        assert isinstance(event_bus_module.get_event_bus(), DispatchEventBus)
+
+    def test_configure_inline_mode(self, monkeypatch):
+        monkeypatch.setattr(event_bus_module, "_default_bus", None)
+        monkeypatch.setattr(event_bus_module, "_bus_mode", "dispatch")
+        event_bus_module.configure_event_bus(mode="inline")
+        bus = event_bus_module.get_event_bus()
+        assert type(bus) is event_bus_module.EventBus
+        with pytest.raises(ValueError):
+            monkeypatch.setattr(event_bus_module, "_default_bus", None)
+            event_bus_module.configure_event_bus(mode="bogus")
@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the off-loop glob/grep engine behind glob_search and grep_search
+
+Tests cover:
+- glob semantics matching glob.glob(recursive=True)
+- Pruning of ignored directories and binary files
+- The mmap scan path for large files
+- Early termination and event-loop responsiveness
+"""
+
+import asyncio
+import glob
+import os
+import sys
+import time
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.tools import file_search
+from engine.tools.file_search import glob_files, grep_files, iter_glob, iter_grep
+
+
+@pytest.fixture
+def tree(tmp_path):
+    files = {
+        "a.py": "import os\nprint('hello')\n",
+        "b.txt": "Hello world\n",
+        "src/c.py": "def hello():\n    pass\n",
+        "src/deep/d.py": "x = 1\n",
+        "src/.hidden.py": "hello\n",
+        "node_modules/pkg/e.py": "hello\n",
+    }
+    for rel, content in files.items():
+        path = tmp_path / rel
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(content)
+    (tmp_path / "image.bin").write_bytes(b"hello\0\x01\x02")
+    return tmp_path
+
+
+class TestGlob:
+
+    @pytest.mark.parametrize("pattern", ["*.py", "**/*.py", "src/*.py", "src/**/*.py", "s?c/*", "*"])
+    def test_matches_stdlib_glob(self, tree, pattern):
+        expected = sorted(
+            p for p in glob.glob(os.path.join(str(tree), pattern), recursive=True)
+            if os.path.isfile(p) and "node_modules" not in p
+        )
+        assert sorted(iter_glob(str(tree), pattern)) == expected
+
+    def test_prunes_ignored_dirs(self, tree):
+        assert not any("node_modules" in p for p in iter_glob(str(tree), "**/*.py"))
+
+    @pytest.mark.asyncio
+    async def test_truncates_at_max_results(self, tree):
+        paths, truncated = await glob_files(str(tree), "**/*", 2)
+        assert len(paths) == 2
+        assert truncated
+
+
+class TestGrep:
+
+    def test_case_insensitive_and_skips_binaries(self, tree):
+        hits = {(os.path.relpath(f, tree), n) for f, n, _ in iter_grep(str(tree), "hello")}
+        assert hits == {("a.py", 2), ("b.txt", 1), ("src/c.py", 1), ("src/.hidden.py", 1)}
+
+    def test_file_pattern(self, tree):
+        hits = [os.path.relpath(f, tree) for f, _, _ in iter_grep(str(tree), "hello", "*.txt")]
+        assert hits == ["b.txt"]
+
+    def test_mmap_path(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(file_search, "MMAP_THRESHOLD", 1)
+        (tmp_path / "big.log").write_text("alpha\nbeta NEEDLE\ngamma\n\nneedle again")
+        hits = list(iter_grep(str(tmp_path), "needle"))
+        assert [(n, line) for _, n, line in hits] == [(2, "beta NEEDLE"), (5, "needle again")]
+
+    @pytest.mark.asyncio
+    async def test_invalid_regex_raises(self, tree):
+        import re
+        with pytest.raises(re.error):
+            await grep_files(str(tree), "(unclosed", "*", 10)
+
+    @pytest.mark.asyncio
+    async def test_early_termination_does_not_block_loop(self, tmp_path):
+        for i in range(200):
+            (tmp_path / f"f{i:03d}.txt").write_text("match\n" * 50)
+
+        ticks = 0
+
+        async def heartbeat():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0)
+
+        beat = asyncio.create_task(heartbeat())
+        t0 = time.perf_counter()
+        matches, truncated = await grep_files(str(tmp_path), "match", "*", 10)
+        beat.cancel()
+
+        assert len(matches) == 10
+        assert truncated
+        assert ticks > 0
+        assert time.perf_counter() - t0 < 5
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for change-driven hook capture
+
+Tests cover:
+- on_context_update fires only when the context actually changes
+  (last_updated alone is not a change)
+- Polling backs off while idle and resets after a change
+- request_capture() from another thread wakes the loop immediately
+- Event sources are registered on start and removed on stop, including
+  sources started by a hook that then fell back to polling
+- FileHook: watchdog file events request a capture
+"""
+
+import asyncio
+import os
+import sys
+import threading
+from datetime import datetime
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.context.hooks.base_hook import BaseHook, HookConfig
+from engine.context.hooks.file_hook import FileHook
+from engine.context.store import FileContext, HookType
+
+
+class FakeHook(BaseHook):
+    """Hook whose 'desktop' is a list of files the test edits"""
+
+    def __init__(self, config=None, event_sources=True):
+        super().__init__("fake", HookType.FILE, config)
+        self.files = ["a.txt"]
+        self.event_sources = event_sources
+        self.sources_started = False
+        self.capture_times = []
+
+    async def _connect(self, target=None):
+        return True
+
+    async def _disconnect(self):
+        return True
+
+    async def _start_event_sources(self):
+        self.sources_started = self.event_sources
+        return self.event_sources
+
+    async def _stop_event_sources(self):
+        self.sources_started = False
+
+    async def capture(self):
+        self.capture_times.append(asyncio.get_running_loop().time())
+        return FileContext(recent_files=list(self.files), last_updated=datetime.now().isoformat())
+
+    def change(self, name):
+        self.files.insert(0, name)
+        self.request_capture()
+
+
+def fast_config(**kwargs):
+    kwargs.setdefault("capture_interval", 0.02)
+    kwargs.setdefault("max_idle_interval", 0.16)
+    kwargs.setdefault("event_fallback_interval", 0.16)
+    kwargs.setdefault("idle_backoff", 2.0)
+    kwargs.setdefault("event_debounce", 0)
+    return HookConfig(**kwargs)
+
+
+async def wait_until(predicate, timeout=2.0):
+    deadline = asyncio.get_running_loop().time() + timeout
+    while not predicate():
+        assert asyncio.get_running_loop().time() < deadline, "timed out"
+        await asyncio.sleep(0.005)
+
+
+class TestDiff:
+
+    def test_only_real_changes_notify(self):
+        hook = FakeHook()
+        updates = []
+        hook.set_callbacks(on_context_update=updates.append)
+
+        assert hook._notify_context_update(FileContext(recent_files=["a"], last_updated="t1"))
+        assert not hook._notify_context_update(FileContext(recent_files=["a"], last_updated="t2"))
+        assert hook._notify_context_update(FileContext(recent_files=["b", "a"], last_updated="t3"))
+
+        assert [u.recent_files for u in updates] == [["a"], ["b", "a"]]
+        assert hook.state.context.recent_files == ["b", "a"]
+        assert hook.get_capture_stats()["unchanged"] == 1
+
+
+class TestScheduling:
+
+    @pytest.mark.asyncio
+    async def test_idle_backoff_and_reset(self):
+        hook = FakeHook(config=fast_config(), event_sources=False)
+        updates = []
+        hook.set_callbacks(on_context_update=updates.append)
+        await hook.start()
+        try:
+            await wait_until(lambda: hook._interval >= 0.16)
+            assert len(updates) == 1  # idle: captured repeatedly, notified once
+
+            captures = hook.get_capture_stats()["captures"]
+            await asyncio.sleep(0.4)
+            # at the ceiling, 0.4 s of idle costs ~2-3 captures instead of ~20
+            assert hook.get_capture_stats()["captures"] - captures <= 4
+
+            hook.files.insert(0, "b.txt")
+            await wait_until(lambda: len(updates) == 2)
+            assert hook._interval == pytest.approx(0.02)
+        finally:
+            await hook.stop()
+
+    @pytest.mark.asyncio
+    async def test_fixed_interval_when_backoff_disabled(self):
+        hook = FakeHook(config=fast_config(idle_backoff=1.0), event_sources=False)
+        await hook.start()
+        try:
+            await wait_until(lambda: len(hook.capture_times) >= 5)
+            assert hook._interval == pytest.approx(0.02)
+        finally:
+            await hook.stop()
+
+    @pytest.mark.asyncio
+    async def test_event_wakes_capture_from_other_thread(self):
+        hook = FakeHook(config=fast_config(capture_interval=0.05, idle_backoff=4.0, event_fallback_interval=60.0,
+                                           max_idle_interval=60.0))
+        updates = []
+        hook.set_callbacks(on_context_update=updates.append)
+        await hook.start()
+        try:
+            assert hook.sources_started and hook.get_capture_stats()["event_driven"]
+            await wait_until(lambda: hook._interval >= 1.0)  # backed off far beyond the test
+
+            loop = asyncio.get_running_loop()
+            sent = loop.time()
+            threading.Thread(target=hook.change, args=("b.txt",)).start()
+            await wait_until(lambda: len(updates) == 2)
+
+            assert hook.capture_times[-1] - sent < 0.5
+            assert hook.get_capture_stats()["event_wakeups"] >= 1
+        finally:
+            await hook.stop()
+        assert not hook.sources_started
+
+    @pytest.mark.asyncio
+    async def test_event_driven_can_be_disabled(self):
+        hook = FakeHook(config=fast_config(event_driven=False))
+        await hook.start()
+        try:
+            assert not hook.sources_started
+            assert not hook.get_capture_stats()["event_driven"]
+        finally:
+            await hook.stop()
+
+
+    @pytest.mark.asyncio
+    async def test_partial_event_sources_stopped(self):
+        class PartialHook(FakeHook):
+            async def _start_event_sources(self):
+                self.sources_started = True  # e.g. clipboard watcher up, file events unavailable
+                return False
+
+        hook = PartialHook(config=fast_config())
+        await hook.start()
+        try:
+            assert hook.sources_started and not hook.get_capture_stats()["event_driven"]
+        finally:
+            await hook.stop()
+        assert not hook.sources_started
+
+
+class TestFileHook:
+
+    @pytest.mark.asyncio
+    async def test_file_event_requests_capture(self, tmp_path):
+        hook = FileHook(config=fast_config(capture_interval=0.05, idle_backoff=4.0, max_idle_interval=60.0,
+                                           event_fallback_interval=60.0, extra={"live_rag_index": False}))
+        updates = []
+        hook.set_callbacks(on_context_update=updates.append)
+        await hook.start(str(tmp_path))
+        try:
+            await wait_until(lambda: hook._interval >= 1.0)
+            path = str(tmp_path / "notes.md")
+            hook._on_file_change(path, "created")
+            await wait_until(lambda: updates and updates[-1].recent_files == [path])
+        finally:
+            await hook.stop()
@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the shared HTTP client registry
+
+Tests cover:
+- Keep-alive connection reuse on the shared aiohttp session
+- Per-host limit queues excess requests and reports queue wait
+- Pool saturation stats for both clients
+- httpx client pooling (used by the Anthropic / OpenAI SDKs)
+- httpx client replaced when its event loop is closed
+- sdk_client() falls back to the SDK transport when the shared client is rejected
+- Close and lazy re-creation
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+from aiohttp import web
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine import http_clients
+from engine.http_clients import HTTPClientRegistry, sdk_client
+
+
+@pytest.fixture
+async def stub_url():
+    async def search(request):
+        await asyncio.sleep(float(request.query.get("delay", "0")))
+        return web.json_response({"results": [], "answer": "ok"})
+
+    app = web.Application()
+    app.router.add_post("/search", search)
+    runner = web.AppRunner(app)
+    await runner.setup()
+    site = web.TCPSite(runner, "127.0.0.1", 0)
+    await site.start()
+    port = site._server.sockets[0].getsockname()[1]
+    yield f"http://127.0.0.1:{port}/search"
+    await runner.cleanup()
+
+
+@pytest.fixture
+async def registry():
+    registry = HTTPClientRegistry(max_connections=10, max_per_host=2)
+    await registry.start()
+    yield registry
+    await registry.close()
+
+
+class TestSession:
+
+    @pytest.mark.asyncio
+    async def test_connections_are_reused(self, registry, stub_url):
+        for _ in range(5):
+            async with registry.session().post(stub_url, json={"query": "q"}) as resp:
+                assert (await resp.json())["answer"] == "ok"
+
+        stats = registry.get_stats()
+        assert stats["requests"] == 5
+        assert stats["connections_created"] == 1
+        assert stats["connections_reused"] == 4
+        assert stats["aiohttp"]["idle"] == 1
+        assert stats["aiohttp"]["in_use"] == 0
+
+    @pytest.mark.asyncio
+    async def test_per_host_limit_queues(self, registry, stub_url):
+        async def call():
+            async with registry.session().post(stub_url + "?delay=0.05", json={}) as resp:
+                await resp.read()
+
+        calls = asyncio.gather(*(call() for _ in range(6)))
+        await asyncio.sleep(0.025)
+        busy = registry.get_stats()["aiohttp"]
+        await calls
+
+        stats = registry.get_stats()
+        assert stats["connections_created"] == 2
+        assert stats["queued"] >= 4
+        assert stats["max_queue_wait_ms"] >= 40
+        assert busy["in_use"] == 2
+        assert busy["waiting"] == 4
+        assert busy["saturation"] == pytest.approx(0.2)
+        assert list(busy["per_host_in_use"].values()) == [2]
+
+    @pytest.mark.asyncio
+    async def test_close_and_recreate(self, registry, stub_url):
+        first = registry.session()
+        await registry.close()
+        assert first.closed
+        assert registry.get_stats()["aiohttp"] == {"open": False}
+
+        async with registry.session().post(stub_url, json={}) as resp:
+            assert resp.status == 200
+        assert registry.session() is not first
+
+
+class TestHttpx:
+
+    @pytest.mark.asyncio
+    async def test_httpx_pool_reuse(self, registry, stub_url):
+        client = registry.httpx_client()
+        assert registry.httpx_client() is client
+        for _ in range(3):
+            resp = await client.post(stub_url, json={})
+            assert resp.status_code == 200
+
+        stats = registry.get_stats()
+        assert stats["httpx_requests"] == 3
+        assert stats["httpx"]["connections"] == 1
+        assert stats["httpx"]["idle"] == 1
+        assert stats["httpx"]["waiting"] == 0
+
+    def test_httpx_client_follows_event_loop(self):
+        registry = HTTPClientRegistry()
+
+        async def get():
+            return registry.httpx_client()
+
+        first = registry.httpx_client()  # built outside a loop (sync SDK setup)
+        assert asyncio.run(get()) is first  # adopted by the first loop that uses it
+        second = asyncio.run(get())  # that loop is closed now
+        assert second is not first
+        asyncio.run(registry.close())
+
+    def test_sdk_client_fallback(self, monkeypatch):
+        monkeypatch.setattr(http_clients, "_registry", HTTPClientRegistry())
+
+        class StrictSDK:
+            def __init__(self, api_key, http_client=None):
+                if http_client is not None:
+                    raise TypeError("this SDK uses its own httpx build")
+                self.api_key = api_key
+
+        class PoolSDK:
+            def __init__(self, api_key, http_client=None):
+                self.http_client = http_client
+
+        assert sdk_client(StrictSDK, api_key="k").api_key == "k"
+        assert sdk_client(PoolSDK, api_key="k").http_client is http_clients._registry.httpx_client()
+
+    def test_installed_sdks_construct(self):
+        anthropic = pytest.importorskip("anthropic")
+        client = sdk_client(anthropic.AsyncAnthropic, api_key="test-key")
+        assert client.api_key == "test-key"
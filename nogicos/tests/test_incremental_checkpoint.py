@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for IncrementalCheckpointer
+
+Tests cover:
+- Structural diff / JSON-patch round trip over arbitrary state
+- Deltas carry only changed paths; unchanged saves write nothing
+- Compaction into a full checkpoint by count and by size
+- Restore replays only the deltas since the latest full checkpoint
+- A failed write keeps the previous base, so its changes go into the next delta
+- Screenshots are stored by reference and resolved on restore, byte for byte
+"""
+
+import base64
+import json
+import os
+import sys
+from io import BytesIO
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.incremental_checkpoint import (
+    IncrementalCheckpointer, PATCH_FORMAT, apply_patch, diff_into, snapshot,
+)
+from engine.agent.screenshot_manager import ScreenshotManager, PIL_AVAILABLE
+
+
+class MemoryTaskStore:
+    """Checkpoint rows kept in memory, in the shape AsyncTaskStore returns"""
+
+    def __init__(self):
+        self.rows = []
+
+    async def save_checkpoint(self, task_id, iteration, state, screenshot_id=None, is_full=True, state_json=None):
+        self.rows.append({
+            "task_id": task_id,
+            "iteration": iteration,
+            "state_json": state_json if state_json is not None else json.dumps(state),
+            "is_full": is_full,
+            "screenshot_id": screenshot_id,
+        })
+
+    async def get_latest_checkpoints(self, task_id):
+        rows = [r for r in self.rows if r["task_id"] == task_id]
+        full = max((i for i, r in enumerate(rows) if r["is_full"]), default=0)
+        return [
+            {"iteration": r["iteration"], "state": json.loads(r["state_json"]), "is_full": r["is_full"]}
+            for r in rows[full:]
+        ]
+
+
+def make_state(iteration, messages):
+    return {
+        "iteration": iteration,
+        "status": "running",
+        "messages": [{"role": "user", "content": f"message {i}"} for i in range(messages)],
+    }
+
+
+class TestStructuralDiff:
+
+    def test_round_trip(self):
+        old = {
+            "a": 1, "b": [1, 2, 3], "c": {"x": "y", "gone": True},
+            "d/e": "slash", "t~": [{"k": 1}], "flag": 1,
+        }
+        new = {
+            "a": 2, "b": [1, 5], "c": {"x": "y", "new": [1]},
+            "d/e": "changed", "t~": [{"k": 1}, {"k": 2}], "flag": True, "added": None,
+        }
+        mirror = snapshot(old)
+        ops = []
+        diff_into(mirror, new, "", ops)
+        assert mirror == new
+
+        encoded = [{"op": op, "path": path, "value": value} for op, path, value in ops]
+        assert apply_patch(snapshot(old), json.loads(json.dumps(encoded))) == new
+        # bool vs int is a change even though 1 == True
+        assert ("replace", "/flag", True) in ops
+
+    def test_caller_mutation_is_detected(self):
+        state = make_state(1, 2)
+        mirror = snapshot(state)
+        state["messages"][0]["content"] = "edited"
+        state["messages"].append({"role": "assistant", "content": "hi"})
+        ops = []
+        diff_into(mirror, state, "", ops)
+        assert [(op, path) for op, path, _ in ops] == [
+            ("replace", "/messages/0/content"),
+            ("add", "/messages/2"),
+        ]
+
+
+class TestCheckpointer:
+
+    @pytest.mark.asyncio
+    async def test_deltas_and_restore(self):
+        store = MemoryTaskStore()
+        checkpointer = IncrementalCheckpointer(store, store_screenshots=False, compact_ratio=100)
+        for i in range(1, 6):
+            await checkpointer.save("t1", make_state(i, i * 3))
+        await checkpointer.save("t1", make_state(5, 15))  # unchanged
+
+        assert [r["is_full"] for r in store.rows] == [True, False, False, False, False]
+        delta = json.loads(store.rows[1]["state_json"])
+        assert delta["format"] == PATCH_FORMAT
+        assert {op["path"] for op in delta["ops"]} == {"/iteration", "/messages/3", "/messages/4", "/messages/5"}
+        assert checkpointer.get_stats()["unchanged"] == 1
+
+        restored = await IncrementalCheckpointer(store, store_screenshots=False).restore("t1")
+        assert restored == make_state(5, 15)
+
+    @pytest.mark.asyncio
+    async def test_compaction_by_count(self):
+        store = MemoryTaskStore()
+        checkpointer = IncrementalCheckpointer(store, store_screenshots=False, max_deltas=3, compact_ratio=100)
+        for i in range(1, 9):
+            await checkpointer.save("t1", make_state(i, i))
+
+        assert [r["is_full"] for r in store.rows] == [True, False, False, False, True, False, False, False]
+        assert checkpointer.get_stats()["compactions"] == 1
+        assert len(await store.get_latest_checkpoints("t1")) == 4
+        assert await IncrementalCheckpointer(store).restore("t1") == make_state(8, 8)
+
+    @pytest.mark.asyncio
+    async def test_compaction_by_size(self):
+        store = MemoryTaskStore()
+        checkpointer = IncrementalCheckpointer(store, store_screenshots=False, max_deltas=100, compact_ratio=0.5)
+        await checkpointer.save("t1", make_state(1, 20))
+        await checkpointer.save("t1", make_state(2, 21))
+        await checkpointer.save("t1", make_state(3, 40))
+
+        assert [r["is_full"] for r in store.rows] == [True, False, True]
+        assert await IncrementalCheckpointer(store).restore("t1") == make_state(3, 40)
+
+    @pytest.mark.asyncio
+    async def test_failed_write_keeps_base(self):
+        class FlakyStore(MemoryTaskStore):
+            fail = False
+
+            async def save_checkpoint(self, *args, **kwargs):
+                if self.fail:
+                    raise OSError("disk full")
+                await super().save_checkpoint(*args, **kwargs)
+
+        store = FlakyStore()
+        checkpointer = IncrementalCheckpointer(store, store_screenshots=False, compact_ratio=100)
+        await checkpointer.save("t1", make_state(1, 2))
+        store.fail = True
+        with pytest.raises(OSError):
+            await checkpointer.save("t1", make_state(2, 3))
+        store.fail = False
+        await checkpointer.save("t1", make_state(3, 4))
+
+        delta = json.loads(store.rows[-1]["state_json"])
+        assert {op["path"] for op in delta["ops"]} == {"/iteration", "/messages/2", "/messages/3"}
+        assert await IncrementalCheckpointer(store).restore("t1") == make_state(3, 4)
+
+    @pytest.mark.asyncio
+    async def test_failed_first_write_is_retried_in_full(self):
+        class FailOnceStore(MemoryTaskStore):
+            failed = False
+
+            async def save_checkpoint(self, *args, **kwargs):
+                if not self.failed:
+                    self.failed = True
+                    raise OSError("disk full")
+                await super().save_checkpoint(*args, **kwargs)
+
+        store = FailOnceStore()
+        checkpointer = IncrementalCheckpointer(store, store_screenshots=False)
+        with pytest.raises(OSError):
+            await checkpointer.save("t1", make_state(1, 2))
+        await checkpointer.save("t1", make_state(1, 2))
+        assert [r["is_full"] for r in store.rows] == [True]
+
+    @pytest.mark.asyncio
+    async def test_legacy_deltas_still_restore(self):
+        store = MemoryTaskStore()
+        await store.save_checkpoint("t1", 1, {"iteration": 1, "messages": [{"role": "user", "content": "a"}]})
+        await store.save_checkpoint("t1", 2, {
+            "new_messages": [{"role": "assistant", "content": "b"}], "iteration": 2, "status": "running",
+        }, is_full=False)
+        restored = await IncrementalCheckpointer(store).restore("t1")
+        assert restored["iteration"] == 2
+        assert [m["content"] for m in restored["messages"]] == ["a", "b"]
+
+
+@pytest.mark.skipif(not PIL_AVAILABLE, reason="Pillow not installed")
+class TestScreenshotReferences:
+
+    @staticmethod
+    def screenshot_block(seed):
+        from PIL import Image
+        rng = __import__("random").Random(seed)
+        buf = BytesIO()
+        Image.frombytes("RGB", (64, 48), bytes(rng.randrange(256) for _ in range(64 * 48 * 3))).save(buf, format="PNG")
+        return {"type": "image", "source": {
+            "type": "base64", "media_type": "image/png", "data": base64.b64encode(buf.getvalue()).decode(),
+        }}
+
+    @pytest.mark.asyncio
+    async def test_screenshots_stored_by_reference(self):
+        store = MemoryTaskStore()
+        manager = ScreenshotManager()
+        checkpointer = IncrementalCheckpointer(store, screenshot_manager=manager)
+
+        state = make_state(1, 1)
+        first = self.screenshot_block(1)
+        state["messages"].append({"role": "user", "content": [
+            {"type": "tool_result", "tool_use_id": "t", "content": [first]},
+        ]})
+        await checkpointer.save("t1", state)
+        second = self.screenshot_block(2)
+        state["messages"].append({"role": "user", "content": [second]})
+        state["iteration"] = 2
+        await checkpointer.save("t1", state)
+
+        written = "".join(r["state_json"] for r in store.rows)
+        assert first["source"]["data"] not in written
+        assert second["source"]["data"] not in written
+        assert "/api/screenshots/" in written
+        assert store.rows[-1]["screenshot_id"] is not None
+        assert checkpointer.get_stats()["screenshots_stored"] == 2
+
+        restored = await IncrementalCheckpointer(store, screenshot_manager=manager).restore("t1")
+        assert restored == state
+
+    @pytest.mark.asyncio
+    async def test_similar_screenshots_restore_exactly(self):
+        from PIL import Image, ImageDraw
+
+        def login(name):
+            img = Image.new("RGB", (1280, 800), "white")
+            ImageDraw.Draw(img).text((100, 100), f"Username: {name}", fill="black")
+            buf = BytesIO()
+            img.save(buf, format="PNG")
+            return {"type": "image", "source": {
+                "type": "base64", "media_type": "image/png", "data": base64.b64encode(buf.getvalue()).decode(),
+            }}
+
+        store = MemoryTaskStore()
+        manager = ScreenshotManager()
+        checkpointer = IncrementalCheckpointer(store, screenshot_manager=manager)
+        state = make_state(1, 0)
+        state["messages"] = [{"role": "user", "content": [login("alice"), login("bob")]}]
+        await checkpointer.save("t1", state)
+
+        restored = await IncrementalCheckpointer(store, screenshot_manager=manager).restore("t1")
+        assert restored == state
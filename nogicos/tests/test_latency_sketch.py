@@ -0,0 +1,155 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the streaming latency sketches
+
+Tests cover:
+- DDSketch quantiles stay within the configured relative accuracy
+- Merging sketches matches recording into one sketch
+- Bucket count is bounded
+- Time windows rotate with the clock
+- Export / merge across processes
+- check_slo evaluates the configured window only
+"""
+
+import json
+import os
+import random
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.observability.metrics import (
+    DDSketch, LatencyHistogram, PerformanceMetrics, WindowedSketch,
+)
+from engine.config import PerformanceSLO
+
+
+class FakeClock:
+
+    def __init__(self, now=1_000_000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def exact_quantile(values, q):
+    ordered = sorted(values)
+    return ordered[int(q * (len(ordered) - 1))]
+
+
+class TestDDSketch:
+
+    def test_relative_accuracy(self):
+        rng = random.Random(7)
+        values = [rng.lognormvariate(3, 1.2) for _ in range(20000)]
+        sketch = DDSketch(relative_accuracy=0.01)
+        for v in values:
+            sketch.add(v)
+
+        for q in (0.5, 0.9, 0.99, 0.999):
+            expected = exact_quantile(values, q)
+            assert abs(sketch.quantile(q) - expected) <= expected * 0.02
+        assert sketch.count == len(values)
+        assert sketch.quantile(0) == min(values)
+        assert sketch.quantile(1) == max(values)
+
+    def test_merge_matches_single_sketch(self):
+        rng = random.Random(1)
+        values = [rng.uniform(0, 500) for _ in range(5000)]
+        whole, left, right = DDSketch(), DDSketch(), DDSketch()
+        for i, v in enumerate(values):
+            whole.add(v)
+            (left if i % 2 else right).add(v)
+
+        merged = left.merge(right)
+        assert merged.bins == whole.bins
+        assert merged.count == whole.count
+        assert merged.quantile(0.99) == whole.quantile(0.99)
+
+        with pytest.raises(ValueError):
+            DDSketch(0.01).merge(DDSketch(0.05))
+
+    def test_bounded_buckets(self):
+        sketch = DDSketch(relative_accuracy=0.01, max_buckets=64)
+        for exponent in range(-3, 9):
+            for step in range(100):
+                sketch.add(10 ** exponent * (1 + step / 10))
+        assert len(sketch.bins) <= 64
+        assert sketch.quantile(0.99) == pytest.approx(exact_quantile(
+            [10 ** e * (1 + s / 10) for e in range(-3, 9) for s in range(100)], 0.99), rel=0.02)
+
+    def test_serialization_round_trip(self):
+        sketch = DDSketch()
+        for v in (0, 1.5, 20, 300):
+            sketch.add(v)
+        restored = DDSketch.from_dict(json.loads(json.dumps(sketch.to_dict())))
+        assert restored.bins == sketch.bins
+        assert restored.zero_count == 1
+        assert restored.quantile(0.5) == sketch.quantile(0.5)
+
+
+class TestWindows:
+
+    def test_rotation(self):
+        clock = FakeClock()
+        sketch = WindowedSketch(clock=clock)
+        for _ in range(10):
+            sketch.record(1000)
+        clock.now += 120
+        for _ in range(10):
+            sketch.record(10)
+
+        assert sketch.window("1m").count == 10
+        assert sketch.window("1m").quantile(0.99) == pytest.approx(10, rel=0.01)
+        assert sketch.window("5m").count == 20
+        assert sketch.window("all").count == 20
+
+        clock.now += 3600
+        assert sketch.window("5m").count == 0
+        assert sketch.window("1h").count == 0
+        assert sketch.window().count == 20
+
+    def test_cross_process_merge(self):
+        clock = FakeClock()
+        a, b = LatencyHistogram("tool", clock=clock), LatencyHistogram("tool", clock=clock)
+        for i in range(100):
+            a.record(i)
+            b.record(i + 100)
+
+        a.merge(LatencyHistogram.from_export(json.loads(json.dumps(b.export())), clock=clock))
+        assert a.count == 200
+        assert a.percentile(50) == pytest.approx(100, rel=0.02)
+        assert a.to_dict()["windows"]["1m"]["count"] == 200
+
+
+class TestCheckSLO:
+
+    def test_only_recent_window_is_evaluated(self):
+        clock = FakeClock()
+        metrics = PerformanceMetrics(slo_window="5m", clock=clock)
+        slo = PerformanceSLO()
+        for _ in range(50):
+            metrics.record_tool_call("click", slo.tool_execution_p99_ms * 10, success=True)
+        assert metrics.check_slo(slo)["click_p99"] is False
+
+        clock.now += 600
+        for _ in range(50):
+            metrics.record_tool_call("click", 1, success=True)
+        assert metrics.check_slo(slo)["click_p99"] is True
+        assert metrics.check_slo(slo, window="all")["click_p99"] is False
+
+    def test_merge_export(self):
+        main, worker = PerformanceMetrics(), PerformanceMetrics()
+        worker.record_tool_call("type", 5, success=False)
+        worker.record_llm_call(800)
+        main.merge_export(json.loads(json.dumps(worker.export())))
+
+        summary = main.get_summary()
+        assert summary["tool_calls"] == 1
+        assert summary["tool_errors"] == 1
+        assert summary["tool_latencies"]["type"]["count"] == 1
+        assert summary["llm_latency"]["p50"] == pytest.approx(800, rel=0.01)
@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for LLMClient call timing
+
+Tests cover:
+- TTFT, time to message_start, inter-token gaps and tokens/s from a stream
+- Cache state tagging (hit / write / miss)
+- Retry and backoff time, and fallback to non-streaming
+- Aggregation into PerformanceMetrics by model and cache state
+- ReActAgent stream calls (which bypass LLMClient) reach the same summary
+"""
+
+import asyncio
+import os
+import sys
+import time
+from types import SimpleNamespace
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.llm_client import LLMClient, LLMConfig
+from engine.agent.types import CallTiming, Message
+from engine.observability.metrics import PerformanceMetrics, set_metrics
+
+
+def usage(output_tokens=5, cache_read=0, cache_write=0):
+    return SimpleNamespace(
+        input_tokens=100, output_tokens=output_tokens,
+        cache_read_input_tokens=cache_read, cache_creation_input_tokens=cache_write,
+    )
+
+
+def text_delta(text):
+    return SimpleNamespace(type="content_block_delta", delta=SimpleNamespace(text=text))
+
+
+class FakeStream:
+
+    def __init__(self, script, final_usage):
+        self.script = script
+        self.final_usage = final_usage
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    async def __aiter__(self):
+        for delay, event in self.script:
+            await asyncio.sleep(delay)
+            yield event
+
+    async def get_final_message(self):
+        return SimpleNamespace(usage=self.final_usage)
+
+
+class FakeMessages:
+
+    def __init__(self, streams, fail_first=0):
+        self.streams = streams
+        self.fail_first = fail_first
+        self.calls = 0
+
+    def stream(self, **kwargs):
+        self.calls += 1
+        if self.calls <= self.fail_first:
+            raise asyncio.TimeoutError()
+        return self.streams.pop(0)
+
+    async def create(self, **kwargs):
+        return SimpleNamespace(
+            content=[SimpleNamespace(type="text", text="fallback")],
+            stop_reason="end_turn", usage=usage(output_tokens=3),
+        )
+
+
+def make_client(messages, **config):
+    client = LLMClient(LLMConfig(api_key="test", model="test-model", retry_delay=0.02, **config))
+    client._client = SimpleNamespace(messages=messages)
+    client._initialized = True
+    return client
+
+
+def script(ttfb=0.02, prefill=0.03, tokens=5, gap=0.01):
+    events = [(ttfb, SimpleNamespace(type="message_start", message=SimpleNamespace(usage=usage())))]
+    events.append((prefill, text_delta("t0")))
+    events += [(gap, text_delta(f"t{i}")) for i in range(1, tokens)]
+    return events
+
+
+@pytest.fixture
+def metrics():
+    metrics = PerformanceMetrics()
+    set_metrics(metrics)
+    yield metrics
+    set_metrics(None)
+
+
+class TestStreamTiming:
+
+    @pytest.mark.asyncio
+    async def test_stream_phases(self, metrics):
+        messages = FakeMessages([FakeStream(script(), usage(output_tokens=5, cache_read=80))])
+        response = await make_client(messages).stream([Message.user("hi")], "system")
+
+        timing = response.timing
+        assert response.content == "t0t1t2t3t4"
+        assert timing.cache == "hit"
+        assert timing.attempts == 1 and timing.retry_ms < 5
+        assert 15 <= timing.queue_ms < timing.ttft_ms
+        assert timing.ttft_ms >= 45
+        assert len(timing.inter_token_ms) == 4
+        assert timing.generation_ms >= 35
+        assert 0 < timing.tokens_per_second <= 101
+
+        [stats] = metrics.get_llm_summary()["calls"]
+        assert (stats["model"], stats["cache"], stats["calls"]) == ("test-model", "hit", 1)
+        assert stats["inter_token_ms"]["count"] == 4
+        assert stats["bound"] in ("generation", "queueing")
+        assert metrics.get_summary()["llm_latency"]["count"] == 1
+
+    @pytest.mark.asyncio
+    async def test_retry_time_and_cache_tags(self, metrics):
+        messages = FakeMessages([
+            FakeStream(script(tokens=2), usage(cache_write=50)),
+            FakeStream(script(tokens=2), usage()),
+        ], fail_first=1)
+        client = make_client(messages)
+        first = await client.stream([Message.user("a")], "system")
+        second = await client.stream([Message.user("b")], "system")
+
+        assert first.timing.attempts == 2
+        assert first.timing.retry_ms >= 15
+        assert (first.timing.cache, second.timing.cache) == ("write", "miss")
+        summary = {s["cache"]: s for s in metrics.get_llm_summary()["calls"]}
+        assert set(summary) == {"write", "miss"}
+        assert summary["write"]["retried_calls"] == 1
+
+    @pytest.mark.asyncio
+    async def test_fallback_counts_stream_time_as_retry(self, metrics):
+        messages = FakeMessages([], fail_first=99)
+        response = await make_client(messages, max_retries=2).stream([Message.user("a")], "system")
+
+        assert response.is_fallback and response.content == "fallback"
+        assert response.timing.fallback and not response.timing.streaming
+        assert response.timing.retry_ms >= 15
+        [stats] = metrics.get_llm_summary()["calls"]
+        assert stats["fallbacks"] == 1
+        assert stats["streaming_calls"] == 0
+
+
+class TestAgentStreamTiming:
+
+    def test_agent_stream_recorded(self, metrics):
+        from engine.agent.react_agent import ReActAgent
+
+        started = time.perf_counter() - 0.3
+        timing = CallTiming(model="agent-model", queue_ms=50.0, inter_token_ms=[10.0, 10.0])
+        response = SimpleNamespace(usage=usage(output_tokens=3, cache_write=40))
+        ReActAgent._record_llm_timing(None, timing, started, started + 0.1, started + 0.12, response)
+
+        assert timing.total_ms >= 300
+        assert 99 <= timing.ttft_ms <= 101
+        assert (timing.cache, timing.output_tokens) == ("write", 3)
+        [stats] = metrics.get_llm_summary()["calls"]
+        assert (stats["model"], stats["cache"], stats["calls"]) == ("agent-model", "write", 1)
@@ -458,6 +458,164 @@ class TestSemanticSearch:
         assert isinstance(result, str)
 
 
+class TestMemoryVectorIndex:
+    """Tests for the persistent vector index behind search_memories"""
+    
+    @pytest.fixture
+    def embedded_store(self, tmp_path, monkeypatch):
+        """Store with a deterministic fake embedding function"""
+        np = pytest.importorskip("numpy")
+        from engine.knowledge.store import SemanticMemoryStore
+        
+        store = SemanticMemoryStore(db_path=str(tmp_path / "memory.db"))
+        
+        async def fake_embedding(text):
+            rng = np.random.default_rng(abs(hash(text.split()[-1])) % (2 ** 32))
+            return rng.standard_normal(store.EMBEDDING_DIM).tolist()
+        
+        monkeypatch.setattr(store, "get_embedding", fake_embedding)
+        return store
+    
+    @pytest.mark.asyncio
+    async def test_search_uses_index(self, embedded_store):
+        """Exact match ranks first and scores match cosine similarity"""
+        await embedded_store.add_memory("user", "likes", "python", session_id="s1")
+        await embedded_store.add_memory("user", "uses", "vim", session_id="s1")
+        await embedded_store.add_memory("user", "owns", "python", session_id="s2")
+        
+        results = await embedded_store.search_memories("python", session_id="s1", threshold=0.5)
+        
+        assert len(results) == 1
+        assert results[0]["object"] == "python"
+        assert results[0]["score"] == pytest.approx(1.0, abs=1e-5)
+        assert "embedding" not in results[0]
+        assert embedded_store.get_stats()["vector_index"]["vectors"] == 3
+    
+    @pytest.mark.asyncio
+    async def test_delete_and_supersede_update_index(self, embedded_store):
+        """Deleted and superseded memories drop out of the index"""
+        id1 = await embedded_store.add_memory("user", "prefers", "light", session_id="s1")
+        await embedded_store.add_memory("user", "prefers", "dark", session_id="s1")
+        id3 = await embedded_store.add_memory("user", "uses", "python", session_id="s1")
+        embedded_store.delete_memory(id3)
+        
+        assert (await embedded_store.search_memories("python", session_id="s1")) == []
+        assert (await embedded_store.search_memories("light", session_id="s1")) == []
+        results = await embedded_store.search_memories("dark", session_id="s1")
+        assert [r["object"] for r in results] == ["dark"]
+        assert id1 not in embedded_store._vector_index
+    
+    @pytest.mark.asyncio
+    async def test_index_persists_and_rebuilds(self, embedded_store, tmp_path):
+        """Index reloads from disk and is rebuilt when missing"""
+        from engine.knowledge.store import SemanticMemoryStore
+        
+        await embedded_store.add_memory("user", "likes", "python", session_id="s1")
+        await embedded_store.add_memory("user", "uses", "vim", session_id="s1")
+        embedded_store._vector_index.close()
+        
+        reopened = SemanticMemoryStore(db_path=str(tmp_path / "memory.db"))
+        assert len(await reopened._get_vector_index()) == 2
+        reopened._vector_index.close()
+        
+        os.remove(tmp_path / "memory.vec")
+        rebuilt = SemanticMemoryStore(db_path=str(tmp_path / "memory.db"))
+        rebuilt.get_embedding = embedded_store.get_embedding
+        results = await rebuilt.search_memories("vim", session_id="s1")
+        assert results[0]["object"] == "vim"
+    
+    @pytest.mark.asyncio
+    async def test_edit_with_same_count_rebuilds(self, embedded_store, tmp_path):
+        """An embedding replaced outside the store is picked up on open"""
+        from engine.knowledge.store import SemanticMemoryStore
+        
+        memory_id = await embedded_store.add_memory("user", "likes", "python", session_id="s1")
+        await embedded_store.add_memory("user", "uses", "vim", session_id="s1")
+        embedded_store._vector_index.close()
+        
+        rust = await embedded_store.get_embedding("rust")
+        with embedded_store._get_connection() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO memory_embeddings (memory_id, embedding, model, created_at) "
+                "VALUES (?, ?, 'test', ?)",
+                (memory_id, embedded_store._embedding_to_bytes(rust), datetime.now().isoformat()),
+            )
+            conn.commit()
+        
+        reopened = SemanticMemoryStore(db_path=str(tmp_path / "memory.db"))
+        reopened.get_embedding = embedded_store.get_embedding
+        results = await reopened.search_memories("rust", session_id="s1", threshold=0.5)
+        assert [r["id"] for r in results] == [memory_id]
+    
+    @pytest.mark.asyncio
+    async def test_skipped_embeddings_do_not_force_rebuild(self, embedded_store, tmp_path, monkeypatch):
+        """Zero-norm embeddings are counted, not re-detected as staleness on every open"""
+        from engine.knowledge.store import SemanticMemoryStore
+        from engine.knowledge.vector_index import MemoryVectorIndex
+        
+        await embedded_store.add_memory("user", "likes", "python", session_id="s1")
+        real_embedding = embedded_store.get_embedding
+        
+        async def zero_embedding(text):
+            return [0.0] * embedded_store.EMBEDDING_DIM
+        
+        embedded_store.get_embedding = zero_embedding
+        await embedded_store.add_memory("user", "uses", "vim", session_id="s1")
+        assert embedded_store.get_stats()["vector_index"] == {"mode": "flat", "vectors": 1, "skipped": 1}
+        embedded_store._vector_index.close()
+        
+        rebuilds = []
+        monkeypatch.setattr(MemoryVectorIndex, "rebuild", lambda self, items: rebuilds.append(1))
+        reopened = SemanticMemoryStore(db_path=str(tmp_path / "memory.db"))
+        reopened.get_embedding = real_embedding
+        assert len(await reopened._get_vector_index()) == 1
+        assert reopened._vector_index.skipped == 1
+        assert rebuilds == []
+    
+    def test_index_grows_and_compacts(self, tmp_path, monkeypatch):
+        """Capacity doubles on overflow and dead rows are compacted away"""
+        np = pytest.importorskip("numpy")
+        from engine.knowledge.vector_index import MemoryVectorIndex
+        
+        monkeypatch.setattr(MemoryVectorIndex, "INITIAL_CAPACITY", 4)
+        index = MemoryVectorIndex(str(tmp_path / "idx"), dim=8)
+        vectors = np.eye(8, dtype=np.float32)
+        for i in range(8):
+            index.add(f"m{i}", "s", vectors[i] * (i + 1))
+        assert len(index) == 8
+        assert index._capacity == 8
+        
+        for i in range(5):
+            index.remove(f"m{i}")
+        assert len(index) == 3
+        assert index._count == 3  # compacted
+        
+        hits = index.search(vectors[6], "s", limit=2)
+        assert hits[0] == ("m6", pytest.approx(1.0))
+
+    
+    def test_hnsw_session_shortfall_falls_back_to_exact(self, tmp_path):
+        """A small session crowded out of the HNSW neighbours is still found"""
+        np = pytest.importorskip("numpy")
+        from engine.knowledge.vector_index import MemoryVectorIndex
+        
+        index = MemoryVectorIndex(str(tmp_path / "idx"), dim=8)
+        query = np.ones(8, dtype=np.float32)
+        for i in range(10):
+            index.add(f"big{i}", "big", query + np.eye(8, dtype=np.float32)[i % 8] * 0.1)
+        index.add("mine", "small", np.eye(8, dtype=np.float32)[0])
+        
+        class ExactGraph:
+            def knn_query(self, q, k):
+                scores = index._matrix[:index._count] @ q[0]
+                order = np.argsort(-scores)[:k]
+                return [order], [1.0 - scores[order]]
+        
+        index._hnsw = ExactGraph()
+        hits = index.search(query, "small", limit=1)
+        assert [memory_id for memory_id, _ in hits] == ["mine"]
+        assert len(index.search(query, "big", limit=3)) == 3
+
 # Run with: pytest tests/test_memory.py -v
 if __name__ == "__main__":
     pytest.main([__file__, "-v", "-x"])
@@ -0,0 +1,250 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the OCR result cache
+
+Tests cover:
+- OCRCache: LRU bound, single-flight for concurrent lookups (per event loop),
+  failed runs not cached
+- OCRExtractor.extract(): pixel-identical images reuse the cached result
+- Keys separate engines and languages
+- Tiled extraction: only the bands that changed are re-OCRed, and text the
+  engine returned without regions is kept
+- ScreenshotOCR.recognize(): hook OCR goes through the same cache
+- Hit rates are exposed through PerformanceMetrics
+"""
+
+import asyncio
+import base64
+import os
+import sys
+import threading
+from io import BytesIO
+
+import pytest
+from PIL import Image, ImageDraw
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.vision.ocr import OCRExtractor, OCRResult, TextRegion
+from engine.context.hooks import ocr_utils
+from engine.observability.metrics import PerformanceMetrics
+from engine.ocr_cache import OCRCache, make_ocr_key
+
+
+class FakeExtractor(OCRExtractor):
+    """Reads "text lines": 20px bars drawn at x < 10, gray value = line number"""
+
+    def __init__(self, engine="fake", drop=(), **kwargs):
+        super().__init__(**kwargs)
+        self._engine_name = engine
+        self.drop = set(drop)  # lines read as text but missing from regions (like conf <= 0)
+        self.calls = []
+
+    async def _run_engine(self, image, detect_regions):
+        self.calls.append(image.size)
+        gray = image.convert("L")
+        regions, start = [], None
+        for y in range(image.height + 1):
+            value = gray.getpixel((0, y)) if y < image.height else 0
+            if value and start is None:
+                start = y
+            elif not value and start is not None:
+                line = gray.getpixel((0, start))
+                regions.append(TextRegion(text=f"line{line}", bbox=(0, start, 10, y)))
+                start = None
+        return OCRResult(
+            full_text="\n".join(r.text for r in regions),
+            regions=[r for r in regions if r.text not in self.drop] if detect_regions else [],
+            engine=self._engine_name,
+        )
+
+
+def screenshot(lines, height=1000):
+    image = Image.new("L", (64, height))
+    draw = ImageDraw.Draw(image)
+    for value, y in lines:
+        draw.rectangle((0, y, 9, y + 19), fill=value)
+    return image
+
+
+def encode(image):
+    buffer = BytesIO()
+    image.save(buffer, format="PNG")
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+@pytest.fixture
+def metrics():
+    return PerformanceMetrics()
+
+
+@pytest.fixture
+def cache(metrics):
+    return OCRCache(max_entries=64, metrics=metrics)
+
+
+class TestOCRCache:
+
+    @pytest.mark.asyncio
+    async def test_lru_bound(self, cache):
+        cache.max_entries = 2
+        for name in ("a", "b", "c"):
+            cache.put(name, name.upper())
+        assert cache.get("a") is None
+        assert cache.get("c") == "C"
+        assert cache.get_stats()["entries"] == 2
+
+    @pytest.mark.asyncio
+    async def test_single_flight(self, cache):
+        runs = []
+
+        async def compute():
+            runs.append(1)
+            await asyncio.sleep(0.01)
+            return "text"
+
+        results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+        assert runs == [1]
+        assert [value for value, _ in results] == ["text"] * 5
+        assert sorted(hit for _, hit in results) == [False, True, True, True, True]
+
+    @pytest.mark.asyncio
+    async def test_single_flight_is_per_event_loop(self, cache):
+        started, release = threading.Event(), threading.Event()
+
+        async def slow():
+            started.set()
+            await asyncio.to_thread(release.wait, 2)
+            return "other loop"
+
+        thread = threading.Thread(target=lambda: asyncio.run(cache.get_or_compute("k", slow)))
+        thread.start()
+        try:
+            assert started.wait(2)
+
+            async def compute():
+                return "this loop"
+
+            assert await cache.get_or_compute("k", compute) == ("this loop", False)
+        finally:
+            release.set()
+            thread.join(2)
+
+    @pytest.mark.asyncio
+    async def test_failures_are_not_cached(self, cache):
+        async def fail():
+            raise RuntimeError("engine crashed")
+
+        async def empty():
+            return []
+
+        with pytest.raises(RuntimeError):
+            await cache.get_or_compute("k", fail)
+        await cache.get_or_compute("k", empty, cacheable=bool)
+        assert cache.get_stats()["entries"] == 0
+
+
+class TestExtract:
+
+    @pytest.mark.asyncio
+    async def test_identical_pixels_hit(self, cache, metrics):
+        extractor = FakeExtractor(cache=cache)
+        image = encode(screenshot([(50, 100)], height=200))
+
+        first = await extractor.extract(image)
+        second = await extractor.extract(image)
+        assert len(extractor.calls) == 1
+        assert not first.cached and second.cached
+        assert second.full_text == "line50"
+
+        second.regions.clear()  # callers get copies
+        assert len((await extractor.extract(image)).regions) == 1
+
+        await extractor.extract(encode(screenshot([(60, 100)], height=200)))
+        assert len(extractor.calls) == 2
+
+        summary = metrics.get_ocr_summary()
+        assert summary["sources"]["extract"]["hits"] == 2
+        assert summary["sources"]["extract"]["hit_rate"] == 0.5
+        assert summary["latency"]["count"] == 2
+
+    @pytest.mark.asyncio
+    async def test_keys_separate_engine_and_language(self, cache):
+        image = encode(screenshot([(50, 100)], height=200))
+        english = FakeExtractor(cache=cache, languages=["en"])
+        chinese = FakeExtractor(cache=cache, languages=["zh"])
+        other = FakeExtractor(engine="other", cache=cache, languages=["en"])
+        for extractor in (english, chinese, other, english):
+            await extractor.extract(image)
+        assert (len(english.calls), len(chinese.calls), len(other.calls)) == (1, 1, 1)
+        assert make_ocr_key("e", ["en", "zh"], "d") != make_ocr_key("e", ["en"], "d")
+
+
+class TestTiled:
+
+    @pytest.mark.asyncio
+    async def test_only_changed_bands_are_reocred(self, cache):
+        extractor = FakeExtractor(cache=cache, tile_height=256, tile_overlap=32)
+        # 245 straddles the first band boundary, 900 sits in the last band
+        lines = [(10, 40), (20, 245), (30, 500), (40, 900)]
+
+        first = await extractor.extract(encode(screenshot(lines)), tiled=True)
+        assert first.full_text == "line10\nline20\nline30\nline40"
+        assert [r.bbox[1] for r in first.regions] == [40, 245, 500, 900]
+        assert (first.tiles, first.tiles_reused) == (4, 0)
+
+        extractor.calls.clear()
+        changed = await extractor.extract(encode(screenshot(lines[:3] + [(41, 900)])), tiled=True)
+        assert changed.full_text == "line10\nline20\nline30\nline41"
+        assert (changed.tiles, changed.tiles_reused) == (4, 3)
+        assert extractor.calls == [(64, 1000 - 768 + 32)]
+
+        again = await extractor.extract(encode(screenshot(lines[:3] + [(41, 900)])), tiled=True)
+        assert again.cached
+        assert cache.get_stats()["sources"]["tile"]["hits"] == 7
+
+    @pytest.mark.asyncio
+    async def test_text_without_regions_is_kept(self, cache):
+        extractor = FakeExtractor(cache=cache, drop={"line30"}, tile_height=256, tile_overlap=32)
+        lines = [(10, 40), (20, 245), (30, 500), (40, 900)]
+
+        result = await extractor.extract(encode(screenshot(lines)), tiled=True)
+        assert result.full_text == "line10\nline20\nline30\nline40"
+        assert [r.text for r in result.regions] == ["line10", "line20", "line40"]
+
+    @pytest.mark.asyncio
+    async def test_small_images_are_not_tiled(self, cache):
+        extractor = FakeExtractor(cache=cache)
+        result = await extractor.extract(encode(screenshot([(10, 40)], height=200)), tiled=True)
+        assert result.tiles == 0
+        assert extractor.calls == [(64, 200)]
+
+
+class TestScreenshotOCR:
+
+    @pytest.mark.asyncio
+    async def test_recognize_is_cached(self, cache):
+        class Engine(ocr_utils.OCREngine):
+            def __init__(self):
+                super().__init__()
+                self._available = True
+                self.calls = 0
+
+            async def recognize(self, image_data):
+                self.calls += 1
+                return [ocr_utils.OCRResult(text="https://example.com", confidence=0.9)]
+
+        engine = Engine()
+        ocr = ocr_utils.ScreenshotOCR(cache=cache)
+        ocr._engines = [engine]
+
+        first = await ocr.recognize(b"address-bar-pixels")
+        first.clear()
+        second = await ocr.recognize(b"address-bar-pixels")
+        assert engine.calls == 1
+        assert second[0].text == "https://example.com"
+
+        await ocr.recognize(b"other-pixels")
+        assert engine.calls == 2
+        assert cache.get_stats()["sources"]["recognize"]["hit_rate"] == pytest.approx(1 / 3)
@@ -0,0 +1,133 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for PlanCache
+
+Tests cover:
+- Exact and semantic lookup through the index backend
+- LRU size cap and TTL eviction
+- Hit/miss/latency counters in get_stats
+- Re-embedding plans stored by a different embedder
+"""
+
+import os
+import sys
+import time
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.plan_cache import (
+    PlanCache, PlanEmbedder, KeywordPlanEmbedder,
+    MatrixPlanIndex, LinearPlanIndex, NUMPY_AVAILABLE,
+)
+
+
+STEPS = [{"tool": "list_directory", "args": {"path": "."}}]
+
+
+@pytest.fixture
+def cache(tmp_path):
+    return PlanCache(db_path=str(tmp_path / "plans.db"), max_plans=100, ttl_seconds=0)
+
+
+class TestPlanCacheLookup:
+    """Exact and semantic matching"""
+
+    def test_exact_match(self, cache):
+        cache.cache_plan("List files in downloads", STEPS, 2.0)
+        plan, score = cache.find_similar("  list files in Downloads ")
+        assert score == 1.0
+        assert plan.task == "List files in downloads"
+
+    def test_semantic_match(self, cache):
+        cache.cache_plan("show all files in this folder", STEPS, 2.0)
+        cache.cache_plan("click the submit button", STEPS, 1.0)
+
+        result = cache.find_similar("display every document in current directory", threshold=0.8)
+        assert result is not None
+        assert result[0].task == "show all files in this folder"
+
+    def test_miss_below_threshold(self, cache):
+        cache.cache_plan("click the submit button", STEPS, 1.0)
+        assert cache.find_similar("take a screenshot of the desktop", threshold=0.8) is None
+
+    def test_stats_counters(self, cache):
+        cache.cache_plan("open the browser", STEPS, 1.0)
+        cache.find_similar("open the browser")
+        cache.find_similar("launch chrome browser", threshold=0.5)
+        cache.find_similar("delete every photo", threshold=0.9)
+
+        stats = cache.get_stats()
+        assert stats["exact_hits"] == 1
+        assert stats["semantic_hits"] == 1
+        assert stats["misses"] == 1
+        assert stats["hit_rate"] == pytest.approx(2 / 3)
+        assert stats["lookup_avg_ms"] >= 0
+        assert stats["embedder"] == KeywordPlanEmbedder.name
+
+
+class TestPlanCacheEviction:
+    """LRU cap and TTL"""
+
+    def test_lru_cap(self, tmp_path):
+        cache = PlanCache(db_path=str(tmp_path / "plans.db"), max_plans=2, ttl_seconds=0)
+        cache.cache_plan("task one", STEPS, 1.0)
+        cache.cache_plan("task two", STEPS, 1.0)
+        cache.find_similar("task one")  # one becomes most recent
+        cache.cache_plan("task three", STEPS, 1.0)
+
+        assert cache.find_similar("task two", threshold=1.01) is None
+        assert cache.find_similar("task one") is not None
+        assert cache.get_stats()["evictions"] == 1
+
+        # Eviction is persisted
+        reopened = PlanCache(db_path=str(tmp_path / "plans.db"), max_plans=2, ttl_seconds=0)
+        assert reopened.get_stats()["total_plans"] == 2
+
+    def test_ttl(self, tmp_path):
+        cache = PlanCache(db_path=str(tmp_path / "plans.db"), ttl_seconds=60)
+        cache.cache_plan("stale task", STEPS, 1.0)
+        cache._last_access[cache._compute_hash("stale task")] = time.time() - 120
+        assert cache.find_similar("stale task") is None
+        assert cache.get_stats()["total_plans"] == 0
+
+
+class TestPlanCacheBackends:
+    """Index and embedder plumbing"""
+
+    @pytest.mark.skipif(not NUMPY_AVAILABLE, reason="numpy not installed")
+    def test_matrix_index_matches_linear(self):
+        import random
+        rng = random.Random(0)
+        matrix, linear = MatrixPlanIndex(dim=8, initial_capacity=2), LinearPlanIndex(dim=8)
+        for i in range(20):
+            v = [rng.uniform(-1, 1) for _ in range(8)]
+            matrix.add(f"k{i}", v)
+            linear.add(f"k{i}", v)
+        for i in range(0, 20, 3):
+            matrix.remove(f"k{i}")
+            linear.remove(f"k{i}")
+
+        q = [rng.uniform(-1, 1) for _ in range(8)]
+        got = matrix.search(q, k=3)
+        expected = linear.search(q, k=3)
+        assert [k for k, _ in got] == [k for k, _ in expected]
+        assert len(matrix) == len(linear) == 13
+
+    def test_reembeds_on_embedder_change(self, tmp_path):
+        class UpperEmbedder(PlanEmbedder):
+            name = "test-upper"
+            dim = 2
+
+            def embed(self, texts):
+                return [[1.0, float(t.isupper())] for t in texts]
+
+        db_path = str(tmp_path / "plans.db")
+        PlanCache(db_path=db_path).cache_plan("open app", STEPS, 1.0)
+
+        cache = PlanCache(db_path=db_path, embedder=UpperEmbedder())
+        plan, score = cache.find_similar("close app", threshold=0.9)
+        assert plan.task == "open app"
+        assert plan.embedding == [1.0, 0.0]
@@ -0,0 +1,303 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for CodebaseIndexer incremental indexing
+
+LangChain/Chroma are replaced by an in-memory fake vectorstore and a
+line splitter so the manifest and change detection logic can run anywhere.
+"""
+
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.rag import indexer as indexer_module
+from engine.rag.indexer import CodebaseIndexer
+
+
+class FakeSplitter:
+    def __init__(self, *args, **kwargs):
+        pass
+
+    @classmethod
+    def from_language(cls, **kwargs):
+        return cls()
+
+    def split_text(self, text):
+        return [line for line in text.splitlines() if line.strip()]
+
+
+class FakeVectorStore:
+    def __init__(self):
+        self.docs = {}
+        self.add_calls = 0
+
+    def add_texts(self, texts, metadatas, ids):
+        self.add_calls += 1
+        for text, metadata, doc_id in zip(texts, metadatas, ids):
+            self.docs[doc_id] = (text, metadata)
+
+    def delete(self, ids=None, where=None):
+        if ids is not None:
+            for doc_id in ids:
+                self.docs.pop(doc_id, None)
+        elif where is not None:
+            self.docs = {
+                k: v for k, v in self.docs.items()
+                if v[1].get("source") != where["source"]
+            }
+
+    def get(self, limit=None):
+        return {"ids": list(self.docs)[:limit]}
+
+    def sources(self):
+        return sorted({metadata["source"] for _, metadata in self.docs.values()})
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    monkeypatch.setattr(indexer_module, "LANGCHAIN_AVAILABLE", True)
+    monkeypatch.setattr(indexer_module, "RecursiveCharacterTextSplitter", FakeSplitter)
+    monkeypatch.setattr(indexer_module, "_worker_splitters", {})
+
+    root = tmp_path / "ws"
+    (root / "pkg").mkdir(parents=True)
+    (root / "node_modules" / "dep").mkdir(parents=True)
+    (root / "pkg" / "a.py").write_text("def a():\n    return 1\n")
+    (root / "pkg" / "b.py").write_text("def b():\n    return 2\n")
+    (root / "node_modules" / "dep" / "index.js").write_text("module.exports = 1\n")
+
+    store = FakeVectorStore()
+
+    def make_indexer():
+        idx = CodebaseIndexer(str(root), persist_dir=str(tmp_path / "rag"))
+        idx._vectorstore = store
+        return idx
+
+    return root, store, make_indexer
+
+
+class TestIncrementalIndexing:
+
+    @pytest.mark.asyncio
+    async def test_initial_index_prunes_ignored_dirs(self, workspace):
+        root, store, make_indexer = workspace
+        stats = await make_indexer().index()
+
+        assert stats["indexed"] == 2
+        assert stats["chunks"] == 4
+        assert store.sources() == ["pkg/a.py", "pkg/b.py"]
+        assert store.add_calls == 1  # embedding batched across files
+
+    @pytest.mark.asyncio
+    async def test_restart_reindexes_nothing(self, workspace):
+        root, store, make_indexer = workspace
+        await make_indexer().index()
+
+        stats = await make_indexer().index()
+        assert stats["indexed"] == 0
+        assert stats["skipped"] == 2
+        assert store.add_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_changed_and_deleted_files(self, workspace):
+        root, store, make_indexer = workspace
+        await make_indexer().index()
+
+        (root / "pkg" / "a.py").write_text("def a():\n    return 10\n\nx = 1\n")
+        os.remove(root / "pkg" / "b.py")
+
+        idx = make_indexer()
+        stats = await idx.index()
+        assert stats["indexed"] == 1
+        assert stats["removed"] == 1
+        assert store.sources() == ["pkg/a.py"]
+        assert sorted(text for text, _ in store.docs.values()) == ["    return 10", "def a():", "x = 1"]
+
+    @pytest.mark.asyncio
+    async def test_touch_without_content_change(self, workspace):
+        root, store, make_indexer = workspace
+        await make_indexer().index()
+
+        path = root / "pkg" / "a.py"
+        st = path.stat()
+        os.utime(path, (st.st_atime, st.st_mtime + 10))
+
+        stats = await make_indexer().index()
+        assert stats["indexed"] == 0
+        assert store.add_calls == 1
+
+    @pytest.mark.asyncio
+    async def test_index_and_remove_single_file(self, workspace):
+        root, store, make_indexer = workspace
+        idx = make_indexer()
+        await idx.index()
+
+        (root / "pkg" / "c.py").write_text("c = 3\n")
+        assert await idx.index_file(root / "pkg" / "c.py") == 1
+        assert "pkg/c.py" in store.sources()
+
+        assert await idx.remove_file(root / "pkg" / "c.py")
+        assert "pkg/c.py" not in store.sources()
+        assert idx.get_stats()["indexed_files"] == 2
+
+
+    @pytest.mark.asyncio
+    async def test_chunk_settings_change_reindexes(self, workspace, tmp_path):
+        root, store, make_indexer = workspace
+        await make_indexer().index()
+        old_ids = set(store.docs)
+
+        idx = CodebaseIndexer(str(root), persist_dir=str(tmp_path / "rag"), chunk_size=500)
+        idx._vectorstore = store
+        stats = await idx.index()
+        assert stats["indexed"] == 2
+        assert set(store.docs) == old_ids  # old chunks replaced, not duplicated
+        assert store.add_calls == 2
+
+        stats = await idx.index()
+        assert stats["indexed"] == 0
+
+    @pytest.mark.asyncio
+    async def test_failed_add_is_retried(self, workspace):
+        root, store, make_indexer = workspace
+        await make_indexer().index()
+        (root / "pkg" / "a.py").write_text("def a():\n    return 10\n")
+
+        def failing_add(texts, metadatas, ids):
+            raise RuntimeError("embedding service down")
+
+        store.add_texts = failing_add
+        idx = make_indexer()
+        stats = await idx.index()
+        assert stats["errors"] == 1 and stats["indexed"] == 0
+        assert "pkg/a.py" not in idx._indexed_files
+
+        del store.add_texts
+        stats = await make_indexer().index()
+        assert stats["indexed"] == 1
+        assert sorted(text for text, m in store.docs.values() if m["source"] == "pkg/a.py") == [
+            "    return 10", "def a():",
+        ]
+
+    @pytest.mark.asyncio
+    async def test_legacy_native_paths_deleted(self, workspace, monkeypatch):
+        from pathlib import PureWindowsPath
+
+        root, store, make_indexer = workspace
+        monkeypatch.setattr(indexer_module, "PurePath", PureWindowsPath)
+        store.add_texts(["def a():"], [{"source": "pkg\\a.py"}], ["legacy-0"])
+
+        await make_indexer().index()
+        assert "legacy-0" not in store.docs
+        assert store.sources() == ["pkg/a.py", "pkg/b.py"]
+
+
+class RecordingIndexer:
+    """Stands in for CodebaseIndexer in queue tests"""
+
+    def __init__(self, workspace_path):
+        self.workspace_path = workspace_path
+        self.updates = []
+        self.full_scans = 0
+
+    async def update_files(self, paths):
+        self.updates.append(sorted(str(p) for p in paths))
+        return {"indexed": len(paths), "removed": 0}
+
+    async def index(self, force=False):
+        self.full_scans += 1
+        return {}
+
+
+class TestIndexUpdateQueue:
+
+    @pytest.mark.asyncio
+    async def test_coalesces_events_from_threads(self, tmp_path):
+        import asyncio
+        import threading
+        from engine.rag.watcher import IndexUpdateQueue
+
+        indexer = RecordingIndexer(tmp_path)
+        queue = IndexUpdateQueue(indexer, debounce=0.05)
+        queue.start()
+
+        def burst():
+            for _ in range(50):
+                queue.submit_threadsafe("/ws/a.py", "modified")
+            queue.submit_threadsafe("/ws/b.py", "created")
+            queue.submit_threadsafe("/ws/c.py", "moved", dest_path="/ws/d.py")
+
+        thread = threading.Thread(target=burst)
+        thread.start()
+        thread.join()
+        await asyncio.sleep(0.3)
+        await queue.stop()
+
+        assert indexer.updates == [["/ws/a.py", "/ws/b.py", "/ws/c.py", "/ws/d.py"]]
+        stats = queue.get_stats()
+        assert stats["events"] == 53
+        assert stats["coalesced"] == 49
+
+    @pytest.mark.asyncio
+    async def test_backpressure_falls_back_to_rescan(self, tmp_path):
+        import asyncio
+        from engine.rag.watcher import IndexUpdateQueue
+
+        indexer = RecordingIndexer(tmp_path)
+        queue = IndexUpdateQueue(indexer, debounce=0.05, max_pending=10)
+        queue.start()
+        for i in range(1000):
+            queue.submit_threadsafe(f"/ws/f{i}.py", "modified")
+        await asyncio.sleep(0.3)
+        await queue.stop()
+
+        assert indexer.updates == []
+        assert indexer.full_scans == 1
+        assert queue.get_stats()["full_rescans"] == 1
+
+    @pytest.mark.asyncio
+    async def test_file_hook_feeds_queue(self, tmp_path):
+        import asyncio
+        from engine.context.hooks.file_hook import FileHook
+
+        indexer = RecordingIndexer(tmp_path)
+        hook = FileHook()
+        hook._watched_dirs = [str(tmp_path)]
+        hook._loop = asyncio.get_running_loop()
+        hook.attach_indexer(indexer, debounce=0.05)
+        handler = hook._make_handler()
+
+        handler._handle_event(str(tmp_path / "x.py"), "modified")
+        handler._handle_event(str(tmp_path / "node_modules" / "y.js"), "modified")
+        await asyncio.sleep(0.3)
+        await hook._disconnect()
+
+        assert indexer.updates == [[str(tmp_path / "x.py")]]
+        assert hook.get_recent_files() == []  # cleared on disconnect
+
+    @pytest.mark.asyncio
+    async def test_quick_resaves_reach_queue(self, tmp_path):
+        import asyncio
+        from engine.context.hooks.file_hook import FileHook
+
+        indexer = RecordingIndexer(tmp_path)
+        hook = FileHook()
+        hook._watched_dirs = [str(tmp_path)]
+        hook._loop = asyncio.get_running_loop()
+        hook.attach_indexer(indexer, debounce=0.05)
+        handler = hook._make_handler()
+
+        path = str(tmp_path / "x.py")
+        handler._handle_event(path, "modified")
+        await asyncio.sleep(0.2)
+        handler._handle_event(path, "modified")  # second save inside DEDUPE_WINDOW
+        await asyncio.sleep(0.2)
+        recent = hook.get_recent_files()
+        await hook._disconnect()
+
+        assert indexer.updates == [[path], [path]]
+        assert recent == [path]
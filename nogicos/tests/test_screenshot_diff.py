@@ -0,0 +1,141 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for dirty-region screenshot diffing
+
+Tests cover:
+- First capture of a window is sent in full and becomes the keyframe
+- Identical captures are replaced by a "no visual change" note
+- Small changes are sent as a crop with frame coordinates, cumulative vs the keyframe
+- Large changes and resized windows send a new full keyframe
+- JPEG noise stays inside the blocks that changed
+- Pruning keeps pinned keyframes; the agent formats diffs as tool results
+"""
+
+import base64
+import os
+import sys
+from io import BytesIO
+
+from PIL import Image, ImageDraw
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.conversation import ConversationHistory
+from engine.agent.screenshot_diff import ScreenshotDiffer
+
+
+def capture(rects=(), size=(1280, 800)):
+    """Window capture the way WindowTools encodes it (JPEG, quality 60)"""
+    image = Image.new("RGB", size, "white")
+    draw = ImageDraw.Draw(image)
+    for y in range(40, size[1] - 40, 30):
+        draw.text((20, y), "File  Edit  View  " * 10, fill="black")
+    for rect, color in rects:
+        draw.rectangle(rect, fill=color)
+    buffer = BytesIO()
+    image.save(buffer, format="JPEG", quality=60, optimize=True)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def decoded_size(image_b64):
+    return Image.open(BytesIO(base64.b64decode(image_b64))).size
+
+
+def contains(outer, inner):
+    return outer[0] <= inner[0] and outer[1] <= inner[1] and outer[2] >= inner[2] and outer[3] >= inner[3]
+
+
+class TestScreenshotDiffer:
+
+    def test_first_capture_is_keyframe_then_unchanged(self):
+        differ = ScreenshotDiffer()
+        frame = capture()
+        assert differ.diff(100, frame).kind == "full"
+
+        diff = differ.diff(100, frame)
+        assert diff.kind == "unchanged"
+        assert diff.image_base64 == ""
+        assert "no visual change" in diff.describe()
+        assert differ.pinned_images() == {frame}
+
+    def test_small_change_sends_region(self):
+        differ = ScreenshotDiffer()
+        differ.diff(100, capture())
+        diff = differ.diff(100, capture([((600, 400, 700, 430), "blue")]))
+
+        assert diff.kind == "region"
+        assert contains(diff.region, (600, 400, 701, 431))
+        width, height = decoded_size(diff.image_base64)
+        assert (width, height) == (diff.region[2] - diff.region[0], diff.region[3] - diff.region[1])
+        assert width * height < 0.05 * 1280 * 800  # JPEG noise did not spread the region
+        assert f"({diff.region[0]}, {diff.region[1]})" in diff.describe()
+
+    def test_regions_are_cumulative_against_keyframe(self):
+        differ = ScreenshotDiffer()
+        differ.diff(100, capture())
+        first = [((100, 100, 140, 120), "red")]
+        differ.diff(100, capture(first))
+
+        # Same state again: nothing new since the last crop
+        assert differ.diff(100, capture(first)).kind == "unchanged"
+
+        diff = differ.diff(100, capture(first + [((900, 600, 940, 620), "green")]))
+        assert diff.kind == "region"
+        assert len(diff.boxes) == 2
+        assert contains(diff.region, (100, 100, 941, 621))
+
+    def test_large_change_or_resize_sends_full_frame(self):
+        differ = ScreenshotDiffer()
+        differ.diff(100, capture())
+        dialog = capture([((0, 0, 1279, 600), "gray")])
+        assert differ.diff(100, dialog).kind == "full"
+        assert differ.pinned_images() == {dialog}
+        assert differ.diff(100, capture(size=(1024, 768))).kind == "full"
+
+    def test_windows_are_tracked_separately(self):
+        differ = ScreenshotDiffer(max_keyframes=1)
+        differ.diff(100, capture())
+        assert differ.diff(200, capture()).kind == "full"
+        # Window 100's keyframe was evicted (no longer pinned), so it is resent in full
+        assert differ.diff(100, capture()).kind == "full"
+        stats = differ.get_stats()
+        assert stats["full"] == 3 and stats["keyframes"] == 1
+
+
+class TestPinnedPruning:
+
+    def test_keyframe_outlives_newer_crops(self):
+        def shot(tag):
+            return {"role": "user", "content": [{
+                "type": "tool_result", "tool_use_id": tag,
+                "content": [{"type": "image", "source": {"type": "base64", "media_type": "image/jpeg", "data": tag}}],
+            }]}
+
+        history = ConversationHistory([shot("keyframe"), shot("crop1"), shot("crop2")])
+        history.prune_images(2, pinned={"keyframe"})
+        live = [m["content"][0]["content"][0].get("source", {}).get("data") for m in history]
+        assert live == ["keyframe", None, "crop2"]
+
+
+class TestAgentFormatting:
+
+    def test_tool_results_carry_diffs(self):
+        from engine.agent.react_agent import ReActAgent
+
+        differ = ScreenshotDiffer()
+        fmt = ReActAgent._format_window_screenshot_result
+
+        def output(image_b64):
+            return {"hwnd": 100, "image_base64": image_b64, "window_title": "Notepad", "window_size": [1280, 800]}
+
+        full = fmt(None, "t1", output(capture()), differ=differ)["content"]
+        assert [b["type"] for b in full] == ["image", "text"]
+
+        same = fmt(None, "t2", output(capture()), differ=differ)["content"]
+        assert [b["type"] for b in same] == ["text", "text"]
+        assert "no visual change" in same[0]["text"]
+
+        region = fmt(None, "t3", output(capture([((10, 10, 50, 30), "red")])), differ=differ)["content"]
+        assert [b["type"] for b in region] == ["text", "image", "text"]
+        assert "region" in region[0]["text"]
@@ -0,0 +1,145 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the tiered ScreenshotManager store
+
+Tests cover:
+- Identical frames are deduplicated in memory and on disk
+- Frames that differ only in a few pixels are kept apart
+- base64 and thumbnails are cached per entry
+- Hot-tier eviction falls back to the mmap'd disk segment
+- Screenshots survive a restart and can be streamed by ID
+- Disk compaction keeps the newest screenshots under the cap
+"""
+
+import os
+import sys
+from io import BytesIO
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.screenshot_manager import ScreenshotManager, PIL_AVAILABLE
+
+pytestmark = pytest.mark.skipif(not PIL_AVAILABLE, reason="Pillow not installed")
+
+
+def frame(color, size=(640, 400)):
+    from PIL import Image, ImageDraw
+    img = Image.new("RGB", size, color)
+    ImageDraw.Draw(img).rectangle((40, 40, 200, 120), fill=(255 - color[0], 20, 20))
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+def noisy_frame(seed, size=(320, 200)):
+    from PIL import Image
+    rng = __import__("random").Random(seed)
+    img = Image.frombytes("RGB", size, bytes(rng.randrange(256) for _ in range(size[0] * size[1] * 3)))
+    buf = BytesIO()
+    img.save(buf, format="PNG")
+    return buf.getvalue()
+
+
+class TestScreenshotStore:
+
+    @pytest.mark.asyncio
+    async def test_identical_frames_are_deduplicated(self, tmp_path):
+        manager = ScreenshotManager(storage_dir=str(tmp_path))
+        first = await manager.store(frame((10, 10, 10)), hwnd=1)
+        second = await manager.store(frame((10, 10, 10)), hwnd=1)
+        third = await manager.store(frame((200, 200, 200)), hwnd=1)
+
+        assert first != second
+        assert await manager.get_raw(first) == await manager.get_raw(second)
+        assert await manager.get_raw(first) != await manager.get_raw(third)
+        stats = manager.get_stats()
+        assert stats["dedup_count"] == 1
+        assert stats["disk_blobs"] == 2
+        manager.close()
+
+    @pytest.mark.asyncio
+    async def test_similar_frames_are_not_merged(self, tmp_path):
+        from PIL import Image, ImageDraw
+
+        def login(name):
+            img = Image.new("RGB", (1280, 800), "white")
+            ImageDraw.Draw(img).text((100, 100), f"Username: {name}", fill="black")
+            buf = BytesIO()
+            img.save(buf, format="PNG")
+            return buf.getvalue()
+
+        alice, bob = login("alice"), login("bob")
+
+        manager = ScreenshotManager(storage_dir=str(tmp_path))
+        first = await manager.store(alice, hwnd=1)
+        second = await manager.store(bob, hwnd=1)
+        assert await manager.get_raw(first) != await manager.get_raw(second)
+        assert manager.get_stats()["dedup_count"] == 0
+        manager.close()
+
+    @pytest.mark.asyncio
+    async def test_base64_and_thumbnail_are_cached(self):
+        manager = ScreenshotManager()
+        sid = await manager.store(frame((30, 60, 90), size=(1280, 800)))
+        encoded = await manager.get_base64(sid)
+        assert await manager.get_base64(sid) is encoded
+        assert manager.get_stats()["base64_cache_hits"] == 1
+
+        thumb = await manager.get_thumbnail(sid)
+        from PIL import Image
+        assert max(Image.open(BytesIO(thumb)).size) <= max(ScreenshotManager.THUMBNAIL_SIZE)
+        assert await manager.get_base64(sid, thumbnail=True)
+
+    @pytest.mark.asyncio
+    async def test_evicted_entries_are_read_from_disk(self, tmp_path):
+        manager = ScreenshotManager(max_entries=2, storage_dir=str(tmp_path))
+        ids = [await manager.store(frame((i * 40, 0, 0)), hwnd=7) for i in range(4)]
+        assert manager.get_stats()["count"] == 2
+
+        raw = await manager.get_raw(ids[0])
+        assert raw[:2] == b"\xff\xd8"
+        assert manager.get_stats()["disk_hits"] == 1
+        assert manager.get_recent(4) == ids
+        assert all([await manager.get_base64(sid) for sid in manager.get_recent(4)])  # disk-only IDs resolve
+        manager.close()
+
+    @pytest.mark.asyncio
+    async def test_restart_and_stream_by_id(self, tmp_path):
+        manager = ScreenshotManager(storage_dir=str(tmp_path))
+        sid = await manager.store(frame((5, 100, 5), size=(1024, 768)), hwnd=3)
+        original = await manager.get_raw(sid)
+        manager.close()
+
+        reopened = ScreenshotManager(storage_dir=str(tmp_path))
+        assert reopened.has(sid)
+        chunks = [c async for c in reopened.iter_chunks(sid, chunk_size=1000)]
+        assert len(chunks) > 1
+        assert b"".join(chunks) == original
+        assert reopened.get_stats()["count"] == 0  # Streaming does not promote
+
+        ref = await reopened.make_ref(sid)
+        assert (ref["width"], ref["height"]) == (1024, 768)
+        assert ref["url"].endswith(sid)
+
+        assert await reopened.delete_by_hwnd(3) == 1
+        assert not reopened.has(sid)
+        assert [c async for c in reopened.iter_chunks(sid)] == []
+        reopened.close()
+
+    @pytest.mark.asyncio
+    async def test_compaction_keeps_newest(self, tmp_path):
+        manager = ScreenshotManager(storage_dir=str(tmp_path), max_disk_mb=1)
+        ids = [await manager.store(noisy_frame(i), compress=False) for i in range(8)]
+        stats = manager.get_stats()
+        assert stats["compactions"] >= 1
+        assert stats["disk_size_mb"] <= 1
+        assert manager.has(ids[-1])
+        assert not manager._segment.has(ids[0])
+        manager.close()
+
+        reopened = ScreenshotManager(storage_dir=str(tmp_path), max_disk_mb=1)
+        assert await reopened.get_raw(ids[-1]) == noisy_frame(7)
+        reopened.close()
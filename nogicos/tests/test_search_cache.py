@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the quick-search / smart-search result cache
+
+Tests cover:
+- Query normalization and option-sensitive keys
+- TTL expiry, LRU eviction
+- Single-flight coalescing of concurrent identical requests
+- Negative caching of exceptions and error results
+- Stale-while-revalidate, keeping the stale value when the refresh fails
+- smart_search() integration and stats
+"""
+
+import asyncio
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.tools import search_cache
+from engine.tools.search_cache import SearchResultCache, make_key
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class Upstream:
+
+    def __init__(self, delay=0.0, fail=False):
+        self.calls = 0
+        self.delay = delay
+        self.fail = fail
+
+    async def __call__(self):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if self.fail:
+            raise RuntimeError("upstream down")
+        return {"success": True, "n": self.calls}
+
+
+@pytest.fixture
+def clock():
+    return Clock()
+
+
+@pytest.fixture
+def cache(clock):
+    return SearchResultCache(max_entries=3, ttl=10, stale_ttl=60, negative_ttl=5, clock=clock)
+
+
+class TestKeys:
+
+    def test_normalized_query(self):
+        assert make_key("quick", "  AI  最新进展 ") == make_key("quick", "ai 最新进展")
+        assert make_key("quick", "Ｃｕｒｓｏｒ") == make_key("quick", "cursor")
+        assert make_key("quick", "q", max_results=5) != make_key("quick", "q", max_results=3)
+        assert make_key("quick", "q") != make_key("smart", "q")
+
+
+class TestCache:
+
+    @pytest.mark.asyncio
+    async def test_hit_expiry_and_lru(self, cache, clock):
+        upstream = Upstream()
+        assert await cache.get_or_compute("a", upstream) == ({"success": True, "n": 1}, "miss")
+        assert await cache.get_or_compute("a", upstream) == ({"success": True, "n": 1}, "hit")
+
+        for key in ("b", "c", "d"):
+            await cache.get_or_compute(key, upstream)
+        assert cache.get_stats()["evictions"] == 1
+        assert "a" not in cache._entries
+
+        clock.now += 100  # past ttl + stale_ttl
+        _, status = await cache.get_or_compute("d", upstream)
+        assert status == "miss"
+
+    @pytest.mark.asyncio
+    async def test_single_flight(self, cache):
+        upstream = Upstream(delay=0.05)
+        results = await asyncio.gather(*(cache.get_or_compute("q", upstream) for _ in range(5)))
+
+        assert upstream.calls == 1
+        assert sorted(status for _, status in results) == ["coalesced"] * 4 + ["miss"]
+        assert cache.get_stats()["coalesced"] == 4
+
+    @pytest.mark.asyncio
+    async def test_cancelled_leader_does_not_break_waiters(self, cache):
+        upstream = Upstream(delay=0.05)
+        leader = asyncio.ensure_future(cache.get_or_compute("q", upstream))
+        await asyncio.sleep(0)
+        follower = asyncio.ensure_future(cache.get_or_compute("q", upstream))
+        await asyncio.sleep(0.01)
+        leader.cancel()
+
+        value, status = await follower
+        assert status == "coalesced" and value["n"] == 1
+        assert upstream.calls == 1
+
+    @pytest.mark.asyncio
+    async def test_negative_caching(self, cache, clock):
+        upstream = Upstream(fail=True)
+        for _ in range(3):
+            with pytest.raises(RuntimeError):
+                await cache.get_or_compute("q", upstream)
+        assert upstream.calls == 1
+        assert cache.get_stats()["negative_hits"] == 2
+
+        clock.now += 6  # negative entries never serve stale
+        upstream.fail = False
+        assert (await cache.get_or_compute("q", upstream))[1] == "miss"
+
+        is_error = lambda r: not r["success"]
+
+        async def error_result():
+            return {"success": False, "error": "quota"}
+
+        await cache.get_or_compute("e", error_result, is_error=is_error)
+        assert (await cache.get_or_compute("e", error_result, is_error=is_error))[1] == "negative"
+
+    @pytest.mark.asyncio
+    async def test_stale_while_revalidate(self, cache, clock):
+        upstream = Upstream(delay=0.01)
+        await cache.get_or_compute("q", upstream)
+        clock.now += 20  # stale, within stale_ttl
+
+        value, status = await cache.get_or_compute("q", upstream)
+        assert (value["n"], status) == (1, "stale")
+        await asyncio.sleep(0.05)
+        value, status = await cache.get_or_compute("q", upstream)
+        assert (value["n"], status) == (2, "hit")
+
+        clock.now += 20
+        upstream.fail = True
+        await cache.get_or_compute("q", upstream)
+        await asyncio.sleep(0.05)
+        value, status = await cache.get_or_compute("q", upstream)
+        assert (value["n"], status) == (2, "stale")
+
+        stats = cache.get_stats()
+        assert stats["refresh_errors"] >= 1
+        assert stats["upstream_errors"] == 0
+        assert stats["latency_saved_ms"] > 0
+
+
+class TestSmartSearch:
+
+    @pytest.mark.asyncio
+    async def test_smart_search_uses_cache(self, monkeypatch):
+        from engine.tools import smart_search as module
+
+        calls = []
+
+        class FakeSearch:
+            async def search(self, query, max_results, force_search):
+                calls.append(query)
+                await asyncio.sleep(0.01)
+                return {"success": True, "query": query, "answer": "42"}
+
+        monkeypatch.setattr(module, "get_smart_search", lambda: FakeSearch())
+        monkeypatch.setattr(search_cache, "_search_cache", SearchResultCache())
+
+        first, second = await asyncio.gather(
+            module.smart_search("What is AI", force_search=True),
+            module.smart_search("what  is ai", force_search=True),
+        )
+        third = await module.smart_search("WHAT IS AI", force_search=True)
+
+        assert calls == ["What is AI"]
+        assert (first["cache"], second["cache"], third["cache"]) == ("miss", "coalesced", "hit")
+        assert third["query"] == "WHAT IS AI"
+        stats = search_cache.get_search_cache().get_stats()
+        assert stats["hit_ratio"] == pytest.approx(2 / 3, abs=1e-3)
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for append-only session storage
+
+Tests cover:
+- save_session() only writes the new tail of a growing history
+- Edited / truncated histories rewrite from the first changed message
+- Keyset pagination for load_session() and list_sessions()
+- Incrementally maintained summary rows (count, preview)
+- Migration from v1 whole-history JSON blobs
+"""
+
+import json
+import os
+import sqlite3
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.knowledge.store import PersistentSessionStore
+
+
+def messages(n, start=0):
+    return [
+        {"role": "user" if i % 2 == 0 else "assistant", "content": f"message {i}", "id": f"m{i}"}
+        for i in range(start, start + n)
+    ]
+
+
+def message_rows(db_path, session_id):
+    conn = sqlite3.connect(db_path)
+    try:
+        return conn.execute(
+            "SELECT seq, id, content FROM session_messages WHERE session_id = ? ORDER BY seq",
+            (session_id,)
+        ).fetchall()
+    finally:
+        conn.close()
+
+
+@pytest.fixture
+def store(tmp_path):
+    return PersistentSessionStore(db_path=str(tmp_path / "sessions.db"))
+
+
+class TestAppendOnly:
+
+    def test_growing_history_appends_tail(self, store):
+        history = messages(3)
+        store.save_session("s1", history)
+        first_ids = [row[1] for row in message_rows(store.db_path, "s1")]
+
+        history += messages(2, start=3)
+        store.save_session("s1", history)
+
+        rows = message_rows(store.db_path, "s1")
+        assert [row[0] for row in rows] == [0, 1, 2, 3, 4]
+        assert [row[1] for row in rows[:3]] == first_ids  # untouched
+        loaded = store.load_session("s1")
+        assert loaded["history"] == history
+        assert loaded["message_count"] == 5
+
+    def test_edit_and_truncate_rewrite_from_divergence(self, store):
+        history = messages(5)
+        store.save_session("s1", history)
+        kept_ids = [row[1] for row in message_rows(store.db_path, "s1")[:2]]
+
+        edited = history[:2] + [{"role": "user", "content": "edited"}]
+        store.save_session("s1", edited)
+
+        rows = message_rows(store.db_path, "s1")
+        assert [row[1] for row in rows[:2]] == kept_ids
+        assert [row[2] for row in rows] == ["message 0", "message 1", "edited"]
+        assert store.load_session("s1")["history"] == edited
+
+        store.save_session("s1", [])
+        assert store.load_session("s1")["history"] == []
+
+    def test_summary_preview_and_add_message(self, store):
+        store.save_session("s1", messages(2), title="Chat")
+        store.add_message("s1", "assistant", "done", tool_calls=[{"name": "click"}])
+
+        [summary] = store.list_sessions()
+        assert summary["message_count"] == 3
+        assert summary["preview"] == "done"
+        history = store.load_session("s1")["history"]
+        assert history[-1] == {"role": "assistant", "content": "done", "tool_calls": [{"name": "click"}]}
+
+        # save_session after add_message keeps the appended row
+        store.save_session("s1", history + messages(1, start=9))
+        assert len(message_rows(store.db_path, "s1")) == 4
+
+
+class TestPagination:
+
+    def test_message_pages(self, store):
+        history = messages(25)
+        store.save_session("s1", history)
+
+        page = store.load_session("s1", limit=10)
+        pages = [page["history"]]
+        while page["next_cursor"] is not None:
+            page = store.load_session("s1", limit=10, before=page["next_cursor"])
+            pages.append(page["history"])
+
+        assert [len(p) for p in pages] == [10, 10, 5]
+        assert [m for p in reversed(pages) for m in p] == history
+
+    def test_session_pages(self, store):
+        for i in range(7):
+            store.save_session(f"s{i}", messages(1), title=f"Chat {i}")
+
+        seen, cursor = [], None
+        while True:
+            page = store.list_sessions(limit=3, cursor=cursor)
+            seen += [s["title"] for s in page]
+            if len(page) < 3:
+                break
+            cursor = store.make_cursor(page[-1])
+
+        assert seen == [f"Chat {i}" for i in reversed(range(7))]
+
+
+class TestMigration:
+
+    def test_v1_blob_migrates(self, tmp_path):
+        db_path = str(tmp_path / "v1.db")
+        conn = sqlite3.connect(db_path)
+        conn.executescript("""
+            CREATE TABLE sessions (
+                id TEXT PRIMARY KEY, title TEXT, history TEXT NOT NULL DEFAULT '[]',
+                preferences TEXT NOT NULL DEFAULT '{}', created_at TEXT NOT NULL,
+                updated_at TEXT NOT NULL, message_count INTEGER DEFAULT 0
+            );
+            CREATE TABLE session_messages (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, session_id TEXT NOT NULL,
+                role TEXT NOT NULL, content TEXT NOT NULL, tool_calls TEXT, created_at TEXT NOT NULL
+            );
+        """)
+        history = messages(3)
+        conn.execute(
+            "INSERT INTO sessions VALUES ('old', 'Old chat', ?, '{\"language\": \"zh\"}', '2025-01-01', '2025-01-02', 3)",
+            (json.dumps(history),)
+        )
+        conn.execute(
+            "INSERT INTO session_messages (session_id, role, content, created_at) VALUES ('old', 'user', 'late', '2025-01-03')"
+        )
+        conn.commit()
+        conn.close()
+
+        store = PersistentSessionStore(db_path=db_path)
+        loaded = store.load_session("old")
+        assert loaded["history"] == history + [{"role": "user", "content": "late"}]
+        assert loaded["preferences"] == {"language": "zh"}
+        assert store.list_sessions()[0]["preview"] == "late"
+
+        conn = sqlite3.connect(db_path)
+        assert conn.execute("SELECT history FROM sessions").fetchone()[0] == "[]"
+        assert conn.execute("PRAGMA user_version").fetchone()[0] == PersistentSessionStore.SCHEMA_VERSION
+        conn.close()
+
+        # Re-opening does not migrate again
+        PersistentSessionStore(db_path=db_path)
+        assert len(message_rows(db_path, "old")) == 4
@@ -0,0 +1,194 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the span API
+
+Tests cover:
+- Parent/child nesting through await, gather and to_thread
+- Manual activate()/end() restores the parent, even past an open child
+- Head sampling: unsampled traces export nothing
+- Task IDs tag every span of a trace
+- OTLP/JSON file exporter output
+- Per-iteration flame breakdown and folded stacks
+- ToolRegistry.execute emits tool.execute spans
+"""
+
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.observability import spans as tracing
+from engine.observability.spans import (
+    OTLPFileExporter, RingBufferExporter, Tracer, flame_breakdown, folded_stacks,
+)
+
+
+@pytest.fixture
+def ring():
+    ring = RingBufferExporter()
+    tracing.set_tracer(Tracer(exporters=[ring]))
+    yield ring
+    tracing.set_tracer(None)
+
+
+def by_name(spans):
+    return {s.name: s for s in spans}
+
+
+class TestPropagation:
+
+    @pytest.mark.asyncio
+    async def test_nesting_across_tasks_and_threads(self, ring):
+        def in_thread():
+            with tracing.span("thread.work"):
+                pass
+
+        async def child(i):
+            with tracing.span("child", i=i):
+                await asyncio.sleep(0)
+
+        with tracing.span("root") as root:
+            await asyncio.gather(child(1), child(2))
+            await asyncio.to_thread(in_thread)
+        assert tracing.current_span() is tracing.NOOP_SPAN
+
+        spans = ring.spans()
+        assert [s.name for s in spans].count("child") == 2
+        assert all(s.trace_id == root.trace_id for s in spans)
+        assert all(s.parent_id == root.span_id for s in spans if s is not root)
+        assert by_name(spans)["root"].parent_id is None
+
+    def test_manual_spans_and_errors(self, ring):
+        with tracing.span("run"):
+            iteration = tracing.span("iteration").activate()
+            tracing.span("llm").activate()  # left open by an "exception"
+            iteration.record_error(RuntimeError("boom"))
+            iteration.end()
+            iteration.end()  # idempotent
+            assert tracing.current_span().name == "run"
+
+        spans = by_name(ring.spans())
+        assert set(spans) == {"iteration", "run"}
+        assert spans["iteration"].status == "error"
+        assert "boom" in spans["iteration"].error
+
+    def test_error_in_with_block(self, ring):
+        with pytest.raises(ValueError):
+            with tracing.span("fails"):
+                raise ValueError("bad input")
+        assert ring.spans()[0].status == "error"
+
+
+class TestSampling:
+
+    def test_unsampled_trace_records_nothing(self):
+        ring = RingBufferExporter()
+        tracer = Tracer(sample_rate=0.0, exporters=[ring])
+        tracing.set_tracer(tracer)
+        try:
+            with tracing.span("root"):
+                tracing.set_task_id("t1")
+                with tracing.span("child") as child:
+                    child.set_attribute("x", 1)
+                    assert child is tracing.NOOP_SPAN
+            assert tracing.current_span() is tracing.NOOP_SPAN
+            assert ring.spans() == []
+            assert tracer.get_stats()["traces_dropped"] == 1
+        finally:
+            tracing.set_tracer(None)
+
+    def test_task_id_tags_whole_trace(self, ring):
+        with tracing.span("agent.run"):
+            with tracing.span("early"):
+                pass
+            tracing.set_task_id("task-1")
+        with tracing.span("other"):
+            pass
+
+        assert {s.name for s in ring.spans(task_id="task-1")} == {"agent.run", "early"}
+        assert ring.task_ids() == ["task-1"]
+
+
+class TestExport:
+
+    def test_otlp_file(self, tmp_path):
+        path = tmp_path / "spans.jsonl"
+        exporter = OTLPFileExporter(str(path), batch_size=2)
+        tracing.set_tracer(Tracer(exporters=[exporter]))
+        try:
+            with tracing.span("root", flag=True, count=3, ratio=0.5):
+                tracing.set_task_id("task-9")
+                with tracing.span("child") as child:
+                    child.add_event("retry", attempt=2)
+            with tracing.span("tail"):
+                pass
+            assert len(path.read_text().splitlines()) == 1
+            tracing.get_tracer().flush()
+        finally:
+            tracing.set_tracer(None)
+
+        lines = [json.loads(line) for line in path.read_text().splitlines()]
+        assert len(lines) == 2
+        spans = [s for line in lines for s in line["resourceSpans"][0]["scopeSpans"][0]["spans"]]
+        child, root, tail = spans
+        assert len(root["traceId"]) == 32 and len(root["spanId"]) == 16
+        assert child["parentSpanId"] == root["spanId"]
+        assert "parentSpanId" not in root
+        attributes = {a["key"]: a["value"] for a in root["attributes"]}
+        assert attributes["flag"] == {"boolValue": True}
+        assert attributes["count"] == {"intValue": "3"}
+        assert attributes["nogicos.task_id"] == {"stringValue": "task-9"}
+        assert child["events"][0]["name"] == "retry"
+        assert int(root["endTimeUnixNano"]) >= int(root["startTimeUnixNano"])
+
+
+class TestBreakdown:
+
+    @pytest.mark.asyncio
+    async def test_flame_breakdown(self, ring):
+        with tracing.span(tracing.AGENT_RUN):
+            tracing.set_task_id("task-2")
+            for i in (1, 2):
+                iteration = tracing.span(tracing.AGENT_ITERATION, iteration=i).activate()
+                with tracing.span(tracing.LLM_STREAM) as llm:
+                    llm.set_attribute("ttft_ms", 5.0)
+                    await asyncio.sleep(0.01)
+                with tracing.span(tracing.TOOL_EXECUTE, tool="screenshot"):
+                    with tracing.span(tracing.SCREENSHOT_ENCODE):
+                        await asyncio.sleep(0.005)
+                iteration.end()
+
+        breakdown = flame_breakdown("task-2")
+        assert [b["iteration"] for b in breakdown] == [1, 2]
+        first = breakdown[0]
+        assert first["breakdown"]["llm.stream"] >= 10
+        assert first["breakdown"]["llm.ttft"] == 5.0
+        assert first["breakdown"]["tool.execute"] >= first["breakdown"]["screenshot.encode"] >= 5
+        assert first["counts"] == {"llm.stream": 1, "tool.execute": 1, "screenshot.encode": 1}
+        assert "self" in first["breakdown"]
+
+        stacks = folded_stacks("task-2")
+        assert any(line.startswith("agent.run;agent.iteration[2];tool.execute;screenshot.encode ") for line in stacks)
+
+    @pytest.mark.asyncio
+    async def test_tool_registry_span(self, ring):
+        from engine.tools.base import ToolRegistry, ToolCategory
+
+        registry = ToolRegistry()
+
+        @registry.action("Echo message", category=ToolCategory.LOCAL)
+        async def echo(message: str) -> str:
+            return message
+
+        with tracing.span(tracing.AGENT_ITERATION, iteration=1) as parent:
+            await registry.execute("echo", {"message": "hi"})
+            await registry.execute("missing", {})
+
+        tools = [s for s in ring.spans() if s.name == tracing.TOOL_EXECUTE]
+        assert [(s.attributes["tool"], s.attributes["success"]) for s in tools] == [("echo", True), ("missing", False)]
+        assert all(s.parent_id == parent.span_id for s in tools)
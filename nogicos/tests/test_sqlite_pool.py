@@ -0,0 +1,148 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for the shared SQLite access layer
+
+Tests cover:
+- One reused connection per thread, with WAL and tuned pragmas
+- connect(): uncommitted work is rolled back at the outermost block only
+- transaction(): commit on success, rollback on error
+- run_db(): queries run off the event loop
+- Connections of exited threads are closed
+- Concurrent session saves through the executor stay consistent
+- Shutdown lets running queries finish before closing connections
+"""
+
+import asyncio
+import os
+import sys
+import threading
+import time
+
+import pytest
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.sqlite_pool import (
+    SQLitePool, close_sqlite_pool, close_sqlite_pools, get_db_executor, get_sqlite_pool, run_db,
+)
+
+
+@pytest.fixture
+def pool(tmp_path):
+    pool = SQLitePool(str(tmp_path / "pool.db"))
+    with pool.transaction() as conn:
+        conn.execute("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT)")
+    yield pool
+    pool.close()
+
+
+def count(pool):
+    with pool.connect() as conn:
+        return conn.execute("SELECT COUNT(*) FROM items").fetchone()[0]
+
+
+class TestConnections:
+
+    def test_reuse_and_pragmas(self, pool):
+        with pool.connect() as first:
+            pass
+        with pool.connect() as second:
+            assert second.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+            assert second.execute("PRAGMA synchronous").fetchone()[0] == 1  # NORMAL
+            assert second.execute("PRAGMA busy_timeout").fetchone()[0] == 5000
+        assert first is second
+
+        other = []
+        thread = threading.Thread(target=lambda: other.append(pool.connection()))
+        thread.start()
+        thread.join()
+        assert other[0] is not first
+        assert pool.get_stats()["opened"] == 2
+
+    def test_dead_thread_connections_are_closed(self, pool):
+        for _ in range(3):
+            thread = threading.Thread(target=pool.connection)
+            thread.start()
+            thread.join()
+        assert pool.get_stats()["open_connections"] <= 2
+        assert pool.get_stats()["closed"] >= 2
+
+    def test_registry_is_per_path(self, tmp_path):
+        path = str(tmp_path / "shared.db")
+        assert get_sqlite_pool(path) is get_sqlite_pool(os.path.join(str(tmp_path), ".", "shared.db"))
+        close_sqlite_pool(path)
+
+
+class TestTransactions:
+
+    def test_uncommitted_work_rolls_back(self, pool):
+        with pool.connect() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('kept')")
+            conn.commit()
+            with pool.connect() as inner:
+                inner.execute("INSERT INTO items (name) VALUES ('nested')")
+            assert conn.in_transaction  # inner exit does not end the outer block's work
+            conn.commit()
+        with pool.connect() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('dropped')")
+        assert count(pool) == 2
+        assert pool.get_stats()["rollbacks"] == 1
+
+    def test_transaction(self, pool):
+        with pool.transaction() as conn:
+            conn.execute("INSERT INTO items (name) VALUES ('a')")
+        with pytest.raises(ValueError):
+            with pool.transaction() as conn:
+                conn.execute("INSERT INTO items (name) VALUES ('b')")
+                raise ValueError("abort")
+        assert count(pool) == 1
+
+
+class TestExecutor:
+
+    @pytest.mark.asyncio
+    async def test_run_off_loop(self, pool):
+        loop_thread = threading.current_thread()
+
+        def insert(name):
+            assert threading.current_thread() is not loop_thread
+            with pool.transaction() as conn:
+                conn.execute("INSERT INTO items (name) VALUES (?)", (name,))
+            return name
+
+        names = await asyncio.gather(*(pool.run(insert, f"n{i}") for i in range(20)))
+        assert len(names) == 20
+        assert count(pool) == 20
+
+    @pytest.mark.asyncio
+    async def test_concurrent_session_saves(self, tmp_path):
+        from engine.knowledge.store import PersistentSessionStore
+
+        store = PersistentSessionStore(db_path=str(tmp_path / "sessions.db"))
+        history = [{"role": "user", "content": f"m{i}"} for i in range(40)]
+        await asyncio.gather(*(
+            run_db(store.save_session, "s1", history[:n]) for n in range(1, 41)
+        ))
+        saved = await run_db(store.load_session, "s1")
+        assert saved["history"] == history[:saved["message_count"]]
+        close_sqlite_pool(store.db_path)
+
+    def test_shutdown_waits_for_running_queries(self, tmp_path):
+        pool = get_sqlite_pool(str(tmp_path / "shutdown.db"))
+        started, release = threading.Event(), threading.Event()
+
+        def slow_query():
+            with pool.connect() as conn:
+                started.set()
+                release.wait(5)
+                return conn.execute("SELECT 1").fetchone()[0]
+
+        future = get_db_executor().submit(slow_query)
+        assert started.wait(5)
+        closer = threading.Thread(target=close_sqlite_pools)
+        closer.start()
+        time.sleep(0.05)
+        release.set()
+        closer.join(5)
+        assert future.result() == 1
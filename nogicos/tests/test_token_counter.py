@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Tests for TokenCounter memoization, image costs and calibration
+
+Tests cover:
+- Per-message counts are cached and invalidated when content changes
+- Image tokens come from the real dimensions in the image header
+- ContextManager keeps an incremental running total
+- Anthropic usage calibrates the estimate
+"""
+
+import base64
+import os
+import struct
+import sys
+
+# Add project root to path
+sys.path.insert(0, os.path.dirname(os.path.dirname(__file__)))
+
+from engine.agent.context_manager import (
+    ContextManager, TokenBudget, TokenCounter, image_dimensions, usage_input_tokens,
+)
+from engine.agent.types import Message, MessageRole
+
+
+def png_b64(width, height):
+    header = b"\x89PNG\r\n\x1a\n" + struct.pack(">I", 13) + b"IHDR" + struct.pack(">II", width, height)
+    return base64.b64encode(header + b"\x08\x02\x00\x00\x00" + b"\x00" * 64).decode()
+
+
+def jpeg_b64(width, height):
+    app0 = b"\xff\xe0" + struct.pack(">H", 16) + b"JFIF\x00" + b"\x00" * 9
+    sof = b"\xff\xc0" + struct.pack(">HBHH", 17, 8, height, width) + b"\x00" * 10
+    return base64.b64encode(b"\xff\xd8" + app0 + sof + b"\x00" * 32).decode()
+
+
+def image_message(data):
+    return Message(role=MessageRole.USER, content=[
+        {"type": "text", "text": "screenshot"},
+        {"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": data}},
+    ])
+
+
+class Usage:
+    def __init__(self, input_tokens, cache_read_input_tokens=0, cache_creation_input_tokens=0):
+        self.input_tokens = input_tokens
+        self.output_tokens = 10
+        self.cache_read_input_tokens = cache_read_input_tokens
+        self.cache_creation_input_tokens = cache_creation_input_tokens
+
+
+class TestTokenCounter:
+
+    def test_message_count_is_memoized(self):
+        counter = TokenCounter()
+        message = Message.user("hello world " * 50)
+        first = counter.count_message(message)
+        assert counter.count_message(message) == first
+        assert counter.get_stats()["message_hits"] == 1
+
+    def test_in_place_edit_invalidates(self):
+        counter = TokenCounter()
+        message = image_message(png_b64(800, 600))
+        before = counter.count_message(message)
+        message.content.append({"type": "text", "text": "extra words " * 100})
+        assert counter.count_message(message) > before
+
+    def test_image_dimensions_from_header(self):
+        assert image_dimensions(png_b64(1280, 800)) == (1280, 800)
+        assert image_dimensions(jpeg_b64(640, 480)) == (640, 480)
+        assert image_dimensions("not an image") is None
+
+    def test_image_tokens_follow_resize_rules(self):
+        counter = TokenCounter()
+        screenshot = counter._estimate_image_tokens({"type": "image", "source": {"data": png_b64(1092, 1092)}})
+        assert screenshot == 1590
+        assert TokenCounter.image_tokens(100, 100) == TokenCounter.MIN_IMAGE_TOKENS
+        assert TokenCounter.image_tokens(1000, 750) == 1000
+        assert TokenCounter.image_tokens(3840, 2160) == TokenCounter.MAX_IMAGE_TOKENS
+
+    def test_heuristic_handles_cjk(self):
+        counter = TokenCounter()
+        assert counter._estimate_tokens("a" * 400) == 110
+        assert counter._estimate_tokens("中" * 150) == 110
+
+    def test_usage_calibrates_estimate(self):
+        counter = TokenCounter()
+        assert usage_input_tokens(Usage(100, cache_read_input_tokens=900)) == 1000
+        counter.calibrate(500, Usage(100, cache_read_input_tokens=900))
+        assert counter.calibration_factor == 2.0
+        assert counter.apply_calibration(250) == 500
+        # Tiny requests are too noisy to calibrate on
+        counter.calibrate(10, 1000)
+        assert counter.calibration_factor == 2.0
+
+
+class TestContextManagerRunningTotal:
+
+    def test_appends_count_only_new_messages(self):
+        counter = TokenCounter()
+        manager = ContextManager(TokenBudget(), counter=counter)
+        messages = [Message.user(f"message {i} " * 20) for i in range(5)]
+        total = manager.count_tokens(messages)
+        misses = counter.get_stats()["message_misses"]
+
+        messages.append(Message.user("one more " * 20))
+        assert manager.count_tokens(messages) > total
+        assert counter.get_stats()["message_misses"] == misses + 1
+        assert manager.count_tokens(messages) == counter.count_messages(messages)
+
+    def test_new_list_recounts_from_cache(self):
+        counter = TokenCounter()
+        manager = ContextManager(TokenBudget(), counter=counter)
+        messages = [Message.user(f"message {i} " * 20) for i in range(5)]
+        manager.count_tokens(messages)
+        misses = counter.get_stats()["message_misses"]
+
+        trimmed = messages[2:]
+        assert manager.count_tokens(trimmed) == counter.count_messages(trimmed)
+        assert counter.get_stats()["message_misses"] == misses
+
+    def test_record_usage_scales_usage_ratio(self):
+        counter = TokenCounter()
+        manager = ContextManager(TokenBudget(), counter=counter)
+        messages = [Message.user("word " * 400)]
+        raw = manager.count_tokens(messages)
+        manager.record_usage(raw * 2, messages)
+        assert manager.count_tokens(messages) == raw * 2
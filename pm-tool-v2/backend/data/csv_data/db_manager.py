@@ -8,6 +8,7 @@ SQLite数据库管理器
 import os
 import json
 import sqlite3
+import threading
 from typing import Dict, List, Optional, Tuple
 from datetime import datetime
 from contextlib import contextmanager
@@ -17,26 +18,51 @@ BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
 DB_PATH = os.path.join(BASE_DIR, "data", "pm_tool.db")
 
 
+# 每个新连接执行一次的 PRAGMA（WAL 允许读写并发，NORMAL 在 WAL 下仍然崩溃安全）
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode = WAL",
+    "PRAGMA synchronous = NORMAL",
+    "PRAGMA busy_timeout = 5000",
+    "PRAGMA temp_store = MEMORY",
+    "PRAGMA cache_size = -8192",
+)
+
+
 class DBManager:
     """数据库管理器"""
     
     def __init__(self, db_path: str = None):
         self.db_path = db_path or DB_PATH
+        self._local = threading.local()  # 每个线程复用一个连接（保留预编译语句缓存）
         self._init_db()
     
+    def _connection(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, cached_statements=256)
+            conn.row_factory = sqlite3.Row  # 返回字典式结果
+            for pragma in CONNECTION_PRAGMAS:
+                conn.execute(pragma)
+            self._local.conn = conn
+        return conn
+    
     @contextmanager
     def get_connection(self):
-        """获取数据库连接（上下文管理器）"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # 返回字典式结果
+        """获取当前线程的数据库连接（上下文管理器，成功提交、异常回滚）"""
+        conn = self._connection()
         try:
             yield conn
             conn.commit()
         except Exception:
             conn.rollback()
             raise
-        finally:
+    
+    def close(self):
+        """关闭当前线程的连接"""
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
             conn.close()
+            self._local.conn = None
     
     def _init_db(self):
         """初始化数据库表结构"""